@@ -0,0 +1,300 @@
+"""
+benchmarks/fixtures.py
+
+Deterministic, production-sized inputs for the benchmark cases in run.py.
+Every generator takes a scale factor (1.0 = roughly today's production
+volume) and a seed, so two runs of the suite time exactly the same data.
+
+Shapes mirror what the live APIs return / what the scripts store:
+  elevate_pages      Nelly Elevate landing-page responses (primaryList →
+                     productGroups → products → variants)
+  nelly_by_market    {market: {variant_key: extract_products_from_page() dict}}
+  rvrc_by_market     {market: {variant_key: RVRC variant dict with sale_last_week}}
+  ahlsell_snapshots  {date: {article: {"warehouses": {wid: qty}}}} + products
+  anoto_history      day partitions for core.snapshots (Anoto + Neo stores)
+  ted_notices        eForms award-notice XML documents
+  trends_sheets      wide Google Trends DataFrames
+"""
+from __future__ import annotations
+
+import random
+from datetime import date, timedelta
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+NELLY_VARIANTS  = 40_000   # per primary market at scale 1.0
+RVRC_VARIANTS   = 15_000   # per market
+AHLSELL_ARTS    = 150
+AHLSELL_WH      = 200
+AHLSELL_DAYS    = 30
+ANOTO_DAYS      = 120
+ANOTO_VARIANTS  = 300
+TED_NOTICES     = 200
+TED_LOTS        = 20
+NELLY_DAYS      = 365
+
+BRANDS = ["Nelly", "NLY Trend", "NLY One", "Levi's", "Calvin Klein", "Tommy Jeans", "Vero Moda",
+          "ONLY", "Adidas", "Nike", "Puma", "Guess", "Michael Kors", "Steve Madden", "NLY Man"]
+CATEGORIES = ["Kläder>Jeans", "Kläder>Klänningar", "Kläder>Toppar", "Kläder>Jackor", "Skor>Sneakers",
+              "Skor>Boots", "Accessoarer>Väskor", "Accessoarer>Smycken", "Sport>Tights", "Kläder>Byxor"]
+SIZES = ["XS", "S", "M", "L", "XL", "EU 36", "EU 38", "EU 40"]
+
+
+def _n(base: int, scale: float) -> int:
+    return max(1, int(base * scale))
+
+
+def _dates(n: int, end: date = date(2026, 9, 30)) -> list[str]:
+    return [(end - timedelta(days=n - 1 - i)).isoformat() for i in range(n)]
+
+
+# ── Nelly / Elevate ───────────────────────────────────────────────────────────
+
+def elevate_pages(scale: float = 1.0, seed: int = 1, per_page: int = 60) -> list[dict]:
+    """Landing-page responses holding ~NELLY_VARIANTS * scale variants in total."""
+    rng = random.Random(seed)
+    n_products = _n(NELLY_VARIANTS, scale) // 5
+    products = []
+    for i in range(n_products):
+        key = f"{260000 + i}-{rng.randint(1000, 9999)}"
+        sell = float(rng.choice([199, 249, 299, 399, 499, 599, 799]))
+        disc = rng.random() < 0.3
+        badges = [{"theme": "DISCOUNT"}] if disc else []
+        if rng.random() < 0.1:
+            badges.append({"theme": "NEW"})
+        cat = rng.choice(CATEGORIES)
+        products.append({
+            "key":          key,
+            "brand":        rng.choice(BRANDS),
+            "title":        f"Product {i}",
+            "sellingPrice": {"min": sell * (0.7 if disc else 1.0), "max": sell},
+            "listPrice":    {"min": sell, "max": sell},
+            "badges":       {"primary": badges, "secondary": []},
+            "custom":       {"categoryNode": [{"label": p} for p in cat.split(">")]},
+            "variants": [
+                {
+                    "key":          f"{key}-{s}",
+                    "label":        size,
+                    "stockNumber":  rng.randint(0, 60),
+                    "sellingPrice": sell * (0.7 if disc else 1.0),
+                    "listPrice":    sell,
+                    "custom":       {"historic_lowest_selling_price": str(sell * 0.6)},
+                }
+                for s, size in enumerate(rng.sample(SIZES, 5))
+            ],
+        })
+    return [
+        {"primaryList": {
+            "totalHits": n_products,
+            "productGroups": [{"products": [p]} for p in products[i:i + per_page]],
+        }}
+        for i in range(0, n_products, per_page)
+    ]
+
+
+def nelly_by_market(scale: float = 1.0, seed: int = 2) -> tuple[dict, dict]:
+    """(curr_by_market, last_snapshot) for compute_snapshot_summary."""
+    from track_nelly_inventory import MARKETS, extract_products_from_page
+
+    rng = random.Random(seed)
+    curr: dict[str, dict] = {}
+    last: dict[str, int] = {}
+    for i, (mc, cfg) in enumerate(MARKETS.items()):
+        if not cfg.get("primary"):
+            continue
+        variants: dict = {}
+        for page in elevate_pages(scale / 2, seed=seed * 100 + i):
+            variants.update(extract_products_from_page(page)[0])
+        curr[mc] = variants
+        for key, v in variants.items():
+            if rng.random() < 0.95:
+                last[f"{cfg['site']}/{key}"] = max(0, v["stock"] + rng.choice([-3, -1, 0, 0, 0, 1, 2, 15]))
+    # Non-primary markets list a subset of the primary keys (availability key sets).
+    for mc, cfg in MARKETS.items():
+        if cfg.get("primary"):
+            continue
+        primary = next(m for m, c in MARKETS.items() if c.get("primary") and c["site"] == cfg["site"])
+        curr[mc] = frozenset(k for k in curr[primary] if rng.random() < 0.7)
+    return curr, last
+
+
+def nelly_state(scale: float = 1.0, seed: int = 3) -> dict:
+    """state["daily_summary"] with NELLY_DAYS days of summaries for write_excel."""
+    rng = random.Random(seed)
+    entries = []
+    for d in _dates(_n(NELLY_DAYS, min(scale, 1.0))):
+        events = [
+            {"key": f"{rng.randint(260000, 270000)}-1", "site": "Nelly", "brand": rng.choice(BRANDS),
+             "title": "Product", "category": rng.choice(CATEGORIES), "size": "M",
+             "stock_before": 2, "stock_after": 30, "delta": 28, "sell_price_sek": 299.0}
+            for _ in range(rng.randint(5, 40))
+        ]
+        entries.append({"date": d, "summary": {
+            "est_sold_today_sek": rng.uniform(2e5, 6e5),
+            "est_sold_today_list_sek": rng.uniform(3e5, 8e5),
+            "returns": rng.randint(50, 400), "restocks": len(events),
+            "by_category": {c: {"sell_rev_sek": rng.uniform(0, 5e4), "list_rev_sek": rng.uniform(0, 6e4)}
+                            for c in CATEGORIES},
+            "by_brand": {b: {"sell_rev_sek": rng.uniform(0, 5e4), "list_rev_sek": rng.uniform(0, 6e4)}
+                         for b in BRANDS},
+            "by_site": {s: {"sell_rev_sek": 1.0, "list_rev_sek": 1.0, "est_sold_units": 10}
+                        for s in ("Nelly", "NlyMan")},
+            "restock_events": events, "return_events": events[: len(events) // 2],
+        }})
+    return {"daily_summary": entries}
+
+
+# ── RevolutionRace ────────────────────────────────────────────────────────────
+
+def rvrc_by_market(scale: float = 1.0, seed: int = 4) -> dict[str, dict]:
+    from track_rvrc_inventory import MARKETS
+
+    rng = random.Random(seed)
+    n_colours = _n(RVRC_VARIANTS, scale) // 6
+    base = [(f"{10000 + i}_{2000 + rng.randint(0, 40)}", rng.choice(CATEGORIES),
+             rng.choice([0, 0, 3, 12, 40, 150]), rng.choice([59.9, 89.9, 129.9, 199.9]))
+            for i in range(n_colours)]
+    out: dict[str, dict] = {}
+    for mc in MARKETS:
+        out[mc] = {
+            f"{b}-{size}": {"sale_last_week": slw, "sell_price": price * (0.8 if slw > 20 else 1.0),
+                            "list_price": price, "category": cat, "title": f"Jacket {b}"}
+            for b, cat, slw, price in base
+            for size in SIZES[:6]
+        }
+    return out
+
+
+# ── Ahlsell / Plejd ───────────────────────────────────────────────────────────
+
+def ahlsell_snapshots(scale: float = 1.0, seed: int = 5) -> tuple[dict, dict]:
+    """({date: {article: {"warehouses": {wid: qty}}}}, products) for compute_deltas."""
+    rng = random.Random(seed)
+    arts = [str(7000000 + i) for i in range(_n(AHLSELL_ARTS, scale))]
+    names = ["LED-panel 600x600", "Dimmer 250W", "Downlight 8W", "Termostat golv", "Relä"]
+    products = {a: {"product_name": rng.choice(names)} for a in arts}
+    stocking = {a: rng.sample(range(1, AHLSELL_WH + 1), int(AHLSELL_WH * 0.6)) for a in arts}
+    level = {(a, w): float(rng.randint(0, 50)) for a in arts for w in stocking[a]}
+    snapshots: dict[str, dict] = {}
+    for d in _dates(AHLSELL_DAYS):
+        for k in level:
+            if rng.random() < 0.1:
+                level[k] = max(0.0, level[k] + rng.choice([-2, -1, -1, 1, 10]))
+        snapshots[d] = {a: {"warehouses": {str(w): level[(a, w)] for w in stocking[a]}} for a in arts}
+    return snapshots, products
+
+
+# ── Anoto / Neo (core.snapshots) ──────────────────────────────────────────────
+
+def anoto_history(scale: float = 1.0, seed: int = 6) -> Iterator[tuple[str, dict, list[dict]]]:
+    """(date, header, rows) partitions, ANOTO_DAYS days of ANOTO_VARIANTS variants."""
+    rng = random.Random(seed)
+    n = _n(ANOTO_VARIANTS, scale)
+    titles = [f"Pen {i % 40}" for i in range(n)]
+    for d in _dates(ANOTO_DAYS):
+        rows = []
+        by_product: dict[str, dict] = {}
+        for i in range(n):
+            sold = rng.choice([0, 0, 0, 1, 2])
+            rows.append({"product_title": titles[i], "variant_title": f"V{i}", "sku": f"SKU{i}",
+                         "price": 149.0, "stock_curr": 40 - sold, "stock_prev": 40, "delta": -sold,
+                         "est_sold": sold, "est_rev": sold * 149.0})
+            bp = by_product.setdefault(titles[i], {"est_sold_units": 0, "est_rev": 0.0})
+            bp["est_sold_units"] += sold
+            bp["est_rev"] += sold * 149.0
+        header = {"timestamp": f"{d}T02:00:00", "summary": {
+            "est_sold_units": sum(r["est_sold"] for r in rows),
+            "est_revenue": sum(r["est_rev"] for r in rows),
+            "restocks": 0, "by_product": by_product,
+        }}
+        yield d, header, rows
+
+
+# ── TED eForms ────────────────────────────────────────────────────────────────
+
+_TED_NS = (
+    'xmlns="urn:oasis:names:specification:ubl:schema:xsd:ContractAwardNotice-2" '
+    'xmlns:cbc="urn:oasis:names:specification:ubl:schema:xsd:CommonBasicComponents-2" '
+    'xmlns:cac="urn:oasis:names:specification:ubl:schema:xsd:CommonAggregateComponents-2" '
+    'xmlns:efac="http://data.europa.eu/p27/eforms-ubl-extension-aggregate-components/1" '
+    'xmlns:efbc="http://data.europa.eu/p27/eforms-ubl-extension-basic-components/1"'
+)
+
+
+def ted_notices(scale: float = 1.0, seed: int = 7, company: str = "EQL Pharma AB") -> list[bytes]:
+    """TED_NOTICES * scale award notices with TED_LOTS lots and 3-8 tenders per lot."""
+    rng = random.Random(seed)
+    docs = []
+    for _ in range(_n(TED_NOTICES, scale)):
+        orgs = [company] + [f"Competitor {j} AB" for j in range(12)]
+        org_xml = "".join(
+            f"<efac:Organization><efac:Company><cac:PartyIdentification><cbc:ID>ORG-{j:04d}</cbc:ID>"
+            f"</cac:PartyIdentification><cac:PartyName><cbc:Name>{name}</cbc:Name></cac:PartyName>"
+            f"</efac:Company></efac:Organization>"
+            for j, name in enumerate(orgs)
+        )
+        party_xml = "".join(
+            f"<efac:TenderingParty><cbc:ID>TPA-{j:04d}</cbc:ID><efac:Tenderer><cbc:ID>ORG-{j:04d}</cbc:ID>"
+            f"</efac:Tenderer></efac:TenderingParty>"
+            for j in range(len(orgs))
+        )
+        lots, tenders, results, contracts = [], [], [], []
+        t = 0
+        for lot in range(TED_LOTS):
+            lid = f"LOT-{lot:04d}"
+            lots.append(
+                f"<cac:ProcurementProjectLot><cbc:ID>{lid}</cbc:ID><cac:ProcurementProject>"
+                f"<cbc:Name>Substance {lot}</cbc:Name><cac:PlannedPeriod><cbc:StartDate>2026-01-01+01:00"
+                f"</cbc:StartDate><cbc:EndDate>2028-12-31+01:00</cbc:EndDate></cac:PlannedPeriod>"
+                f"</cac:ProcurementProject></cac:ProcurementProjectLot>"
+            )
+            parties = rng.sample(range(len(orgs)), rng.randint(3, 8))
+            ids = []
+            for p in parties:
+                tid = f"TEN-{t:04d}"
+                t += 1
+                ids.append(tid)
+                tenders.append(
+                    f"<efac:LotTender><cbc:ID>{tid}</cbc:ID><cac:LegalMonetaryTotal>"
+                    f"<cbc:PayableAmount currencyID=\"SEK\">{rng.randint(10_000, 5_000_000)}</cbc:PayableAmount>"
+                    f"</cac:LegalMonetaryTotal><efac:TenderLot><cbc:ID>{lid}</cbc:ID></efac:TenderLot>"
+                    f"<efac:TenderingParty><cbc:ID>TPA-{p:04d}</cbc:ID></efac:TenderingParty></efac:LotTender>"
+                )
+            winner = ids[0]
+            results.append(
+                f"<efac:LotResult><cbc:TenderResultCode>selec-w</cbc:TenderResultCode>"
+                f"<efac:LotTender><cbc:ID>{winner}</cbc:ID></efac:LotTender>"
+                f"<efac:TenderLot><cbc:ID>{lid}</cbc:ID></efac:TenderLot></efac:LotResult>"
+            )
+            contracts.append(
+                f"<efac:SettledContract><cbc:ID>CON-{lot:04d}</cbc:ID><efac:LotTender><cbc:ID>{winner}"
+                f"</cbc:ID></efac:LotTender></efac:SettledContract>"
+            )
+        docs.append((
+            f"<ContractAwardNotice {_TED_NS}><cac:ProcurementProject><cac:RequestedTenderTotal>"
+            f"<cbc:EstimatedOverallContractAmount currencyID=\"SEK\">90000000</cbc:EstimatedOverallContractAmount>"
+            f"</cac:RequestedTenderTotal></cac:ProcurementProject>{''.join(lots)}"
+            f"<efac:NoticeResult><cbc:TotalAmount currencyID=\"SEK\">50000000</cbc:TotalAmount>"
+            f"{''.join(results)}{''.join(tenders)}{''.join(contracts)}</efac:NoticeResult>"
+            f"<efac:Organizations>{org_xml}</efac:Organizations>{party_xml}</ContractAwardNotice>"
+        ).encode("utf-8"))
+    return docs
+
+
+# ── Google Trends ─────────────────────────────────────────────────────────────
+
+def trends_sheets(scale: float = 1.0, seed: int = 8, n_sheets: int = 8) -> dict[str, pd.DataFrame]:
+    """n_sheets wide frames: ~20 years of months x 60*scale series, ~5% NaN."""
+    rng = np.random.default_rng(seed)
+    months = pd.date_range("2006-01-01", periods=240, freq="MS")
+    n_series = _n(60, scale)
+    sheets = {}
+    for s in range(n_sheets):
+        values = rng.uniform(0, 100, size=(len(months), n_series)).round(0)
+        values[rng.random(values.shape) < 0.05] = np.nan
+        df = pd.DataFrame(values, columns=[f"term_{s}_{i}" for i in range(n_series)])
+        df.insert(0, "Date", months)
+        sheets[f"sheet{s}"] = df
+    return sheets
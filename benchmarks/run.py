@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+benchmarks/run.py
+
+Times the parsing, delta and report hot paths on generated, production-sized
+fixtures (benchmarks/fixtures.py) — no network, no database. Each case
+reports its best and median wall time over --repeat runs plus its peak
+traced Python memory (one extra run under tracemalloc, so tracing overhead
+never skews the timings), and is compared against benchmarks/baseline.json.
+
+A case regresses when its best time exceeds the baseline by more than
+--max-slowdown (default 1.5x) or its peak memory by more than
+--max-mem-growth (default 1.25x). With --check the script exits 1 on any
+regression. Baselines are only comparable on the same scale and similar
+hardware, so CI (shared GitHub runners, not the machine baseline.json was
+recorded on) runs without --check and only reports; use --check locally
+against a baseline you recorded yourself with --save-baseline.
+
+ahlsell_compute_deltas times the reference implementation;
+ahlsell_backfill_deltas is what the daily run actually executes.
+
+Usage
+-----
+  python benchmarks/run.py                       # all cases, compare with baseline
+  python benchmarks/run.py --only ted_parse_eforms,nelly_extract_products
+  python benchmarks/run.py --scale 0.1           # quick smoke run (no comparison)
+  python benchmarks/run.py --check               # exit 1 on regression (same machine as baseline)
+  python benchmarks/run.py --save-baseline       # record baseline.json
+  python benchmarks/run.py --list
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, NamedTuple
+
+BENCH_DIR  = Path(__file__).resolve().parent
+SCRIPT_DIR = BENCH_DIR.parent / "scripts"
+BASELINE   = BENCH_DIR / "baseline.json"
+
+sys.path.insert(0, str(SCRIPT_DIR))
+sys.path.insert(0, str(BENCH_DIR))
+
+import fixtures  # noqa: E402
+
+SCALE = 1.0   # set from --scale before any case runs
+WORK  = Path(tempfile.mkdtemp(prefix="scraper-bench-"))
+
+
+class Case(NamedTuple):
+    name:  str
+    setup: Callable[[], tuple]     # untimed; called before every run, returns fn's args
+    fn:    Callable[..., Any]
+
+
+# ── Fixtures (built once per process) ─────────────────────────────────────────
+
+@lru_cache(maxsize=None)
+def _elevate_pages():
+    return fixtures.elevate_pages(SCALE)
+
+
+@lru_cache(maxsize=None)
+def _nelly_markets():
+    return fixtures.nelly_by_market(SCALE)
+
+
+@lru_cache(maxsize=None)
+def _rvrc_markets():
+    return fixtures.rvrc_by_market(SCALE)
+
+
+@lru_cache(maxsize=None)
+def _ahlsell():
+    return fixtures.ahlsell_snapshots(SCALE)
+
+
+@lru_cache(maxsize=None)
+def _ahlsell_store():
+    """The same snapshots as a core.snapshots store, as the daily run reads them."""
+    from core.snapshots import SnapshotStore
+    snapshots, products = _ahlsell()
+    store = SnapshotStore("ahlsell_plejd", root=WORK / "snapshots")
+    for d, snap in snapshots.items():
+        store.put(d, [{"article": art, **entry} for art, entry in snap.items()])
+    return store, products
+
+
+@lru_cache(maxsize=None)
+def _ted():
+    return fixtures.ted_notices(SCALE)
+
+
+@lru_cache(maxsize=None)
+def _trends():
+    return fixtures.trends_sheets(SCALE)
+
+
+@lru_cache(maxsize=None)
+def _trends_rows_and_current():
+    from core.trends import trends_to_rows
+    rows = trends_to_rows("bench", _trends(), "2026-09-30T00:00:00+00:00")
+    # Stored state as of "last run": every month known, the last 2% changed.
+    current = {(r[1], r[2], r[3]): r[4] for r in rows}
+    for r in rows[-len(rows) // 50:]:
+        current[(r[1], r[2], r[3])] = r[4] + 1
+    return rows, current
+
+
+@lru_cache(maxsize=None)
+def _anoto_stores():
+    from core.snapshots import SnapshotStore
+    root = WORK / "snapshots"
+    stores = []
+    for name, currency in (("anoto_inventory", "USD"), ("neo_inventory", "SEK")):
+        store = SnapshotStore(name, root=root)
+        for d, header, rows in fixtures.anoto_history(SCALE):
+            store.put(d, rows, header)
+        store.save_meta({"product_catalog": {"p": {"currency": currency}}})
+        stores.append(store)
+    return tuple(stores)
+
+
+def _fresh_xlsx(module, name: str) -> Path:
+    """Point module.XLSX_PATH at an empty temp path (no sheet cache to hit)."""
+    path = WORK / "xlsx" / name
+    if path.parent.exists():
+        shutil.rmtree(path.parent)
+    path.parent.mkdir(parents=True)
+    module.XLSX_PATH = path
+    return path
+
+
+# ── Cases ─────────────────────────────────────────────────────────────────────
+
+def _cases() -> list[Case]:
+    import fetch_ted_procurements as ted
+    import track_ahlsell_plejd_inventory as plejd
+    import track_anoto_inventory as anoto
+    import track_nelly_inventory as nelly
+    import track_rvrc_inventory as rvrc
+    from core.trends import _changed_rows, trends_to_rows
+
+    def nelly_extract(pages):
+        for page in pages:
+            nelly.extract_products_from_page(page)
+
+    def ted_parse(docs):
+        for doc in docs:
+            ted.parse_eforms_xml(doc, "EQL Pharma AB")
+
+    def nelly_excel_setup():
+        _fresh_xlsx(nelly, "nelly.xlsx")
+        summary, detail_rows, _, _ = nelly.compute_snapshot_summary(*_nelly_markets())
+        return fixtures.nelly_state(SCALE), detail_rows
+
+    def anoto_excel_setup():
+        _fresh_xlsx(anoto, "anoto.xlsx")
+        return _anoto_stores()
+
+    def rvrc_excel_setup():
+        _fresh_xlsx(rvrc, "rvrc.xlsx")
+        per_pc = rvrc.compute_daily_from_slw(_rvrc_markets(), {"SEK": 1.0, "EUR": 11.5, "NOK": 0.97, "GBP": 13.0})[0]
+        state = {"daily_sales": [{"date": "2026-09-30", "estimated_units_daily": 1.0,
+                                  "fx_rates": {"EUR": 11.5}, "by_category": {}}]}
+        return state, per_pc
+
+    fx = {"SEK": 1.0, "EUR": 11.5, "NOK": 0.97, "GBP": 13.0}
+    return [
+        Case("nelly_extract_products",   lambda: (_elevate_pages(),), nelly_extract),
+        Case("nelly_snapshot_summary",   _nelly_markets, nelly.compute_snapshot_summary),
+        Case("rvrc_daily_from_slw",      lambda: (_rvrc_markets(), fx), rvrc.compute_daily_from_slw),
+        Case("ahlsell_compute_deltas",   _ahlsell, plejd.compute_deltas),
+        Case("ahlsell_backfill_deltas",  _ahlsell_store, plejd.backfill_deltas),
+        Case("ted_parse_eforms",         lambda: (_ted(),), ted_parse),
+        Case("trends_to_rows",           lambda: ("bench", _trends(), "2026-09-30T00:00:00+00:00"), trends_to_rows),
+        Case("trends_changed_rows",      _trends_rows_and_current, _changed_rows),
+        Case("nelly_write_excel",        nelly_excel_setup, nelly.write_excel),
+        Case("anoto_write_excel",        anoto_excel_setup, anoto.write_excel),
+        Case("rvrc_write_excel",         rvrc_excel_setup, rvrc.write_excel),
+    ]
+
+
+# ── Runner ────────────────────────────────────────────────────────────────────
+
+def _run_case(case: Case, repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        args = case.setup()
+        gc.collect()
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            case.fn(*args)
+            times.append(time.perf_counter() - t0)
+
+    args = case.setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            case.fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds":        round(min(times), 4),
+        "median_seconds": round(statistics.median(times), 4),
+        "peak_mb":        round(peak / 2**20, 2),
+    }
+
+
+def _compare(name: str, result: dict, base: dict, max_slowdown: float, max_mem_growth: float) -> list[str]:
+    problems = []
+    if result["seconds"] > base["seconds"] * max_slowdown:
+        problems.append(f"time {result['seconds']:.3f}s vs baseline {base['seconds']:.3f}s")
+    if result["peak_mb"] > base["peak_mb"] * max_mem_growth + 1.0:
+        problems.append(f"memory {result['peak_mb']:.1f} MB vs baseline {base['peak_mb']:.1f} MB")
+    return problems
+
+
+def main() -> None:
+    global SCALE
+    ap = argparse.ArgumentParser(description="Benchmark parsing/delta/report hot paths.")
+    ap.add_argument("--only", default="", help="Comma-separated case names (default: all)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--scale", type=float, default=1.0, help="Fixture size relative to production")
+    ap.add_argument("--baseline", default=str(BASELINE))
+    ap.add_argument("--save-baseline", action="store_true", help="Write results as the new baseline")
+    ap.add_argument("--check", action="store_true", help="Exit 1 if any case regressed")
+    ap.add_argument("--max-slowdown", type=float, default=1.5)
+    ap.add_argument("--max-mem-growth", type=float, default=1.25)
+    ap.add_argument("--json", default=None, help="Also write results to this file")
+    ap.add_argument("--list", action="store_true")
+    args = ap.parse_args()
+    SCALE = args.scale
+
+    cases = _cases()
+    if args.list:
+        for c in cases:
+            print(c.name)
+        return
+    if args.only:
+        wanted = {n.strip() for n in args.only.split(",") if n.strip()}
+        unknown = wanted - {c.name for c in cases}
+        if unknown:
+            ap.error(f"unknown case(s): {', '.join(sorted(unknown))}")
+        cases = [c for c in cases if c.name in wanted]
+
+    baseline_path = Path(args.baseline)
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8")) if baseline_path.exists() else {}
+    comparable = baseline.get("scale") == SCALE
+    if baseline and not comparable:
+        print(f"Baseline is for scale {baseline.get('scale')}, not {SCALE} — not comparing.")
+
+    print(f"{'case':<26} {'best s':>9} {'median s':>9} {'peak MB':>9}  vs baseline")
+    results: dict[str, dict] = {}
+    regressions: dict[str, list[str]] = {}
+    try:
+        for case in cases:
+            r = results[case.name] = _run_case(case, args.repeat)
+            base = baseline.get("cases", {}).get(case.name) if comparable else None
+            if base:
+                ratio = f"{r['seconds'] / base['seconds']:.2f}x time, {r['peak_mb'] / max(base['peak_mb'], 0.01):.2f}x mem"
+                problems = _compare(case.name, r, base, args.max_slowdown, args.max_mem_growth)
+                if problems:
+                    regressions[case.name] = problems
+                    ratio += "  REGRESSION"
+            else:
+                ratio = "-"
+            print(f"{case.name:<26} {r['seconds']:>9.3f} {r['median_seconds']:>9.3f} {r['peak_mb']:>9.1f}  {ratio}")
+    finally:
+        shutil.rmtree(WORK, ignore_errors=True)
+
+    out = {"scale": SCALE, "python": sys.version.split()[0], "cases": results}
+    if args.json:
+        Path(args.json).write_text(json.dumps(out, indent=2) + "\n", encoding="utf-8")
+    if args.save_baseline:
+        if comparable:
+            out["cases"] = {**baseline.get("cases", {}), **results}
+        baseline_path.write_text(json.dumps(out, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline written -> {baseline_path}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s):")
+        for name, problems in regressions.items():
+            print(f"  {name}: {'; '.join(problems)}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,9 @@
 from playwright.sync_api import sync_playwright, TimeoutError as PWTimeout
 from statistics import median
 from datetime import date
-import os, re, sys, requests, json, time, argparse
+import os, re, sys, json, time, argparse
 
+from core.fx import sek_rates
 from excel_utils import append_row  # <-- skriver till Excel (oförändrat)
 
 # ------------ Config ------------
@@ -322,29 +323,6 @@ def discover_pagination_urls(page, cid: str):
         return int(m.group(1)) if m else 1
     return sorted(urls, key=page_key)
 
-def fetch_fx_local_to_sek(currencies):
-    need = sorted({c for c in currencies if c and c != "SEK"})
-    out = {c: 1.0 for c in currencies}
-    if not need: return out
-    try:
-        r = requests.get("https://open.er-api.com/v6/latest/SEK", timeout=15)
-        r.raise_for_status(); data = r.json()
-        if data.get("result") == "success":
-            rates = data.get("rates", {})
-            for c in need:
-                per_sek = float(rates[c]); out[c] = 1.0/per_sek if per_sek else 1.0
-            print("\nFX (open.er-api.com):"); [print(f"  {c} → SEK = {out[c]:.4f}") for c in need]
-            return out
-    except Exception as e:
-        print(f"FX provider 1 failed ({e}); trying fallback…")
-    symbols = ",".join(need)
-    r = requests.get(f"https://api.exchangerate.host/latest?base=SEK&symbols={symbols}", timeout=15)
-    r.raise_for_status(); rates = r.json().get("rates", {})
-    for c in need:
-        per_sek = float(rates[c]); out[c] = 1.0/per_sek if per_sek else 1.0
-    print("\nFX (exchangerate.host):"); [print(f"  {c} → SEK = {out[c]:.4f}") for c in need]
-    return out
-
 # --- Excel-append (oförändrat) ---
 def append_wide_row(xlsx_path, sheet_name, dt, all_median_sek, per_country_values):
     header = ["date", "All (SEK)"] + [f"{c} (SEK)" for c in COUNTRY_ORDER]
@@ -372,7 +350,7 @@ def main():
     else:
         countries = COUNTRY_ORDER
 
-    fx = fetch_fx_local_to_sek({COUNTRY_CCY[c] for c in countries})
+    fx = sek_rates({COUNTRY_CCY[c] for c in countries})
 
     with sync_playwright() as p:
         # 1) Testa befintligt state
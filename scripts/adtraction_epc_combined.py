@@ -4,9 +4,11 @@
 from playwright.sync_api import sync_playwright, TimeoutError as PWTimeout
 from statistics import median
 from datetime import date
-import os, re, time, json, argparse, requests, urllib.parse as _url
+import os, re, time, json, argparse, urllib.parse as _url
 from openpyxl import Workbook, load_workbook
 
+from core.fx import sek_rates
+
 BASE_ROOT = "https://secure.adtraction.com"
 BASE = f"{BASE_ROOT}/partner"
 STATE_PATH = "adtraction_state.json"
@@ -276,32 +278,6 @@ def auto_login_and_save_state(p, email: str, password: str, headless: bool = Tru
     context.close(); browser.close()
     return ok
 
-# ---------- FX ----------
-def fetch_fx_local_to_sek(currencies):
-    need = sorted({c for c in currencies if c and c != "SEK"})
-    out = {c: 1.0 for c in currencies}
-    if not need: return out
-    try:
-        r = requests.get("https://open.er-api.com/v6/latest/SEK", timeout=15)
-        r.raise_for_status(); data = r.json()
-        if data.get("result") == "success":
-            rates = data.get("rates", {})
-            for c in need:
-                per_sek = float(rates[c]); out[c] = 1.0/per_sek if per_sek else 1.0
-            print("\nFX (open.er-api.com):")
-            for c in need: print(f"  {c}→SEK = {out[c]:.4f}")
-            return out
-    except Exception as e:
-        print(f"FX provider 1 failed ({e}); trying fallback…")
-    symbols = ",".join(need)
-    r = requests.get(f"https://api.exchangerate.host/latest?base=SEK&symbols={symbols}", timeout=15)
-    r.raise_for_status(); rates = r.json().get("rates", {})
-    for c in need:
-        per_sek = float(rates[c]); out[c] = 1.0/per_sek if per_sek else 1.0
-    print("\nFX (exchangerate.host):")
-    for c in need: print(f"  {c}→SEK = {out[c]:.4f}")
-    return out
-
 # ---------- Excel ----------
 def ensure_book_and_sheets(path):
     os.makedirs(os.path.dirname(path), exist_ok=True)
@@ -454,7 +430,7 @@ def main():
             sel.extend([c for c in COUNTRY_ORDER if r.lower() in c.lower()])
         seen=set(); countries=[c for c in sel if not (c in seen or seen.add(c))] or COUNTRY_ORDER
 
-    fx = fetch_fx_local_to_sek({COUNTRY_CCY[c] for c in countries})
+    fx = sek_rates({COUNTRY_CCY[c] for c in countries})
     ensure_book_and_sheets(XLSX_PATH)
     today = date.today().isoformat()
 
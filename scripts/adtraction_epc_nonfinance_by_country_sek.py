@@ -1,11 +1,13 @@
 from playwright.sync_api import sync_playwright, TimeoutError as PWTimeout
 from statistics import median
 from datetime import date
-import os, re, sys, requests, json, time, argparse
+import os, re, sys, json, time, argparse
 
 # NEW: Excel writing
 from openpyxl import Workbook, load_workbook
 
+from core.fx import sek_rates
+
 # -------- Config --------
 BASE_ROOT = "https://secure.adtraction.com"
 BASE = f"{BASE_ROOT}/partner"
@@ -272,31 +274,6 @@ def interactive_login_and_save_state(p):
     context.close(); browser.close()
 # ----------------------------------------
 
-def fetch_fx_local_to_sek(currencies):
-    need = sorted({c for c in currencies if c and c != "SEK"})
-    out = {c: 1.0 for c in currencies}
-    if not need: return out
-    try:
-        r = requests.get("https://open.er-api.com/v6/latest/SEK", timeout=15)
-        r.raise_for_status(); data = r.json()
-        if data.get("result") == "success":
-            rates = data.get("rates", {})
-            for c in need:
-                per_sek = float(rates[c]); out[c] = 1.0/per_sek if per_sek else 1.0
-            print("\nFX (open.er-api.com):")
-            for c in need: print(f"  {c}→SEK = {out[c]:.4f}")
-            return out
-    except Exception as e:
-        print(f"FX provider 1 failed ({e}); trying fallback…")
-    symbols = ",".join(need)
-    r = requests.get(f"https://api.exchangerate.host/latest?base=SEK&symbols={symbols}", timeout=15)
-    r.raise_for_status(); rates = r.json().get("rates", {})
-    for c in need:
-        per_sek = float(rates[c]); out[c] = 1.0/per_sek if per_sek else 1.0
-    print("\nFX (exchangerate.host):")
-    for c in need: print(f"  {c}→SEK = {out[c]:.4f}")
-    return out
-
 # ===== Excel helpers (replace CSV) =====
 def ensure_xlsx_header(path):
     os.makedirs(os.path.dirname(path), exist_ok=True)
@@ -336,7 +313,7 @@ def main():
     else:
         countries = COUNTRY_ORDER
 
-    fx = fetch_fx_local_to_sek({COUNTRY_CCY[c] for c in countries})
+    fx = sek_rates({COUNTRY_CCY[c] for c in countries})
     cache = load_cache()
 
     with sync_playwright() as p:
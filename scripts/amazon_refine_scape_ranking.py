@@ -4,7 +4,6 @@ import re
 import os
 from datetime import date
 from pathlib import Path
-from playwright.async_api import async_playwright
 
 try:
     import openpyxl
@@ -12,6 +11,8 @@ except ImportError:
     print("Du måste installera openpyxl: pip install openpyxl")
     exit()
 
+from core.browser import BlockRules, BrowserPool, goto_dom_ready
+
 # ── KONFIGURATION ──────────────────────────────────────────────────────────
 SCRIPT_DIR = Path(__file__).resolve().parent
 DATA_DIR = (SCRIPT_DIR / ".." / "data").resolve()
@@ -47,6 +48,13 @@ UAS = [
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_0) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Safari/605.1.15",
 ]
 
+# Amazons egna telemetri-/reklamvärdar – blockeras tillsammans med bilder,
+# typsnitt och media (vi läser bara text ur DOM:en).
+BLOCK = BlockRules().with_hosts(
+    "fls-na.amazon.com", "fls-eu.amazon.de", "unagi.amazon.com", "unagi.amazon.de",
+    "unagi-na.amazon.com", "unagi-eu.amazon.com",
+)
+
 # ───────────────────────────────────────────────────────────────────────────
 
 def extract_rank_from_row_text(row_text: str) -> int:
@@ -96,15 +104,14 @@ async def handle_blockers(page):
     except:
         pass
 
-async def get_product_rank(context, asin: str, domain: str, gl: str, name: str):
-    page = await context.new_page()
+async def get_product_rank(page, asin: str, domain: str, gl: str, name: str):
     url = f"https://www.{domain}/dp/{asin}?th=1&psc=1&gl={gl}"
     print(f"  Fetching Rank for {name} ({domain})...")
 
     rank_val = 0
 
     try:
-        await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+        await goto_dom_ready(page, url, timeout_ms=30000)
         await handle_blockers(page)
 
         # --- RANKING LOGIK ---
@@ -144,8 +151,6 @@ async def get_product_rank(context, asin: str, domain: str, gl: str, name: str):
     except Exception as e:
         print(f"    ❌ Error: {e}")
         return 0
-    finally:
-        await page.close()
 
 def append_to_excel(data_dict):
     file_exists = os.path.exists(XLSX_PATH)
@@ -185,38 +190,39 @@ async def run_once():
     today = date.today().isoformat()
     results = {"Date": today}
 
-    async with async_playwright() as pw:
-        browser = await pw.chromium.launch(headless=HEADLESS)
+    async with BrowserPool(headless=HEADLESS, args=[], hide_webdriver=False) as pool:
         print(f"--- Starting Rank-Only Scraper ({today}) ---")
 
+        # En context per marknad, alla produkter parallellt (per-domän-tak i poolen)
+        jobs = []
         for code, domain, accept_lang, gl, locale, ck_name, ck_value in COUNTRIES:
-            print(f"\n--- Market: {code} ({domain}) ---")
-            
-            context = await browser.new_context(
+            pool.add_context(
+                code, domain,
+                cookies=[{
+                    "name": ck_name, "value": ck_value,
+                    "domain": f".{domain}", "path": "/",
+                    "secure": True, "httpOnly": False
+                }],
+                block=BLOCK,
                 locale=locale,
                 user_agent=random.choice(UAS),
                 java_script_enabled=True,
                 viewport={"width": 1366, "height": 850},
                 extra_http_headers={"Accept-Language": accept_lang},
             )
-            await context.add_cookies([{
-                "name": ck_name, "value": ck_value,
-                "domain": f".{domain}", "path": "/",
-                "secure": True, "httpOnly": False
-            }])
-
             for prod_name, asin in PRODUCTS:
-                full_name = f"{prod_name} {code}"
-                
-                # Hämtar enbart rank
-                rank = await get_product_rank(context, asin, domain, gl, full_name)
-                
-                results[f"{full_name} Rank"] = rank
-                
-                await asyncio.sleep(random.randint(1, 3))
+                jobs.append((code, (asin, domain, gl, f"{prod_name} {code}")))
+
+        async def fetch(page, job):
+            # Hämtar enbart rank
+            asin, domain, gl, full_name = job
+            return await get_product_rank(page, asin, domain, gl, full_name)
+
+        for (_, job), rank in zip(jobs, await pool.run(jobs, fetch)):
+            results[f"{job[3]} Rank"] = rank
+
+        pool.print_stats()
 
-            await context.close()
-        await browser.close()
     append_to_excel(results)
 
 if __name__ == "__main__":
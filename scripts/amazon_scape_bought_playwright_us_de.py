@@ -4,7 +4,6 @@ import re
 import os
 from datetime import date
 from pathlib import Path
-from playwright.async_api import async_playwright
 
 try:
     import openpyxl
@@ -12,6 +11,7 @@ except ImportError:
     print("Du måste installera openpyxl: pip install openpyxl")
     exit()
 
+from core.browser import BlockRules, BrowserPool, goto_dom_ready
 from core.db import safe_insert
 
 # ── KONFIGURATION ──────────────────────────────────────────────────────────
@@ -56,6 +56,13 @@ BOUGHT_SELECTORS = [
     "div.social-proofing-faceout span.a-text-bold",              
 ]
 
+# Amazons egna telemetri-/reklamvärdar – blockeras tillsammans med bilder,
+# typsnitt och media (vi läser bara text ur DOM:en).
+BLOCK = BlockRules().with_hosts(
+    "fls-na.amazon.com", "fls-eu.amazon.de", "unagi.amazon.com", "unagi.amazon.de",
+    "unagi-na.amazon.com", "unagi-eu.amazon.com",
+)
+
 # ───────────────────────────────────────────────────────────────────────────
 
 def parse_number(text: str) -> int:
@@ -158,8 +165,7 @@ async def handle_amazon_blockers(page, domain="amazon.com"):
         except:
             pass
 
-async def get_product_data(context, asin: str, domain: str, gl: str, name: str):
-    page = await context.new_page()
+async def get_product_data(page, asin: str, domain: str, gl: str, name: str):
     url = f"https://www.{domain}/dp/{asin}?th=1&psc=1&gl={gl}"
     print(f"  Fetching {name} ({domain})...")
 
@@ -167,7 +173,7 @@ async def get_product_data(context, asin: str, domain: str, gl: str, name: str):
     rank_val = 0
 
     try:
-        await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+        await goto_dom_ready(page, url, timeout_ms=30000)
         
         # HÄR VAR FELET TIDIGARE - NU FIXAT:
         await handle_amazon_blockers(page, domain)
@@ -234,8 +240,6 @@ async def get_product_data(context, asin: str, domain: str, gl: str, name: str):
     except Exception as e:
         print(f"    ❌ Error: {e}")
         return 0, 0
-    finally:
-        await page.close()
 
 def append_to_excel(data_dict):
     file_exists = os.path.exists(XLSX_PATH)
@@ -295,36 +299,42 @@ async def run_once():
     today = date.today().isoformat()
     results = {"Date": today}
 
-    async with async_playwright() as pw:
-        # Start-maximized hjälper ofta med Amazon DE layouten
-        browser = await pw.chromium.launch(headless=HEADLESS, args=["--start-maximized"])
+    # Start-maximized hjälper ofta med Amazon DE layouten
+    async with BrowserPool(headless=HEADLESS, args=["--start-maximized"], hide_webdriver=False) as pool:
         print(f"--- Starting Final Combo Scraper (Fixed Name) ({today}) ---")
 
+        # En context per marknad (cookies sätts en gång), alla produkter parallellt
+        # upp till pool.per_domain_limit sidor per Amazon-domän.
+        jobs = []
         for code, domain, accept_lang, gl, locale, ck_name, ck_value in COUNTRIES:
-            print(f"\n--- Market: {code} ({domain}) ---")
-            
-            context = await browser.new_context(
+            pool.add_context(
+                code, domain,
+                cookies=[{
+                    "name": ck_name, "value": ck_value,
+                    "domain": f".{domain}", "path": "/",
+                    "secure": True, "httpOnly": False
+                }],
+                block=BLOCK,
                 locale=locale,
                 user_agent=random.choice(UAS),
                 java_script_enabled=True,
                 viewport={"width": 1920, "height": 1080},
                 extra_http_headers={"Accept-Language": accept_lang},
             )
-            await context.add_cookies([{
-                "name": ck_name, "value": ck_value,
-                "domain": f".{domain}", "path": "/",
-                "secure": True, "httpOnly": False
-            }])
-
             for prod_name, asin in PRODUCTS:
-                full_name = f"{prod_name} {code}"
-                bought, rank = await get_product_data(context, asin, domain, gl, full_name)
-                results[f"{full_name} Bought"] = bought
-                results[f"{full_name} Rank"] = rank
-                await asyncio.sleep(random.randint(2, 5))
-
-            await context.close()
-        await browser.close()
+                jobs.append((code, (asin, domain, gl, f"{prod_name} {code}")))
+
+        async def fetch(page, job):
+            asin, domain, gl, full_name = job
+            return await get_product_data(page, asin, domain, gl, full_name)
+
+        for (_, job), (bought, rank) in zip(jobs, await pool.run(jobs, fetch)):
+            full_name = job[3]
+            results[f"{full_name} Bought"] = bought
+            results[f"{full_name} Rank"] = rank
+
+        pool.print_stats()
+
     append_to_excel(results)
 
     db_rows_written, db_error = write_to_db(results)
@@ -1,18 +1,19 @@
 # backfill_plejd_sensortower_rankings.py
 #
 # ONE-TIME backfill: fetches 90 days of Plejd category ranking history
-# from the Sensor Tower internal API (no auth required) and writes each
-# date as a row into data/plejd_sensortower_rankings.xlsx.
+# from the Sensor Tower internal API (no auth required, see
+# core/sensortower.py) and writes each date as a row into
+# data/plejd_sensortower_rankings.xlsx.
 # Skips dates that are already present in the sheet.
 
 import sys
-from datetime import date, timedelta, datetime, timezone
+from datetime import date, timedelta
 from pathlib import Path
 
-import requests
 from openpyxl import load_workbook
 
 from excel_utils import append_row
+from core.sensortower import category_history
 
 # ── CONFIG ─────────────────────────────────────────────────────────────────────
 APP_ID      = "1032689423"
@@ -29,16 +30,6 @@ DATA_DIR.mkdir(exist_ok=True)
 XLSX_PATH  = str(DATA_DIR / "plejd_sensortower_rankings.xlsx")
 SHEET_NAME = "category_rankings"
 
-API_URL = "https://app.sensortower.com/api/ios/category/category_history"
-HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/124.0.0.0 Safari/537.36"
-    ),
-    "Referer": "https://app.sensortower.com/app-analysis/category-rankings",
-}
-
 # ── HELPERS ────────────────────────────────────────────────────────────────────
 
 def existing_dates() -> set[str]:
@@ -65,41 +56,7 @@ def fetch_history(start: str, end: str) -> dict[str, dict[str, int | None]]:
     Call the Sensor Tower category_history API for all countries at once.
     Returns: {date_str: {country: rank_or_None}}
     """
-    # Build query params — multiple values for the same key
-    params = [
-        ("app_ids[]", APP_ID),
-        ("categories[]", CATEGORY),
-        ("chart_type_ids[]", CHART_TYPE),
-        ("start_date", start),
-        ("end_date", end),
-        ("is_hourly", "false"),
-    ]
-    for cc in COUNTRIES:
-        params.append(("countries[]", cc))
-
-    resp = requests.get(API_URL, params=params, headers=HEADERS, timeout=30)
-    resp.raise_for_status()
-    data = resp.json()
-
-    # data structure: {app_id: {country: {category: {chart_type: {graphData: [[ts, rank, _], ...]}}}}}
-    # Convert to {date_str: {country: rank}}
-    by_date: dict[str, dict[str, int | None]] = {}
-    app_data = data.get(int(APP_ID), data.get(str(APP_ID), {}))
-
-    for cc in COUNTRIES:
-        country_data = app_data.get(cc, {})
-        cat_data = country_data.get(str(CATEGORY), country_data.get(int(CATEGORY), {}))
-        chart_data = cat_data.get(CHART_TYPE, {})
-        graph = chart_data.get("graphData", [])
-
-        for point in graph:
-            ts, rank = point[0], point[1]
-            dt_str = datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d")
-            if dt_str not in by_date:
-                by_date[dt_str] = {c: None for c in COUNTRIES}
-            by_date[dt_str][cc] = rank  # rank is already an int
-
-    return by_date
+    return category_history(APP_ID, CATEGORY, CHART_TYPE, COUNTRIES, start, end)
 
 
 # ── MAIN ───────────────────────────────────────────────────────────────────────
@@ -1,50 +1,38 @@
 #!/usr/bin/env python3
 """
-backfill_revolutionrace_history.py  (one-time run)
+backfill_revolutionrace_history.py
 
-Fetches individual review records from the RVRC GraphQL API to build a
-month-by-month histogram of review publication dates, going back as far
-as the API allows.
+Builds the month-by-month histogram of review publication dates, sliced by
+country / category / gender, from the local review store
+(core/rvrc_reviews.py, data/reviews/revolutionrace/).
 
 Strategy
 --------
-- Products with ≤9,000 reviews:  paginate ascending (oldest first) → full history.
-- Products with  >9,000 reviews:  paginate descending (newest first) up to 9,000
-                                   reviews → recent history (most useful for
-                                   understanding current run-rate).
-
-Fields fetched per review: publishedAt, channelId, item.parentItemCategory,
-item.gender  — so the histogram can be sliced by country/category/gender.
+- The store is synced first. On the very first run that is a full backfill
+  of every product (oldest first; products with >9,000 reviews are split by
+  channel so the server's skip limit no longer cuts their history). On every
+  later run it only fetches reviews newer than the stored watermark.
+- The histogram itself is computed locally from the stored reviews, so
+  re-running it, or adding a new slice, costs no extra API traffic.
 
 Output
 ------
   data/revolutionrace_monthly_history.json  – raw monthly buckets saved to disk
   data/revolutionrace_reviews.xlsx          – new sheet "MonthlyHistory" appended
 
-Runtime: ~6–10 min on a single machine (1,055 requests, throttled to 3 req/s
-         to avoid hammering the server).
+Runtime: first run ~6–10 min (full backfill); afterwards a few seconds.
 """
 
 import json
-import time
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Iterable
 
-import requests
 from openpyxl import load_workbook, Workbook
 
-# ── Config ─────────────────────────────────────────────────────────────────────
-GRAPHQL_URL = "https://reviews.revolutionrace.com/revolutionrace/graphql"
-GQL_HEADERS = {
-    "Content-Type": "application/json",
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-}
-MAX_SKIP       = 9000     # hard server limit
-TAKE           = 5000     # max page size that works
-WORKERS        = 4        # parallel product fetches (be gentle)
-DELAY_S        = 0.1      # per-request delay inside each worker
+from core.rvrc_reviews import MAX_SKIP, Review, ReviewStore, fetch_review_counts, sync
 
+# ── Config ─────────────────────────────────────────────────────────────────────
 CHANNEL_COUNTRIES = {
     "76302142-cd49-4c57-a48e-9217cf41c8b5": "DE",
     "3963b20d-4d89-4ddb-92dc-d0c897dc149a": "SE",
@@ -63,79 +51,18 @@ CHANNEL_COUNTRIES = {
 }
 
 SCRIPT_DIR    = Path(__file__).resolve().parent
-STATE_FILE    = (SCRIPT_DIR / ".." / "data" / "revolutionrace_state.json").resolve()
 HISTORY_FILE  = (SCRIPT_DIR / ".." / "data" / "revolutionrace_monthly_history.json").resolve()
 XLSX_PATH     = (SCRIPT_DIR / ".." / "data" / "revolutionrace_reviews.xlsx").resolve()
 
 
-# ── GraphQL helper ─────────────────────────────────────────────────────────────
-
-def gql(query: str, retries: int = 3) -> dict:
-    for attempt in range(retries):
-        try:
-            resp = requests.post(
-                GRAPHQL_URL, json={"query": query},
-                headers=GQL_HEADERS, timeout=30,
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            if "errors" in data:
-                raise ValueError(data["errors"][0]["message"])
-            return data
-        except Exception as e:
-            if attempt == retries - 1:
-                raise
-            time.sleep(2 ** attempt)
-
-
-# ── Per-product fetcher ────────────────────────────────────────────────────────
-
-REVIEW_FIELDS = "publishedAt channelId item { parentItemCategory gender }"
-
-def fetch_reviews_for_product(base_product: str, total_count: int) -> list[dict]:
-    """
-    Returns a list of review dicts {publishedAt, channelId, category, gender}.
-    For products > MAX_SKIP reviews, fetches the NEWEST reviews (descending).
-    For smaller products, fetches ALL reviews (ascending).
-    """
-    big = total_count > MAX_SKIP
-    sort_dir = "publishedAt_desc" if big else "publishedAt_asc"
-    max_to_fetch = MAX_SKIP if big else total_count
-
-    reviews = []
-    skip = 0
-    while skip < max_to_fetch:
-        take = min(TAKE, max_to_fetch - skip)
-        q = f"""{{
-          publicReviews(
-            take: {take}, skip: {skip},
-            filter: {{ item_baseProduct: ["{base_product}"] }},
-            sort: {{ order: [{sort_dir}] }}
-          ) {{ hits {{ {REVIEW_FIELDS} }} }}
-        }}"""
-        data = gql(q)
-        hits = data["data"]["publicReviews"]["hits"]
-        if not hits:
-            break
-        for h in hits:
-            reviews.append({
-                "month":    h["publishedAt"][:7],   # YYYY-MM
-                "channel":  h.get("channelId", ""),
-                "category": (h.get("item") or {}).get("parentItemCategory", ""),
-                "gender":   (h.get("item") or {}).get("gender", ""),
-                "is_big":   big,
-            })
-        skip += take
-        time.sleep(DELAY_S)
-
-    return reviews
-
-
 # ── Aggregation ────────────────────────────────────────────────────────────────
 
-def aggregate(all_reviews: list[dict]) -> dict:
+def aggregate(reviews: Iterable[Review], big_products: set[str]) -> dict:
     """
-    Returns {YYYY-MM: {total, by_country, by_category, by_gender}}.
+    Returns {YYYY-MM: {total, total_excl_big, by_country, by_category, by_gender}}.
+    total_excl_big leaves out big_products (>MAX_SKIP reviews), whose early
+    history only the store has, so the series stays comparable with the
+    pre-store months.
     """
     monthly: dict[str, dict] = defaultdict(lambda: {
         "total": 0,
@@ -144,15 +71,15 @@ def aggregate(all_reviews: list[dict]) -> dict:
         "by_category": defaultdict(int),
         "by_gender":   defaultdict(int),
     })
-    for r in all_reviews:
-        m = r["month"]
+    for r in reviews:
+        m = r.month
         monthly[m]["total"] += 1
-        if not r.get("is_big"):
+        if r.product not in big_products:
             monthly[m]["total_excl_big"] += 1
-        country = CHANNEL_COUNTRIES.get(r["channel"], "other")
+        country = CHANNEL_COUNTRIES.get(r.channel, "other")
         monthly[m]["by_country"][country]  += 1
-        monthly[m]["by_category"][r["category"] or "unknown"] += 1
-        monthly[m]["by_gender"][r["gender"]   or "unknown"] += 1
+        monthly[m]["by_category"][r.category or "unknown"] += 1
+        monthly[m]["by_gender"][r.gender   or "unknown"] += 1
 
     # Convert defaultdicts to plain dicts for JSON serialisation
     return {
@@ -219,55 +146,22 @@ def write_monthly_sheet(monthly: dict) -> None:
 # ── Main ───────────────────────────────────────────────────────────────────────
 
 def main() -> None:
-    print("Revolution Race – historical review backfill")
-
-    state    = json.loads(STATE_FILE.read_text(encoding="utf-8"))
-    products = state["products"]
+    print("Revolution Race – monthly review history")
 
-    # Get latest review count per product
-    latest_count: dict[str, int] = {}
-    for bp, p in products.items():
-        if p["counts"]:
-            latest_count[bp] = max(e["count"] for e in p["counts"])
+    counts = fetch_review_counts()
+    big    = {bp for bp, c in counts.items() if c > MAX_SKIP}
+    print(f"  {len(counts)} products, {len(big)} with >{MAX_SKIP} reviews")
 
-    small = {bp: c for bp, c in latest_count.items() if c <= MAX_SKIP}
-    big   = {bp: c for bp, c in latest_count.items() if c >  MAX_SKIP}
-
-    total_products = len(small) + len(big)
-    print(f"  {len(small)} products <={MAX_SKIP} reviews (full history)")
-    print(f"  {len(big)} products >{MAX_SKIP} reviews (newest {MAX_SKIP} only)")
-    print(f"  Total: {total_products} products to fetch")
+    store = ReviewStore()
+    sync(store, counts)
+    missing = sum(p.get("missing", 0) for p in store.meta["products"].values())
+    if missing:
+        print(f"  {missing:,} reviews of very large products are out of the API's reach")
     print()
 
-    all_reviews: list[dict] = []
-    done = 0
-    errors = 0
-
-    # Process in parallel with a thread pool
-    tasks = list(latest_count.items())
-    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
-        futures = {
-            pool.submit(fetch_reviews_for_product, bp, count): (bp, count)
-            for bp, count in tasks
-        }
-        for future in as_completed(futures):
-            bp, count = futures[future]
-            done += 1
-            try:
-                reviews = future.result()
-                all_reviews.extend(reviews)
-                strategy = "newest" if count > MAX_SKIP else "all"
-                if done % 50 == 0 or done == total_products:
-                    print(f"  [{done:>4}/{total_products}]  {len(all_reviews):>8,} reviews collected so far")
-            except Exception as e:
-                errors += 1
-                print(f"  [{done:>4}/{total_products}]  ERROR for {bp}: {e}")
-
-    print(f"\n  Fetch complete: {len(all_reviews):,} reviews, {errors} errors")
-
     # Aggregate
     print("  Aggregating by month...")
-    monthly = aggregate(all_reviews)
+    monthly = aggregate(store.iter_reviews(), big)
 
     # Show summary
     print(f"  Monthly buckets: {min(monthly)} -> {max(monthly)}")
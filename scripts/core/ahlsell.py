@@ -0,0 +1,357 @@
+"""
+core/ahlsell.py
+
+Shared Ahlsell.se API client for track_ahlsell_plejd_inventory and
+track_ahlsell_led_panel_inventory.
+
+Both scripts walk the same public endpoints (search, variants, warehouses,
+warehouses/stock). The Plejd tracker used to fetch stock one article at a
+time with a fixed 0.3 s sleep, the LED-panel tracker with a fixed 24-thread
+pool, and both re-downloaded the warehouse catalogue every run. This client
+keeps one pooled keep-alive session and fetches variants and stock
+concurrently under an adaptive limit: it starts at start_concurrency
+in-flight requests, grows by one after every `limit` clean responses, and
+halves on a 429/5xx/timeout (which is then retried after Retry-After or a
+short backoff) — so a healthy API gets full speed and a throttling one
+backs off for the whole pool, not just the worker that was refused.
+
+Caching
+-------
+  warehouses, variant expansions : data/ahlsell_api_cache.json, with
+                                   WAREHOUSE_TTL_S / VARIANT_TTL_S
+  stock                          : per-article {warehouseId: quantity} in a
+                                   temp file scoped to the runner.py run
+                                   (SCRAPER_RUN_ID), so an article that is in
+                                   both the Plejd and the LED-panel set is
+                                   fetched once per nightly run; the runner
+                                   starts the LED-panel tracker after the
+                                   Plejd one. A manual run outside the runner
+                                   has no run id and always fetches live
+                                   stock, so a re-run never reports an
+                                   earlier reading as today's
+
+    with AhlsellClient() as client:
+        cards    = client.search("plejd", page_size=100)["productCards"]
+        products = client.expand_variants(cards)
+        stock, errors = client.stock(products)
+"""
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core.ratelimit import retry_after_seconds
+
+BASE_URL       = "https://www.ahlsell.se"
+SEARCH_URL     = f"{BASE_URL}/api/search"
+VARIANTS_URL   = f"{BASE_URL}/api/search/variants"
+WAREHOUSES_URL = f"{BASE_URL}/api/warehouses"
+STOCK_URL      = f"{BASE_URL}/api/warehouses/stock"
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    "Accept": "application/json",
+    "Accept-Language": "sv-SE,sv;q=0.9",
+}
+
+DATA_DIR   = Path(__file__).resolve().parent.parent.parent / "data"
+CACHE_FILE = DATA_DIR / "ahlsell_api_cache.json"
+RUN_ID     = os.environ.get("SCRAPER_RUN_ID")   # set by runner.py for every worker
+STOCK_FILE = Path(tempfile.gettempdir()) / f"ahlsell_stock_cache_{RUN_ID}.json" if RUN_ID else None
+
+WAREHOUSE_TTL_S = 7 * 86400
+VARIANT_TTL_S   = 3 * 86400
+STOCK_TTL_S     = 3600
+
+MAX_CONCURRENCY   = 24
+START_CONCURRENCY = 8
+MIN_CONCURRENCY   = 1
+MAX_ATTEMPTS      = 4
+BACKOFF_S         = 2.0
+
+_THROTTLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+class _Throttled(Exception):
+    def __init__(self, wait_s: float, reason: str) -> None:
+        super().__init__(reason)
+        self.wait_s = wait_s
+
+
+class AdaptiveLimit:
+    """Concurrency limit that grows by one per `limit` successes and halves on throttling."""
+
+    def __init__(self, start: int, minimum: int, maximum: int) -> None:
+        self.minimum   = max(1, minimum)
+        self.maximum   = max(self.minimum, maximum)
+        self.limit     = min(max(start, self.minimum), self.maximum)
+        self.in_flight = 0
+        self._streak   = 0
+        self._cond     = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, throttled: bool = False) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit   = max(self.minimum, self.limit // 2)
+                self._streak = 0
+            else:
+                self._streak += 1
+                if self._streak >= self.limit and self.limit < self.maximum:
+                    self.limit  += 1
+                    self._streak = 0
+            self._cond.notify_all()
+
+
+# ── Cache files ──────────────────────────────────────────────────────────────
+
+def _read_json(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json(path: Path, data: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":")) + "\n",
+                   encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _fresh(entry: Optional[dict], ttl_s: float, now: float) -> bool:
+    return entry is not None and now - entry.get("at", 0) < ttl_s
+
+
+# ── Client ───────────────────────────────────────────────────────────────────
+
+class AhlsellClient:
+    """Pooled, adaptively concurrent, caching client for the Ahlsell.se API."""
+
+    def __init__(
+        self,
+        max_concurrency: int = MAX_CONCURRENCY,
+        start_concurrency: int = START_CONCURRENCY,
+        cache_file: Optional[Path] = CACHE_FILE,
+        stock_file: Optional[Path] = STOCK_FILE,
+        timeout: int = 30,
+    ) -> None:
+        self.max_concurrency = max(1, max_concurrency)
+        self.limiter    = AdaptiveLimit(start_concurrency, MIN_CONCURRENCY, self.max_concurrency)
+        self.cache_file = cache_file
+        self.stock_file = stock_file
+        self.timeout    = timeout
+        self.requests   = 0
+        self.cache_hits = 0
+        self._cache     = _read_json(cache_file) if cache_file else {}
+        self._lock      = threading.Lock()
+
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency))
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "AhlsellClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ── Requests ──────────────────────────────────────────────────────────────
+
+    def _get(self, url: str, params: Optional[dict] = None):
+        """GET url under the adaptive limit; returns parsed JSON. Retries throttling."""
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            self.limiter.acquire()
+            throttled = False
+            try:
+                try:
+                    resp = self.session.get(url, params=params, timeout=self.timeout)
+                except (requests.Timeout, requests.ConnectionError) as exc:
+                    throttled = True
+                    raise _Throttled(BACKOFF_S * attempt, str(exc))
+                if resp.status_code in _THROTTLE_STATUS:
+                    throttled = True
+                    raise _Throttled(
+                        retry_after_seconds(resp.headers.get("Retry-After"), BACKOFF_S * attempt),
+                        f"HTTP {resp.status_code}",
+                    )
+                resp.raise_for_status()
+                return resp.json()
+            except _Throttled as exc:
+                if attempt == MAX_ATTEMPTS:
+                    raise requests.HTTPError(f"{exc} efter {attempt} försök ({url})")
+                wait_s = exc.wait_s
+            finally:
+                with self._lock:
+                    self.requests += 1
+                self.limiter.release(throttled)
+            time.sleep(wait_s)
+
+    def _map(self, fn, items: list) -> list:
+        """fn over items concurrently (the limiter, not the pool size, caps in-flight requests)."""
+        if len(items) <= 1:
+            return [fn(i) for i in items]
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(items))) as pool:
+            return list(pool.map(fn, items))
+
+    def _save_cache(self) -> None:
+        if self.cache_file:
+            with self._lock:
+                _write_json(self.cache_file, self._cache)
+
+    # ── Endpoints ─────────────────────────────────────────────────────────────
+
+    def search(self, phrase: str, page_size: int, page: Optional[int] = None) -> dict:
+        """One page of the search API (raw JSON: productCards, productCount, ...)."""
+        params = {"searchPhrase": phrase, "pageSize": page_size}
+        if page is not None:
+            params["page"] = page
+        return self._get(SEARCH_URL, params)
+
+    def warehouses(self) -> dict[str, dict]:
+        """{warehouseId: metadata}, from cache if younger than WAREHOUSE_TTL_S."""
+        now = time.time()
+        entry = self._cache.get("warehouses")
+        if _fresh(entry, WAREHOUSE_TTL_S, now):
+            self.cache_hits += 1
+            return entry["data"]
+        data = {
+            str(w["id"]): {
+                "name":        w.get("name", ""),
+                "city":        w.get("city", ""),
+                "address":     w.get("address", ""),
+                "phone":       w.get("phoneNumber", ""),
+                "url_segment": w.get("urlSegment", ""),
+            }
+            for w in self._get(WAREHOUSES_URL)
+        }
+        self._cache["warehouses"] = {"at": now, "data": data}
+        self._save_cache()
+        return data
+
+    def variant_numbers(self, product_code: str, active_variant: str) -> list[str]:
+        """Article numbers of every variant of a product (e.g. all 6 colours of TRM-01)."""
+        now = time.time()
+        variants = self._cache.setdefault("variants", {})
+        entry = variants.get(product_code)
+        if _fresh(entry, VARIANT_TTL_S, now):
+            self.cache_hits += 1
+            return entry["data"]
+        data = self._get(VARIANTS_URL, {"productCode": product_code, "activeVariantNumber": active_variant})
+        codes = [item["code"] for item in data.get("items", []) if item.get("code")]
+        with self._lock:
+            variants[product_code] = {"at": now, "data": codes}
+        return codes
+
+    def expand_variants(self, cards: Iterable[dict]) -> dict[str, dict]:
+        """
+        {articleNumber: {product_name, brand, product_code, page_url}} for
+        every variant of every search card. A card whose variants can't be
+        fetched falls back to its own variantNumber.
+        """
+        def expand(card: dict) -> list[tuple[str, dict]]:
+            most_relevant = str(card["variantNumber"])
+            meta = {
+                "product_name": card["name"],
+                "brand":        card.get("brand", "Okänt"),
+                "product_code": card["code"],
+                "page_url":     card.get("firstVariationPageUrl", ""),
+            }
+            variant_numbers = [most_relevant]
+            if card.get("numberOfVariants", 1) > 1:
+                try:
+                    variant_numbers = self.variant_numbers(card["code"], most_relevant)
+                except Exception as exc:
+                    print(f"  Varning: kunde ej hämta varianter för {card['name']}: {exc}")
+            return [(str(vn), meta) for vn in variant_numbers]
+
+        products: dict[str, dict] = {}
+        for entries in self._map(expand, list(cards)):
+            for art_num, meta in entries:
+                products[art_num] = meta
+        self._save_cache()
+        return products
+
+    def stock(
+        self,
+        articles: Iterable[str],
+        progress_every: int = 0,
+    ) -> tuple[dict[str, dict[str, float]], dict[str, Exception]]:
+        """
+        ({article: {warehouseId: quantity}}, {article: error}). Every
+        warehouse the API lists is included, zero-stock ones too (see
+        KNOWN_ISSUES.md #5). Articles fetched by either tracker earlier in
+        the same runner run (and within STOCK_TTL_S) are served from the
+        shared stock cache.
+        """
+        articles = list(dict.fromkeys(articles))
+        now = time.time()
+        shared = _read_json(self.stock_file) if self.stock_file else {}
+        stock: dict[str, dict[str, float]] = {}
+        for art in articles:
+            entry = shared.get(art)
+            if _fresh(entry, STOCK_TTL_S, now):
+                stock[art] = entry["data"]
+        if stock:
+            self.cache_hits += len(stock)
+            print(f"  {len(stock)} artiklar från lagercachen (hämtade < {STOCK_TTL_S // 60} min sedan)")
+
+        todo = [a for a in articles if a not in stock]
+        errors: dict[str, Exception] = {}
+        done = 0
+
+        def fetch(art: str) -> None:
+            nonlocal done
+            result, error = None, None
+            try:
+                data = self._get(STOCK_URL, {"variantNumber": art})
+                result = {str(e["id"]): e.get("stock", {}).get("quantity") or 0 for e in data}
+            except Exception as exc:
+                error = exc
+            with self._lock:
+                if error is not None:
+                    errors[art] = error
+                else:
+                    stock[art] = result
+                done += 1
+                if progress_every and done % progress_every == 0:
+                    print(f"  {done}/{len(todo)} artiklar klara (parallellitet {self.limiter.limit})...")
+
+        self._map(fetch, todo)
+
+        if self.stock_file and todo:
+            # Re-read before writing so the other tracker's entries aren't lost.
+            merged = {
+                a: e for a, e in _read_json(self.stock_file).items()
+                if _fresh(e, STOCK_TTL_S, now)
+            }
+            fetched_at = time.time()
+            for art in todo:
+                if art in stock:
+                    merged[art] = {"at": fetched_at, "data": stock[art]}
+            _write_json(self.stock_file, merged)
+        return stock, errors
+
+
+def total_in_stock(warehouse_stock: dict[str, float]) -> float:
+    """Sum of positive quantities across warehouses."""
+    return float(sum(q for q in warehouse_stock.values() if q > 0))
@@ -0,0 +1,286 @@
+"""
+core/browser.py
+
+Shared Playwright browser pool for the browser-driven scrapers
+(amazon_scape_bought_playwright_us_de, amazon_refine_scape_ranking,
+fetch_anoto_amazon_data, track_fractal_rankings_playwright,
+fetch_plejd_sensortower_rankings, track_combined_prices, track_nelly_aov).
+
+Each of those used to launch its own Chromium and visit its product/country
+pages strictly one after another with a fixed random sleep in between, so a
+run took the sum of every page load. BrowserPool launches one browser per
+process and hands out pages from named, isolated contexts (one per market or
+site). A context is created and set up once — cookies, init scripts, consent
+clicks — and then reused for every page in that market, so the warm-up is
+paid once instead of per page. Pages run concurrently, capped per domain
+(per_domain_limit) so no single site sees more than a few parallel requests;
+a short random delay before each page keeps the pattern from being a burst.
+
+    async with BrowserPool() as pool:
+        pool.add_context("US", "amazon.com", locale="en-US", cookies=[...])
+        pool.add_context("DE", "amazon.de",  locale="de-DE", cookies=[...])
+        results = await pool.run([("US", asin), ("DE", asin), ...], fetch_one)
+
+fetch_one(page, item) is awaited for every job and its results come back in
+job order.
+
+Lightweight pages
+-----------------
+The scrapers only read a few DOM nodes, so a context can be given
+block=BlockRules(...): every request whose resource type (images, media,
+fonts by default) or host (ad/analytics networks, plus per-site extras) is
+listed gets aborted before it leaves the browser. goto_dom_ready() navigates
+and returns as soon as the DOM is parsed (optionally once one selector is
+attached) instead of waiting for "load"/"networkidle", and
+scroll_until_settled() triggers lazy-loaded listings by waiting for more
+matches of a selector after each scroll instead of a fixed pause. Every page's bytes
+received (from Chromium's network events), request counts and wall time are
+recorded in pool.stats and summarised by pool.print_stats().
+"""
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Optional, Sequence
+from urllib.parse import urlsplit
+
+from playwright.async_api import Browser, BrowserContext, Page, Route, async_playwright
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+# Launch args that reduce headless-detection signals; same set the scrapers
+# used individually.
+DEFAULT_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+]
+
+# Masks navigator.webdriver in every page of a context.
+HIDE_WEBDRIVER = "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
+
+PER_DOMAIN_LIMIT = 3
+JITTER_S = (0.5, 2.0)
+
+# Resource types none of the scrapers read. Stylesheets are NOT blocked by
+# default: several scrapers use is_visible(), which depends on layout.
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font"})
+
+# Ad, tag-manager and analytics hosts (subdomains match too).
+AD_HOSTS = (
+    "doubleclick.net", "googlesyndication.com", "googleadservices.com",
+    "google-analytics.com", "googletagmanager.com", "googletagservices.com",
+    "amazon-adsystem.com", "facebook.net", "facebook.com",
+    "criteo.com", "criteo.net", "adsrvr.org", "scorecardresearch.com",
+    "hotjar.com", "segment.io", "segment.com", "mixpanel.com", "fullstory.com",
+    "newrelic.com", "nr-data.net", "clarity.ms", "bat.bing.com", "quantserve.com",
+    "taboola.com", "outbrain.com", "intercom.io", "hs-analytics.net",
+)
+
+
+@dataclass(frozen=True)
+class BlockRules:
+    """Which requests a context aborts: by Playwright resource type or by host suffix."""
+    resource_types: frozenset = BLOCKED_RESOURCE_TYPES
+    hosts: tuple = AD_HOSTS
+
+    def with_hosts(self, *hosts: str) -> "BlockRules":
+        return BlockRules(self.resource_types, self.hosts + tuple(hosts))
+
+    def blocks(self, resource_type: str, url: str) -> bool:
+        if resource_type in self.resource_types:
+            return True
+        host = urlsplit(url).hostname or ""
+        return any(host == h or host.endswith("." + h) for h in self.hosts)
+
+
+@dataclass
+class PageStats:
+    key: str
+    url: str = ""
+    bytes_received: Optional[int] = 0   # None if network events were unavailable
+    requests: int = 0
+    blocked: int = 0
+    seconds: float = 0.0
+    _started: float = field(default_factory=time.monotonic, repr=False)
+
+
+async def goto_dom_ready(page: Page, url: str, selector: Optional[str] = None, timeout_ms: int = 30_000):
+    """
+    Navigate and return once the DOM is parsed — and, if selector is given,
+    once that element is attached — rather than waiting for every
+    subresource ("load") or for the network to go quiet ("networkidle").
+    Raises Playwright's TimeoutError like page.goto/wait_for_selector.
+    """
+    response = await page.goto(url, wait_until="domcontentloaded", timeout=timeout_ms)
+    if selector:
+        await page.wait_for_selector(selector, state="attached", timeout=timeout_ms)
+    return response
+
+
+async def scroll_until_settled(page: Page, selector: str, max_scrolls: int = 3, settle_ms: int = 1_500) -> int:
+    """
+    Scroll to the bottom up to max_scrolls times to trigger lazy loading.
+    After each scroll, wait until more elements match selector than before;
+    stop as soon as a scroll adds none within settle_ms. Returns the final
+    match count, so a fully rendered page costs one settle_ms at most.
+    """
+    count = await page.locator(selector).count()
+    for _ in range(max_scrolls):
+        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        try:
+            await page.wait_for_function(
+                "([sel, n]) => document.querySelectorAll(sel).length > n",
+                arg=[selector, count], timeout=settle_ms,
+            )
+        except PlaywrightTimeoutError:
+            break
+        count = await page.locator(selector).count()
+    return count
+
+
+class _ContextSpec:
+    def __init__(self, domain, cookies, setup, block, options) -> None:
+        self.domain  = domain
+        self.cookies = list(cookies)
+        self.setup   = setup
+        self.block   = block
+        self.options = options
+        self.context: Optional[BrowserContext] = None
+        self.lock    = asyncio.Lock()
+
+
+class BrowserPool:
+    """One Chromium, many reusable contexts, per-domain page concurrency."""
+
+    def __init__(
+        self,
+        headless: bool = True,
+        args: Sequence[str] = DEFAULT_ARGS,
+        per_domain_limit: int = PER_DOMAIN_LIMIT,
+        jitter_s: tuple[float, float] = JITTER_S,
+        hide_webdriver: bool = True,
+    ) -> None:
+        self.headless         = headless
+        self.args             = list(args)
+        self.per_domain_limit = per_domain_limit
+        self.jitter_s         = jitter_s
+        self.hide_webdriver   = hide_webdriver
+        self.browser: Optional[Browser] = None
+        self._pw = None
+        self._specs: dict[str, _ContextSpec] = {}
+        self._domain_slots: dict[str, asyncio.Semaphore] = {}
+        self.stats: list[PageStats] = []
+
+    async def __aenter__(self) -> "BrowserPool":
+        self._pw = await async_playwright().start()
+        self.browser = await self._pw.chromium.launch(headless=self.headless, args=self.args)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        for spec in self._specs.values():
+            if spec.context is not None:
+                await spec.context.close()
+        if self.browser is not None:
+            await self.browser.close()
+        if self._pw is not None:
+            await self._pw.stop()
+
+    def add_context(
+        self,
+        key: str,
+        domain: str,
+        cookies: Iterable[dict] = (),
+        setup: Optional[Callable[[BrowserContext], Awaitable[None]]] = None,
+        block: Optional[BlockRules] = None,
+        **options: Any,
+    ) -> None:
+        """
+        Register a context (created lazily on first use). options go to
+        browser.new_context(); cookies are added and setup(context) awaited
+        once, before the first page is handed out. block aborts matching
+        requests in every page of the context.
+        """
+        self._specs[key] = _ContextSpec(domain, cookies, setup, block, options)
+        self._domain_slots.setdefault(domain, asyncio.Semaphore(self.per_domain_limit))
+
+    async def context(self, key: str) -> BrowserContext:
+        spec = self._specs[key]
+        async with spec.lock:  # concurrent first pages wait for one setup
+            if spec.context is None:
+                ctx = await self.browser.new_context(**spec.options)
+                if self.hide_webdriver:
+                    await ctx.add_init_script(HIDE_WEBDRIVER)
+                if spec.cookies:
+                    await ctx.add_cookies(spec.cookies)
+                if spec.setup is not None:
+                    await spec.setup(ctx)
+                spec.context = ctx
+        return spec.context
+
+    async def _instrument(self, ctx: BrowserContext, page: Page, spec: _ContextSpec, stats: PageStats) -> None:
+        if spec.block is not None:
+            async def route(r: Route) -> None:
+                if spec.block.blocks(r.request.resource_type, r.request.url):
+                    stats.blocked += 1
+                    await r.abort()
+                else:
+                    await r.continue_()
+            await page.route("**/*", route)
+
+        def finished(event: dict) -> None:
+            stats.requests += 1
+            stats.bytes_received += int(event.get("encodedDataLength", 0))
+
+        try:
+            cdp = await ctx.new_cdp_session(page)
+            cdp.on("Network.loadingFinished", finished)
+            await cdp.send("Network.enable")
+        except Exception:
+            stats.bytes_received = None  # not Chromium, or CDP refused: time still recorded
+
+    @asynccontextmanager
+    async def page(self, key: str) -> AsyncIterator[Page]:
+        """A fresh page in key's warmed context, holding one of its domain's slots."""
+        spec = self._specs[key]
+        async with self._domain_slots[spec.domain]:
+            ctx = await self.context(key)
+            await asyncio.sleep(random.uniform(*self.jitter_s))
+            page = await ctx.new_page()
+            stats = PageStats(key)
+            await self._instrument(ctx, page, spec, stats)
+            try:
+                yield page
+            finally:
+                stats.url = page.url
+                stats.seconds = round(time.monotonic() - stats._started, 2)
+                self.stats.append(stats)
+                await page.close()
+
+    def print_stats(self) -> None:
+        """One line per page plus a total: bytes received, requests, blocked, seconds."""
+        if not self.stats:
+            return
+        print("\nBrowser pages:")
+        for st in self.stats:
+            kb = "?" if st.bytes_received is None else f"{st.bytes_received / 1024:,.0f} KB"
+            print(f"  [{st.key}] {kb:>9}  {st.requests:>4} req  {st.blocked:>4} blocked  "
+                  f"{st.seconds:6.1f}s  {st.url[:80]}")
+        total_kb = sum(st.bytes_received or 0 for st in self.stats) / 1024
+        slowest  = max(st.seconds for st in self.stats)
+        print(f"  Total: {len(self.stats)} pages, {total_kb:,.0f} KB, "
+              f"{sum(st.blocked for st in self.stats)} blocked, slowest {slowest:.1f}s")
+
+    async def run(
+        self,
+        jobs: Iterable[tuple[str, Any]],
+        fn: Callable[[Page, Any], Awaitable[Any]],
+    ) -> list[Any]:
+        """Await fn(page, item) for every (context key, item) job concurrently; results in job order."""
+        async def one(key: str, item: Any) -> Any:
+            async with self.page(key) as page:
+                return await fn(page, item)
+
+        return await asyncio.gather(*(one(key, item) for key, item in jobs))
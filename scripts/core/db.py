@@ -3,54 +3,243 @@ core/db.py
 
 Shared Postgres helpers for scripts that persist snapshots to the database.
 Assumes target tables already exist (see sql/schema.sql and sql/migrations/).
+
+Connections come from one process-wide pool (pooled_connection()), so a
+script that writes several tables pays the TLS + auth handshake to the
+Supabase pooler once per process instead of once per insert_rows call.
+get_connection() still returns a fresh, unpooled connection for callers that
+manage (and close) their own.
+
+A run that writes several related tables (a daily summary plus its detail
+rows, articles + warehouses + stock) should use transaction() /
+safe_transaction(): every write goes through one connection and commits
+once, so readers never see a summary whose detail rows are still missing.
+
+Large writes (more rows than one execute_values batch) go through
+copy_rows(): COPY into a temp staging table, then a single
+INSERT ... SELECT ... ON CONFLICT, all in one transaction. Temp tables are
+never WAL-logged and are created ON COMMIT DROP, so this also works through
+a transaction-mode pooler.
+
+safe_refresh() runs one of the refresh_* functions that keep the daily
+sales aggregate tables (rugvista_daily_sales, ahlsell_plejd_sales_daily,
+anoto_daily_sales) up to date after a load.
 """
 from __future__ import annotations
 
+import atexit
+import csv
+import io
+import json
 import os
 import sys
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Optional, Sequence
+from typing import Any, Callable, Iterator, NamedTuple, Optional, Sequence
 
 import psycopg2
-from psycopg2.extras import execute_values
+from psycopg2 import sql
+from psycopg2.extras import Json, execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from dotenv import load_dotenv
 
 REPO_ROOT = Path(__file__).resolve().parent.parent.parent
 load_dotenv(REPO_ROOT / ".env")  # no-op locally if absent; DATABASE_URL comes from CI env otherwise
 
+# Max connections one process holds open. Scripts write from one thread, so
+# this only matters for the few that write from worker threads.
+POOL_MAX_CONNECTIONS = 4
 
-def get_connection():
-    """Connect to Postgres using DATABASE_URL (.env locally, CI env var in GitHub Actions)."""
+# Writes with more rows than this use COPY (copy_rows) instead of
+# execute_values batches.
+COPY_MIN_ROWS = 1000
+
+
+def _database_url() -> str:
     database_url = os.environ.get("DATABASE_URL")
     if not database_url:
         raise RuntimeError(
             "DATABASE_URL not set. Locally: add it to .env. In CI: pass it as a "
             "step/job env var backed by a secret."
         )
-    return psycopg2.connect(database_url)
+    return database_url
 
 
-def insert_rows(
+def get_connection():
+    """Connect to Postgres using DATABASE_URL (.env locally, CI env var in GitHub Actions).
+    Unpooled: the caller owns the connection and must close it."""
+    return psycopg2.connect(_database_url())
+
+
+# ── Pool ──────────────────────────────────────────────────────────────────────
+
+_pool: Optional[ThreadedConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadedConnectionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            _pool = ThreadedConnectionPool(1, POOL_MAX_CONNECTIONS, _database_url())
+        return _pool
+
+
+def close_pool() -> None:
+    """Close every pooled connection (registered atexit; safe to call twice)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and not _pool.closed:
+            _pool.closeall()
+        _pool = None
+
+
+atexit.register(close_pool)
+
+
+@contextmanager
+def pooled_connection() -> Iterator[Any]:
+    """
+    Borrow a connection from the process-wide pool for one transaction.
+    Commits on normal exit, rolls back if the block raises. A connection
+    that broke mid-transaction is discarded instead of returned to the pool.
+    """
+    pool = _get_pool()
+    conn = pool.getconn()
+    discard = False
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            discard = True
+        raise
+    finally:
+        pool.putconn(conn, close=discard or bool(conn.closed))
+
+
+# ── Writers ───────────────────────────────────────────────────────────────────
+
+_COPY_NULL = r"\N"
+
+
+class WriteResult(NamedTuple):
+    written: int   # rows inserted (or inserted/updated for upserts)
+    skipped: int   # rows that hit ON CONFLICT DO NOTHING (always 0 for upserts)
+
+
+def _conflict_sql(columns: Sequence[str], conflict_columns: Sequence[str], update: bool) -> str:
+    if not update:
+        return f"ON CONFLICT ({', '.join(conflict_columns)}) DO NOTHING"
+    update_columns = [c for c in columns if c not in conflict_columns]
+    set_clause = ", ".join(f"{c} = EXCLUDED.{c}" for c in update_columns)
+    return f"ON CONFLICT ({', '.join(conflict_columns)}) DO UPDATE SET {set_clause}"
+
+
+def _copy_value(value: Any) -> Any:
+    """Render one value for COPY ... CSV: None becomes the NULL marker,
+    jsonb adapters/containers become JSON text."""
+    if value is None:
+        return _COPY_NULL
+    if isinstance(value, Json):
+        value = value.adapted
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _copy_into_stage(cur, table: str, columns: Sequence[str], rows: Sequence[Sequence[Any]]) -> str:
+    """COPY rows into a temp table shaped like table's columns; returns its name.
+    _ord records input order so duplicates within rows resolve like the old
+    batch loop did (first wins for DO NOTHING, last wins for DO UPDATE)."""
+    stage = "_stage_" + table.replace(".", "_")
+    col_list = ", ".join(columns)
+    cur.execute(
+        f"CREATE TEMP TABLE {stage} ON COMMIT DROP AS "
+        f"SELECT {col_list} FROM {table} WITH NO DATA;"
+    )
+    cur.execute(f"ALTER TABLE {stage} ADD COLUMN _ord bigserial;")
+
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    for row in rows:
+        writer.writerow([_copy_value(v) for v in row])
+    buf.seek(0)
+    # Explicit NULL marker: with the CSV default (unquoted empty) the csv
+    # module could not tell None from "" apart.
+    cur.copy_expert(
+        f"COPY {stage} ({col_list}) FROM STDIN WITH (FORMAT csv, NULL '{_COPY_NULL}')", buf
+    )
+    return stage
+
+
+def copy_rows(
     table: str,
     columns: Sequence[str],
     rows: Sequence[Sequence[Any]],
     conflict_columns: Sequence[str],
-    batch_size: int = 1000,
-) -> int:
-    """Batched INSERT ... ON CONFLICT (conflict_columns) DO NOTHING.
-    Returns the total number of rows actually inserted (skipped conflicts don't count)."""
+    update: bool = False,
+    conn=None,
+) -> WriteResult:
+    """
+    Bulk load: COPY rows into a temp staging table, then one
+    INSERT INTO table SELECT ... FROM stage ON CONFLICT DO NOTHING (or
+    DO UPDATE when update=True). Returns WriteResult(written, skipped).
+    Uses conn if given (caller owns the transaction), else a pooled one.
+    """
     if not rows:
-        return 0
+        return WriteResult(0, 0)
+
+    col_list = ", ".join(columns)
+    keys = ", ".join(conflict_columns)
+    order = "DESC" if update else "ASC"
+
+    def run(c) -> WriteResult:
+        with c.cursor() as cur:
+            stage = _copy_into_stage(cur, table, columns, rows)
+            cur.execute(
+                f"INSERT INTO {table} ({col_list}) "
+                f"SELECT DISTINCT ON ({keys}) {col_list} FROM {stage} "
+                f"ORDER BY {keys}, _ord {order} "
+                f"{_conflict_sql(columns, conflict_columns, update)};"
+            )
+            written = cur.rowcount
+            cur.execute(f"DROP TABLE {stage};")
+        result = WriteResult(written, len(rows) - written)
+        print(f"  {table}: {result.written} inserted/updated, {result.skipped} skipped (COPY)")
+        return result
+
+    if conn is not None:
+        return run(conn)
+    with pooled_connection() as pooled:
+        return run(pooled)
+
+
+def _write_rows(
+    table: str,
+    columns: Sequence[str],
+    rows: Sequence[Sequence[Any]],
+    conflict_columns: Sequence[str],
+    batch_size: int,
+    update: bool,
+    conn=None,
+) -> WriteResult:
+    if not rows:
+        return WriteResult(0, 0)
+    if len(rows) > max(batch_size, COPY_MIN_ROWS):
+        return copy_rows(table, columns, rows, conflict_columns, update=update, conn=conn)
 
     insert_sql = (
         f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s "
-        f"ON CONFLICT ({', '.join(conflict_columns)}) DO NOTHING;"
+        f"{_conflict_sql(columns, conflict_columns, update)};"
     )
 
-    conn = get_connection()
-    try:
+    def run(c) -> WriteResult:
         rows_written = 0
-        with conn.cursor() as cur:
+        with c.cursor() as cur:
             for i in range(0, len(rows), batch_size):
                 chunk = rows[i:i + batch_size]
                 # page_size must cover the whole chunk: execute_values silently
@@ -58,10 +247,25 @@ def insert_rows(
                 # INSERT statements, and cur.rowcount only reflects the last one.
                 execute_values(cur, insert_sql, chunk, page_size=len(chunk))
                 rows_written += cur.rowcount
-        conn.commit()
-        return rows_written
-    finally:
-        conn.close()
+        return WriteResult(rows_written, 0 if update else len(rows) - rows_written)
+
+    if conn is not None:
+        return run(conn)
+    with pooled_connection() as pooled:
+        return run(pooled)
+
+
+def insert_rows(
+    table: str,
+    columns: Sequence[str],
+    rows: Sequence[Sequence[Any]],
+    conflict_columns: Sequence[str],
+    batch_size: int = 1000,
+) -> int:
+    """Batched INSERT ... ON CONFLICT (conflict_columns) DO NOTHING.
+    Returns the total number of rows actually inserted (skipped conflicts don't count).
+    More than batch_size rows are bulk-loaded with COPY (see copy_rows)."""
+    return _write_rows(table, columns, rows, conflict_columns, batch_size, update=False).written
 
 
 def safe_insert(
@@ -92,29 +296,9 @@ def upsert_rows(
     """Batched INSERT ... ON CONFLICT (conflict_columns) DO UPDATE SET ...
     for tables that track "latest known state" rather than an append-only
     snapshot history (e.g. an entity whose fields change over time). Returns
-    the total number of rows inserted or updated."""
-    if not rows:
-        return 0
-
-    update_columns = [c for c in columns if c not in conflict_columns]
-    set_clause = ", ".join(f"{c} = EXCLUDED.{c}" for c in update_columns)
-    insert_sql = (
-        f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s "
-        f"ON CONFLICT ({', '.join(conflict_columns)}) DO UPDATE SET {set_clause};"
-    )
-
-    conn = get_connection()
-    try:
-        rows_written = 0
-        with conn.cursor() as cur:
-            for i in range(0, len(rows), batch_size):
-                chunk = rows[i:i + batch_size]
-                execute_values(cur, insert_sql, chunk, page_size=len(chunk))
-                rows_written += cur.rowcount
-        conn.commit()
-        return rows_written
-    finally:
-        conn.close()
+    the total number of rows inserted or updated. More than batch_size rows
+    are bulk-loaded with COPY (see copy_rows)."""
+    return _write_rows(table, columns, rows, conflict_columns, batch_size, update=True).written
 
 
 def safe_upsert(
@@ -133,3 +317,120 @@ def safe_upsert(
         error = str(e)
         print(f"DB upsert into {table} failed (continuing anyway): {e}", file=sys.stderr)
         return None, error
+
+
+# ── Unit of work ──────────────────────────────────────────────────────────────
+
+class UnitOfWork:
+    """
+    Table writes that share one pooled connection and one transaction; get
+    one from transaction(). By default the first failing write raises and
+    the whole run is rolled back. A write made with savepoint=True runs
+    under its own SAVEPOINT instead: if it fails, only that table is rolled
+    back, its error is recorded in .errors, and the remaining writes still
+    commit. Use it for a table the rest of the run doesn't depend on.
+    """
+
+    def __init__(self, conn) -> None:
+        self.conn    = conn
+        self.written = 0
+        self.errors: dict[str, str] = {}
+        self._n_savepoints = 0
+
+    def _write(self, table, columns, rows, conflict_columns, batch_size, update, savepoint) -> Optional[int]:
+        if not savepoint:
+            result = _write_rows(table, columns, rows, conflict_columns, batch_size, update, conn=self.conn)
+            self.written += result.written
+            return result.written
+
+        self._n_savepoints += 1
+        name = f"uow_{self._n_savepoints}"
+        with self.conn.cursor() as cur:
+            cur.execute(f"SAVEPOINT {name};")
+        try:
+            result = _write_rows(table, columns, rows, conflict_columns, batch_size, update, conn=self.conn)
+        except psycopg2.Error as e:
+            with self.conn.cursor() as cur:
+                cur.execute(f"ROLLBACK TO SAVEPOINT {name};")
+            self.errors[table] = str(e)
+            print(f"DB write to {table} failed, rolled back to savepoint: {e}", file=sys.stderr)
+            return None
+        with self.conn.cursor() as cur:
+            cur.execute(f"RELEASE SAVEPOINT {name};")
+        self.written += result.written
+        return result.written
+
+    def insert(
+        self,
+        table: str,
+        columns: Sequence[str],
+        rows: Sequence[Sequence[Any]],
+        conflict_columns: Sequence[str],
+        batch_size: int = 1000,
+        savepoint: bool = False,
+    ) -> Optional[int]:
+        """insert_rows inside this transaction. None if a savepointed write failed."""
+        return self._write(table, columns, rows, conflict_columns, batch_size, False, savepoint)
+
+    def upsert(
+        self,
+        table: str,
+        columns: Sequence[str],
+        rows: Sequence[Sequence[Any]],
+        conflict_columns: Sequence[str],
+        batch_size: int = 1000,
+        savepoint: bool = False,
+    ) -> Optional[int]:
+        """upsert_rows inside this transaction. None if a savepointed write failed."""
+        return self._write(table, columns, rows, conflict_columns, batch_size, True, savepoint)
+
+
+@contextmanager
+def transaction() -> Iterator[UnitOfWork]:
+    """
+    with transaction() as tx:
+        tx.insert("x_daily_summary", ...)
+        tx.insert("x_variant_snapshot", ...)
+    Commits once when the block exits; rolls everything back if it raises.
+    """
+    with pooled_connection() as conn:
+        yield UnitOfWork(conn)
+
+
+def safe_transaction(work: Callable[[UnitOfWork], Any]) -> tuple[Optional[int], Optional[str]]:
+    """
+    Run work(tx) inside transaction() and never raise, mirroring
+    safe_insert: returns (rows_written, None) on success, or
+    (None, error_message) if the transaction failed. If it committed but a
+    savepointed write failed, returns (rows_written, "table: error; ...").
+    """
+    try:
+        with transaction() as tx:
+            work(tx)
+    except Exception as e:
+        print(f"DB transaction failed, nothing written (continuing anyway): {e}", file=sys.stderr)
+        return None, str(e)
+    if tx.errors:
+        return tx.written, "; ".join(f"{t}: {err}" for t, err in tx.errors.items())
+    return tx.written, None
+
+
+# ── Aggregate refresh ─────────────────────────────────────────────────────────
+
+def safe_refresh(function: str, since: Optional[str] = None) -> tuple[Optional[int], Optional[str]]:
+    """
+    Best-effort: SELECT function(since) for one of the incrementally
+    maintained aggregate tables (refresh_* functions in sql/views/). With
+    since=None the function recomputes from the newest day it already
+    holds. Returns (rows_refreshed, None), or (None, error_message) on
+    failure; never raises.
+    """
+    try:
+        with pooled_connection() as conn, conn.cursor() as cur:
+            cur.execute(sql.SQL("SELECT {}(%s::date)").format(sql.Identifier(function)), (since,))
+            n = cur.fetchone()[0]
+    except Exception as e:
+        print(f"DB refresh {function} failed (continuing anyway): {e}", file=sys.stderr)
+        return None, str(e)
+    print(f"  {function}: {n} aggregate rows recomputed")
+    return n, None
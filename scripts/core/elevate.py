@@ -0,0 +1,198 @@
+"""
+core/elevate.py
+
+Shared Voyado Elevate (Apptus) storefront client for the scripts that walk
+the landing-page API (track_nelly_inventory, track_rvrc_sales,
+track_rvrc_inventory).
+
+All three used to page through every category of every market one request
+at a time with a bare requests.get, so wall time was the sum of every page.
+This client keeps one pooled keep-alive session per cluster and runs
+categories and skip-offsets concurrently, capped at max_concurrency
+in-flight requests against the cluster host. The first page of each
+category is fetched on its own; once its totalHits is known, every
+remaining offset is scheduled at once instead of paging serially, so wall
+time is bounded by the slowest category rather than the sum of all pages.
+
+Parsing stays in each script: callers pass their own extract function with
+the existing (data, page_ref) -> (variants, total_hits, group_count)
+signature, and get back the same {market: {key: variant}} structure the
+serial loops used to build.
+"""
+from __future__ import annotations
+
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+ELEVATE_BASE_URL_TEMPLATE = "https://{cluster}.api.esales.apptus.cloud"
+ELEVATE_ENDPOINT          = "/api/storefront/v3/queries/landing-page"
+ELEVATE_LIMIT             = 600   # max allowed by the API (1000 returns 400 error)
+
+# Max in-flight requests per cluster host. Elevate has shown no throttling at
+# this level; lower it per script if that ever changes.
+DEFAULT_MAX_CONCURRENCY = 8
+
+ExtractFn = Callable[[dict, str], tuple[dict[str, dict], int, int]]
+
+
+class ElevateClient:
+    """
+    Pooled, concurrent client for one Elevate cluster.
+
+    base_params are sent with every request on top of the market/paging
+    params (e.g. {"presentCustom": ..., "presentPrices": ...}).
+    """
+
+    def __init__(
+        self,
+        cluster_id: str,
+        base_params: Optional[dict] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        limit: int = ELEVATE_LIMIT,
+        timeout: tuple[int, int] = (10, 60),
+    ) -> None:
+        self.cluster_id      = cluster_id
+        self.url             = ELEVATE_BASE_URL_TEMPLATE.format(cluster=cluster_id) + ELEVATE_ENDPOINT
+        self.base_params     = dict(base_params or {})
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit           = limit
+        self.timeout         = timeout
+        # {market_code: pages that failed} for the last fetch_markets() call
+        self.failed_pages: dict[str, int] = {}
+
+        self.session = requests.Session()
+        retry = Retry(
+            total=3,
+            backoff_factor=1.0,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.max_concurrency,
+            max_retries=retry,
+        )
+        self.session.mount("https://", adapter)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "ElevateClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ── Single page ───────────────────────────────────────────────────────────
+
+    def fetch_page(
+        self,
+        elevate_market: str,
+        locale: str,
+        page_ref: str,
+        skip: int = 0,
+        customer_key: str = "",
+        session_key: str = "",
+    ) -> Optional[dict]:
+        """Fetch one page from the landing-page API. Returns None on failure."""
+        params = {
+            "market":        elevate_market,
+            "locale":        locale,
+            "customerKey":   customer_key,
+            "sessionKey":    session_key,
+            "touchpoint":    "desktop",
+            "pageReference": page_ref,
+            "limit":         self.limit,
+            "skip":          skip,
+            **self.base_params,
+        }
+        try:
+            resp = self.session.get(self.url, params=params, timeout=self.timeout)
+            resp.raise_for_status()
+            return resp.json()
+        except (requests.RequestException, ValueError) as exc:
+            print(f"    [WARN] Elevate {elevate_market} {page_ref} skip={skip}: {exc}")
+            return None
+
+    # ── All markets × categories × offsets ───────────────────────────────────
+
+    def fetch_markets(
+        self,
+        markets: dict[str, dict],
+        extract: ExtractFn,
+        label: str = "variants",
+    ) -> dict[str, dict[str, dict]]:
+        """
+        Fetch every category of every market concurrently.
+
+        markets: {market_code: {"elevate_market", "locale", "categories"}} —
+        the scripts' own MARKETS entries work as-is; a market without a
+        "categories" key must be given one by the caller.
+
+        Returns {market_code: {key: variant}}. Pages are merged per market in
+        (category order, skip) order, so when the same key appears twice the
+        result is identical to the old serial loop's dict.update sequence.
+        A market with a failed page (after retries) is only partly there;
+        self.failed_pages counts them per market (a failed first page loses
+        the whole category).
+        """
+        sessions = {mc: (str(uuid.uuid4()), str(uuid.uuid4())) for mc in markets}
+        pages: dict[tuple[str, int, int], dict[str, dict]] = {}
+        self.failed_pages = {}
+
+        def run(mc: str, cat_idx: int, skip: int):
+            cfg = markets[mc]
+            cat = cfg["categories"][cat_idx]
+            customer_key, session_key = sessions[mc]
+            data = self.fetch_page(
+                cfg["elevate_market"], cfg["locale"], cat, skip, customer_key, session_key,
+            )
+            if data is None:
+                return None
+            return extract(data, cat)
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            pending: dict[Future, tuple[str, int, int]] = {}
+            for mc, cfg in markets.items():
+                for cat_idx in range(len(cfg["categories"])):
+                    pending[pool.submit(run, mc, cat_idx, 0)] = (mc, cat_idx, 0)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    mc, cat_idx, skip = pending.pop(fut)
+                    cat = markets[mc]["categories"][cat_idx]
+                    result = fut.result()
+                    if result is None:
+                        self.failed_pages[mc] = self.failed_pages.get(mc, 0) + 1
+                        continue
+                    new_v, total_hits, group_count = result
+                    pages[(mc, cat_idx, skip)] = new_v
+                    print(f"  [{mc}] {cat} skip={skip}: +{len(new_v)} {label} "
+                          f"[{skip}–{skip + group_count}/{total_hits}]")
+
+                    if skip != 0:
+                        continue
+                    if total_hits == 0:
+                        print(f"  [WARN] [{mc}] {cat}: 0 hits — check pageReference")
+                        continue
+                    # First page is in: schedule every remaining offset at once.
+                    # Elevate pages by productGroup, so the first page's group
+                    # count is the stride (== limit unless the category fits in
+                    # one page, in which case the range is empty).
+                    if group_count > 0:
+                        for next_skip in range(group_count, total_hits, group_count):
+                            key = (mc, cat_idx, next_skip)
+                            pending[pool.submit(run, *key)] = key
+
+        market_order = {mc: i for i, mc in enumerate(markets)}
+        result: dict[str, dict[str, dict]] = {mc: {} for mc in markets}
+        for mc, cat_idx, skip in sorted(pages, key=lambda k: (market_order[k[0]], k[1], k[2])):
+            result[mc].update(pages[(mc, cat_idx, skip)])
+        return result
@@ -0,0 +1,191 @@
+"""
+core/fx.py
+
+Shared, cached FX rates for every script that converts prices to SEK
+(track_rvrc_sales, track_rvrc_inventory, track_revolutionrace_reviews and
+the three adtraction_epc_* scripts).
+
+Those scripts each called frankfurter.app or open.er-api.com themselves on
+every run, for just the currencies they needed, and each kept its own
+fallback table. Here one day's full rate vector (units per 1 EUR, every
+currency the ECB publishes) is fetched once and every pair is cross-derived
+from it: SEK per NOK = (SEK per EUR) / (NOK per EUR).
+
+Vectors are kept in data/fx_rates.json keyed by calendar day, loaded once
+per process, so any lookup for a day already seen — today on a second run,
+or a past day when re-pricing an old snapshot — is a dictionary hit with no
+network call. Newly fetched vectors are also upserted (best-effort) into
+fx_rate_daily. Static FALLBACK_SEK rates are used only if every provider
+fails, and are never cached.
+
+    from core.fx import rates, sek_rates
+    sek_rates({"EUR", "NOK"})        # {"EUR": 11.2, "NOK": 0.95}
+    rates("2026-03-02").rate("GBP")  # SEK per GBP on that day
+"""
+from __future__ import annotations
+
+import json
+import os
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional, Union
+
+import requests
+
+from core.db import safe_upsert
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+FX_CACHE = DATA_DIR / "fx_rates.json"
+
+BASE = "EUR"
+
+# SEK per unit, used only if no provider answers. Superset of the tables the
+# scripts used to carry individually.
+FALLBACK_SEK: dict[str, float] = {
+    "SEK": 1.0,
+    "EUR": 11.5,
+    "NOK": 0.97,
+    "DKK": 1.54,
+    "GBP": 13.0,
+    "PLN": 2.7,
+    "CHF": 12.3,
+    "USD": 10.6,
+}
+
+_COLUMNS = ["rate_date", "currency", "per_eur", "as_of", "source", "fetched_at"]
+_KEY     = ["rate_date", "currency"]
+
+Day = Union[date, str, None]
+
+
+class DayRates(NamedTuple):
+    day:     str                # calendar day the vector is stored under
+    as_of:   str                # publication date reported by the provider
+    source:  str
+    per_eur: dict[str, float]   # units of currency per 1 EUR; EUR itself = 1.0
+
+    def rate(self, currency: str, quote: str = "SEK") -> float:
+        """Units of quote per 1 unit of currency."""
+        return self._per_eur(quote) / self._per_eur(currency)
+
+    def _per_eur(self, currency: str) -> float:
+        v = self.per_eur.get(currency)
+        if v is not None:
+            return v
+        if currency in FALLBACK_SEK:
+            print(f"  [FX] {currency} not in {self.source} rates — using fallback")
+            return FALLBACK_SEK[BASE] / FALLBACK_SEK[currency]
+        raise KeyError(f"no FX rate for {currency} on {self.day}")
+
+
+_cache: Optional[dict[str, DayRates]] = None
+
+
+# ── Local cache ──────────────────────────────────────────────────────────────
+
+def _load_cache() -> dict[str, DayRates]:
+    global _cache
+    if _cache is None:
+        _cache = {}
+        if FX_CACHE.exists():
+            try:
+                raw = json.loads(FX_CACHE.read_text(encoding="utf-8"))
+            except ValueError:
+                raw = {}
+            for day, entry in raw.items():
+                _cache[day] = DayRates(day, entry["as_of"], entry["source"], entry["rates"])
+    return _cache
+
+
+def _save_cache(cache: dict[str, DayRates]) -> None:
+    raw = {
+        day: {"as_of": r.as_of, "source": r.source, "rates": r.per_eur}
+        for day, r in sorted(cache.items())
+    }
+    FX_CACHE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = FX_CACHE.with_name(f"{FX_CACHE.name}.{os.getpid()}.tmp")  # runner workers save concurrently
+    tmp.write_text(json.dumps(raw, sort_keys=True, separators=(",", ":")) + "\n", encoding="utf-8")
+    os.replace(tmp, FX_CACHE)
+
+
+# ── Providers ────────────────────────────────────────────────────────────────
+
+def _frankfurter(day: str, latest: bool) -> tuple[str, dict[str, float]]:
+    resp = requests.get(f"https://api.frankfurter.app/{'latest' if latest else day}?from={BASE}", timeout=10)
+    resp.raise_for_status()
+    data = resp.json()
+    return data["date"], {c: float(v) for c, v in data["rates"].items()}
+
+
+def _open_er_api(day: str, latest: bool) -> tuple[str, dict[str, float]]:
+    if not latest:
+        raise ValueError("open.er-api.com has no historical rates")
+    resp = requests.get(f"https://open.er-api.com/v6/latest/{BASE}", timeout=15)
+    resp.raise_for_status()
+    data = resp.json()
+    if data.get("result") != "success":
+        raise ValueError(f"result={data.get('result')}")
+    as_of = datetime.fromtimestamp(data["time_last_update_unix"], timezone.utc).date().isoformat()
+    return as_of, {c: float(v) for c, v in data["rates"].items() if v}
+
+
+_PROVIDERS = (("frankfurter.app", _frankfurter), ("open.er-api.com", _open_er_api))
+
+
+def _fetch(day: str) -> Optional[DayRates]:
+    latest = day == date.today().isoformat()
+    for name, fetch in _PROVIDERS:
+        try:
+            as_of, per_eur = fetch(day, latest)
+        except Exception as e:
+            print(f"  [FX] {name} failed ({e})")
+            continue
+        per_eur[BASE] = 1.0
+        return DayRates(day, as_of, name, per_eur)
+    return None
+
+
+def _write_to_db(r: DayRates) -> tuple[Optional[int], Optional[str]]:
+    fetched_at = datetime.now(timezone.utc).isoformat()
+    rows = [(r.day, c, v, r.as_of, r.source, fetched_at) for c, v in sorted(r.per_eur.items())]
+    return safe_upsert(table="fx_rate_daily", columns=_COLUMNS, rows=rows, conflict_columns=_KEY)
+
+
+# ── Public API ───────────────────────────────────────────────────────────────
+
+def rates(day: Day = None) -> DayRates:
+    """
+    The rate vector for day (default today). Cached days are returned
+    without a network call; otherwise it is fetched once, cached and
+    written to fx_rate_daily. If every provider fails, returns the
+    FALLBACK_SEK rates (not cached, so the next call retries).
+    """
+    key = day if isinstance(day, str) else (day or date.today()).isoformat()
+    cache = _load_cache()
+    hit = cache.get(key)
+    if hit is not None:
+        return hit
+
+    fetched = _fetch(key)
+    if fetched is None:
+        print("  [FX] all providers failed — using fallback rates")
+        return DayRates(key, key, "fallback",
+                        {c: FALLBACK_SEK[BASE] / v for c, v in FALLBACK_SEK.items()})
+
+    cache[key] = fetched
+    _save_cache(cache)
+    _write_to_db(fetched)
+    return fetched
+
+
+def rate(currency: str, quote: str = "SEK", day: Day = None) -> float:
+    """Units of quote per 1 unit of currency on day (default today)."""
+    return rates(day).rate(currency, quote)
+
+
+def sek_rates(currencies: Iterable[str], day: Day = None) -> dict[str, float]:
+    """{currency: SEK per unit} for every currency given (SEK included as 1.0)."""
+    r = rates(day)
+    out = {c: 1.0 if c == "SEK" else r.rate(c) for c in sorted(set(currencies)) if c}
+    print(f"  [FX] {r.source} {r.as_of}: " + ", ".join(f"{c}={v:.4f}" for c, v in out.items() if c != "SEK"))
+    return out
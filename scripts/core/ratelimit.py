@@ -0,0 +1,65 @@
+"""
+core/ratelimit.py
+
+Thread-safe token bucket shared by a pool of download workers, so a whole
+pool stays under one request rate instead of each worker sleeping a fixed
+delay between its own requests.
+
+A 429 from the server should call pause(): it empties the bucket and holds
+every worker until the Retry-After has passed, rather than only the worker
+that happened to receive the 429.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """rate tokens per second, at most capacity banked (the burst size)."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.rate      = rate
+        self.capacity  = capacity if capacity is not None else max(1.0, rate)
+        self._tokens   = self.capacity
+        self._updated  = time.monotonic()
+        self._resume_at = 0.0
+        self._lock     = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens  = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """Block until `tokens` are available (and any pause has expired), then take them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._resume_at:
+                    wait = self._resume_at - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= tokens:
+                        self._tokens -= tokens
+                        return
+                    wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Hold all callers for `seconds` (e.g. a 429's Retry-After) and drop banked tokens."""
+        with self._lock:
+            now = time.monotonic()
+            self._resume_at = max(self._resume_at, now + seconds)
+            self._tokens    = 0.0
+            self._updated   = max(now, self._resume_at)
+
+
+def retry_after_seconds(value: Optional[str], default: float) -> float:
+    """Parse a Retry-After header given in seconds; fall back to `default`."""
+    try:
+        return max(0.0, float(value)) if value else default
+    except ValueError:
+        return default
@@ -0,0 +1,292 @@
+"""
+core/report.py
+
+Streaming xlsx report writer for the trackers whose workbook is rebuilt
+from history on every run (track_nelly_inventory, track_anoto_inventory,
+track_rvrc_inventory).
+
+Those scripts used to load_workbook() the whole existing file, delete and
+re-create every sheet cell by cell, style each header cell individually and
+_autofit() every column by walking all cells again, so time and memory grew
+with the history. ReportWriter instead writes an openpyxl write_only
+workbook: rows are streamed straight to disk, the header style is shared,
+and column widths are computed up front from the header plus the first
+WIDTH_SAMPLE_ROWS rows.
+
+Sheet cache
+-----------
+A sheet can be given a key: any JSON-serialisable value that changes
+whenever the sheet's content would (e.g. the store's latest date and run
+timestamp). The key hashes are kept next to the workbook in
+<name>.sheets.json, together with the sha256 of the file they describe. On
+the next run a sheet whose key hash is unchanged is not regenerated — its
+rows callable is never called and the previous worksheet XML is copied into
+the new file (shared-string indices remapped). If nothing changed the file
+is not rewritten at all. Any mismatch (file edited by hand, different
+styles) silently falls back to regenerating every sheet.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import zipfile
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Optional, Sequence, Union
+
+from lxml import etree
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+HDR_FILL  = PatternFill("solid", fgColor="1F497D")
+HDR_FONT  = Font(bold=True, color="FFFFFF")
+HDR_ALIGN = Alignment(horizontal="center")
+
+WIDTH_SAMPLE_ROWS = 500   # rows buffered to size the columns before streaming
+MAX_COL_WIDTH     = 55
+
+Rows = Union[Iterable[Sequence[Any]], Callable[[], Iterable[Sequence[Any]]]]
+
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS  = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_NS  = "http://schemas.openxmlformats.org/package/2006/relationships"
+_SST_PART = "xl/sharedStrings.xml"
+_STR_CELL = re.compile(rb'(<c\b[^>]*\bt="s"[^>]*><v>)(\d+)(</v>)')
+
+
+class _Sheet(NamedTuple):
+    title:   str
+    headers: list[str]
+    rows:    Rows
+    key:     Optional[str]
+
+
+def _key_hash(key: Any) -> str:
+    blob = json.dumps(key, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _col_widths(headers: Sequence[str], sample: Sequence[Sequence[Any]]) -> list[float]:
+    widths = [len(str(h)) for h in headers]
+    for row in sample:
+        for i, v in enumerate(row):
+            if v is None:
+                continue
+            n = len(str(v))
+            if i >= len(widths):
+                widths.append(n)
+            elif n > widths[i]:
+                widths[i] = n
+    return [min(w + 4, MAX_COL_WIDTH) for w in widths]
+
+
+# ── xlsx parts ────────────────────────────────────────────────────────────────
+
+def _sheet_parts(zf: zipfile.ZipFile) -> dict[str, str]:
+    """{sheet title: zip part name} from workbook.xml + its rels."""
+    rels = etree.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    targets = {}
+    for rel in rels.iter(f"{{{_PKG_NS}}}Relationship"):
+        target = rel.get("Target")
+        targets[rel.get("Id")] = target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+    book = etree.fromstring(zf.read("xl/workbook.xml"))
+    return {
+        s.get("name"): targets[s.get(f"{{{_REL_NS}}}id")]
+        for s in book.iter(f"{{{_MAIN_NS}}}sheet")
+    }
+
+
+def _read_sst(zf: zipfile.ZipFile) -> list[str]:
+    if _SST_PART not in zf.namelist():
+        return []
+    root = etree.fromstring(zf.read(_SST_PART))
+    return ["".join(si.itertext()) for si in root.iter(f"{{{_MAIN_NS}}}si")]
+
+
+def _sst_xml(strings: Sequence[str]) -> bytes:
+    root = etree.Element(f"{{{_MAIN_NS}}}sst", nsmap={None: _MAIN_NS},
+                         count=str(len(strings)), uniqueCount=str(len(strings)))
+    for s in strings:
+        t = etree.SubElement(etree.SubElement(root, f"{{{_MAIN_NS}}}si"), f"{{{_MAIN_NS}}}t")
+        t.text = s
+        if s != s.strip():
+            t.set("{http://www.w3.org/XML/1998/namespace}space", "preserve")
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+
+def _splice(new_path: Path, old_path: Path, titles: set[str]) -> bool:
+    """
+    Replace the placeholder worksheets `titles` in new_path with the same
+    sheets' XML from old_path. Returns False (new_path untouched) if the two
+    files' styles differ, since cell style ids would then not line up.
+    """
+    with zipfile.ZipFile(old_path) as old, zipfile.ZipFile(new_path) as new:
+        if old.read("xl/styles.xml") != new.read("xl/styles.xml"):
+            return False
+        old_parts, new_parts = _sheet_parts(old), _sheet_parts(new)
+        if not titles <= set(old_parts):
+            return False
+
+        strings = _read_sst(new)
+        index = {s: i for i, s in enumerate(strings)}
+        old_strings = _read_sst(old)
+
+        def remap(match: re.Match) -> bytes:
+            s = old_strings[int(match.group(2))]
+            i = index.get(s)
+            if i is None:
+                i = index[s] = len(strings)
+                strings.append(s)
+            return match.group(1) + str(i).encode() + match.group(3)
+
+        replaced = {new_parts[t]: _STR_CELL.sub(remap, old.read(old_parts[t])) for t in titles}
+
+        tmp = new_path.with_name(new_path.name + ".splice")
+        with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as out:
+            for info in new.infolist():
+                if info.filename in replaced:
+                    out.writestr(info, replaced[info.filename])
+                elif info.filename == _SST_PART:
+                    out.writestr(info, _sst_xml(strings))
+                else:
+                    out.writestr(info, new.read(info.filename))
+    os.replace(tmp, new_path)
+    return True
+
+
+# ── Writer ────────────────────────────────────────────────────────────────────
+
+class ReportWriter:
+    """
+    Collect sheets with sheet(), then save() once:
+
+        report = ReportWriter(XLSX_PATH)
+        report.sheet("Daily Summary", ["Date", ...], rows_iterable)
+        report.sheet("History", [...], lambda: stream_rows(), key=(n_days, latest))
+        report.save()
+
+    rows is a zero-argument callable returning an iterable of row sequences
+    (so an unchanged keyed sheet's rows are never produced), or the rows
+    themselves. A plain iterable is turned into a list on registration:
+    save() may have to write every sheet twice (see _splice), and a
+    generator would come out header-only the second time. Sheets are
+    written in registration order.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path       = path
+        self.cache_path = path.with_suffix(".sheets.json")
+        self._sheets: list[_Sheet] = []
+
+    def sheet(self, title: str, headers: Sequence[str], rows: Rows, key: Any = None) -> None:
+        if key is not None and not callable(rows):
+            raise TypeError(f"sheet {title!r}: keyed sheets need a rows callable")
+        if not callable(rows) and not isinstance(rows, (list, tuple)):
+            rows = list(rows)
+        self._sheets.append(_Sheet(title, list(headers), rows, None if key is None else _key_hash(key)))
+
+    def existing_rows(self, title: str, with_header: bool = False) -> Iterator[tuple]:
+        """
+        Rows of `title` in the current file (header first only if
+        with_header), streamed in read-only mode. For append-style sheets
+        whose history lives only in the workbook itself. Yields nothing if
+        the file or sheet is missing.
+        """
+        if not self.path.exists():
+            return
+        wb = load_workbook(self.path, read_only=True)
+        try:
+            if title not in wb.sheetnames:
+                return
+            rows = wb[title].iter_rows(values_only=True)
+            header = next(rows, None)
+            if with_header and header is not None:
+                yield header
+            for row in rows:
+                if any(v is not None for v in row):
+                    yield row
+        finally:
+            wb.close()
+
+    # ── save ─────────────────────────────────────────────────────────────────
+
+    def _load_cache(self) -> dict:
+        """The sheet cache, or {} if it doesn't describe the current file."""
+        if not (self.path.exists() and self.cache_path.exists()):
+            return {}
+        try:
+            cache = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        except ValueError:
+            return {}
+        if cache.get("file_sha256") != _file_sha256(self.path):
+            return {}
+        return cache
+
+    def _write(self, dest: Path, reuse: set[str]) -> None:
+        wb = Workbook(write_only=True)
+        for sh in self._sheets:
+            ws = wb.create_sheet(sh.title)
+            if sh.title in reuse:
+                rows_iter: Iterator = iter(())
+            else:
+                rows_iter = iter(sh.rows() if callable(sh.rows) else sh.rows)
+            sample = []
+            for row in rows_iter:
+                sample.append(row)
+                if len(sample) >= WIDTH_SAMPLE_ROWS:
+                    break
+            for i, w in enumerate(_col_widths(sh.headers, sample), 1):
+                ws.column_dimensions[get_column_letter(i)].width = w
+
+            header = []
+            for h in sh.headers:
+                cell = WriteOnlyCell(ws, value=h)
+                cell.fill, cell.font, cell.alignment = HDR_FILL, HDR_FONT, HDR_ALIGN
+                header.append(cell)
+            ws.append(header)
+            for row in sample:
+                ws.append(list(row))
+            for row in rows_iter:
+                ws.append(list(row))
+        wb.save(dest)
+
+    def save(self) -> None:
+        """Write the workbook (atomically) and its sheet cache."""
+        titles = [sh.title for sh in self._sheets]
+        cache = self._load_cache()
+        cached = cache.get("sheets", {})
+        reuse = {
+            sh.title for sh in self._sheets
+            if sh.key is not None and cached.get(sh.title) == sh.key
+        }
+        if cache.get("titles") == titles and reuse == set(titles):
+            print(f"  Unchanged -> {self.path} (all {len(titles)} sheets cached)")
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        self._write(tmp, reuse)
+        if reuse and not _splice(tmp, self.path, reuse):
+            reuse = set()
+            self._write(tmp, reuse)
+        os.replace(tmp, self.path)
+
+        sheets = {sh.title: sh.key for sh in self._sheets if sh.key is not None}
+        self.cache_path.write_text(
+            json.dumps({"file_sha256": _file_sha256(self.path), "titles": titles, "sheets": sheets},
+                       ensure_ascii=False, indent=1) + "\n",
+            encoding="utf-8",
+        )
+        if reuse:
+            print(f"  Reused {len(reuse)} unchanged sheet(s): {', '.join(sorted(reuse))}")
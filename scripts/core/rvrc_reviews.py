@@ -0,0 +1,503 @@
+"""
+core/rvrc_reviews.py
+
+Local, review-level store for Revolution Race's public GraphQL reviews API,
+shared by backfill_revolutionrace_history (monthly country/category/gender
+history), fetch_rvrc_ski_product_reviews (ski-product share report) and
+track_revolutionrace_reviews (daily new-review deltas).
+
+Those scripts used to re-page every review of every product each time they
+needed a monthly number, and products with more than MAX_SKIP reviews lost
+everything beyond the server's skip limit. Here every review is fetched
+once and kept as one compact row. sync() only pages the reviews published
+since the stored watermark, and every report is computed locally from the
+store, so a new report variant costs no API traffic.
+
+Layout
+------
+  data/reviews/revolutionrace/
+    2025-01.jsonl     one partition per publication month; one JSON array
+    2025-02.jsonl     per line: [id, product, publishedAt, channel,
+    ...                          category, gender], sorted by publishedAt
+    meta.json         watermark (newest publishedAt stored) and the
+                      products whose full history has been backfilled
+
+Backfill
+--------
+Each product is backfilled once, oldest first. A product with more than
+MAX_SKIP reviews is split by channel, and a channel slice that is still too
+large is paged from both ends (up to 2 x MAX_SKIP); whatever remains in the
+middle is recorded as "missing" for that product in meta.json instead of
+being dropped silently. A stored review is never removed, so history no
+longer falls out of the API's window.
+
+All paging goes through BatchPager: the next pages of many products are
+packed into one aliased GraphQL query, a few queries run concurrently, and
+the batch size follows response size and latency. A full backfill is a few
+dozen round-trips rather than one request per product per page.
+
+    store = ReviewStore()
+    result = sync(store)         # full backfill on the first run, then incremental
+    for r in store.iter_reviews("2025-01", "2026-03"):
+        ...
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional
+
+import requests
+
+DATA_DIR   = Path(__file__).resolve().parent.parent.parent / "data"
+STORE_ROOT = DATA_DIR / "reviews" / "revolutionrace"
+
+GRAPHQL_URL = "https://reviews.revolutionrace.com/revolutionrace/graphql"
+GQL_HEADERS = {
+    "Content-Type": "application/json",
+    "User-Agent":   "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+}
+
+MAX_SKIP          = 9000   # hard server limit
+TAKE              = 5000   # max page size that works
+WORKERS           = 4      # aliased queries in flight at once (be gentle)
+SYNC_OVERLAP_DAYS = 3      # re-read this far behind the watermark (late-published reviews)
+CHECKPOINT_EVERY  = 50     # flush to disk every N backfilled products
+
+REVIEW_FIELDS = "id publishedAt channelId item { baseProduct parentItemCategory gender }"
+
+_META   = "meta.json"
+_SUFFIX = ".jsonl"
+
+
+class Review(NamedTuple):
+    id:           str
+    product:      str
+    published_at: str
+    channel:      str
+    category:     str
+    gender:       str
+
+    @property
+    def month(self) -> str:
+        return self.published_at[:7]
+
+
+class SyncResult(NamedTuple):
+    newer:      list[Review]   # paged since the watermark
+    backfilled: list[Review]   # full history of products never backfilled before
+
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def _atomic_write(path: Path, text: str) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+# ── Store ─────────────────────────────────────────────────────────────────────
+
+class ReviewStore:
+    """Month-partitioned review rows under data/reviews/revolutionrace/."""
+
+    def __init__(self, root: Path = STORE_ROOT) -> None:
+        self.dir = root
+        self._months: dict[str, dict[str, Review]] = {}
+        self._dirty: set[str] = set()
+        path = self.dir / _META
+        self.meta: dict = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+        self.meta.setdefault("watermark", None)
+        self.meta.setdefault("products", {})
+
+    def __repr__(self) -> str:
+        return f"ReviewStore({str(self.dir)!r})"
+
+    @property
+    def watermark(self) -> Optional[str]:
+        """publishedAt of the newest stored review (None for an empty store)."""
+        return self.meta["watermark"]
+
+    def months(self) -> list[str]:
+        on_disk = {p.name[: -len(_SUFFIX)] for p in self.dir.glob(f"*{_SUFFIX}")} if self.dir.exists() else set()
+        return sorted(on_disk | set(self._months))
+
+    def _month(self, month: str) -> dict[str, Review]:
+        if month not in self._months:
+            rows: dict[str, Review] = {}
+            path = self.dir / f"{month}{_SUFFIX}"
+            if path.exists():
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            r = Review(*json.loads(line))
+                            rows[r.id] = r
+            self._months[month] = rows
+        return self._months[month]
+
+    def iter_reviews(self, start_month: Optional[str] = None, end_month: Optional[str] = None) -> Iterator[Review]:
+        """Stored reviews in [start_month, end_month] (YYYY-MM, inclusive, either open)."""
+        for month in self.months():
+            if (start_month and month < start_month) or (end_month and month > end_month):
+                continue
+            yield from self._month(month).values()
+
+    def add(self, reviews: Iterable[Review]) -> list[Review]:
+        """Store reviews not seen before (by id); returns just those."""
+        added: list[Review] = []
+        for r in reviews:
+            rows = self._month(r.month)
+            if r.id in rows:
+                continue
+            rows[r.id] = r
+            self._dirty.add(r.month)
+            added.append(r)
+            if self.meta["watermark"] is None or r.published_at > self.meta["watermark"]:
+                self.meta["watermark"] = r.published_at
+        return added
+
+    def flush(self) -> None:
+        """Write every changed month partition and meta.json (atomically, one by one)."""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        for month in sorted(self._dirty):
+            rows = sorted(self._months[month].values(), key=lambda r: (r.published_at, r.id))
+            _atomic_write(self.dir / f"{month}{_SUFFIX}", "".join(_dumps(list(r)) + "\n" for r in rows))
+        self._dirty.clear()
+        _atomic_write(self.dir / _META, json.dumps(self.meta, ensure_ascii=False, indent=1, sort_keys=True) + "\n")
+
+
+# ── GraphQL ───────────────────────────────────────────────────────────────────
+
+def _post(query: str, retries: int = 3) -> tuple[dict, int]:
+    """POST a GraphQL query -> (data, response bytes); retry with exponential back-off."""
+    for attempt in range(retries):
+        try:
+            resp = requests.post(
+                GRAPHQL_URL, json={"query": query},
+                headers=GQL_HEADERS, timeout=60,
+            )
+            resp.raise_for_status()
+            data = resp.json()
+            if "errors" in data:
+                raise ValueError(data["errors"][0]["message"])
+            return data, len(resp.content)
+        except Exception:
+            if attempt == retries - 1:
+                raise
+            time.sleep(2 ** attempt)
+
+
+def gql(query: str, retries: int = 3) -> dict:
+    """POST a GraphQL query; retry with exponential back-off on failure."""
+    return _post(query, retries)[0]
+
+
+def fetch_review_counts() -> dict[str, int]:
+    """Single facets call -> {base_product_id: total_review_count}."""
+    data = gql("""
+    {
+      publicReviews(take: 0, facets: { item_baseProduct: [] }) {
+        facets { item_baseProduct { value count } }
+      }
+    }
+    """)
+    facets = data["data"]["publicReviews"]["facets"]["item_baseProduct"]
+    return {item["value"]: item["count"] for item in facets}
+
+
+def _filter(product: Optional[str] = None, channel: Optional[str] = None) -> str:
+    parts = []
+    if product:
+        parts.append(f'item_baseProduct: ["{product}"]')
+    if channel:
+        parts.append(f'channelId: ["{channel}"]')
+    return f"filter: {{ {', '.join(parts)} }}," if parts else ""
+
+
+def _to_review(hit: dict, product: Optional[str] = None) -> Review:
+    item = hit.get("item") or {}
+    return Review(
+        hit["id"],
+        item.get("baseProduct") or product or "",
+        hit["publishedAt"],
+        hit.get("channelId") or "",
+        item.get("parentItemCategory") or "",
+        item.get("gender") or "",
+    )
+
+
+def fetch_channel_counts(products: list[str]) -> dict[str, dict[str, int]]:
+    """{product: {channel: review_count}}, MAX_ALIASES products per request."""
+    result: dict[str, dict[str, int]] = {}
+    for start in range(0, len(products), MAX_ALIASES):
+        chunk = products[start : start + MAX_ALIASES]
+        aliases = "\n".join(
+            f"  a{i}: publicReviews(take: 0, {_filter(bp)} facets: {{ channelId: [] }}) {{"
+            f"    facets {{ channelId {{ value count }} }}"
+            f"  }}"
+            for i, bp in enumerate(chunk)
+        )
+        data = gql(f"{{ {aliases} }}")
+        for i, bp in enumerate(chunk):
+            facets = data["data"][f"a{i}"]["facets"]["channelId"]
+            result[bp] = {item["value"]: item["count"] for item in facets}
+    return result
+
+
+# ── Batched paging ────────────────────────────────────────────────────────────
+#
+# Every paging sequence (one product, one product x channel slice, or the
+# whole catalogue newest-first) is a PageCursor. BatchPager packs the next
+# page of many cursors into one aliased query:
+#
+#   { a0: publicReviews(take: 412, skip: 0, filter: {...}, sort: ...) { hits {...} }
+#     a1: publicReviews(take: 5000, skip: 5000, filter: {...}, sort: ...) { hits {...} }
+#     ... }
+#
+# so hundreds of small products cost a few dozen round-trips instead of one
+# request per product per page. Each cursor keeps its own early exit (short
+# page, limit, stop_before), so one alias finishing never stops the others.
+
+BATCH_ROWS_START = 20_000      # reviews requested per query, to begin with
+BATCH_ROWS_MIN   = 1_000
+BATCH_ROWS_MAX   = 100_000
+MAX_ALIASES      = 50          # aliases per query (as the name/info batches)
+TARGET_LATENCY_S = 5.0         # grow the batch while responses are faster than half this
+TARGET_BYTES     = 8 * 2**20   # ... and smaller than half this; halve it above
+FIRST_PAGE_NEWER = 200         # first page of a stop_before cursor (usually few new reviews)
+
+
+@dataclass(eq=False)
+class PageCursor:
+    """
+    One publicReviews paging sequence, advanced one page per batch. Ends on a
+    short page, at limit (<= MAX_SKIP) or — with stop_before, desc order —
+    after the first page that reaches a review published before it.
+    """
+    filter_clause: str
+    order:         str
+    limit:         int = MAX_SKIP
+    stop_before:   Optional[str] = None
+    product:       Optional[str] = None
+    take:          int = TAKE
+    skip:          int = 0
+    reviews:       list = field(default_factory=list)
+    done:          bool = False
+    truncated:     bool = False   # ended at limit with more reviews left
+    solo:          bool = False   # was in a failed batch: query it alone
+    error:         Optional[Exception] = None
+
+    def __post_init__(self) -> None:
+        self.limit = min(self.limit, MAX_SKIP)
+        self.done  = self.limit <= 0
+
+    def next_take(self) -> int:
+        return min(self.take, TAKE, self.limit - self.skip)
+
+    def query(self, alias: str) -> str:
+        return (
+            f"  {alias}: publicReviews(take: {self.next_take()}, skip: {self.skip}, "
+            f"{self.filter_clause} sort: {{ order: [{self.order}] }}) {{ hits {{ {REVIEW_FIELDS} }} }}"
+        )
+
+    def advance(self, hits: list[dict]) -> None:
+        take = self.next_take()
+        self.reviews.extend(_to_review(h, self.product) for h in hits)
+        self.skip += take
+        self.solo = False
+        if len(hits) < take or (self.stop_before and hits[-1]["publishedAt"] < self.stop_before):
+            self.done = True
+        elif self.skip >= self.limit:
+            self.done = self.truncated = True
+        else:
+            self.take = min(TAKE, self.take * 2)
+
+
+class BatchPager:
+    """
+    Runs PageCursors to completion: packs their next pages into aliased
+    queries of about `rows` requested reviews (at most MAX_ALIASES aliases),
+    keeps up to `concurrency` queries in flight, and resizes `rows` after
+    every response — growing while responses come back fast and small,
+    halving when one is slow, large or fails. A failed batch is re-queued
+    with every cursor on its own, so one bad alias cannot sink the rest;
+    a cursor that fails alone gets .error and is finished.
+    """
+
+    def __init__(self, concurrency: int = WORKERS, rows: int = BATCH_ROWS_START) -> None:
+        self.concurrency = concurrency
+        self.rows        = rows
+        self.requests    = 0
+
+    def _pack(self, queue: deque) -> list[PageCursor]:
+        batch = [queue.popleft()]
+        if batch[0].solo:
+            return batch
+        rows = batch[0].next_take()
+        while (queue and len(batch) < MAX_ALIASES and not queue[0].solo
+               and rows + queue[0].next_take() <= self.rows):
+            cursor = queue.popleft()
+            batch.append(cursor)
+            rows += cursor.next_take()
+        return batch
+
+    def _query(self, batch: list[PageCursor]) -> tuple[dict, int, float]:
+        aliases = "\n".join(c.query(f"a{i}") for i, c in enumerate(batch))
+        t0 = time.monotonic()
+        data, nbytes = _post(f"{{\n{aliases}\n}}")
+        return data, nbytes, time.monotonic() - t0
+
+    def _adapt(self, nbytes: int, seconds: float, ok: bool = True) -> None:
+        if not ok or seconds > TARGET_LATENCY_S or nbytes > TARGET_BYTES:
+            self.rows = max(BATCH_ROWS_MIN, self.rows // 2)
+        elif seconds < TARGET_LATENCY_S / 2 and nbytes < TARGET_BYTES / 2:
+            self.rows = min(BATCH_ROWS_MAX, int(self.rows * 1.5))
+
+    def run(self, cursors: Iterable[PageCursor], on_done: Optional[Callable[[PageCursor], None]] = None) -> None:
+        """Page every cursor to its end; on_done(cursor) is called (in this thread) as each finishes."""
+        queue = deque(c for c in cursors if not c.done)
+        inflight: dict = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            while queue or inflight:
+                while queue and len(inflight) < self.concurrency:
+                    batch = self._pack(queue)
+                    inflight[pool.submit(self._query, batch)] = batch
+                    self.requests += 1
+                finished, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    batch = inflight.pop(future)
+                    try:
+                        data, nbytes, seconds = future.result()
+                    except Exception as e:
+                        self._adapt(0, 0.0, ok=False)
+                        if len(batch) == 1:
+                            batch[0].error, batch[0].done = e, True
+                            if on_done:
+                                on_done(batch[0])
+                            continue
+                        for c in batch:
+                            c.solo = True
+                        queue.extendleft(reversed(batch))
+                        continue
+                    self._adapt(nbytes, seconds)
+                    for i, c in enumerate(batch):
+                        c.advance(data["data"][f"a{i}"]["hits"])
+                        if not c.done:
+                            queue.append(c)
+                        elif on_done:
+                            on_done(c)
+
+
+# ── Sync ──────────────────────────────────────────────────────────────────────
+
+def _backfill(store: ReviewStore, pending: dict[str, int]) -> list[Review]:
+    total = len(pending)
+    big = [bp for bp, c in pending.items() if c > MAX_SKIP]
+    print(f"  Backfilling {total} products ({len(big)} with >{MAX_SKIP:,} reviews, split by channel) …")
+    channels = fetch_channel_counts(big) if big else {}
+
+    cursors: list[PageCursor] = []
+    missing: dict[str, int] = {}
+    for bp, count in pending.items():
+        if count <= MAX_SKIP:
+            cursors.append(PageCursor(_filter(bp), "publishedAt_asc", count, product=bp))
+            missing[bp] = 0
+            continue
+        missing[bp] = 0
+        for channel, n in channels.get(bp, {}).items():
+            f = _filter(bp, channel)
+            cursors.append(PageCursor(f, "publishedAt_asc", n, product=bp))
+            if n > MAX_SKIP:
+                cursors.append(PageCursor(f, "publishedAt_desc", n - MAX_SKIP, product=bp))
+                missing[bp] += max(0, n - 2 * MAX_SKIP)
+
+    added: list[Review] = []
+    outstanding = Counter(c.product for c in cursors)
+    collected: dict[str, list[Review]] = defaultdict(list)
+    failed: set[str] = set()
+    done = 0
+
+    def finished(c: PageCursor) -> None:
+        nonlocal done
+        bp = c.product
+        if c.error is not None:
+            failed.add(bp)
+            print(f"  ERROR for {bp}: {c.error}")
+        else:
+            collected[bp] += c.reviews
+        outstanding[bp] -= 1
+        if outstanding[bp]:
+            return
+        done += 1
+        reviews = collected.pop(bp, [])
+        if bp in failed:
+            return
+        added.extend(store.add(reviews))
+        store.meta["products"][bp] = {"count": pending[bp], "missing": missing[bp]}
+        if missing[bp]:
+            print(f"  [{done:>4}/{total}]  {bp}: {missing[bp]:,} middle reviews out of API reach")
+        if done % CHECKPOINT_EVERY == 0 or done == total:
+            store.flush()
+            print(f"  [{done:>4}/{total}]  {len(added):>8,} reviews stored so far")
+
+    pager = BatchPager()
+    pager.run(cursors, finished)
+    print(f"  {len(cursors)} paging sequences in {pager.requests} requests")
+    if failed:
+        print(f"  {len(failed)} product(s) failed; they are retried on the next sync.")
+    return added
+
+
+def _sync_newer(store: ReviewStore) -> list[Review]:
+    stop_before = (date.fromisoformat(store.watermark[:10]) - timedelta(days=SYNC_OVERLAP_DAYS)).isoformat()
+    print(f"  Fetching reviews published since {stop_before} (watermark {store.watermark}) …")
+    pager = BatchPager()
+    newest = PageCursor("", "publishedAt_desc", stop_before=stop_before, take=FIRST_PAGE_NEWER)
+    pager.run([newest])
+    if newest.error is not None:
+        raise newest.error
+    reviews = newest.reviews
+    if newest.truncated:
+        # Too many new reviews for one newest-first window: per product instead.
+        print(f"  More than {MAX_SKIP:,} reviews since {stop_before}; catching up per product …")
+        cursors = [
+            PageCursor(_filter(bp), "publishedAt_desc", stop_before=stop_before, product=bp, take=FIRST_PAGE_NEWER)
+            for bp in store.meta["products"]
+        ]
+        pager.run(cursors)
+        for c in cursors:
+            if c.error is not None:
+                raise c.error
+            reviews += c.reviews
+    return store.add(reviews)
+
+
+def sync(store: ReviewStore, counts: Optional[dict[str, int]] = None) -> SyncResult:
+    """
+    Bring the store up to date and return the reviews it did not have yet.
+    Reviews newer than the watermark are paged newest-first; products never
+    backfilled (every product on the first run, new products and retried
+    failed backfills later) get their full history. The two are returned
+    separately, since a backfill adds reviews of any age. counts
+    ({product: review_count}) is fetched if not given.
+    """
+    newer: list[Review] = []
+    backfilled: list[Review] = []
+    if store.watermark is not None:
+        newer = _sync_newer(store)
+    counts = fetch_review_counts() if counts is None else counts
+    pending = {bp: c for bp, c in counts.items() if bp not in store.meta["products"]}
+    if pending:
+        backfilled = _backfill(store, pending)
+    store.flush()
+    print(f"  Review store: {len(newer) + len(backfilled):,} new reviews "
+          f"({len(backfilled):,} backfilled), watermark {store.watermark}")
+    return SyncResult(newer, backfilled)
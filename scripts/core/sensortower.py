@@ -0,0 +1,90 @@
+"""
+core/sensortower.py
+
+Sensor Tower's category_history JSON endpoint, shared by
+fetch_plejd_sensortower_rankings (daily) and
+backfill_plejd_sensortower_rankings (90-day history).
+
+It is the endpoint behind Sensor Tower's public Category Rankings page and
+needs no login. One GET covers every requested country and every day in
+[start, end], so the daily rank for all markets is a single small request
+instead of one rendered overview page per country.
+
+    history = category_history("1032689423", "6012", "topfreeapplications",
+                               ["SE", "NO"], "2026-10-01", "2026-10-17")
+    # {"2026-10-16": {"SE": 270, "NO": None}, ...}
+
+A missing country (no data points) simply comes back as None for that day.
+Anything that is not ranking JSON — an HTTP error such as 401/403/429, a
+network error, an HTML challenge page — raises SensorTowerRefused, so a
+caller can fall back to another source.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+import requests
+
+API_URL = "https://app.sensortower.com/api/ios/category/category_history"
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/124.0.0.0 Safari/537.36"
+    ),
+    "Accept": "application/json",
+    "Referer": "https://app.sensortower.com/app-analysis/category-rankings",
+}
+
+
+class SensorTowerRefused(RuntimeError):
+    """The API did not answer with ranking data (HTTP/network error or non-JSON body)."""
+
+
+def category_history(
+    app_id: str,
+    category: str,
+    chart_type: str,
+    countries: Iterable[str],
+    start: str,
+    end: str,
+    user_agent: Optional[str] = None,
+    timeout: int = 30,
+) -> dict[str, dict[str, int | None]]:
+    """
+    Daily category rank of app_id per country for start..end (YYYY-MM-DD,
+    inclusive). Returns {date_str: {country: rank_or_None}} for every date
+    that has at least one data point.
+    """
+    countries = list(countries)
+    params = [
+        ("app_ids[]", app_id),
+        ("categories[]", category),
+        ("chart_type_ids[]", chart_type),
+        ("start_date", start),
+        ("end_date", end),
+        ("is_hourly", "false"),
+    ]
+    params += [("countries[]", cc) for cc in countries]
+    headers = HEADERS | ({"User-Agent": user_agent} if user_agent else {})
+
+    try:
+        resp = requests.get(API_URL, params=params, headers=headers, timeout=timeout)
+        resp.raise_for_status()
+        data = resp.json()
+    except (requests.RequestException, ValueError) as exc:
+        raise SensorTowerRefused(str(exc)) from exc
+    if not isinstance(data, dict):
+        raise SensorTowerRefused(f"unexpected response: {str(data)[:200]}")
+
+    # {app_id: {country: {category: {chart_type: {graphData: [[ts, rank, _], ...]}}}}}
+    app_data = data.get(str(app_id)) or {}
+    by_date: dict[str, dict[str, int | None]] = {}
+    for cc in countries:
+        cat_data = (app_data.get(cc) or {}).get(str(category)) or {}
+        for point in (cat_data.get(chart_type) or {}).get("graphData", []):
+            ts, rank = point[0], point[1]
+            dt_str = datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d")
+            by_date.setdefault(dt_str, dict.fromkeys(countries))[cc] = rank
+    return by_date
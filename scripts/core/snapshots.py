@@ -0,0 +1,235 @@
+"""
+core/snapshots.py
+
+Append-only, per-day partitioned snapshot store for the inventory trackers
+(track_anoto_inventory, track_ahlsell_led_panel_inventory,
+track_ahlsell_plejd_inventory).
+
+Those trackers used to keep every historical snapshot in one state JSON
+document that was parsed in full and re-serialised with indent=2 on every
+run, so each run cost O(total history) and every commit rewrote a multi-MB
+file. Here each day is its own small file and a run only touches the
+partitions it needs.
+
+Layout
+------
+  data/snapshots/<name>/
+    2026-08-07.jsonl      one partition per day
+    2026-08-08.jsonl
+    LATEST                date of the newest partition (O(1) latest lookup)
+    meta.json             small mutable sidecar (product catalog, warehouses …)
+
+A partition is JSON Lines: line 1 is the day header ({"date": ..., plus
+whatever day-level fields the tracker stores, e.g. a summary}), every
+following line is one row. Partitions are written atomically (tmp file +
+os.replace) and never modified after the day they belong to, except by an
+explicit re-run of that same day.
+
+pyarrow is not a dependency of this repo, so partitions are compact JSONL
+rather than Parquet/Arrow IPC; the API does not expose the file format.
+"""
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+SNAPSHOT_ROOT = DATA_DIR / "snapshots"
+
+_LATEST = "LATEST"
+_META   = "meta.json"
+_SUFFIX = ".jsonl"
+
+
+class Snapshot(NamedTuple):
+    date:   str
+    header: dict
+    rows:   list[dict]
+
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def _atomic_write(path: Path, text: str) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class SnapshotStore:
+    """One named, date-partitioned snapshot series under data/snapshots/<name>/."""
+
+    def __init__(self, name: str, root: Path = SNAPSHOT_ROOT) -> None:
+        self.name = name
+        self.dir  = root / name
+
+    def __repr__(self) -> str:
+        return f"SnapshotStore({self.name!r})"
+
+    def _path(self, snapshot_date: str) -> Path:
+        return self.dir / f"{snapshot_date}{_SUFFIX}"
+
+    # ── Index ────────────────────────────────────────────────────────────────
+
+    def dates(self) -> list[str]:
+        """All partition dates, ascending. Lists the directory; reads no partition."""
+        if not self.dir.exists():
+            return []
+        return sorted(p.name[: -len(_SUFFIX)] for p in self.dir.glob(f"*{_SUFFIX}"))
+
+    def __contains__(self, snapshot_date: str) -> bool:
+        return self._path(snapshot_date).exists()
+
+    def is_empty(self) -> bool:
+        return self.latest_date() is None
+
+    def latest_date(self) -> Optional[str]:
+        """Newest partition date, read from the LATEST pointer."""
+        pointer = self.dir / _LATEST
+        if pointer.exists():
+            d = pointer.read_text(encoding="utf-8").strip()
+            if d and d in self:
+                return d
+        # Pointer missing or stale (e.g. partition deleted by hand to force a re-run).
+        dates = self.dates()
+        return dates[-1] if dates else None
+
+    def previous_date(self, before: str) -> Optional[str]:
+        """Newest partition date strictly before `before` (normally yesterday)."""
+        latest = self.latest_date()
+        if latest is None:
+            return None
+        if latest < before:
+            return latest
+        earlier = [d for d in self.dates() if d < before]
+        return earlier[-1] if earlier else None
+
+    # ── Read ─────────────────────────────────────────────────────────────────
+
+    def iter_rows(self, snapshot_date: str) -> Iterator[dict]:
+        """Stream one partition's rows without materialising the list."""
+        with self._path(snapshot_date).open(encoding="utf-8") as fh:
+            next(fh, None)  # header
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+
+    def read_header(self, snapshot_date: str) -> Optional[dict]:
+        path = self._path(snapshot_date)
+        if not path.exists():
+            return None
+        with path.open(encoding="utf-8") as fh:
+            first = fh.readline()
+        return json.loads(first) if first.strip() else {"date": snapshot_date}
+
+    def get(self, snapshot_date: Optional[str]) -> Optional[Snapshot]:
+        if snapshot_date is None or snapshot_date not in self:
+            return None
+        header = self.read_header(snapshot_date) or {}
+        return Snapshot(snapshot_date, header, list(self.iter_rows(snapshot_date)))
+
+    def latest(self) -> Optional[Snapshot]:
+        return self.get(self.latest_date())
+
+    def previous(self, before: str) -> Optional[Snapshot]:
+        return self.get(self.previous_date(before))
+
+    def iter_range(
+        self,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        headers_only: bool = False,
+    ) -> Iterator[Snapshot]:
+        """
+        Yield snapshots with start <= date <= end (either bound optional) in
+        date order, one partition in memory at a time. headers_only skips the
+        row lines entirely (rows == []), for callers that only need day-level
+        fields.
+        """
+        for d in self.dates():
+            if start is not None and d < start:
+                continue
+            if end is not None and d > end:
+                break
+            header = self.read_header(d) or {}
+            rows = [] if headers_only else list(self.iter_rows(d))
+            yield Snapshot(d, header, rows)
+
+    # ── Write ────────────────────────────────────────────────────────────────
+
+    def put(self, snapshot_date: str, rows: Iterable[dict], header: Optional[dict] = None) -> Path:
+        """Write (or replace) one day's partition and advance LATEST if newer."""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        lines = [_dumps({**(header or {}), "date": snapshot_date})]
+        lines.extend(_dumps(r) for r in rows)
+        path = self._path(snapshot_date)
+        _atomic_write(path, "\n".join(lines) + "\n")
+
+        current = self.latest_date()
+        if current is None or snapshot_date >= current:
+            _atomic_write(self.dir / _LATEST, snapshot_date + "\n")
+        return path
+
+    def update_header(self, snapshot_date: str, **fields) -> None:
+        """Merge fields into an existing partition's header (rows unchanged)."""
+        snap = self.get(snapshot_date)
+        if snap is None:
+            raise KeyError(f"{self.name}: no partition for {snapshot_date}")
+        header = {k: v for k, v in snap.header.items() if k != "date"}
+        self.put(snapshot_date, snap.rows, {**header, **fields})
+
+    # ── Sidecar ──────────────────────────────────────────────────────────────
+
+    def load_meta(self) -> dict:
+        path = self.dir / _META
+        if path.exists():
+            return json.loads(path.read_text(encoding="utf-8"))
+        return {}
+
+    def save_meta(self, meta: dict) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        _atomic_write(
+            self.dir / _META,
+            json.dumps(meta, ensure_ascii=False, indent=1, sort_keys=True) + "\n",
+        )
+
+    # ── Migration ────────────────────────────────────────────────────────────
+
+    def import_legacy(
+        self,
+        legacy_path: Path,
+        convert: Callable[[dict], tuple[dict, Iterable[tuple[str, dict, list[dict]]]]],
+    ) -> int:
+        """
+        One-time import of an old whole-history state JSON file. Runs only
+        when the store is still empty; convert(state) returns
+        (meta, [(date, header, rows), ...]). The legacy file is left in place
+        (git history keeps it either way) and can be deleted once migrated.
+        Returns the number of partitions written.
+        """
+        if not self.is_empty() or not legacy_path.exists():
+            return 0
+        state = json.loads(legacy_path.read_text(encoding="utf-8-sig"))
+        meta, snapshots = convert(state)
+        n = 0
+        for snapshot_date, header, rows in snapshots:
+            self.put(snapshot_date, rows, header)
+            n += 1
+        self.save_meta(meta)
+        print(f"  Migrated {n} day(s) from {legacy_path.name} -> {self.dir}")
+        return n
+
+
+def open_store(
+    name: str,
+    legacy_path: Optional[Path] = None,
+    convert: Optional[Callable[[dict], tuple[dict, Iterable[tuple[str, dict, list[dict]]]]]] = None,
+) -> SnapshotStore:
+    """Open data/snapshots/<name>/, importing legacy_path first if the store is empty."""
+    store = SnapshotStore(name)
+    if legacy_path is not None and convert is not None:
+        store.import_legacy(legacy_path, convert)
+    return store
@@ -0,0 +1,243 @@
+"""
+core/transport.py
+
+Record/replay layer under every requests call, so a pipeline can run
+end-to-end without the live Elevate, Ahlsell, Shopify, TED, Rugvista or
+GraphQL endpoints — e.g. to time extract_products_from_page,
+compute_snapshot_summary or parse_eforms_xml on identical input run after run.
+
+install() wraps requests.adapters.HTTPAdapter.send, which every
+requests.get/post and every Session (including ones that mount their own
+retrying adapter, like core.elevate) ends up in:
+
+  record  requests go to the network as usual; each response is also
+          stored, gzip-compressed, under the cassette directory. An error
+          response (4xx/5xx, e.g. a throttled 429) is only stored if the
+          request has no recording yet, so a retry never replaces a good
+          response with the error that preceded it
+  replay  nothing goes to the network; recorded responses are served
+          after an optional simulated latency, and an unrecorded request
+          raises requests.ConnectionError like an unreachable host would
+
+Responses are keyed by method, URL with normalised query (sorted, minus the
+per-run random IGNORED_PARAMS such as Elevate's customerKey/sessionKey) and
+a hash of the body (JSON bodies are key-sorted first). Playwright and urllib
+traffic is not covered.
+
+Run one script:
+    cd scripts
+    python -m core.transport record track_nelly_inventory.py
+    python -m core.transport replay --latency-ms 40 track_nelly_inventory.py
+    python -m core.transport replay --latency-ms recorded fetch_ted_procurements.py
+
+or set SCRAPER_HTTP_MODE=record|replay (plus SCRAPER_HTTP_CASSETTE,
+SCRAPER_HTTP_LATENCY_MS) for runner.py, which calls install_from_env() in
+every worker.
+"""
+from __future__ import annotations
+
+import argparse
+import atexit
+import base64
+import gzip
+import hashlib
+import json
+import os
+import runpy
+import sys
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Optional, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+REPO_ROOT       = Path(__file__).resolve().parent.parent.parent
+DEFAULT_CASSETTE = REPO_ROOT / ".http_cassettes"
+
+MODES = ("record", "replay")
+
+# Query/body-independent params that differ on every run and must not be
+# part of the key.
+IGNORED_PARAMS = frozenset({"customerKey", "sessionKey", "_", "cb", "ts", "timestamp"})
+
+# Hop-by-hop/encoding headers that no longer describe the stored (decoded) body.
+_DROP_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "connection"}
+
+Latency = Union[float, str]   # seconds, or "recorded" to replay each response's own elapsed time
+
+
+def request_key(method: str, url: str, body: Union[bytes, str, None]) -> tuple[str, str]:
+    """(sha256 key, normalised request line) for one request."""
+    parts = urlsplit(url)
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k not in IGNORED_PARAMS
+    )
+    line = f"{method.upper()} {parts.scheme.lower()}://{parts.netloc.lower()}{parts.path or '/'}"
+    if query:
+        line += "?" + urlencode(query)
+
+    h = hashlib.sha256(line.encode("utf-8"))
+    if body:
+        raw = body.encode("utf-8") if isinstance(body, str) else body
+        try:
+            raw = json.dumps(json.loads(raw), sort_keys=True, separators=(",", ":")).encode("utf-8")
+        except ValueError:
+            pass
+        h.update(b"\n")
+        h.update(raw)
+    return h.hexdigest(), line
+
+
+class Cassette:
+    """One directory of recorded responses: <dir>/<host>/<key>.json.gz."""
+
+    def __init__(self, root: Path) -> None:
+        self.root   = Path(root)
+        self.hits   = 0
+        self.misses = 0
+        self.stored = 0
+        self._lock  = threading.Lock()
+
+    def _path(self, url: str, key: str) -> Path:
+        host = (urlsplit(url).hostname or "_").lower()
+        return self.root / host / f"{key}.json.gz"
+
+    def has(self, url: str, key: str) -> bool:
+        return self._path(url, key).exists()
+
+    def load(self, url: str, key: str) -> Optional[dict]:
+        path = self._path(url, key)
+        if not path.exists():
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return json.loads(gzip.decompress(path.read_bytes()))
+
+    def store(self, url: str, key: str, entry: dict) -> None:
+        path = self._path(url, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(gzip.compress(json.dumps(entry, ensure_ascii=False).encode("utf-8")))
+        os.replace(tmp, path)
+        with self._lock:
+            self.stored += 1
+
+
+def _to_entry(line: str, resp: requests.Response) -> dict:
+    return {
+        "request": line,
+        "url":     resp.url,
+        "status":  resp.status_code,
+        "reason":  resp.reason,
+        "headers": {k: v for k, v in resp.headers.items() if k.lower() not in _DROP_HEADERS},
+        "body":    base64.b64encode(resp.content).decode("ascii"),
+        "elapsed": resp.elapsed.total_seconds(),
+    }
+
+
+def _from_entry(entry: dict, request: requests.PreparedRequest, adapter: HTTPAdapter) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = entry["status"]
+    resp.reason      = entry["reason"]
+    resp.headers     = CaseInsensitiveDict(entry["headers"])
+    resp._content    = base64.b64decode(entry["body"])
+    resp.encoding    = get_encoding_from_headers(resp.headers)
+    resp.url         = request.url
+    resp.request     = request
+    resp.connection  = adapter
+    resp.elapsed     = timedelta(seconds=entry["elapsed"])
+    return resp
+
+
+# ── Install ──────────────────────────────────────────────────────────────────
+
+_original_send = HTTPAdapter.send
+_active: Optional[Cassette] = None
+
+
+def install(mode: str, cassette_dir: Union[Path, str] = DEFAULT_CASSETTE, latency: Latency = 0.0) -> Cassette:
+    """Route every requests call through record or replay mode (see module docstring)."""
+    global _active
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}, not {mode!r}")
+    cassette = Cassette(Path(cassette_dir))
+
+    def send(adapter: HTTPAdapter, request: requests.PreparedRequest, *args, **kwargs) -> requests.Response:
+        key, line = request_key(request.method, request.url, request.body)
+        if mode == "record":
+            resp = _original_send(adapter, request, *args, **kwargs)
+            if resp.status_code < 400 or not cassette.has(request.url, key):
+                cassette.store(request.url, key, _to_entry(line, resp))
+            return resp
+
+        entry = cassette.load(request.url, key)
+        if entry is None:
+            raise requests.ConnectionError(f"[replay] no recorded response for {line}", request=request)
+        delay = entry["elapsed"] if latency == "recorded" else float(latency)
+        if delay > 0:
+            time.sleep(delay)
+        return _from_entry(entry, request, adapter)
+
+    HTTPAdapter.send = send
+    if _active is None:
+        atexit.register(_report)
+    _active = cassette
+    print(f"[http] {mode} mode, cassette {cassette.root}", file=sys.stderr)
+    return cassette
+
+
+def uninstall() -> None:
+    global _active
+    HTTPAdapter.send = _original_send
+    _active = None
+
+
+def _report() -> None:
+    c = _active
+    if c is not None:
+        print(f"[http] {c.hits} replayed, {c.misses} not recorded, {c.stored} recorded", file=sys.stderr)
+
+
+def install_from_env() -> Optional[Cassette]:
+    """install() according to SCRAPER_HTTP_MODE / _CASSETTE / _LATENCY_MS; no-op if the mode is unset."""
+    mode = os.environ.get("SCRAPER_HTTP_MODE", "").strip().lower()
+    if not mode or mode == "live":
+        return None
+    latency = os.environ.get("SCRAPER_HTTP_LATENCY_MS", "0")
+    return install(
+        mode,
+        os.environ.get("SCRAPER_HTTP_CASSETTE") or DEFAULT_CASSETTE,
+        latency if latency == "recorded" else float(latency) / 1000,
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Run a script with its HTTP traffic recorded or replayed.")
+    ap.add_argument("mode", choices=MODES)
+    ap.add_argument("script", help="Script path, e.g. track_nelly_inventory.py")
+    ap.add_argument("script_args", nargs=argparse.REMAINDER)
+    ap.add_argument("--dir", default=str(DEFAULT_CASSETTE), help="Cassette directory")
+    ap.add_argument("--latency-ms", default="0",
+                    help="Replay delay per response in ms, or 'recorded' for each response's original time")
+    args = ap.parse_args()
+
+    latency = args.latency_ms if args.latency_ms == "recorded" else float(args.latency_ms) / 1000
+    install(args.mode, args.dir, latency)
+
+    script = Path(args.script).resolve()
+    sys.argv = [str(script), *args.script_args]
+    sys.path.insert(0, str(script.parent))
+    runpy.run_path(str(script), run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,47 +6,125 @@ produce the same shape (a wide DataFrame: a "Date" column plus one column
 per search term/geo series) and share one table, google_trends_monthly.
 See sql/schema.sql for why this is upserted (latest-known-state) rather
 than snapshot-inserted.
+
+Every run re-stitches the full history back to each script's FETCH_START,
+but most months come back with the same value as last time. By default
+write_trends_to_db() therefore compares against what the table already
+holds for the pipeline and upserts only new or changed months.
 """
 from __future__ import annotations
 
+import math
 from datetime import datetime, timezone
+from itertools import repeat
 
+import numpy as np
 import pandas as pd
 
-from core.db import safe_upsert
+from core.db import pooled_connection, safe_upsert
+
+_COLUMNS = ["pipeline", "sheet", "series", "month", "value", "fetched_at"]
+_KEY = ["pipeline", "sheet", "series", "month"]
+
+
+def _months(dates: pd.Series) -> np.ndarray:
+    """The "Date" column as an object array of datetime.date."""
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates.dt.date.to_numpy(dtype=object)
+    return np.array([d.date() if hasattr(d, "date") else d for d in dates], dtype=object)
+
+
+def trends_to_rows(
+    pipeline: str,
+    sheets: dict[str, pd.DataFrame],
+    fetched_at: str,
+) -> list[tuple]:
+    """
+    Long-format google_trends_monthly rows from the wide sheets, in
+    (month, series) order. Stacks each sheet's value matrix and drops NaN
+    cells with one mask instead of iterating rows and cells in Python.
+    """
+    rows: list[tuple] = []
+    for sheet_label, df in sheets.items():
+        if df is None or df.empty:
+            continue
+        series_cols = [c for c in df.columns if c != "Date"]
+        if not series_cols:
+            continue
+        values = df[series_cols].to_numpy(dtype=float)
+        r, c = np.nonzero(~np.isnan(values))
+        series = np.array(series_cols, dtype=object)
+        rows.extend(zip(
+            repeat(pipeline), repeat(sheet_label),
+            series[c].tolist(), _months(df["Date"])[r].tolist(),
+            values[r, c].tolist(), repeat(fetched_at),
+        ))
+    return rows
+
+
+def _load_current(pipeline: str) -> tuple[dict[tuple, float], str | None]:
+    """{(sheet, series, month): value} currently stored for pipeline, plus its last fetched_at."""
+    with pooled_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT sheet, series, month, value, fetched_at "
+            "FROM google_trends_monthly WHERE pipeline = %s",
+            (pipeline,),
+        )
+        current: dict[tuple, float] = {}
+        last_fetched = None
+        for sheet, series, month, value, fetched_at in cur:
+            current[(sheet, series, month)] = None if value is None else float(value)
+            if last_fetched is None or fetched_at > last_fetched:
+                last_fetched = fetched_at
+    return current, (last_fetched.isoformat() if last_fetched else None)
+
+
+def _changed_rows(rows: list[tuple], current: dict[tuple, float]) -> list[tuple]:
+    changed = []
+    for row in rows:
+        old = current.get((row[1], row[2], row[3]))
+        if old is None or not math.isclose(old, row[4], rel_tol=1e-9, abs_tol=1e-9):
+            changed.append(row)
+    return changed
 
 
 def write_trends_to_db(
     pipeline: str,
     sheets: dict[str, pd.DataFrame],
+    only_changed: bool = True,
 ) -> tuple[int | None, str | None]:
     """
-    Best-effort: upsert one script's full monthly trends output.
+    Best-effort: upsert one script's monthly trends output.
 
     sheets: {sheet_label: df}, where df has a "Date" column plus one column
     per series. Use {"default": df} for a script with a single sheet.
+
+    only_changed (default): upsert only months that are new or whose value
+    differs from the stored one, so unchanged history keeps its old
+    fetched_at. Pass False to rewrite every month. If the stored values
+    can't be read, falls back to a full upsert.
     """
     fetched_at = datetime.now(timezone.utc).isoformat()
-    rows = []
-    for sheet_label, df in sheets.items():
-        if df is None or df.empty:
-            continue
-        series_cols = [c for c in df.columns if c != "Date"]
-        for _, row in df.iterrows():
-            date_val = row["Date"]
-            month = date_val.date() if hasattr(date_val, "date") else date_val
-            for series in series_cols:
-                value = row[series]
-                if pd.isna(value):
-                    continue
-                rows.append((pipeline, sheet_label, series, month, float(value), fetched_at))
-
+    rows = trends_to_rows(pipeline, sheets, fetched_at)
     if not rows:
         return 0, None
 
+    if only_changed:
+        try:
+            current, last_fetched = _load_current(pipeline)
+        except Exception as e:
+            print(f"  google_trends_monthly: could not read stored values ({e}); full upsert")
+        else:
+            total = len(rows)
+            rows = _changed_rows(rows, current)
+            print(f"  google_trends_monthly: {len(rows)}/{total} months new or changed "
+                  f"since {last_fetched or 'first run'}")
+            if not rows:
+                return 0, None
+
     return safe_upsert(
         table="google_trends_monthly",
-        columns=["pipeline", "sheet", "series", "month", "value", "fetched_at"],
+        columns=_COLUMNS,
         rows=rows,
-        conflict_columns=["pipeline", "sheet", "series", "month"],
+        conflict_columns=_KEY,
     )
@@ -4,7 +4,6 @@ import re
 import os
 from datetime import date
 from pathlib import Path
-from playwright.async_api import async_playwright
 
 try:
     import openpyxl
@@ -12,6 +11,7 @@ except ImportError:
     print("Du måste installera openpyxl: pip install openpyxl")
     exit()
 
+from core.browser import BlockRules, BrowserPool, goto_dom_ready
 from core.db import safe_insert
 
 # ── KONFIGURATION ──────────────────────────────────────────────────────────
@@ -45,6 +45,13 @@ BOUGHT_SELECTORS = [
     "div.social-proofing-faceout span.a-text-bold",
 ]
 
+# Amazons egna telemetri-/reklamvärdar – blockeras tillsammans med bilder,
+# typsnitt och media (vi läser bara text ur DOM:en).
+BLOCK = BlockRules().with_hosts(
+    "fls-na.amazon.com", "fls-eu.amazon.de", "unagi.amazon.com", "unagi.amazon.de",
+    "unagi-na.amazon.com", "unagi-eu.amazon.com",
+)
+
 # ───────────────────────────────────────────────────────────────────────────
 
 def parse_number(text: str) -> int:
@@ -139,8 +146,7 @@ async def handle_blockers(page):
             pass
 
 
-async def get_product_data(context) -> tuple[int, int]:
-    page = await context.new_page()
+async def get_product_data(page) -> tuple[int, int]:
     url = f"https://www.{DOMAIN}/dp/{ASIN}?th=1&psc=1&gl={GL}"
     print(f"  Fetching {PRODUCT_NAME} ({DOMAIN})...")
 
@@ -148,7 +154,7 @@ async def get_product_data(context) -> tuple[int, int]:
     rank_val = 0
 
     try:
-        await page.goto(url, wait_until="domcontentloaded", timeout=30000)
+        await goto_dom_ready(page, url, timeout_ms=30000)
         await handle_blockers(page)
 
         full_html = await page.content()
@@ -209,8 +215,6 @@ async def get_product_data(context) -> tuple[int, int]:
     except Exception as e:
         print(f"    Error: {e}")
         return 0, 0
-    finally:
-        await page.close()
 
 
 def append_to_excel(today: str, bought: int, rank: int):
@@ -251,30 +255,29 @@ def append_to_excel(today: str, bought: int, rank: int):
 async def run_once():
     today = date.today().isoformat()
 
-    async with async_playwright() as pw:
-        browser = await pw.chromium.launch(headless=HEADLESS, args=["--start-maximized"])
+    async with BrowserPool(headless=HEADLESS, args=["--start-maximized"], hide_webdriver=False) as pool:
         print(f"--- Anoto Amazon Data Fetcher ({today}) ---")
 
-        context = await browser.new_context(
+        pool.add_context(
+            "US", DOMAIN,
+            cookies=[{
+                "name": COOKIE_NAME,
+                "value": COOKIE_VALUE,
+                "domain": f".{DOMAIN}",
+                "path": "/",
+                "secure": True,
+                "httpOnly": False,
+            }],
+            block=BLOCK,
             locale=LOCALE,
             user_agent=random.choice(UAS),
             java_script_enabled=True,
             viewport={"width": 1920, "height": 1080},
             extra_http_headers={"Accept-Language": ACCEPT_LANG},
         )
-        await context.add_cookies([{
-            "name": COOKIE_NAME,
-            "value": COOKIE_VALUE,
-            "domain": f".{DOMAIN}",
-            "path": "/",
-            "secure": True,
-            "httpOnly": False,
-        }])
-
-        bought, rank = await get_product_data(context)
-
-        await context.close()
-        await browser.close()
+        async with pool.page("US") as page:
+            bought, rank = await get_product_data(page)
+        pool.print_stats()
 
     print(f"\nResults for {PRODUCT_NAME} (US):")
     print(f"  Bought Past Month : {bought}")
@@ -40,7 +40,8 @@ def fetch_stats():
             i += 1
     return stats
 
-if __name__ == "__main__":
+
+def main():
     stats = fetch_stats()
     conv   = stats.get("Konverteringar", 0)
     brands = stats.get("Varumärken",    0)
@@ -72,3 +73,7 @@ if __name__ == "__main__":
         print(f"Databas: MISSLYCKADES – {db_error}")
     else:
         print(f"Databas: {db_rows_written} rader skrivna")
+
+
+if __name__ == "__main__":
+    main()
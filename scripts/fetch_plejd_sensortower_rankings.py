@@ -1,20 +1,27 @@
 # fetch_plejd_sensortower_rankings.py
 #
 # Fetches Plejd's daily App Store category ranking (Lifestyle, Top Free iPhone)
-# from the public Sensor Tower overview page — no login required.
-# Appends one row per run to data/plejd_sensortower_rankings.xlsx.
-
+# for every country in one call to Sensor Tower's category_history JSON API
+# (core/sensortower.py, the same endpoint the backfill uses) — no login
+# required. Only if the API refuses (HTTP error, challenge page, no data at
+# all) does it fall back to rendering the public overview page per country.
+# Appends one row per published day to data/plejd_sensortower_rankings.xlsx,
+# each under its own date (the same rows backfill_plejd_sensortower_rankings
+# writes), skipping days already in the sheet.
+
+import asyncio
 import re
-import time
 import random
-from datetime import date
+from datetime import date, timedelta
 from pathlib import Path
 
 from openpyxl import load_workbook
-from playwright.sync_api import sync_playwright, TimeoutError as PWTimeoutError
+from playwright.async_api import TimeoutError as PWTimeoutError
 
 from excel_utils import append_row
+from core.browser import BlockRules, BrowserPool, goto_dom_ready
 from core.db import safe_insert
+from core.sensortower import SensorTowerRefused, category_history
 
 # ── CONFIG ─────────────────────────────────────────────────────────────────────
 APP_ID     = "1032689423"
@@ -24,6 +31,19 @@ DEVICE     = "iphone"
 
 COUNTRIES = ["SE", "NO", "FI", "NL", "DE", "DK", "ES"]
 
+# category_history's id for Top Free iPhone (CHART_TYPE/DEVICE above are the
+# overview page's). The window reaches back a few days because today's point
+# is usually not published yet when the job runs: every day in it that isn't
+# in the sheet yet is written under its own date, and today is left to the
+# next run rather than labelled with an older rank.
+API_CHART_TYPE    = "topfreeapplications"
+API_LOOKBACK_DAYS = 3
+
+# Fallback only: country pages load in parallel from one warmed context, at most this many
+# at a time, each after a random 2–4 s delay (the old polite gap).
+MAX_PARALLEL_PAGES = 2
+PAGE_DELAY_S       = (2.0, 4.0)
+
 
 
 REPO_ROOT  = Path(__file__).resolve().parent.parent
@@ -61,33 +81,39 @@ _BROWSER_ARGS = [
 # (renders as e.g. "#270", "#13")
 _KPI_SELECTOR = '[aria-labelledby="app-overview-unified-kpi-category-ranking"]'
 
+# Only the KPI card's text is read: drop images/fonts/media, ad/analytics
+# hosts and Sensor Tower's own chat/telemetry widgets.
+_BLOCK = BlockRules().with_hosts("sentry.io", "datadoghq.com", "browser-intake-datadoghq.com", "pendo.io", "zendesk.com")
+
 # ── HELPERS ────────────────────────────────────────────────────────────────────
 
-def get_row_for_date(target_date: str) -> dict | None:
-    """Returns the row dict for target_date if already in the Excel sheet, else None."""
+def read_rows() -> dict[str, dict]:
+    """{date_str: row dict} for every row already in the Excel sheet."""
     path = Path(XLSX_PATH)
     if not path.exists():
-        return None
+        return {}
+    rows: dict[str, dict] = {}
     try:
         wb = load_workbook(path, read_only=True, data_only=True)
         if SHEET_NAME not in wb.sheetnames:
-            return None
+            return {}
         ws = wb[SHEET_NAME]
         rows_iter = ws.iter_rows(values_only=True)
         headers = next(rows_iter)
         for row in rows_iter:
-            if row and row[0] is not None and str(row[0])[:10] == target_date:
-                return dict(zip(headers, row))
+            if row and row[0] is not None:
+                rows[str(row[0])[:10]] = dict(zip(headers, row))
     except Exception:
         pass
-    return None
+    return rows
 
 
-def write_rankings_to_db(row: dict) -> tuple[int | None, str | None]:
-    """Best-effort: write one row per country to Postgres. Must never raise."""
-    snapshot_date = str(row["Date"])
+def write_rankings_to_db(rows: list[dict]) -> tuple[int | None, str | None]:
+    """Best-effort: write one row per date and country to Postgres. Must never raise.
+    Dates already in the table are left as they are (insert, not upsert)."""
     values = [
-        (snapshot_date, country, int(row[country]))
+        (str(row["Date"])[:10], country, int(row[country]))
+        for row in rows
         for country in COUNTRIES
         if row.get(country) is not None
     ]
@@ -99,7 +125,35 @@ def write_rankings_to_db(row: dict) -> tuple[int | None, str | None]:
     )
 
 
-def fetch_rank(page, country: str) -> int | None:
+def fetch_ranks_api(today_str: str) -> dict[str, dict[str, int | None]] | None:
+    """
+    {date_str: {country: rank}} for the last API_LOOKBACK_DAYS days from one
+    category_history call; None if the API refused.
+    """
+    start = str(date.fromisoformat(today_str) - timedelta(days=API_LOOKBACK_DAYS))
+    print(f"Fetching category_history {start} → {today_str} for: {', '.join(COUNTRIES)}")
+    try:
+        history = category_history(
+            APP_ID, CATEGORY, API_CHART_TYPE, COUNTRIES, start, today_str,
+            user_agent=random.choice(_USER_AGENTS),
+        )
+    except SensorTowerRefused as exc:
+        print(f"  API refused: {exc}")
+        return None
+    if not history:
+        print("  API returned no data points for any country.")
+        return None
+
+    for dt_str in sorted(history):
+        ranks_str = "  ".join(
+            f"{cc}={history[dt_str][cc] if history[dt_str][cc] is not None else '-'}"
+            for cc in COUNTRIES
+        )
+        print(f"  {dt_str}  {ranks_str}")
+    return history
+
+
+async def fetch_rank(page, country: str) -> int | None:
     """Navigate to the Sensor Tower overview page and extract the KPI ranking card."""
     today_str = str(date.today())
     url = OVERVIEW_URL.format(
@@ -112,7 +166,7 @@ def fetch_rank(page, country: str) -> int | None:
     )
     print(f"  [{country}] Loading {url}")
     try:
-        page.goto(url, timeout=30_000)
+        await goto_dom_ready(page, url, timeout_ms=30_000)
     except PWTimeoutError:
         print(f"  [{country}] Navigation timed out.")
         return None
@@ -123,12 +177,12 @@ def fetch_rank(page, country: str) -> int | None:
 
     # Wait for the KPI ranking card to render
     try:
-        page.wait_for_selector(_KPI_SELECTOR, timeout=20_000)
+        await page.wait_for_selector(_KPI_SELECTOR, timeout=20_000)
     except PWTimeoutError:
         print(f"  [{country}] KPI ranking card not found — app likely unranked here.")
         return None
 
-    raw = page.locator(_KPI_SELECTOR).first.inner_text()
+    raw = await page.locator(_KPI_SELECTOR).first.inner_text()
     # Text is e.g. "#270\nLifestyle - Downloads" — extract the leading integer
     match = re.search(r"#(\d+)", raw)
     if match:
@@ -140,55 +194,60 @@ def fetch_rank(page, country: str) -> int | None:
     return None
 
 
+async def fetch_ranks_browser() -> dict[str, int | None]:
+    """Fallback: one overview page per country, reading the KPI ranking card."""
+    # BrowserPool masks navigator.webdriver in every page of the context.
+    async with BrowserPool(
+        headless=True,
+        args=_BROWSER_ARGS,
+        per_domain_limit=MAX_PARALLEL_PAGES,
+        jitter_s=PAGE_DELAY_S,
+    ) as pool:
+        pool.add_context(
+            "sensortower", "app.sensortower.com",
+            block=_BLOCK,
+            user_agent=random.choice(_USER_AGENTS),
+            locale="en-US",
+            viewport={"width": random.choice([1280, 1366, 1440, 1920]), "height": random.choice([800, 900, 1080])},
+            java_script_enabled=True,
+        )
+        results = await pool.run([("sensortower", c) for c in COUNTRIES], fetch_rank)
+        pool.print_stats()
+    return dict(zip(COUNTRIES, results))
+
+
 # ── MAIN ───────────────────────────────────────────────────────────────────────
 
-def main():
+async def main():
     today_str = str(date.today())
-    existing_row = get_row_for_date(today_str)
+    existing = read_rows()
 
-    if existing_row is not None:
+    if today_str in existing:
         print(f"Today ({today_str}) is already written to {XLSX_PATH}. Skipping fetch, writing to DB only.")
-        row = existing_row
+        rows = [existing[today_str]]
     else:
         # Random startup delay (0–45 s) so the run time varies each day and
         # doesn’t leave a perfectly fixed pattern in Sensor Tower’s logs.
         startup_delay = random.uniform(0, 45)
         print(f"Startup delay: {startup_delay:.1f}s")
-        time.sleep(startup_delay)
-
-        ranks: dict[str, int | None] = {}
-
-        with sync_playwright() as pw:
-            browser = pw.chromium.launch(
-                headless=True,
-                args=_BROWSER_ARGS,
-            )
-            context = browser.new_context(
-                user_agent=random.choice(_USER_AGENTS),
-                locale="en-US",
-                viewport={"width": random.choice([1280, 1366, 1440, 1920]), "height": random.choice([800, 900, 1080])},
-                java_script_enabled=True,
-            )
-            # Mask the navigator.webdriver property
-            context.add_init_script(
-                "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
-            )
-            page = context.new_page()
-
-            for country in COUNTRIES:
-                ranks[country] = fetch_rank(page, country)
-                # Polite delay between requests
-                time.sleep(random.uniform(2.0, 4.0))
-
-            browser.close()
-
-        row = {"Date": today_str} | {c: ranks[c] for c in COUNTRIES}
-        append_row(XLSX_PATH, SHEET_NAME, row)
-        print(f"\nDone. Row written to {XLSX_PATH}:")
-        for k, v in row.items():
-            print(f"  {k}: {v}")
-
-    db_rows_written, db_error = write_rankings_to_db(row)
+        await asyncio.sleep(startup_delay)
+
+        history = await asyncio.to_thread(fetch_ranks_api, today_str)
+        if history is None:
+            print("Falling back to the overview pages.")
+            # The overview pages show the rank for the date in their URL, i.e. today.
+            history = {today_str: await fetch_ranks_browser()}
+        if today_str not in history:
+            print(f"  Today's point ({today_str}) is not published yet; it is written by a later run.")
+
+        rows = [{"Date": dt_str} | {c: history[dt_str][c] for c in COUNTRIES} for dt_str in sorted(history)]
+        new_rows = [row for row in rows if row["Date"] not in existing]
+        for row in new_rows:
+            append_row(XLSX_PATH, SHEET_NAME, row)
+        print(f"\nDone. {len(new_rows)} new day(s) written to {XLSX_PATH}"
+              f"{': ' + ', '.join(r['Date'] for r in new_rows) if new_rows else ''}")
+
+    db_rows_written, db_error = write_rankings_to_db(rows)
     if db_error is not None:
         print(f"Databas: MISSLYCKADES – {db_error}")
     else:
@@ -196,4 +255,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
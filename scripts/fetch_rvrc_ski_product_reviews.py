@@ -17,13 +17,12 @@ Products tracked
 
 Methodology
 -----------
-1. Resolve product universe via facets + displayName name-matching.
-2. For each target product, paginate reviews newest-first and stop once
-   we pass the start of the observation window.  These products have at most
-   a few hundred reviews each, so fetching is fast.
-3. Bucket by YYYY-MM.
-4. Load monthly PANTS / JACKETS totals from the existing history JSON
-   (produced by backfill_revolutionrace_history.py).
+1. Sync the local review store (core/rvrc_reviews.py) – only reviews newer
+   than its watermark are fetched.
+2. Resolve product universe from the stored reviews' categories +
+   displayName name-matching (names are the only API lookup left).
+3. Bucket the target products' stored reviews by YYYY-MM.
+4. Count monthly PANTS / JACKETS totals from the same stored reviews.
 5. Compute share (%) and write Excel.
 
 Output
@@ -34,10 +33,9 @@ Output
 """
 
 import ast
-import json
 import re
 import time
-from collections import defaultdict
+from collections import Counter, defaultdict
 from pathlib import Path
 
 import requests
@@ -45,6 +43,8 @@ from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment
 from openpyxl.utils import get_column_letter
 
+from core.rvrc_reviews import ReviewStore, sync
+
 # ── Config ─────────────────────────────────────────────────────────────────────
 GRAPHQL_URL = "https://reviews.revolutionrace.com/revolutionrace/graphql"
 GQL_HEADERS = {
@@ -53,13 +53,11 @@ GQL_HEADERS = {
 }
 
 SCRIPT_DIR   = Path(__file__).resolve().parent
-HISTORY_FILE = (SCRIPT_DIR / ".." / "data" / "revolutionrace_monthly_history.json").resolve()
 XLSX_PATH    = (SCRIPT_DIR / ".." / "data" / "rvrc_ski_products_monthly.xlsx").resolve()
 
 START_MONTH = "2025-01"
 END_MONTH   = "2026-03"
 
-TAKE       = 5000   # max page size the server accepts
 DELAY_S    = 0.15   # polite pause between requests
 BATCH_SIZE = 50     # products per alias round-trip
 
@@ -139,30 +137,23 @@ def _is_skirt_or_legging(name: str) -> bool:
     return "skirt" in nl or "legging" in nl or "skort" in nl
 
 
-def discover_target_products() -> tuple[dict[str, str], dict[str, str]]:
+def discover_target_products(store: ReviewStore) -> tuple[dict[str, str], dict[str, str]]:
     """
     Returns:
       ski_pants_products  : {base_product_id: product_name}
       ski_jacket_products : {base_product_id: product_name}
     """
+    # A base product's category is the one most of its stored reviews carry.
+    seen: dict[str, Counter] = defaultdict(Counter)
+    for r in store.iter_reviews():
+        seen[r.product][r.category] += 1
     bp_to_category: dict[str, str] = {}
+    for bp, cats in seen.items():
+        category = cats.most_common(1)[0][0]
+        if category in ("PANTS", "JACKETS"):
+            bp_to_category[bp] = category
     for category in ["PANTS", "JACKETS"]:
-        q = f"""
-        {{
-          publicReviews(
-            take: 0,
-            filter: {{ item_parentItemCategory: ["{category}"] }},
-            facets: {{ item_baseProduct: [] }}
-          ) {{
-            facets {{ item_baseProduct {{ value }} }}
-          }}
-        }}
-        """
-        data = gql(q)
-        for item in data["data"]["publicReviews"]["facets"]["item_baseProduct"]:
-            bp_to_category[item["value"]] = category
         print(f"  {category}: {len([k for k,v in bp_to_category.items() if v == category])} base products")
-        time.sleep(DELAY_S)
 
     all_bps = list(bp_to_category.keys())
     print(f"  Resolving names for {len(all_bps)} products (this takes ~{len(all_bps)//BATCH_SIZE + 1} requests)...")
@@ -184,48 +175,6 @@ def discover_target_products() -> tuple[dict[str, str], dict[str, str]]:
     return ski_pants, ski_jackets
 
 
-# ── Review fetching ────────────────────────────────────────────────────────────
-
-def fetch_months_in_window(bp: str) -> list[str]:
-    """
-    Paginate reviews for a single base product (newest first).
-    Returns a list of YYYY-MM strings, one entry per review published in
-    [START_MONTH, END_MONTH].  Stops paging as soon as the oldest review on a
-    page predates START_MONTH (no need to go back further).
-    """
-    months: list[str] = []
-    skip = 0
-    while True:
-        q = f"""
-        {{
-          publicReviews(
-            take: {TAKE}, skip: {skip},
-            filter: {{ item_baseProduct: ["{bp}"] }},
-            sort: {{ order: [publishedAt_desc] }}
-          ) {{ hits {{ publishedAt }} }}
-        }}
-        """
-        data = gql(q)
-        hits = data["data"]["publicReviews"]["hits"]
-        if not hits:
-            break
-
-        oldest_on_page: str | None = None
-        for h in hits:
-            month = h["publishedAt"][:7]  # YYYY-MM
-            oldest_on_page = month        # desc order → last hit is oldest
-            if START_MONTH <= month <= END_MONTH:
-                months.append(month)
-
-        # Early exit: all remaining reviews are older than our window
-        if oldest_on_page and oldest_on_page < START_MONTH:
-            break
-        skip += TAKE
-        time.sleep(DELAY_S)
-
-    return months
-
-
 # ── Excel helpers ──────────────────────────────────────────────────────────────
 
 _HDR_FILL = PatternFill("solid", fgColor="1F4E79")
@@ -250,9 +199,11 @@ def main() -> None:
     print(f"Period: {START_MONTH} → {END_MONTH}")
     print("=" * 60)
 
-    # 1. Discover target products ───────────────────────────────────────────────
-    print("\n[1/4]  Discovering Ski Pants and Ski Jacket products...")
-    ski_pants, ski_jackets = discover_target_products()
+    # 1. Sync review store + discover target products ──────────────────────────
+    print("\n[1/4]  Syncing review store, discovering Ski Pants and Ski Jacket products...")
+    store = ReviewStore()
+    sync(store)
+    ski_pants, ski_jackets = discover_target_products(store)
 
     print(f"\n  Ski Pants   ({len(ski_pants)} base products):")
     for bp, name in sorted(ski_pants.items(), key=lambda x: x[1]):
@@ -266,35 +217,29 @@ def main() -> None:
         print("\n  No ski products found – exiting.")
         return
 
-    # 2. Fetch reviews in window ────────────────────────────────────────────────
-    print("\n[2/4]  Fetching reviews for Ski Pants products...")
-    pants_monthly: dict[str, int] = defaultdict(int)
-    for bp, name in ski_pants.items():
-        months = fetch_months_in_window(bp)
-        for m in months:
-            pants_monthly[m] += 1
-        print(f"    {bp:8s}  {name:<50s}  {len(months)} reviews in window")
-
-    print("\n        Fetching reviews for Ski Jacket products...")
+    # 2./3. Count target-product reviews and PANTS / JACKETS totals in window ──
+    print("\n[2/4]  Counting stored reviews in window...")
+    pants_monthly: dict[str, int]  = defaultdict(int)
     jacket_monthly: dict[str, int] = defaultdict(int)
-    for bp, name in ski_jackets.items():
-        months = fetch_months_in_window(bp)
-        for m in months:
-            jacket_monthly[m] += 1
-        print(f"    {bp:8s}  {name:<50s}  {len(months)} reviews in window")
-
-    # 3. Load category totals from history ─────────────────────────────────────
-    print("\n[3/4]  Loading monthly PANTS / JACKETS totals from history JSON...")
-    history = json.loads(HISTORY_FILE.read_text(encoding="utf-8"))
-    cat_totals: dict[str, dict[str, int]] = {}
-    for month, d in history.items():
-        if START_MONTH <= month <= END_MONTH:
-            cats = d.get("by_category", {})
-            cat_totals[month] = {
-                "PANTS":   cats.get("PANTS", 0),
-                "JACKETS": cats.get("JACKETS", 0),
-            }
-    print(f"    Loaded {len(cat_totals)} months from {HISTORY_FILE.name}")
+    per_product: dict[str, int]    = defaultdict(int)
+    cat_totals: dict[str, dict[str, int]] = defaultdict(lambda: {"PANTS": 0, "JACKETS": 0})
+    for r in store.iter_reviews(START_MONTH, END_MONTH):
+        if r.category in ("PANTS", "JACKETS"):
+            cat_totals[r.month][r.category] += 1
+        if r.product in ski_pants:
+            pants_monthly[r.month] += 1
+        elif r.product in ski_jackets:
+            jacket_monthly[r.month] += 1
+        else:
+            continue
+        per_product[r.product] += 1
+
+    for group, products in (("Ski Pants", ski_pants), ("Ski Jackets", ski_jackets)):
+        print(f"\n        {group}:")
+        for bp, name in products.items():
+            print(f"    {bp:8s}  {name:<50s}  {per_product.get(bp, 0)} reviews in window")
+
+    print(f"\n[3/4]  Category totals for {len(cat_totals)} months counted from the review store")
 
     # 4. Build summary and write Excel ─────────────────────────────────────────
     print("\n[4/4]  Building summary table and writing Excel...")
@@ -11,6 +11,13 @@ write_notices_to_db().
 
 The Search API is fully anonymous – no API key or registration required.
 
+Search hits and eForms XML are cached on disk under data/ted_cache/ (see
+TedCache). Each archive (scope=ALL) query keeps a high-water mark, so a daily
+run only asks TED for ``PD >= watermark - WATERMARK_LOOKBACK_DAYS`` and merges
+the hits into the cached history; each notice's XML is downloaded once.
+Run with ``--full-refresh`` to ignore the watermarks and re-fetch the whole
+archive from MIN_PUBLICATION_DATE.
+
 API docs:  https://docs.ted.europa.eu/api/latest/search.html
 Swagger:   https://api.ted.europa.eu/swagger
 Query ref: https://ted.europa.eu/en/help/search-browse#expert-search
@@ -18,11 +25,17 @@ Query ref: https://ted.europa.eu/en/help/search-browse#expert-search
 
 from __future__ import annotations
 
+import argparse
+import gzip
+import hashlib
+import json
+import os
 import re
 import sys
 import time
 import logging
-from datetime import datetime, timezone
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
 from io import BytesIO
 from pathlib import Path
 from typing import Any, Union
@@ -33,6 +46,7 @@ from lxml import etree
 from openpyxl.styles import Font
 
 from core.db import get_connection, safe_upsert
+from core.ratelimit import TokenBucket, retry_after_seconds
 
 # ---------------------------------------------------------------------------
 # Configuration
@@ -43,6 +57,8 @@ from core.db import get_connection, safe_upsert
 #   search_terms  – list of names/brands used in the FT query
 #   org_numbers   – list of Swedish/Norwegian/Danish org numbers for
 #                   precise role-detection (winner / buyer matching)
+#   lot_detail    – also download/parse each notice's eForms XML for
+#                   lot-level tender data (fetch_lot_details)
 #
 # Org numbers are normalised internally (dashes and spaces stripped)
 # before comparison with TED identifier fields.
@@ -53,9 +69,14 @@ from core.db import get_connection, safe_upsert
 # database can't be read, so the fetch never breaks because of a DB problem.
 _FALLBACK_COMPANIES: list[Union[str, dict]] = [
     "Exsitec AB",
-    "EQL Pharma AB",
+    {"display_name": "EQL Pharma AB", "search_terms": ["EQL Pharma AB"], "lot_detail": True},
 ]
 
+# Lot detail used to be a hardcoded DETAIL_COMPANIES set; it is now the
+# ted_tracked_companies.lot_detail column (sql/migrations/002). Until that
+# migration has been applied, these companies keep their lot detail.
+_LEGACY_DETAIL_COMPANIES = {"EQL Pharma AB"}
+
 
 def load_tracked_companies() -> list[Union[str, dict]]:
     """Loads tracked companies from ted_tracked_companies; falls back to
@@ -65,17 +86,24 @@ def load_tracked_companies() -> list[Union[str, dict]]:
         conn = get_connection()
         try:
             with conn.cursor() as cur:
+                # to_jsonb(t) so an optional column (lot_detail) that hasn't
+                # been migrated in yet is simply absent, not a query error.
                 cur.execute(
-                    "SELECT company, search_terms, org_numbers FROM ted_tracked_companies ORDER BY company;"
+                    "SELECT to_jsonb(t) FROM ted_tracked_companies t ORDER BY company;"
                 )
-                rows = cur.fetchall()
+                rows = [r[0] for r in cur.fetchall()]
         finally:
             conn.close()
         if not rows:
             raise RuntimeError("ted_tracked_companies is empty")
         return [
-            {"display_name": company, "search_terms": search_terms, "org_numbers": org_numbers}
-            for company, search_terms, org_numbers in rows
+            {
+                "display_name": r["company"],
+                "search_terms": r["search_terms"],
+                "org_numbers": r.get("org_numbers") or [],
+                "lot_detail": r.get("lot_detail", r["company"] in _LEGACY_DETAIL_COMPANIES),
+            }
+            for r in rows
         ]
     except Exception as exc:
         print(f"[WARN] Could not load tracked companies from DB ({exc}); using built-in fallback list.")
@@ -134,6 +162,20 @@ MAX_PAGES = 150          # safety limit (100 x 150 = 15 000 notices)
 # Reduces result size significantly for broad queries like Ambea.
 MIN_PUBLICATION_DATE = "20210101"
 
+# eForms XML download/parse pipeline (fetch_lot_details). Downloads share one
+# token bucket across all workers; a 429 pauses the whole bucket for the
+# server's Retry-After instead of sleeping a fixed delay per notice.
+XML_RATE_PER_S = 2.0       # sustained XML requests per second, all workers
+XML_BURST = 4              # token-bucket capacity
+XML_DOWNLOAD_WORKERS = 4
+XML_PARSE_WORKERS = None   # ProcessPoolExecutor default: one per CPU
+XML_MAX_ATTEMPTS = 4
+XML_429_DEFAULT_WAIT = 5.0 # seconds, when a 429 carries no Retry-After
+
+# Incremental archive queries re-ask for this many days before the stored
+# watermark, to pick up notices TED indexes a few days after their PD.
+WATERMARK_LOOKBACK_DAYS = 7
+
 # Columns to include in the Excel output (in this order).
 # "Won by Company" is computed internally but intentionally excluded here;
 # it is still used to apply green font formatting in the Excel writer.
@@ -153,6 +195,7 @@ REPO_ROOT = Path(__file__).resolve().parent.parent
 DATA_DIR = REPO_ROOT / "data"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 OUTPUT_FILE = DATA_DIR / "ted_procurements.xlsx"
+TED_CACHE_DIR = DATA_DIR / "ted_cache"
 
 # Logging
 logging.basicConfig(
@@ -264,6 +307,7 @@ def _normalize_company_config(company: Union[str, dict]) -> dict:
             "display_name": company,
             "search_terms": [company],
             "org_numbers": set(),
+            "lot_detail": False,
         }
     org_numbers = {
         _normalize_org_num(n)
@@ -274,6 +318,7 @@ def _normalize_company_config(company: Union[str, dict]) -> dict:
         "display_name": company["display_name"],
         "search_terms": company.get("search_terms", [company["display_name"]]),
         "org_numbers": org_numbers,
+        "lot_detail": bool(company.get("lot_detail", False)),
     }
 
 
@@ -289,6 +334,95 @@ def _org_in_identifier_field(field_value: Any, org_nums: set) -> bool:
     return False
 
 
+# ---------------------------------------------------------------------------
+# Local notice cache
+# ---------------------------------------------------------------------------
+
+class TedCache:
+    """On-disk cache of TED search hits and eForms XML, keyed by
+    publication-number.
+
+    Layout under *root*::
+
+        queries/<sha1(query)[:16]>.json.gz  {"query", "watermark", "notices": {pub_num: notice}}
+        xml/<ab>/<sha256>.xml.gz            raw XML, content-addressed
+        xml_index.json                      {pub_num: sha256}
+
+    One file per archive query means a daily run only rewrites the files of
+    queries that actually got new or changed hits.
+    """
+
+    def __init__(self, root: Path = TED_CACHE_DIR) -> None:
+        self.root = root
+        self._index_path = root / "xml_index.json"
+        self._xml_index: dict[str, str] | None = None
+        self._index_dirty = False
+
+    # --- Search hits ---------------------------------------------------------
+
+    def _query_path(self, query: str) -> Path:
+        key = hashlib.sha1(query.encode("utf-8")).hexdigest()[:16]
+        return self.root / "queries" / f"{key}.json.gz"
+
+    def load_query(self, query: str) -> dict:
+        path = self._query_path(query)
+        if path.exists():
+            with gzip.open(path, "rt", encoding="utf-8") as fh:
+                return json.load(fh)
+        return {"query": query, "watermark": None, "notices": {}}
+
+    def save_query(self, entry: dict) -> None:
+        path = self._query_path(entry["query"])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # mtime=0 keeps the gzip bytes stable when the content is unchanged
+        with open(path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as gz:
+            gz.write(json.dumps(entry, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+
+    # --- Raw XML -------------------------------------------------------------
+
+    @property
+    def xml_index(self) -> dict[str, str]:
+        if self._xml_index is None:
+            self._xml_index = (
+                json.loads(self._index_path.read_text(encoding="utf-8"))
+                if self._index_path.exists() else {}
+            )
+        return self._xml_index
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.root / "xml" / digest[:2] / f"{digest}.xml.gz"
+
+    def get_xml(self, pub_num: str) -> bytes | None:
+        digest = self.xml_index.get(pub_num)
+        if digest is None:
+            return None
+        path = self._blob_path(digest)
+        if not path.exists():
+            return None
+        return gzip.decompress(path.read_bytes())
+
+    def put_xml(self, pub_num: str, xml_bytes: bytes) -> None:
+        digest = hashlib.sha256(xml_bytes).hexdigest()
+        path = self._blob_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(gzip.compress(xml_bytes, mtime=0))
+        if self.xml_index.get(pub_num) != digest:
+            self.xml_index[pub_num] = digest
+            self._index_dirty = True
+
+    def flush(self) -> None:
+        """Persist the XML index if anything was added this run."""
+        if not self._index_dirty:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._index_path.write_text(
+            json.dumps(self.xml_index, indent=0, sort_keys=True) + "\n",
+            encoding="utf-8",
+        )
+        self._index_dirty = False
+
+
 # ---------------------------------------------------------------------------
 # XML lot-level parsing (eForms)
 # ---------------------------------------------------------------------------
@@ -296,23 +430,36 @@ def _org_in_identifier_field(field_value: Any, org_nums: set) -> bool:
 TED_XML_URL = "https://ted.europa.eu/en/notice/{pub_num}/xml"
 
 
-def fetch_notice_xml(pub_num: str) -> bytes | None:
+def fetch_notice_xml(
+    pub_num: str,
+    bucket: TokenBucket | None = None,
+    session: requests.Session | None = None,
+) -> bytes | None:
     """Download the eForms XML for a single notice. Returns bytes or None.
 
-    Retries once on 429 (Too Many Requests) with a longer back-off.
+    Every attempt first takes a token from *bucket* (shared by all download
+    workers). A 429 pauses the whole bucket for the Retry-After (or
+    XML_429_DEFAULT_WAIT) and retries; other errors retry after 2 s.
     """
     url = TED_XML_URL.format(pub_num=pub_num)
-    for attempt in range(2):
+    http = session or requests
+    for attempt in range(1, XML_MAX_ATTEMPTS + 1):
+        if bucket is not None:
+            bucket.acquire()
         try:
-            resp = requests.get(url, timeout=30)
-            if resp.status_code == 429 and attempt == 0:
-                log.info("  Rate-limited on %s, waiting 3 s and retrying...", pub_num)
-                time.sleep(3)
+            resp = http.get(url, timeout=30)
+            if resp.status_code == 429 and attempt < XML_MAX_ATTEMPTS:
+                delay = retry_after_seconds(resp.headers.get("Retry-After"), XML_429_DEFAULT_WAIT)
+                log.info("  Rate-limited on %s, pausing downloads %.0f s...", pub_num, delay)
+                if bucket is not None:
+                    bucket.pause(delay)
+                else:
+                    time.sleep(delay)
                 continue
             resp.raise_for_status()
             return resp.content
         except requests.RequestException as exc:
-            if attempt == 0:
+            if attempt < XML_MAX_ATTEMPTS:
                 time.sleep(2)
                 continue
             log.warning("  XML download failed for %s: %s", pub_num, exc)
@@ -586,31 +733,34 @@ def parse_eforms_xml(xml_bytes: bytes, company_name: str) -> list[dict]:
 def fetch_lot_details(
     notices: list[dict],
     config: dict,
+    cache: TedCache,
 ) -> pd.DataFrame:
-    """For each notice, download XML and parse lot-level data.
+    """For each notice, load its XML and parse lot-level data.
+
+    Producer/consumer pipeline: XML already in *cache* goes straight to a
+    process pool running parse_eforms_xml (lxml parsing is CPU-bound, so
+    it uses every core); the rest is downloaded by XML_DOWNLOAD_WORKERS
+    threads sharing one TokenBucket, and each download is cached and handed
+    to the parsers as soon as it lands. At most 2 x workers parse jobs are
+    in flight at a time.
 
     Returns a DataFrame with one row per lot tender where the company
     participated, enriched with notice-level metadata.
     """
     company = config["display_name"]
     all_rows: list[dict] = []
-    total = len(notices)
-
-    for i, n in enumerate(notices, 1):
+    by_pub: dict[str, dict] = {}
+    for n in notices:
         pub_num = _extract_text(n.get("publication-number"))
-        if not pub_num:
-            continue
-
-        log.info("  XML %d/%d: %s", i, total, pub_num)
-        xml_bytes = fetch_notice_xml(pub_num)
-        if xml_bytes is None:
-            continue
+        if pub_num:
+            by_pub.setdefault(pub_num, n)
 
-        lot_rows = parse_eforms_xml(xml_bytes, company)
-        if not lot_rows:
-            continue
+    cached = [pn for pn in by_pub if pn in cache.xml_index]
+    missing = [pn for pn in by_pub if pn not in cache.xml_index]
+    log.info("  %d notices: %d XML cached, %d to download", len(by_pub), len(cached), len(missing))
 
-        # Enrich with notice-level info
+    def enrich(pub_num: str, lot_rows: list[dict]) -> None:
+        n = by_pub[pub_num]
         pub_date = _extract_text(n.get("publication-date", "")).split("+")[0]
         buyer = _extract_text(n.get("buyer-name"))
         notice_type_raw = _extract_text(n.get("notice-type"))
@@ -624,10 +774,68 @@ def fetch_lot_details(
             row["buyer_name"] = buyer
             row["notice_type"] = NOTICE_TYPE_LABELS.get(notice_type_raw, notice_type_raw)
             row["notice_title"] = notice_title
-
         all_rows.extend(lot_rows)
-        time.sleep(0.5)  # polite delay to avoid 429 rate-limiting
 
+    bucket = TokenBucket(XML_RATE_PER_S, XML_BURST)
+    downloaded = failed = 0
+
+    parse_workers = XML_PARSE_WORKERS or os.cpu_count() or 1
+    max_in_flight = 2 * parse_workers
+
+    with ProcessPoolExecutor(max_workers=parse_workers) as parsers, \
+            ThreadPoolExecutor(max_workers=XML_DOWNLOAD_WORKERS) as downloaders, \
+            requests.Session() as session:
+        parsing: dict[Future, str] = {}
+
+        def collect(block_until: int) -> None:
+            """Harvest finished parse jobs until fewer than block_until remain."""
+            while parsing and len(parsing) >= block_until:
+                done, _ = wait(parsing, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    pub_num = parsing.pop(fut)
+                    try:
+                        lot_rows = fut.result()
+                    except Exception as exc:
+                        log.warning("  XML parse failed for %s: %s", pub_num, exc)
+                        continue
+                    if lot_rows:
+                        enrich(pub_num, lot_rows)
+
+        def submit_parse(pub_num: str, xml_bytes: bytes) -> None:
+            collect(max_in_flight)
+            parsing[parsers.submit(parse_eforms_xml, xml_bytes, company)] = pub_num
+
+        downloads = {
+            downloaders.submit(fetch_notice_xml, pn, bucket, session): pn
+            for pn in missing
+        }
+
+        for pub_num in cached:
+            xml_bytes = cache.get_xml(pub_num)
+            if xml_bytes is None:   # index entry without blob - fetch it again
+                downloads[downloaders.submit(fetch_notice_xml, pub_num, bucket, session)] = pub_num
+                continue
+            submit_parse(pub_num, xml_bytes)
+
+        while downloads:
+            done, _ = wait(downloads, return_when=FIRST_COMPLETED)
+            for fut in done:
+                pub_num = downloads.pop(fut)
+                xml_bytes = fut.result()
+                if xml_bytes is None:
+                    failed += 1
+                    continue
+                downloaded += 1
+                cache.put_xml(pub_num, xml_bytes)
+                if downloaded % 25 == 0:
+                    log.info("  XML downloaded: %d/%d", downloaded, len(missing))
+                submit_parse(pub_num, xml_bytes)
+
+        collect(1)
+
+    cache.flush()
+    log.info("  XML: %d from cache, %d downloaded, %d failed",
+             len(by_pub) - downloaded - failed, downloaded, failed)
     if not all_rows:
         return pd.DataFrame()
 
@@ -647,12 +855,16 @@ def fetch_lot_details(
     ]
     col_order = [c for c in col_order if c in df.columns]
     df = df[col_order]
-    df.sort_values("publication_date", ascending=True, inplace=True)
+    # Parse jobs finish in any order; sort on a full key so the output is stable.
+    df.sort_values(
+        [c for c in ("publication_date", "publication_number", "lot_id") if c in df.columns],
+        ascending=True, inplace=True, kind="stable",
+    )
     df.reset_index(drop=True, inplace=True)
     return df
 
 
-def _build_query(config: dict) -> str:
+def _build_query(config: dict, since: str | None = MIN_PUBLICATION_DATE) -> str:
     """Build a TED expert-search query from *config*.
 
     Each search term becomes its own ``FT ~ "..."`` clause joined with OR.
@@ -664,6 +876,9 @@ def _build_query(config: dict) -> str:
     FT ~ operator.
 
     Corporate suffixes are automatically stripped to broaden recall.
+
+    *since* (YYYYMMDD) becomes the ``PD >=`` filter; ``None`` returns the
+    query without it, which is what the notice cache keys on.
     """
     terms = config["search_terms"]
 
@@ -675,13 +890,19 @@ def _build_query(config: dict) -> str:
             "", name, flags=re.IGNORECASE,
         ).strip()
         if core and core.lower() != name.lower():
-            return f'FT ~ ("{name}" OR "{core}") AND PD >= {MIN_PUBLICATION_DATE}'
-        return f'FT ~ "{name}" AND PD >= {MIN_PUBLICATION_DATE}'
+            base = f'FT ~ ("{name}" OR "{core}")'
+        else:
+            base = f'FT ~ "{name}"'
+    else:
+        # Multiple terms: chain as separate FT clauses, wrapped in parens for the date AND
+        clauses = [f'FT ~ "{t}"' for t in terms]
+        base = f'({" OR ".join(clauses)})'
 
-    # Multiple terms: chain as separate FT clauses, wrapped in parens for the date AND
-    clauses = [f'FT ~ "{t}"' for t in terms]
-    ft_part = f'({" OR ".join(clauses)})'
-    return f'{ft_part} AND PD >= {MIN_PUBLICATION_DATE}'
+    return _with_since(base, since)
+
+
+def _with_since(base_query: str, since: str | None) -> str:
+    return f"{base_query} AND PD >= {since}" if since else base_query
 
 
 # ---------------------------------------------------------------------------
@@ -703,6 +924,13 @@ def search_notices(query: str, scope: str = "ALL") -> list[dict]:
     list[dict]
         Raw notice dicts as returned by the API.
     """
+    return _search_pages(query, scope)[0]
+
+
+def _search_pages(query: str, scope: str) -> tuple[list[dict], bool]:
+    """search_notices() body. Also returns whether the result set is
+    complete (False if a page failed or MAX_PAGES cut it short), which
+    decides whether a cached query's watermark may advance."""
     all_notices: list[dict] = []
     page = 1
 
@@ -732,7 +960,7 @@ def search_notices(query: str, scope: str = "ALL") -> list[dict]:
                     time.sleep(2)
                 else:
                     log.error("  API request failed after 3 attempts: %s", exc)
-                    return all_notices
+                    return all_notices, False
 
         data = resp.json()
         notices = data.get("notices", [])
@@ -742,18 +970,64 @@ def search_notices(query: str, scope: str = "ALL") -> list[dict]:
             log.info("  Total matching notices: %s", total)
 
         if not notices:
-            break
+            return all_notices, True
 
         all_notices.extend(notices)
 
         # Are we done?
         if isinstance(total, int) and len(all_notices) >= total:
-            break
+            return all_notices, True
 
         page += 1
         time.sleep(REQUEST_DELAY)
 
-    return all_notices
+    log.warning("  Stopped at MAX_PAGES=%d; result set is incomplete", MAX_PAGES)
+    return all_notices, False
+
+
+def search_archive_cached(
+    base_query: str,
+    cache: TedCache,
+    full_refresh: bool = False,
+) -> list[dict]:
+    """Archive (scope=ALL) search for *base_query* (no PD clause) merged
+    with the cached history for that query.
+
+    Only ``PD >= watermark - WATERMARK_LOOKBACK_DAYS`` is requested from
+    TED; new and revised hits overwrite the cached notice with the same
+    publication-number. The watermark (run date, UTC) only advances when the
+    incremental search completed, so a failed page is retried in full the
+    next day. *full_refresh* (or an empty cache) queries from
+    MIN_PUBLICATION_DATE and, if complete, replaces the cached set.
+    """
+    entry = cache.load_query(base_query)
+    incremental = bool(entry["watermark"]) and not full_refresh
+    since = MIN_PUBLICATION_DATE
+    if incremental:
+        wm = datetime.strptime(entry["watermark"], "%Y%m%d") - timedelta(days=WATERMARK_LOOKBACK_DAYS)
+        since = max(MIN_PUBLICATION_DATE, wm.strftime("%Y%m%d"))
+
+    query = _with_since(base_query, since)
+    log.info("  Archive query: %s (%s)", query, "incremental" if incremental else "full")
+    hits, complete = _search_pages(query, scope="ALL")
+
+    before = entry["notices"]
+    fresh = {_extract_text(n.get("publication-number")): n for n in hits}
+    fresh.pop("", None)
+    if complete and not incremental:
+        merged = fresh
+    else:
+        merged = {**before, **fresh}
+    new_count = len(merged.keys() - before.keys())
+
+    watermark = entry["watermark"]
+    if complete:
+        watermark = datetime.now(timezone.utc).strftime("%Y%m%d")
+    if merged != before or watermark != entry["watermark"]:
+        cache.save_query({"query": base_query, "watermark": watermark, "notices": merged})
+
+    log.info("  %d hits from TED (%d new), %d notices in cache", len(hits), new_count, len(merged))
+    return list(merged.values())
 
 
 # ---------------------------------------------------------------------------
@@ -982,7 +1256,7 @@ def write_notices_to_db(company: str, df: pd.DataFrame) -> tuple[int | None, str
 def write_lot_details_to_db(company: str, df: pd.DataFrame) -> tuple[int | None, str | None]:
     """
     Best-effort: upsert the latest known state of every lot tender for
-    *company* (only DETAIL_COMPANIES gets this - see fetch_lot_details()).
+    *company* (only companies with lot_detail set - see fetch_lot_details()).
     Uses upsert, same reasoning as write_notices_to_db - a lot's result/
     value can be revised between runs.
     """
@@ -1151,20 +1425,24 @@ def write_excel(
     log.info("Wrote %s", OUTPUT_FILE)
 
 
-def _build_winner_id_queries(org_numbers: set, batch_size: int = 25) -> list[str]:
+def _build_winner_id_queries(
+    org_numbers: set,
+    batch_size: int = 25,
+    since: str | None = MIN_PUBLICATION_DATE,
+) -> list[str]:
     """Build one or more ``winner-identifier IN (...)`` queries for *org_numbers*.
 
     Splits into batches to stay well within TED's query-length limits.
-    Each query is already suffixed with the MIN_PUBLICATION_DATE filter.
+    Each query is suffixed with ``PD >= since`` unless *since* is None.
+    Numbers are sorted so the batches (and their cache keys) are stable
+    between runs.
     """
-    nums = list(org_numbers)
+    nums = sorted(org_numbers)
     queries = []
     for i in range(0, len(nums), batch_size):
         batch = nums[i : i + batch_size]
         id_list = " ".join(batch)
-        queries.append(
-            f"winner-identifier IN ({id_list}) AND PD >= {MIN_PUBLICATION_DATE}"
-        )
+        queries.append(_with_since(f"winner-identifier IN ({id_list})", since))
     return queries
 
 
@@ -1173,10 +1451,17 @@ def _build_winner_id_queries(org_numbers: set, batch_size: int = 25) -> list[str
 # ---------------------------------------------------------------------------
 
 def main() -> None:
+    ap = argparse.ArgumentParser(description="Fetch TED procurement notices for tracked companies.")
+    ap.add_argument("--full-refresh", action="store_true",
+                    help="Ignore cached watermarks and re-fetch the archive from MIN_PUBLICATION_DATE")
+    args = ap.parse_args()
+
     log.info("=" * 60)
     log.info("TED Procurement Data Fetcher")
     log.info("=" * 60)
 
+    cache = TedCache()
+
     company_frames: dict[str, pd.DataFrame] = {}
     company_notices: dict[str, tuple[list[dict], dict]] = {}  # raw notices + config
     db_status: dict[str, tuple[int | None, str | None]] = {}
@@ -1195,11 +1480,10 @@ def main() -> None:
                 "  Using %d org numbers; querying winner-identifier directly",
                 len(config["org_numbers"]),
             )
-            id_queries = _build_winner_id_queries(config["org_numbers"])
+            id_queries = _build_winner_id_queries(config["org_numbers"], since=None)
             won_notices: list[dict] = []
             for q in id_queries:
-                log.info("  Winner-ID query: %s", q)
-                won_notices.extend(search_notices(q, scope="ALL"))
+                won_notices.extend(search_archive_cached(q, cache, args.full_refresh))
             log.info("  Retrieved %d won notices", len(won_notices))
 
             # Active: use FT query so we catch open tenders before a winner
@@ -1227,7 +1511,9 @@ def main() -> None:
             query = _build_query(config)
             log.info("  Expert query: %s", query)
 
-            all_notices = search_notices(query, scope="ALL")
+            all_notices = search_archive_cached(
+                _build_query(config, since=None), cache, args.full_refresh,
+            )
             log.info("  Retrieved %d notices total", len(all_notices))
 
             active_raw = search_notices(query, scope="ACTIVE")
@@ -1245,15 +1531,14 @@ def main() -> None:
 
         db_status[display_name] = write_notices_to_db(display_name, df_full)
 
-    # --- Lot-level detail via XML parsing (only for selected companies) ---
-    DETAIL_COMPANIES = {"EQL Pharma AB"}
+    # --- Lot-level detail via XML parsing (companies with lot_detail set) ---
     detail_frames: dict[str, pd.DataFrame] = {}
     detail_db_status: dict[str, tuple[int | None, str | None]] = {}
     for display_name, (raw_notices, config) in company_notices.items():
-        if not raw_notices or display_name not in DETAIL_COMPANIES:
+        if not raw_notices or not config["lot_detail"]:
             continue
         log.info("Fetching XML lot details for: %s", display_name)
-        df_detail = fetch_lot_details(raw_notices, config)
+        df_detail = fetch_lot_details(raw_notices, config, cache)
         if not df_detail.empty:
             detail_frames[display_name] = df_detail
             log.info("  %d lot-level rows for '%s'", len(df_detail), display_name)
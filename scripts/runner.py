@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+runner.py
+
+Runs the nightly pipelines concurrently instead of as one workflow step per
+script. Each pipeline's main() (or async run_once()) is imported and called
+in its own worker process, so a crash, hang or sys.exit in one script never
+takes the others down.
+
+Scheduling
+----------
+Every pipeline declares a resource class:
+  browser : launches Chromium/Playwright (memory-heavy, bot-detection sensitive)
+  http    : plain requests/API scraping
+  db      : only reads/writes Postgres and local files
+Each class has its own concurrency limit (RESOURCE_LIMITS), so e.g. two
+Playwright scrapers overlap with four API scrapers, but four browsers never
+run at once on the 7 GB GitHub runner. A pipeline may also list other
+pipelines in "after"; it starts only once those have finished OK, and is
+marked "skipped" if one of them failed. "wait_for" is ordering only: the
+pipeline starts once those have finished, whatever their status (used when
+it merely benefits from a cache the other one fills).
+
+Per-script timeouts mirror the old per-step timeout-minutes. A worker that
+overruns is killed together with its process group (Chromium children
+included) and reported as "timeout".
+
+Output
+------
+Each worker's stdout/stderr goes to a log file that is echoed (grouped, in
+GitHub Actions) when the worker finishes. A machine-readable run report is
+written to --report (default: $RUNNER_TEMP/run_report.json):
+  {"started_at", "finished_at", "duration_s",
+   "scripts": [{"script", "status", "duration_s", "rows_written",
+                "db_failed", "exit_code", "log"}, ...]}
+rows_written is the sum of every "Databas: N rader skrivna/uppserta" line
+the script printed — the same line every DB-writing script already logs.
+
+Usage
+-----
+  python scripts/runner.py                       # all pipelines
+  python scripts/runner.py --only fetch_kpi.py,track_nelly_inventory.py
+  python scripts/runner.py --list
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import re
+import signal
+import sys
+import tempfile
+import time
+import traceback
+from datetime import datetime, timezone
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_ROOT  = SCRIPT_DIR.parent
+
+RESOURCE_LIMITS: dict[str, int] = {
+    "browser": 2,
+    "http":    4,
+    "db":      2,
+}
+
+# script -> {module, entry, resource, timeout_min, after, wait_for}
+# entry may be a plain function or a coroutine function (asyncio.run is used).
+PIPELINES: dict[str, dict] = {
+    "fetch_kpi.py": {
+        "module": "fetch_kpi", "entry": "main",
+        "resource": "http", "timeout_min": 10,
+    },
+    "amazon_scape_bought_playwright_us_de.py": {
+        "module": "amazon_scape_bought_playwright_us_de", "entry": "run_once",
+        "resource": "browser", "timeout_min": 10,
+    },
+    "track_fractal_rankings_playwright.py": {
+        "module": "track_fractal_rankings_playwright", "entry": "main",
+        "resource": "browser", "timeout_min": 10,
+    },
+    "track_nelly_aov.py": {
+        "module": "track_nelly_aov", "entry": "main",
+        "resource": "browser", "timeout_min": 10,
+    },
+    "track_rugvista_bestsellers.py": {
+        "module": "track_rugvista_bestsellers", "entry": "main",
+        "resource": "http", "timeout_min": 10,
+    },
+    "track_rugvista_daily_sales.py": {
+        "module": "track_rugvista_daily_sales", "entry": "main",
+        "resource": "http", "timeout_min": 10,
+    },
+    "fetch_ted_procurements.py": {
+        "module": "fetch_ted_procurements", "entry": "main",
+        "resource": "http", "timeout_min": 10,
+    },
+    "track_rvrc_sales.py": {
+        "module": "track_rvrc_sales", "entry": "main",
+        "resource": "http", "timeout_min": 10,
+    },
+    "track_nelly_inventory.py": {
+        "module": "track_nelly_inventory", "entry": "main",
+        "resource": "http", "timeout_min": 30,
+    },
+    "fetch_plejd_sensortower_rankings.py": {
+        "module": "fetch_plejd_sensortower_rankings", "entry": "main",
+        "resource": "browser", "timeout_min": 10,
+    },
+    "track_tu_brands.py": {
+        "module": "track_tu_brands", "entry": "main",
+        "resource": "http", "timeout_min": 10,
+    },
+    "fetch_anoto_amazon_data.py": {
+        "module": "fetch_anoto_amazon_data", "entry": "run_once",
+        "resource": "browser", "timeout_min": 10,
+    },
+    "track_anoto_inventory.py": {
+        "module": "track_anoto_inventory", "entry": "main",
+        "resource": "http", "timeout_min": 10,
+    },
+    "track_ahlsell_plejd_inventory.py": {
+        "module": "track_ahlsell_plejd_inventory", "entry": "main",
+        "resource": "http", "timeout_min": 15,
+    },
+    "track_ahlsell_led_panel_inventory.py": {
+        "module": "track_ahlsell_led_panel_inventory", "entry": "main",
+        "resource": "http", "timeout_min": 15,
+        # reads the stock the Plejd tracker just cached (core/ahlsell.py), but
+        # still runs, fetching everything itself, if that tracker failed
+        "wait_for": ["track_ahlsell_plejd_inventory.py"],
+    },
+}
+
+POLL_INTERVAL_S = 0.5
+_ROWS_RE = re.compile(r"(\d+) rader (?:skrivna|uppserta)")
+
+
+# ── Worker ─────────────────────────────────────────────────────────────────────
+
+def _run_pipeline(module_name: str, entry: str, script: str, log_path: str) -> None:
+    """Worker-process body: import the script and call its entry point with
+    stdout/stderr redirected to log_path. Exit code 0 = OK, 1 = raised."""
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()  # own process group, so a timeout can kill Chromium children too
+    log = open(log_path, "w", encoding="utf-8", buffering=1)
+    sys.stdout = sys.stderr = log
+    sys.argv = [script]  # scripts with argparse must not see the runner's args
+    os.chdir(REPO_ROOT)  # CI used to run every script from the repo root
+    if str(SCRIPT_DIR) not in sys.path:
+        sys.path.insert(0, str(SCRIPT_DIR))
+
+    exit_code = 0
+    try:
+        import importlib
+        from core.transport import install_from_env
+        install_from_env()  # SCRAPER_HTTP_MODE=record|replay, see core/transport.py
+        module = importlib.import_module(module_name)
+        result = getattr(module, entry)()
+        if asyncio.iscoroutine(result):
+            asyncio.run(result)
+    except SystemExit as exc:
+        exit_code = exc.code if isinstance(exc.code, int) else (0 if exc.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        _close_worker()
+        log.flush()
+    os._exit(exit_code)  # skips atexit, hence _close_worker() above
+
+
+def _close_worker() -> None:
+    """What atexit would have done in a normal interpreter exit: close the DB
+    pool and print the HTTP record/replay stats, if the script used them."""
+    for module_name, func in (("core.db", "close_pool"), ("core.transport", "_report")):
+        module = sys.modules.get(module_name)
+        if module is None:
+            continue
+        try:
+            getattr(module, func)()
+        except Exception:
+            traceback.print_exc()
+
+
+def _kill_group(proc: mp.Process) -> None:
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except (ProcessLookupError, PermissionError):
+        proc.kill()
+    proc.join(5)
+
+
+def _parse_log(log_path: Path) -> tuple[int | None, bool]:
+    """Returns (rows_written, db_failed) from a finished script's log."""
+    try:
+        text = log_path.read_text(encoding="utf-8", errors="replace")
+    except OSError:
+        return None, False
+    counts = [int(n) for n in _ROWS_RE.findall(text)]
+    return (sum(counts) if counts else None), ("MISSLYCKADES" in text)
+
+
+def _echo_log(script: str, log_path: Path, status: str) -> None:
+    in_gha = bool(os.environ.get("GITHUB_ACTIONS"))
+    header = f"{script} [{status}]"
+    print(f"::group::{header}" if in_gha else f"\n===== {header} =====")
+    try:
+        print(log_path.read_text(encoding="utf-8", errors="replace").rstrip())
+    except OSError:
+        print("(no log)")
+    print("::endgroup::" if in_gha else "=" * (len(header) + 12))
+    sys.stdout.flush()
+
+
+# ── Scheduler ──────────────────────────────────────────────────────────────────
+
+def run_all(selected: list[str], log_dir: Path) -> list[dict]:
+    ctx = mp.get_context("spawn")  # clean interpreter per script, no inherited module state
+    pending   = list(selected)
+    running: dict[str, tuple[mp.Process, float, Path]] = {}
+    in_use    = {cls: 0 for cls in RESOURCE_LIMITS}
+    results: dict[str, dict] = {}
+
+    while pending or running:
+        # Start everything whose dependencies are done and whose class has a free slot.
+        for script in list(pending):
+            spec = PIPELINES[script]
+            deps = [d for d in spec.get("after", []) if d in selected]
+            if any(results.get(d, {}).get("status") not in (None, "ok") for d in deps):
+                pending.remove(script)
+                results[script] = {"script": script, "status": "skipped", "duration_s": 0.0,
+                                   "rows_written": None, "db_failed": False, "exit_code": None,
+                                   "log": None}
+                print(f"[runner] SKIP  {script} (dependency failed)")
+                continue
+            waits = [d for d in spec.get("wait_for", []) if d in selected]
+            if any(d not in results for d in deps + waits):
+                continue
+            cls = spec["resource"]
+            if in_use[cls] >= RESOURCE_LIMITS[cls]:
+                continue
+            log_path = log_dir / f"{script}.log"
+            proc = ctx.Process(
+                target=_run_pipeline,
+                args=(spec["module"], spec.get("entry", "main"), script, str(log_path)),
+                name=script,
+            )
+            proc.start()
+            running[script] = (proc, time.monotonic(), log_path)
+            in_use[cls] += 1
+            pending.remove(script)
+            print(f"[runner] START {script} ({cls} {in_use[cls]}/{RESOURCE_LIMITS[cls]})")
+
+        time.sleep(POLL_INTERVAL_S)
+
+        for script, (proc, started, log_path) in list(running.items()):
+            spec    = PIPELINES[script]
+            elapsed = time.monotonic() - started
+            if proc.is_alive():
+                if elapsed < spec["timeout_min"] * 60:
+                    continue
+                _kill_group(proc)
+                status = "timeout"
+            else:
+                proc.join()
+                status = "ok" if proc.exitcode == 0 else "failed"
+
+            del running[script]
+            in_use[spec["resource"]] -= 1
+            rows_written, db_failed = _parse_log(log_path)
+            results[script] = {
+                "script":       script,
+                "status":       status,
+                "duration_s":   round(elapsed, 1),
+                "rows_written": rows_written,
+                "db_failed":    db_failed,
+                "exit_code":    proc.exitcode,
+                "log":          str(log_path),
+            }
+            print(f"[runner] {status.upper():<5} {script} after {elapsed:.0f}s")
+            _echo_log(script, log_path, status)
+
+    return [results[s] for s in selected]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Run the nightly pipelines concurrently.")
+    ap.add_argument("--only", default="", help="Comma-separated script names to run (default: all)")
+    ap.add_argument("--report", default=None,
+                    help="Path for the JSON run report (default: $RUNNER_TEMP/run_report.json)")
+    ap.add_argument("--list", action="store_true", help="List pipelines and exit")
+    args = ap.parse_args()
+
+    if args.list:
+        for script, spec in PIPELINES.items():
+            after = f"  after={','.join(spec['after'])}" if spec.get("after") else ""
+            after += f"  wait_for={','.join(spec['wait_for'])}" if spec.get("wait_for") else ""
+            print(f"{script:<45} {spec['resource']:<8} {spec['timeout_min']:>3} min{after}")
+        return
+
+    selected = [s.strip() for s in args.only.split(",") if s.strip()] or list(PIPELINES)
+    unknown = [s for s in selected if s not in PIPELINES]
+    if unknown:
+        ap.error(f"unknown pipeline(s): {', '.join(unknown)}")
+
+    temp_dir    = Path(os.environ.get("RUNNER_TEMP", tempfile.gettempdir()))
+    report_path = Path(args.report) if args.report else temp_dir / "run_report.json"
+    log_dir     = temp_dir / "runner_logs"
+    log_dir.mkdir(parents=True, exist_ok=True)
+
+    started_at = datetime.now(timezone.utc)
+    t0 = time.monotonic()
+    # Scopes per-run caches shared between workers (core/ahlsell.py stock).
+    os.environ["SCRAPER_RUN_ID"] = f"{started_at:%Y%m%dT%H%M%S}-{os.getpid()}"
+    print(f"[runner] {len(selected)} pipelines, limits {RESOURCE_LIMITS}")
+    scripts = run_all(selected, log_dir)
+
+    report = {
+        "started_at":  started_at.isoformat(timespec="seconds"),
+        "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "duration_s":  round(time.monotonic() - t0, 1),
+        "scripts":     scripts,
+    }
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print(f"\n[runner] Done in {report['duration_s']:.0f}s — report: {report_path}")
+    for r in scripts:
+        rows = "-" if r["rows_written"] is None else r["rows_written"]
+        print(f"  {r['status']:<8} {r['duration_s']:>7.1f}s  rows={rows:<6} {r['script']}")
+
+    if any(r["status"] != "ok" for r in scripts):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
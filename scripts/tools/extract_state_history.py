@@ -4,13 +4,37 @@ One-off script: walk the full git history of every data/*_state.json file
 and dump each historical version to raw/<name>/<author-date>.json.
 
 Uses the commit's AUTHOR date (not today's date, not commit/committer date).
-Safe to re-run: it just overwrites files for dates it re-derives.
+Safe to re-run: it overwrites files for dates whose version changed.
+
+One `git log --raw` per state file lists every commit together with the
+blob hash of the file at that commit. Only the last version of each day
+is needed, and a day whose blob is identical to the previous written day's
+(a revert, or a rename carried by --follow) is skipped. raw/<name>/.blob-index
+records the blob each date was written from, so a re-run skips every date
+whose file is already extracted from the same blob and only reads new days;
+--force ignores it and rewrites everything (as a decoding fix like
+KNOWN_ISSUES.md #9 needs). The remaining blobs are streamed through a single
+`git cat-file --batch` process per file and written byte-for-byte, with no
+decode/re-encode step. State files are processed in parallel.
+
+Usage
+-----
+  python scripts/tools/extract_state_history.py
+  python scripts/tools/extract_state_history.py --only rugvista_state.json
+  python scripts/tools/extract_state_history.py --gzip   # raw/<name>/<date>.json.gz
+  python scripts/tools/extract_state_history.py --force  # rewrite every date
+
+The load_*_history.py loaders read plain raw/<name>/*.json, so --gzip is
+for archiving a copy, not for feeding them.
 """
 from __future__ import annotations
 
+import argparse
+import gzip
+import os
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from collections import defaultdict
 
 REPO_ROOT = Path(
     subprocess.run(
@@ -21,6 +45,9 @@ REPO_ROOT = Path(
 DATA_DIR = REPO_ROOT / "data"
 RAW_DIR = REPO_ROOT / "raw"
 
+NULL_BLOB = "0" * 40
+BLOB_INDEX = ".blob-index"  # "<date> <blob> <file name>" per line; not *.json, so loaders skip it
+
 
 def git(*args: str) -> str:
     result = subprocess.run(
@@ -36,10 +63,10 @@ def get_state_files() -> list[str]:
 
 
 def get_history(filename: str) -> list[tuple[str, str, str]]:
-    """Return (commit_hash, author_date_iso, path_at_commit) oldest -> newest."""
+    """Return (commit_hash, author_date_iso, blob_hash) oldest -> newest."""
     rel_path = f"data/{filename}"
     out = git(
-        "log", "--follow", "--format=COMMIT\x1f%H\x1f%aI", "--name-only",
+        "log", "--follow", "--format=COMMIT\x1f%H\x1f%aI", "--raw", "--no-abbrev",
         "--", rel_path,
     )
     entries: list[tuple[str, str, str]] = []
@@ -48,36 +75,113 @@ def get_history(filename: str) -> list[tuple[str, str, str]]:
         if line.startswith("COMMIT\x1f"):
             _, h, adate = line.split("\x1f")
             current = (h, adate)
-        elif line.strip():
+        elif line.startswith(":"):
+            # ":<old mode> <new mode> <old blob> <new blob> <status>\t<path>[\t<new path>]"
             assert current is not None
-            entries.append((current[0], current[1], line.strip()))
+            blob = line.split("\t", 1)[0].split()[3]
+            entries.append((current[0], current[1], blob))
     entries.reverse()  # oldest first
     return entries
 
 
-def extract_file(filename: str) -> dict:
+class BlobReader:
+    """One long-lived `git cat-file --batch`: blob hash in, raw bytes out."""
+
+    def __init__(self) -> None:
+        self.proc = subprocess.Popen(
+            ["git", "cat-file", "--batch"], cwd=REPO_ROOT,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        )
+
+    def read(self, blob: str) -> bytes | None:
+        self.proc.stdin.write(blob.encode("ascii") + b"\n")
+        self.proc.stdin.flush()
+        header = self.proc.stdout.readline().split()
+        if len(header) < 3 or header[1] != b"blob":  # "<blob> missing"
+            return None
+        content = self.proc.stdout.read(int(header[2]))
+        self.proc.stdout.read(1)  # trailing newline
+        return content
+
+    def close(self) -> None:
+        self.proc.stdin.close()
+        self.proc.wait()
+
+    def __enter__(self) -> "BlobReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def read_blob_index(out_dir: Path) -> dict[str, tuple[str, str]]:
+    """date -> (blob, file name) for every date a previous run wrote."""
+    path = out_dir / BLOB_INDEX
+    if not path.exists():
+        return {}
+    index = {}
+    for line in path.read_text(encoding="utf-8").splitlines():
+        parts = line.split()
+        if len(parts) == 3:
+            index[parts[0]] = (parts[1], parts[2])
+    return index
+
+
+def extract_file(filename: str, compress: bool = False, force: bool = False) -> dict:
     stem = filename[: -len(".json")]
     out_dir = RAW_DIR / stem
     out_dir.mkdir(parents=True, exist_ok=True)
+    index = {} if force else read_blob_index(out_dir)
+    suffix = ".json.gz" if compress else ".json"
 
     history = get_history(filename)
-    dates_seen: dict[str, str] = {}  # date -> commit hash (last wins, chronological)
+    last_of_day: dict[str, tuple[str, str]] = {}  # date -> (commit, blob); last wins, chronological
     skipped = []
-
-    for commit_hash, author_date, path_at_commit in history:
-        date_only = author_date[:10]
-        try:
-            content = git("show", f"{commit_hash}:{path_at_commit}")
-        except RuntimeError:
+    for commit_hash, author_date, blob in history:
+        if blob == NULL_BLOB:  # file deleted in this commit
             skipped.append(commit_hash)
             continue
-        (out_dir / f"{date_only}.json").write_text(content, encoding="utf-8", newline="")
-        dates_seen[date_only] = commit_hash
-
+        last_of_day[author_date[:10]] = (commit_hash, blob)
+
+    written = []
+    unchanged = []
+    up_to_date = []
+    new_index: dict[str, tuple[str, str]] = {}
+    previous_blob = None
+    with BlobReader() as reader:
+        for date_only in sorted(last_of_day):
+            commit_hash, blob = last_of_day[date_only]
+            if blob == previous_blob:
+                unchanged.append(date_only)
+                continue
+            name = f"{date_only}{suffix}"
+            previous_blob = blob
+            if index.get(date_only) == (blob, name) and (out_dir / name).exists():
+                up_to_date.append(date_only)
+                new_index[date_only] = (blob, name)
+                continue
+            content = reader.read(blob)
+            if content is None:
+                skipped.append(commit_hash)
+                previous_blob = None
+                continue
+            if compress:
+                (out_dir / name).write_bytes(gzip.compress(content, mtime=0))
+            else:
+                (out_dir / name).write_bytes(content)
+            written.append(date_only)
+            new_index[date_only] = (blob, name)
+
+    (out_dir / BLOB_INDEX).write_text(
+        "".join(f"{d} {blob} {name}\n" for d, (blob, name) in sorted(new_index.items())),
+        encoding="utf-8",
+    )
     return {
         "commits_seen": len(history),
-        "snapshots_written": len(dates_seen),
-        "dates": sorted(dates_seen.keys()),
+        "snapshots_written": len(written),
+        "already_extracted": len(up_to_date),
+        "unchanged_skipped": len(unchanged),
+        "dates": sorted(written + up_to_date + unchanged),
         "skipped_commits": skipped,
     }
 
@@ -100,16 +204,31 @@ def missing_dates(dates: list[str]) -> list[str]:
 
 
 def main():
+    ap = argparse.ArgumentParser(description="Extract every daily version of data/*_state.json into raw/.")
+    ap.add_argument("--only", default="", help="Comma-separated state file names (default: all)")
+    ap.add_argument("--gzip", action="store_true", help="Write raw/<name>/<date>.json.gz instead of .json")
+    ap.add_argument("--force", action="store_true", help="Ignore raw/<name>/.blob-index and rewrite every date")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="State files processed in parallel")
+    args = ap.parse_args()
+
+    files = get_state_files()
+    if args.only:
+        wanted = {n.strip() for n in args.only.split(",") if n.strip()}
+        files = [f for f in files if f in wanted]
+
     RAW_DIR.mkdir(parents=True, exist_ok=True)
     summary = {}
-    for filename in get_state_files():
-        info = extract_file(filename)
-        info["missing"] = missing_dates(info["dates"])
-        summary[filename] = info
-        print(f"{filename}: {info['snapshots_written']} snapshots "
-              f"({info['dates'][0] if info['dates'] else '-'} .. "
-              f"{info['dates'][-1] if info['dates'] else '-'}), "
-              f"{len(info['missing'])} missing")
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        results = pool.map(lambda f: extract_file(f, compress=args.gzip, force=args.force), files)
+        for filename, info in zip(files, results):
+            info["missing"] = missing_dates(info["dates"])
+            summary[filename] = info
+            print(f"{filename}: {info['snapshots_written']} snapshots written, "
+                  f"{info['already_extracted']} already extracted, "
+                  f"{info['unchanged_skipped']} unchanged days skipped "
+                  f"({info['dates'][0] if info['dates'] else '-'} .. "
+                  f"{info['dates'][-1] if info['dates'] else '-'}), "
+                  f"{len(info['missing'])} missing")
 
     return summary
 
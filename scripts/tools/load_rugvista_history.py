@@ -5,7 +5,7 @@ load_rugvista_history.py
 Loads every extracted historical snapshot in raw/rugvista_state/*.json into
 the rugvista_variant_snapshot table in Postgres (one row per product variant
 per captured snapshot). Safe to re-run: inserts use ON CONFLICT DO NOTHING
-keyed on (captured_at, product_id).
+keyed on (snapshot_date, product_id).
 """
 from __future__ import annotations
 
@@ -33,7 +33,7 @@ INSERT INTO rugvista_variant_snapshot
     (captured_at, product_id, sku, parent_name, variant_name,
      size_label, length_cm, width_cm, price_sek, available, snapshot_date)
 VALUES %s
-ON CONFLICT (captured_at, product_id) DO NOTHING;
+ON CONFLICT (snapshot_date, product_id) DO NOTHING;
 """
 
 
@@ -13,11 +13,12 @@ Flöde
 -----
   1. Hämta alla produkter i kategorin "Infällda armaturer" via sök-API
      (paginerat, filtrerar klientsidan på item_category5)
-  2. Expandera varianter per produkt (alla artikelnummer)
+  2. Expandera varianter per produkt (alla artikelnummer, cachat)
   3. Hämta och cachelagra butikskatalog
-  4. Hämta lagersaldo per artikelnummer
+  4. Hämta lagersaldo per artikelnummer (parallellt via core.ahlsell,
+     delad lagercache med Plejd-spåraren)
   5. Summera lager per varumärke
-  6. Spara daglig snapshot i JSON-tillståndsfil
+  6. Spara dagens snapshot som egen partition (core.snapshots)
   7. Exportera till Excel (laddas och uppdateras inkrementellt):
        • "Varumärken"  — tidsserie: rader = datum, kolumner = varumärken
        • "Artiklar"    — senaste snapshotens artikeldetaljer (skrivs om)
@@ -32,46 +33,36 @@ API:er (ingen autentisering krävs)
   Lager:     GET https://www.ahlsell.se/api/warehouses/stock
              ?variantNumber={articleNumber}
 
-Tillståndsfil  : data/ahlsell_led_panel_state.json
+Snapshots      : data/snapshots/ahlsell_led_panel/<datum>.jsonl
+                 header = {date, by_brand}, rader = {article, quantity};
+                 meta.json = senaste products + warehouses
+                 (data/ahlsell_led_panel_state.json importeras en gång om
+                 lagret är tomt)
 Excel-utdata   : data/ahlsell_led_panel_inventory.xlsx
 """
 
 import json
-import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date
 from pathlib import Path
 from typing import Optional
 
-import requests
 from openpyxl import Workbook, load_workbook
 from openpyxl.styles import Alignment, Font, PatternFill
 from openpyxl.utils import get_column_letter
 
+from core.ahlsell import AhlsellClient, total_in_stock
 from core.db import safe_insert
+from core.snapshots import SnapshotStore, open_store
 
 # ── Konfiguration ──────────────────────────────────────────────────────────────
-BASE_URL       = "https://www.ahlsell.se"
-SEARCH_URL     = f"{BASE_URL}/api/search"
-VARIANTS_URL   = f"{BASE_URL}/api/search/variants"
-WAREHOUSES_URL = f"{BASE_URL}/api/warehouses"
-STOCK_URL      = f"{BASE_URL}/api/warehouses/stock"
-
 SEARCH_PHRASE    = "infallda armaturer"
 TARGET_CAT5      = "Infällda armaturer"   # item_category5 filter
 PAGE_SIZE        = 200
-REQUEST_DELAY    = 0.15  # sekunder mellan sekventiella anrop
-STOCK_WORKERS    = 24    # parallella trådar för lagerhämtning
 
-STATE_FILE = Path(__file__).parent.parent / "data" / "ahlsell_led_panel_state.json"
+STATE_FILE = Path(__file__).parent.parent / "data" / "ahlsell_led_panel_state.json"  # äldre format, endast import
+STORE_NAME = "ahlsell_led_panel"
 EXCEL_FILE = Path(__file__).parent.parent / "data" / "ahlsell_led_panel_inventory.xlsx"
 
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-    "Accept": "application/json",
-    "Accept-Language": "sv-SE,sv;q=0.9",
-}
-
 PLEJD_BRAND = "Plejd"
 
 # ── Stilar ─────────────────────────────────────────────────────────────────────
@@ -85,7 +76,7 @@ _HDR_OTHER_FILL = PatternFill("solid", fgColor="4A4A4A") # antracit – övriga
 
 # ── API-anrop ──────────────────────────────────────────────────────────────────
 
-def fetch_category_products() -> list[dict]:
+def fetch_category_products(client: AhlsellClient) -> list[dict]:
     """
     Hämtar alla produktkort i kategorin 'Infällda armaturer' via sök-API.
     Paginerar tills alla sidor hämtats och filtrerar på item_category5.
@@ -95,15 +86,7 @@ def fetch_category_products() -> list[dict]:
     total_count: int | None = None
 
     while True:
-        time.sleep(REQUEST_DELAY)
-        resp = requests.get(
-            SEARCH_URL,
-            params={"searchPhrase": SEARCH_PHRASE, "pageSize": PAGE_SIZE, "page": page},
-            headers=HEADERS,
-            timeout=30,
-        )
-        resp.raise_for_status()
-        data = resp.json()
+        data = client.search(SEARCH_PHRASE, page_size=PAGE_SIZE, page=page)
 
         if total_count is None:
             total_count = data.get("productCount", 0)
@@ -125,56 +108,9 @@ def fetch_category_products() -> list[dict]:
     return all_cards
 
 
-def fetch_all_variant_numbers(product_code: str, active_variant: str) -> list[str]:
-    """Returnerar artikelnummer för samtliga varianter av en produkt."""
-    resp = requests.get(
-        VARIANTS_URL,
-        params={"productCode": product_code, "activeVariantNumber": active_variant},
-        headers=HEADERS,
-        timeout=30,
-    )
-    resp.raise_for_status()
-    return [item["code"] for item in resp.json().get("items", []) if item.get("code")]
-
-
-def fetch_warehouses() -> dict[str, dict]:
-    """Hämtar butikskatalog och returnerar som {warehouseId: metadata}."""
-    resp = requests.get(WAREHOUSES_URL, headers=HEADERS, timeout=30)
-    resp.raise_for_status()
-    return {
-        str(w["id"]): {
-            "name":        w.get("name", ""),
-            "city":        w.get("city", ""),
-            "address":     w.get("address", ""),
-            "phone":       w.get("phoneNumber", ""),
-            "url_segment": w.get("urlSegment", ""),
-        }
-        for w in resp.json()
-    }
-
-
-def fetch_stock_total(variant_number: str) -> float:
-    """
-    Hämtar lagersaldo för ett artikelnummer och returnerar total kvantitet
-    över samtliga butiker. Returnerar 0.0 vid fel.
-    """
-    resp = requests.get(
-        STOCK_URL,
-        params={"variantNumber": variant_number},
-        headers=HEADERS,
-        timeout=30,
-    )
-    resp.raise_for_status()
-    return sum(
-        entry.get("stock", {}).get("quantity") or 0.0
-        for entry in resp.json()
-        if (entry.get("stock", {}).get("quantity") or 0.0) > 0
-    )
-
-
 # ── Insamling ──────────────────────────────────────────────────────────────────
 
-def collect_snapshot() -> tuple[dict[str, dict], dict[str, float], dict[str, float]]:
+def collect_snapshot(client: AhlsellClient) -> tuple[dict[str, dict], dict[str, float], dict[str, float]]:
     """
     Kör alla API-anrop och returnerar:
       products       : {articleNumber: {product_name, brand, product_code, page_url}}
@@ -183,59 +119,21 @@ def collect_snapshot() -> tuple[dict[str, dict], dict[str, float], dict[str, flo
     """
     # 1. Produktlista
     print("Hämtar produkter i kategorin 'Infällda armaturer'...")
-    product_cards = fetch_category_products()
+    product_cards = fetch_category_products(client)
     print(f"  {len(product_cards)} produkter hittade i kategorin")
 
-    # 2. Expandera varianter (parallellt för produkter med >1 variant)
-    def expand_card(card: dict) -> list[tuple[str, dict]]:
-        """Returnerar lista av (articleNumber, metadata) för ett produktkort."""
-        product_code  = card["code"]
-        product_name  = card["name"]
-        brand         = card.get("brand", "Okänt")
-        most_relevant = str(card["variantNumber"])
-        num_variants  = card.get("numberOfVariants", 1)
-        page_url      = card.get("firstVariationPageUrl", "")
-        meta = {"product_name": product_name, "brand": brand,
-                "product_code": product_code, "page_url": page_url}
-
-        if num_variants > 1:
-            try:
-                variant_numbers = fetch_all_variant_numbers(product_code, most_relevant)
-            except Exception as exc:
-                print(f"  Varning: kunde ej hämta varianter för {product_name}: {exc}")
-                variant_numbers = [most_relevant]
-        else:
-            variant_numbers = [most_relevant]
-
-        return [(str(vn), meta) for vn in variant_numbers]
-
-    print(f"  Expanderar varianter ({STOCK_WORKERS} parallella trådar)...")
-    products: dict[str, dict] = {}
-    with ThreadPoolExecutor(max_workers=STOCK_WORKERS) as pool:
-        for entries in pool.map(expand_card, product_cards):
-            for art_num, meta in entries:
-                products[art_num] = meta
-
+    # 2. Expandera varianter (parallellt, cachat per produkt)
+    print("  Expanderar varianter...")
+    products = client.expand_variants(product_cards)
     print(f"  Totalt {len(products)} artikelnummer (inkl. alla varianter)")
 
-    # 3. Lagersaldo per artikel (parallellt)
-    print(f"Hämtar lagersaldo ({len(products)} artiklar, {STOCK_WORKERS} parallella trådar)...")
-    stock_by_article: dict[str, float] = {}
-    article_list = list(products.keys())
-    completed = 0
-
-    with ThreadPoolExecutor(max_workers=STOCK_WORKERS) as pool:
-        futures = {pool.submit(fetch_stock_total, art): art for art in article_list}
-        for future in as_completed(futures):
-            art_num = futures[future]
-            try:
-                stock_by_article[art_num] = future.result()
-            except Exception as exc:
-                print(f"  Varning: lagerfel för {art_num}: {exc}")
-                stock_by_article[art_num] = 0.0
-            completed += 1
-            if completed % 100 == 0:
-                print(f"  {completed}/{len(article_list)} artiklar klara...")
+    # 3. Lagersaldo per artikel (parallellt; artiklar som Plejd-spåraren
+    #    nyss hämtat tas från den delade lagercachen)
+    print(f"Hämtar lagersaldo ({len(products)} artiklar)...")
+    stock, errors = client.stock(products, progress_every=100)
+    for art_num, exc in errors.items():
+        print(f"  Varning: lagerfel för {art_num}: {exc}")
+    stock_by_article = {art: total_in_stock(stock.get(art, {})) for art in products}
 
     total = sum(stock_by_article.values())
     print(f"  Klart — {total:.0f} enheter totalt i lager")
@@ -251,34 +149,42 @@ def collect_snapshot() -> tuple[dict[str, dict], dict[str, float], dict[str, flo
 
 # ── Tillstånd ──────────────────────────────────────────────────────────────────
 
-def load_state() -> dict:
-    if STATE_FILE.exists():
-        return json.loads(STATE_FILE.read_text(encoding="utf-8"))
-    return {"warehouses": {}, "products": {}, "snapshots": {}}
+def _legacy_to_partitions(state: dict):
+    """convert() för SnapshotStore.import_legacy: gammal tillståndsfil -> partitioner."""
+    meta = {
+        "warehouses":   state.get("warehouses", {}),
+        "products":     state.get("products", {}),
+        "last_updated": state.get("last_updated"),
+    }
+    partitions = [
+        (
+            d,
+            {"by_brand": snap.get("by_brand", {})},
+            [{"article": a, "quantity": q} for a, q in snap.get("by_article", {}).items()],
+        )
+        for d, snap in sorted(state.get("snapshots", {}).items())
+    ]
+    return meta, partitions
 
 
-def save_state(state: dict) -> None:
-    STATE_FILE.write_text(
-        json.dumps(state, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
+def open_snapshot_store() -> SnapshotStore:
+    return open_store(STORE_NAME, STATE_FILE, _legacy_to_partitions)
 
 
-def update_state(
-    state: dict,
+def save_snapshot(
+    store: SnapshotStore,
     products: dict,
     warehouses: dict,
     stock_by_article: dict[str, float],
     stock_by_brand: dict[str, float],
 ) -> None:
     today = date.today().isoformat()
-    state["warehouses"]   = warehouses
-    state["products"]     = products
-    state["last_updated"] = today
-    state.setdefault("snapshots", {})[today] = {
-        "by_brand":   {b: round(v) for b, v in stock_by_brand.items()},
-        "by_article": {a: round(v) for a, v in stock_by_article.items()},
-    }
+    store.put(
+        today,
+        [{"article": a, "quantity": round(v)} for a, v in stock_by_article.items()],
+        {"by_brand": {b: round(v) for b, v in stock_by_brand.items()}},
+    )
+    store.save_meta({"warehouses": warehouses, "products": products, "last_updated": today})
 
 
 # ── Databasskrivning ───────────────────────────────────────────────────────────
@@ -426,13 +332,20 @@ def _write_articles_sheet(ws, snapshots: dict, products: dict) -> None:
     ws.freeze_panes = "A2"
 
 
-def write_excel(state: dict) -> None:
-    snapshots = state.get("snapshots", {})
-    products  = state.get("products", {})
+def write_excel(store: SnapshotStore) -> None:
+    products = store.load_meta().get("products", {})
 
+    # Varumärkesbladet behöver bara varje dags header-rad; artikelraderna
+    # läses endast för senaste dagen.
+    snapshots = {
+        snap.date: {"by_brand": snap.header.get("by_brand", {})}
+        for snap in store.iter_range(headers_only=True)
+    }
     if not snapshots:
         print("Ingen data att exportera.")
         return
+    latest = store.latest()
+    snapshots[latest.date]["by_article"] = {r["article"]: r["quantity"] for r in latest.rows}
 
     brands = _sorted_brands(snapshots)
 
@@ -467,26 +380,27 @@ def main() -> None:
     today = date.today().isoformat()
     print(f"=== Ahlsell LED-panel lageruppföljning — {today} ===\n")
 
-    state = load_state()
+    store = open_snapshot_store()
 
-    if today in state.get("snapshots", {}):
+    if today in store:
         print(f"Snapshot för {today} finns redan.")
-        products = state.get("products", {})
-        stock_by_article = state["snapshots"][today].get("by_article", {})
+        products = store.load_meta().get("products", {})
+        stock_by_article = {r["article"]: r["quantity"] for r in store.iter_rows(today)}
     else:
-        products, stock_by_article, stock_by_brand = collect_snapshot()
+        with AhlsellClient() as client:
+            products, stock_by_article, stock_by_brand = collect_snapshot(client)
 
-        print("\nHämtar butikskatalog...")
-        try:
-            warehouses = fetch_warehouses()
-            print(f"  {len(warehouses)} butiker")
-        except Exception as exc:
-            print(f"  Varning: kunde ej hämta butiker: {exc}")
-            warehouses = state.get("warehouses", {})
+            print("\nHämtar butikskatalog...")
+            try:
+                warehouses = client.warehouses()
+                print(f"  {len(warehouses)} butiker")
+            except Exception as exc:
+                print(f"  Varning: kunde ej hämta butiker: {exc}")
+                warehouses = store.load_meta().get("warehouses", {})
+            print(f"  {client.requests} API-anrop, {client.cache_hits} cacheträffar")
 
-        update_state(state, products, warehouses, stock_by_article, stock_by_brand)
-        save_state(state)
-        print(f"\nTillstånd sparat: {STATE_FILE}")
+        save_snapshot(store, products, warehouses, stock_by_article, stock_by_brand)
+        print(f"\nSnapshot sparad: {store.dir / (today + '.jsonl')}")
 
         print("\nVarumärkessammanfattning:")
         plejd_total = stock_by_brand.get(PLEJD_BRAND, 0)
@@ -504,7 +418,7 @@ def main() -> None:
     else:
         print(f"Databas: {db_rows_written} rader skrivna")
 
-    write_excel(state)
+    write_excel(store)
     print("\nKlart!")
 
 
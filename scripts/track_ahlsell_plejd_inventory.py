@@ -10,8 +10,10 @@ Flöde
   2. För produkter med fler än 1 variant, hämta samtliga artikelnummer
      via varianter-API (t.ex. TRM-01 har 6 färgvarianter)
   3. Hämta och cachelagra butikskatalog (~100 butiker)
-  4. Hämta lagersaldo per artikelnummer och butik
-  5. Spara daglig snapshot i JSON-tillståndsfil
+  4. Hämta lagersaldo per artikelnummer och butik (parallellt via
+     core.ahlsell, delad lagercache med LED-panel-spåraren)
+  5. Beräkna sales-out/sales-in mot gårdagens partition och spara dagens
+     snapshot som egen partition (core.snapshots), med deltan i headern
   6. Exportera till Excel:
        • "Totalt"   — tidsserie per artikel (rader) × datum (kolumner)
        • "Butiker"  — senaste dagets butikslager i wide-format
@@ -26,113 +28,61 @@ API:er (ingen autentisering krävs)
   Lager:     GET https://www.ahlsell.se/api/warehouses/stock
              ?variantNumber={articleNumber}
 
-Tillståndsfil  : data/ahlsell_plejd_state.json
+Snapshots      : data/snapshots/ahlsell_plejd/<datum>.jsonl
+                 header = {date, sales_out, sales_in, delta_prev},
+                 rader = {article, warehouses: {warehouseId: qty}, total};
+                 meta.json = senaste products + warehouses
+                 (data/ahlsell_plejd_state.json importeras en gång om
+                 lagret är tomt)
 Excel-utdata   : data/ahlsell_plejd_inventory.xlsx
+
+Deltan
+------
+Varje dags sales-out/sales-in per kategori cachas i dagens partition-header
+(delta_prev = datumet den jämfördes mot), så en vanlig körning räknar bara
+det nyaste datumparet. Saknas cachen för något datum (t.ex. direkt efter
+import av den gamla tillståndsfilen, eller om en partition lagts till i
+efterhand) räknas de datumen om med den vektoriserade backfillen.
+Ändras kategoriseringsreglerna körs:
+
+  python scripts/track_ahlsell_plejd_inventory.py --backfill
+
+som räknar om hela historiken (artikel×butik-matris i NumPy) på några
+sekunder utan att hämta något från Ahlsell.
 """
 
-import json
-import time
+import argparse
 from datetime import date
 from pathlib import Path
 from typing import Optional
 
-import requests
+import numpy as np
+import pandas as pd
 from openpyxl import Workbook, load_workbook
 from openpyxl.styles import Alignment, Font, PatternFill
 from openpyxl.utils import get_column_letter
 
-from core.db import safe_insert
+from core.ahlsell import AhlsellClient
+from core.db import safe_refresh, safe_transaction
 from core.cli import warn_if_gap
+from core.snapshots import SnapshotStore, open_store
 
 # ── Konfiguration ──────────────────────────────────────────────────────────────
-BASE_URL       = "https://www.ahlsell.se"
-SEARCH_URL     = f"{BASE_URL}/api/search"
-VARIANTS_URL   = f"{BASE_URL}/api/search/variants"
-WAREHOUSES_URL = f"{BASE_URL}/api/warehouses"
-STOCK_URL      = f"{BASE_URL}/api/warehouses/stock"
-
 SEARCH_PHRASE  = "plejd"
 BRAND_FILTER   = "Plejd"
-REQUEST_DELAY  = 0.3   # sekunder mellan anrop
 
-STATE_FILE = Path(__file__).parent.parent / "data" / "ahlsell_plejd_state.json"
+STATE_FILE = Path(__file__).parent.parent / "data" / "ahlsell_plejd_state.json"  # äldre format, endast import
+STORE_NAME = "ahlsell_plejd"
 EXCEL_FILE = Path(__file__).parent.parent / "data" / "ahlsell_plejd_inventory.xlsx"
 
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-    "Accept": "application/json",
-    "Accept-Language": "sv-SE,sv;q=0.9",
-}
-
-# ── API-anrop ──────────────────────────────────────────────────────────────────
+# ── Insamling ──────────────────────────────────────────────────────────────────
 
-def fetch_products() -> list[dict]:
+def fetch_products(client: AhlsellClient) -> list[dict]:
     """Hämtar alla Plejd-produkter från sök-API:et (filtrerar på brand-klientsidan)."""
-    resp = requests.get(
-        SEARCH_URL,
-        params={"searchPhrase": SEARCH_PHRASE, "pageSize": 100},
-        headers=HEADERS,
-        timeout=30,
-    )
-    resp.raise_for_status()
-    cards = resp.json().get("productCards", [])
+    cards = client.search(SEARCH_PHRASE, page_size=100).get("productCards", [])
     return [c for c in cards if c.get("brand", "").upper() == BRAND_FILTER.upper()]
 
 
-def fetch_all_variant_numbers(product_code: str, active_variant: str) -> list[str]:
-    """
-    Returnerar artikelnummer för samtliga varianter av en produkt
-    (t.ex. alla 6 färger av TRM-01).
-    """
-    resp = requests.get(
-        VARIANTS_URL,
-        params={"productCode": product_code, "activeVariantNumber": active_variant},
-        headers=HEADERS,
-        timeout=30,
-    )
-    resp.raise_for_status()
-    return [item["code"] for item in resp.json().get("items", []) if item.get("code")]
-
-
-def fetch_warehouses() -> dict[str, dict]:
-    """Hämtar butikskatalog och returnerar som {warehouseId: metadata}."""
-    resp = requests.get(WAREHOUSES_URL, headers=HEADERS, timeout=30)
-    resp.raise_for_status()
-    return {
-        str(w["id"]): {
-            "name":        w.get("name", ""),
-            "city":        w.get("city", ""),
-            "address":     w.get("address", ""),
-            "phone":       w.get("phoneNumber", ""),
-            "url_segment": w.get("urlSegment", ""),
-        }
-        for w in resp.json()
-    }
-
-
-def fetch_stock(variant_number: str) -> dict[str, float]:
-    """
-    Hämtar lagersaldo per butik för ett artikelnummer.
-    Returnerar {warehouseId: quantity} för alla butiker, inklusive de med
-    saldo 0 — se KNOWN_ISSUES.md #5 för varför en explicit nolla måste
-    lagras istället för att raden bara försvinner (en saknad rad tolkas som
-    en saknad observation av en framtida delta-vy, inte som "0 i lager").
-    """
-    resp = requests.get(
-        STOCK_URL,
-        params={"variantNumber": variant_number},
-        headers=HEADERS,
-        timeout=30,
-    )
-    resp.raise_for_status()
-    return {
-        str(entry["id"]): entry.get("stock", {}).get("quantity") or 0
-        for entry in resp.json()
-    }
-
-
-# ── Insamling ──────────────────────────────────────────────────────────────────
-
 def collect_snapshot() -> tuple[dict, dict, dict]:
     """
     Kör alla API-anrop och returnerar:
@@ -140,59 +90,30 @@ def collect_snapshot() -> tuple[dict, dict, dict]:
       warehouses : {warehouseId: {name, city, address, ...}}
       stock      : {articleNumber: {warehouseId: quantity}}
     """
-    # 1. Produktlista
-    print("Hämtar produkter...")
-    product_cards = fetch_products()
-    print(f"  {len(product_cards)} Plejd-produkter hittade")
-
-    # 2. Expandera till alla varianter
-    products: dict[str, dict] = {}
-    for card in product_cards:
-        product_code    = card["code"]
-        product_name    = card["name"]
-        brand           = card["brand"]
-        most_relevant   = str(card["variantNumber"])
-        num_variants    = card.get("numberOfVariants", 1)
-        page_url        = card.get("firstVariationPageUrl", "")
-
-        if num_variants > 1:
-            time.sleep(REQUEST_DELAY)
-            try:
-                variant_numbers = fetch_all_variant_numbers(product_code, most_relevant)
-            except Exception as exc:
-                print(f"  Varning: kunde ej hämta varianter för {product_name}: {exc}")
-                variant_numbers = [most_relevant]
-        else:
-            variant_numbers = [most_relevant]
-
-        for vn in variant_numbers:
-            products[str(vn)] = {
-                "product_name": product_name,
-                "brand":        brand,
-                "product_code": product_code,
-                "page_url":     page_url,
-            }
-
-    print(f"  Totalt {len(products)} artikelnummer (inkl. alla varianter)")
-
-    # 3. Butikskatalog
-    print("Hämtar butikskatalog...")
-    warehouses = fetch_warehouses()
-    print(f"  {len(warehouses)} butiker")
-
-    # 4. Lagersaldo per artikel
-    print("Hämtar lagersaldo...")
-    stock: dict[str, dict] = {}
-    for i, art_num in enumerate(products):
-        time.sleep(REQUEST_DELAY)
-        try:
-            stock[art_num] = fetch_stock(art_num)
-        except Exception as exc:
+    with AhlsellClient() as client:
+        # 1. Produktlista
+        print("Hämtar produkter...")
+        product_cards = fetch_products(client)
+        print(f"  {len(product_cards)} Plejd-produkter hittade")
+
+        # 2. Expandera till alla varianter
+        products = client.expand_variants(product_cards)
+        print(f"  Totalt {len(products)} artikelnummer (inkl. alla varianter)")
+
+        # 3. Butikskatalog (cachad, se core/ahlsell.py)
+        print("Hämtar butikskatalog...")
+        warehouses = client.warehouses()
+        print(f"  {len(warehouses)} butiker")
+
+        # 4. Lagersaldo per artikel (parallellt)
+        print("Hämtar lagersaldo...")
+        stock, errors = client.stock(products, progress_every=10)
+        for art_num, exc in errors.items():
             print(f"  Varning: lagerfel för {art_num}: {exc}")
             stock[art_num] = {}
-        if (i + 1) % 10 == 0:
-            print(f"  {i + 1}/{len(products)} artiklar klara...")
+        print(f"  {client.requests} API-anrop, {client.cache_hits} cacheträffar")
 
+    stock = {art: stock[art] for art in products}
     total_entries = sum(len(v) for v in stock.values())
     print(f"  Klart — {total_entries} butiksposter (inkl. nollsaldon)")
     return products, warehouses, stock
@@ -200,38 +121,48 @@ def collect_snapshot() -> tuple[dict, dict, dict]:
 
 # ── Tillstånd ──────────────────────────────────────────────────────────────────
 
-def load_state() -> dict:
-    if STATE_FILE.exists():
-        return json.loads(STATE_FILE.read_text(encoding="utf-8"))
-    return {"warehouses": {}, "products": {}, "snapshots": {}}
+def _legacy_to_partitions(state: dict):
+    """convert() för SnapshotStore.import_legacy: gammal tillståndsfil -> partitioner."""
+    meta = {
+        "warehouses":   state.get("warehouses", {}),
+        "products":     state.get("products", {}),
+        "last_updated": state.get("last_updated"),
+    }
+    partitions = [
+        (d, {}, [{"article": art, **entry} for art, entry in snap.items()])
+        for d, snap in sorted(state.get("snapshots", {}).items())
+    ]
+    return meta, partitions
 
 
-def save_state(state: dict) -> None:
-    STATE_FILE.write_text(
-        json.dumps(state, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
+def open_snapshot_store() -> SnapshotStore:
+    return open_store(STORE_NAME, STATE_FILE, _legacy_to_partitions)
 
 
-def update_state(
-    state: dict,
+def save_snapshot(
+    store: SnapshotStore,
     products: dict,
     warehouses: dict,
     stock: dict,
+    header: Optional[dict] = None,
 ) -> None:
     today = date.today().isoformat()
-    state["warehouses"]    = warehouses
-    state["products"]      = products
-    state["last_updated"]  = today
-
-    snapshot = {
-        art: {
-            "warehouses": wh_stock,
-            "total":      sum(wh_stock.values()),
-        }
+    store.put(today, [
+        {"article": art, "warehouses": wh_stock, "total": sum(wh_stock.values())}
         for art, wh_stock in stock.items()
+    ], header)
+    store.save_meta({"warehouses": warehouses, "products": products, "last_updated": today})
+
+
+def load_snapshots(store: SnapshotStore) -> dict:
+    """{date: {article: {warehouses, total}}} över hela historiken (för compute_deltas)."""
+    return {
+        snap.date: {
+            r["article"]: {"warehouses": r.get("warehouses", {}), "total": r.get("total", 0)}
+            for r in snap.rows
+        }
+        for snap in store.iter_range()
     }
-    state.setdefault("snapshots", {})[today] = snapshot
 
 
 # ── Kategorisering ─────────────────────────────────────────────────────────────
@@ -267,9 +198,10 @@ def categorize(article: str, product_name: str) -> str:
 
 def write_snapshot_to_db(products: dict, warehouses: dict, stock: dict, snapshot_date: str) -> Optional[int]:
     """
-    Best-effort: write a snapshot to Postgres via core.db.safe_insert.
-    Must never raise. Returns total rows inserted across the three tables,
-    or None if any of the three writes failed (see write_snapshot_to_db.last_error).
+    Best-effort: write a snapshot to Postgres in one transaction via
+    core.db.safe_transaction. Must never raise. Returns total rows inserted
+    across the three tables, or None if the write failed and was rolled back
+    (see write_snapshot_to_db.last_error).
     """
     article_rows = [
         (art, meta.get("product_name"), meta.get("product_code"), meta.get("page_url"),
@@ -286,30 +218,33 @@ def write_snapshot_to_db(products: dict, warehouses: dict, stock: dict, snapshot
         for wid, qty in wh_stock.items()
     ]
 
-    n_articles, err_articles = safe_insert(
-        table="ahlsell_article",
-        columns=["article", "product_name", "product_code", "page_url", "category"],
-        rows=article_rows,
-        conflict_columns=["article"],
-    )
-    n_warehouses, err_warehouses = safe_insert(
-        table="ahlsell_warehouse",
-        columns=["warehouse_id", "name", "city", "address"],
-        rows=warehouse_rows,
-        conflict_columns=["warehouse_id"],
-    )
-    n_stock, err_stock = safe_insert(
-        table="ahlsell_stock_snapshot",
-        columns=["snapshot_date", "article", "warehouse_id", "quantity"],
-        rows=stock_rows,
-        conflict_columns=["snapshot_date", "article", "warehouse_id"],
-    )
-
-    error = err_articles or err_warehouses or err_stock
+    def write(tx) -> None:
+        tx.insert(
+            table="ahlsell_article",
+            columns=["article", "product_name", "product_code", "page_url", "category"],
+            rows=article_rows,
+            conflict_columns=["article"],
+        )
+        tx.insert(
+            table="ahlsell_warehouse",
+            columns=["warehouse_id", "name", "city", "address"],
+            rows=warehouse_rows,
+            conflict_columns=["warehouse_id"],
+        )
+        tx.insert(
+            table="ahlsell_stock_snapshot",
+            columns=["snapshot_date", "article", "warehouse_id", "quantity"],
+            rows=stock_rows,
+            conflict_columns=["snapshot_date", "article", "warehouse_id"],
+        )
+
+    # En transaktion för alla tre tabeller: antingen hela snapshotet eller inget.
+    n_rows, error = safe_transaction(write)
     write_snapshot_to_db.last_error = error
     if error is not None:
         return None
-    return n_articles + n_warehouses + n_stock
+    safe_refresh("refresh_ahlsell_plejd_sales_daily")
+    return n_rows
 
 
 write_snapshot_to_db.last_error = None
@@ -317,17 +252,47 @@ write_snapshot_to_db.last_error = None
 
 # ── Deltaberäkning ─────────────────────────────────────────────────────────────
 
+def compute_day_delta(
+    snap_prev: dict,
+    snap_curr: dict,
+    products: dict,
+) -> tuple[dict[str, float], dict[str, float]]:
+    """
+    Beräknar sales-out/sales-in per kategori för ETT datumpar.
+
+    Lagersaldo jämförs per butik och artikel separat. Lagerminsk­ningar och
+    lagerökningar hålls isär så att t.ex. -5 i Göteborg och +5 i Stockholm
+    INTE kvittas mot varandra – båda registreras i sina respektive sheet.
+    Snapshots har formen {article: {"warehouses": {wid: qty}, ...}}.
+    """
+    out_by_cat: dict[str, float] = {c: 0.0 for c in CATEGORIES}
+    in_by_cat:  dict[str, float] = {c: 0.0 for c in CATEGORIES}
+
+    for art in set(snap_prev) | set(snap_curr):
+        meta     = products.get(art, {})
+        cat      = categorize(art, meta.get("product_name", ""))
+        prev_wh  = snap_prev.get(art, {}).get("warehouses", {})
+        curr_wh  = snap_curr.get(art, {}).get("warehouses", {})
+
+        for wid in set(prev_wh) | set(curr_wh):
+            delta = curr_wh.get(wid, 0.0) - prev_wh.get(wid, 0.0)
+            if delta < 0:
+                out_by_cat[cat] += abs(delta)   # lagerminskning = försäljning till kund
+            elif delta > 0:
+                in_by_cat[cat]  += delta        # lagerökning = inköp från Plejd
+
+    return out_by_cat, in_by_cat
+
+
 def compute_deltas(
     snapshots: dict,
     products: dict,
 ) -> tuple[dict, dict]:
     """
-    Beräknar dagliga deltan per artikel per butik och grupperar i kategorier.
-
-    Logik: för varje konsekutivt datumpar jämförs lagersaldo per butik
-    och artikel separat. Lagerminsk­ningar och lagerökningar hålls isär
-    så att t.ex. -5 i Göteborg och +5 i Stockholm INTE kvittas mot
-    varandra – båda registreras i sina respektive sheet.
+    Referensimplementation över hela historiken: compute_day_delta för varje
+    konsekutivt datumpar i {date: snapshot}. Används inte i den dagliga
+    körningen (se delta_header / backfill_deltas), men är den definition som
+    vyn ahlsell_plejd_sales_v och backfillen ska stämma mot.
 
     Returnerar:
       sales_out : {date: {kategori: enheter}}  – kunder köper från Ahlsell
@@ -337,32 +302,117 @@ def compute_deltas(
     sales_out: dict[str, dict[str, float]] = {}
     sales_in:  dict[str, dict[str, float]] = {}
 
-    for i in range(1, len(sorted_dates)):
-        d_prev = sorted_dates[i - 1]
-        d_curr = sorted_dates[i]
+    for d_prev, d_curr in zip(sorted_dates, sorted_dates[1:]):
+        sales_out[d_curr], sales_in[d_curr] = compute_day_delta(
+            snapshots[d_prev], snapshots[d_curr], products,
+        )
 
-        snap_prev = snapshots[d_prev]
-        snap_curr = snapshots[d_curr]
+    return sales_out, sales_in
 
-        out_by_cat: dict[str, float] = {c: 0.0 for c in CATEGORIES}
-        in_by_cat:  dict[str, float] = {c: 0.0 for c in CATEGORIES}
 
-        for art in set(snap_prev) | set(snap_curr):
-            meta     = products.get(art, {})
-            cat      = categorize(art, meta.get("product_name", ""))
-            prev_wh  = snap_prev.get(art, {}).get("warehouses", {})
-            curr_wh  = snap_curr.get(art, {}).get("warehouses", {})
+def _rows_to_snapshot(rows: list[dict]) -> dict:
+    return {r["article"]: {"warehouses": r.get("warehouses", {})} for r in rows}
 
-            for wid in set(prev_wh) | set(curr_wh):
-                delta = curr_wh.get(wid, 0.0) - prev_wh.get(wid, 0.0)
-                if delta < 0:
-                    out_by_cat[cat] += abs(delta)   # lagerminskning = försäljning till kund
-                elif delta > 0:
-                    in_by_cat[cat]  += delta        # lagerökning = inköp från Plejd
 
-        sales_out[d_curr] = out_by_cat
-        sales_in[d_curr]  = in_by_cat
+def delta_header(prev_snap, stock: dict, products: dict) -> dict:
+    """
+    Header för dagens partition: dagens delta mot föregående partition
+    (prev_snap, en core.snapshots.Snapshot eller None vid första körningen).
+    """
+    if prev_snap is None:
+        return {"delta_prev": None}
+    curr = {art: {"warehouses": wh} for art, wh in stock.items()}
+    sales_out, sales_in = compute_day_delta(_rows_to_snapshot(prev_snap.rows), curr, products)
+    return {"sales_out": sales_out, "sales_in": sales_in, "delta_prev": prev_snap.date}
 
+
+def stale_delta_dates(store: SnapshotStore) -> list[str]:
+    """
+    Datum vars cachade delta saknas eller räknats mot fel föregående datum.
+    Läser bara partitionernas header-rader.
+    """
+    stale: list[str] = []
+    prev_date: Optional[str] = None
+    for snap in store.iter_range(headers_only=True):
+        h = snap.header
+        if "delta_prev" not in h or h["delta_prev"] != prev_date:
+            stale.append(snap.date)
+        prev_date = snap.date
+    return stale
+
+
+def backfill_deltas(
+    store: SnapshotStore,
+    products: dict,
+    only_dates: Optional[list[str]] = None,
+) -> int:
+    """
+    Vektoriserad omräkning av sales-out/sales-in för hela historiken.
+
+    Bygger en matris datum × (artikel, butik) med saknade värden = 0 (samma
+    semantik som .get(wid, 0.0) i compute_day_delta), tar np.diff längs
+    datumaxeln och summerar negativa/positiva delar per kategori via en
+    one-hot-matris (kolumn -> kategori). categorize() anropas en gång per
+    artikel i stället för en gång per artikel och datumpar.
+
+    only_dates: skriv bara om headern för dessa datum (t.ex. stale_delta_dates);
+    None = alla. Returnerar antalet partitioner vars header skrevs om.
+    """
+    dates = store.dates()
+    if not dates:
+        return 0
+
+    records = [
+        (snap.date, r["article"], str(wid), float(qty or 0))
+        for snap in store.iter_range()
+        for r in snap.rows
+        for wid, qty in r.get("warehouses", {}).items()
+    ]
+    df = pd.DataFrame(records, columns=["date", "article", "warehouse_id", "quantity"])
+    matrix = (
+        df.pivot_table(index="date", columns=["article", "warehouse_id"],
+                       values="quantity", aggfunc="sum", fill_value=0.0)
+        .reindex(dates, fill_value=0.0)
+    )
+
+    articles = matrix.columns.get_level_values("article")
+    cat_of = {
+        art: CATEGORIES.index(categorize(art, products.get(art, {}).get("product_name", "")))
+        for art in articles.unique()
+    }
+    one_hot = np.zeros((matrix.shape[1], len(CATEGORIES)))
+    one_hot[np.arange(matrix.shape[1]), [cat_of[a] for a in articles]] = 1.0
+
+    diff = np.diff(matrix.to_numpy(dtype=float), axis=0)     # (datum-1) × kolumner
+    out_by_cat = np.clip(-diff, 0.0, None) @ one_hot          # (datum-1) × kategorier
+    in_by_cat  = np.clip(diff, 0.0, None) @ one_hot
+
+    wanted = set(dates if only_dates is None else only_dates)
+    written = 0
+    for i, d in enumerate(dates):
+        if d not in wanted:
+            continue
+        if i == 0:
+            store.update_header(d, delta_prev=None)
+        else:
+            store.update_header(
+                d,
+                sales_out={c: float(v) for c, v in zip(CATEGORIES, out_by_cat[i - 1])},
+                sales_in={c: float(v) for c, v in zip(CATEGORIES, in_by_cat[i - 1])},
+                delta_prev=dates[i - 1],
+            )
+        written += 1
+    return written
+
+
+def load_cached_deltas(store: SnapshotStore) -> tuple[dict, dict]:
+    """Läser cachade sales_out/sales_in ur partition-headrarna."""
+    sales_out: dict[str, dict[str, float]] = {}
+    sales_in:  dict[str, dict[str, float]] = {}
+    for snap in store.iter_range(headers_only=True):
+        if "sales_out" in snap.header:
+            sales_out[snap.date] = snap.header["sales_out"]
+            sales_in[snap.date]  = snap.header.get("sales_in", {})
     return sales_out, sales_in
 
 
@@ -416,15 +466,14 @@ def _write_delta_sheet(
     ws.freeze_panes = "B2"
 
 
-def write_excel(state: dict) -> None:
-    snapshots = state.get("snapshots", {})
-    products  = state.get("products", {})
+def write_excel(store: SnapshotStore) -> None:
+    products  = store.load_meta().get("products", {})
 
-    if not snapshots:
+    if store.is_empty():
         print("Ingen data att exportera.")
         return
 
-    sales_out, sales_in = compute_deltas(snapshots, products)
+    sales_out, sales_in = load_cached_deltas(store)
 
     wb = Workbook()
 
@@ -487,25 +536,37 @@ def write_excel(state: dict) -> None:
 # ── Main ───────────────────────────────────────────────────────────────────────
 
 def main() -> None:
+    ap = argparse.ArgumentParser(description="Spåra Plejds lager på Ahlsell.se per butik.")
+    ap.add_argument("--backfill", action="store_true",
+                    help="Räkna om sales-out/sales-in för hela historiken (t.ex. efter ändrade "
+                         "kategoriseringsregler)")
+    args = ap.parse_args()
+
     today = date.today().isoformat()
     print(f"=== Ahlsell Plejd lageruppföljning — {today} ===\n")
 
-    state = load_state()
+    store = open_snapshot_store()
 
-    prior_dates = [d for d in state.get("snapshots", {}) if d != today]
-    if prior_dates:
-        warn_if_gap(max(prior_dates), today, "sales-out/sales-in")
+    prev_date = store.previous_date(today)
+    if prev_date:
+        warn_if_gap(prev_date, today, "sales-out/sales-in")
 
-    if today in state.get("snapshots", {}):
+    if today in store:
         print(f"Snapshot för {today} finns redan.")
-        products = state.get("products", {})
-        warehouses = state.get("warehouses", {})
-        stock = {art: entry.get("warehouses", {}) for art, entry in state["snapshots"][today].items()}
+        meta = store.load_meta()
+        products = meta.get("products", {})
+        warehouses = meta.get("warehouses", {})
+        stock = {r["article"]: r.get("warehouses", {}) for r in store.iter_rows(today)}
     else:
         products, warehouses, stock = collect_snapshot()
-        update_state(state, products, warehouses, stock)
-        save_state(state)
-        print(f"\nTillstånd sparat: {STATE_FILE}")
+        header = delta_header(store.previous(today), stock, products)
+        save_snapshot(store, products, warehouses, stock, header)
+        print(f"\nSnapshot sparad: {store.dir / (today + '.jsonl')}")
+
+    stale = None if args.backfill else stale_delta_dates(store)
+    if stale is None or stale:
+        n = backfill_deltas(store, products, stale)
+        print(f"Deltan omräknade (vektoriserat) för {n} datum")
 
     db_rows_written = write_snapshot_to_db(products, warehouses, stock, today)
     if db_rows_written is None:
@@ -513,7 +574,7 @@ def main() -> None:
     else:
         print(f"Databas: {db_rows_written} rader skrivna")
 
-    write_excel(state)
+    write_excel(store)
     print("\nKlart!")
 
 
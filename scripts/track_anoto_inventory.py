@@ -4,7 +4,7 @@ track_anoto_inventory.py
 
 Tracks inq.shop (Anoto/Inq) AND shop.neosmartpen.com (Neo Smart Pen)
 per-variant inventory and estimates daily sales via stock deltas.
-Results are written to state JSON files and a shared Excel workbook.
+Results are written to per-day snapshot partitions and a shared Excel workbook.
 
 ──────────────────────────────────────────────────────────────────────────────
 Anoto / inq.shop — inventory data
@@ -46,9 +46,14 @@ Sales estimation methodology (applies to both stores)
 - Day 1 has no prior snapshot → all deltas are zero (baseline only).
 - est_revenue = est_sold_units × variant_price
 
-State files :
-  data/anoto_inventory_state.json
-  data/neo_inventory_state.json
+Snapshots (core.snapshots, one JSONL partition per day):
+  data/snapshots/anoto_inventory/<date>.jsonl
+  data/snapshots/neo_inventory/<date>.jsonl
+  header = {date, timestamp, summary}, rows = detail_rows;
+  meta.json holds the merged product_catalog.
+Each run reads only the previous day's partition and writes today's. The old
+whole-history state files (data/anoto_inventory_state.json,
+data/neo_inventory_state.json) are imported once if the store is empty.
 Excel output: data/anoto_inventory.xlsx  (all sheets for both stores)
 """
 
@@ -60,12 +65,11 @@ from pathlib import Path
 from typing import Optional
 
 import requests
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import Alignment, Font, PatternFill
-from openpyxl.utils import get_column_letter
 
-from core.db import safe_insert
+from core.db import safe_insert, safe_refresh
 from core.cli import warn_if_gap
+from core.report import ReportWriter
+from core.snapshots import Snapshot, SnapshotStore, open_store
 
 # ── Configuration — Anoto / inq.shop ──────────────────────────────────────────
 SHOP_BASE_URL   = "https://inq.shop"
@@ -75,7 +79,8 @@ SHOP_BASE_URL   = "https://inq.shop"
 FORCE_CURRENCY  = "USD"
 
 SCRIPT_DIR      = Path(__file__).resolve().parent
-STATE_FILE      = (SCRIPT_DIR / ".." / "data" / "anoto_inventory_state.json").resolve()
+STATE_FILE      = (SCRIPT_DIR / ".." / "data" / "anoto_inventory_state.json").resolve()  # legacy, import only
+STORE_NAME      = "anoto_inventory"
 
 # Products whose ALL variants match this SKU string are skipped entirely.
 SKIP_SKU        = "ROUTEINS"
@@ -87,7 +92,8 @@ NEO_SHOP_BASE_URL   = "https://shop.neosmartpen.com"
 # Neo serves SEK prices to European IPs.  Leave empty to accept the server
 # default, or set to e.g. "USD" if you want to force a specific currency.
 NEO_FORCE_CURRENCY  = ""
-NEO_STATE_FILE      = (SCRIPT_DIR / ".." / "data" / "neo_inventory_state.json").resolve()
+NEO_STATE_FILE      = (SCRIPT_DIR / ".." / "data" / "neo_inventory_state.json").resolve()  # legacy, import only
+NEO_STORE_NAME      = "neo_inventory"
 # Neo product titles / SKU prefixes to skip (e.g. gift-card, shipping).
 NEO_SKIP_TITLES     = []
 
@@ -114,42 +120,36 @@ _SECTION_RE = re.compile(
 )
 
 
-# ── State I/O — Anoto ─────────────────────────────────────────────────────────
+# ── Snapshot store I/O (both stores) ─────────────────────────────────────────
 
-def load_state() -> dict:
-    if STATE_FILE.exists():
-        return json.loads(STATE_FILE.read_text(encoding="utf-8-sig"))
-    return {
-        "daily_summary":   [],
-        "last_snapshot":   {},   # {variant_id_str: stock_int}
-        "product_catalog": {},   # {variant_id_str: {product_title, variant_title, sku, price, currency}}
-    }
+def _legacy_to_partitions(state: dict):
+    """convert() for SnapshotStore.import_legacy: old state JSON -> partitions."""
+    meta = {"product_catalog": state.get("product_catalog", {})}
+    partitions = [
+        (
+            entry["date"],
+            {"timestamp": entry.get("timestamp", ""), "summary": entry.get("summary", {})},
+            entry.get("detail_rows", []),
+        )
+        for entry in state.get("daily_summary", [])
+        if entry.get("date")
+    ]
+    return meta, partitions
 
 
-def save_state(state: dict) -> None:
-    STATE_FILE.write_text(
-        json.dumps(state, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
+def open_anoto_store() -> SnapshotStore:
+    return open_store(STORE_NAME, STATE_FILE, _legacy_to_partitions)
 
 
-# ── State I/O — Neo Smart Pen ─────────────────────────────────────────────────
+def open_neo_store() -> SnapshotStore:
+    return open_store(NEO_STORE_NAME, NEO_STATE_FILE, _legacy_to_partitions)
 
-def load_neo_state() -> dict:
-    if NEO_STATE_FILE.exists():
-        return json.loads(NEO_STATE_FILE.read_text(encoding="utf-8-sig"))
-    return {
-        "daily_summary":   [],
-        "last_snapshot":   {},
-        "product_catalog": {},
-    }
 
-
-def save_neo_state(state: dict) -> None:
-    NEO_STATE_FILE.write_text(
-        json.dumps(state, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
+def snapshot_inventory(snap: Optional[Snapshot]) -> dict[str, int]:
+    """{variant_id: stock} as of a stored day (its detail rows' stock_curr)."""
+    if snap is None:
+        return {}
+    return {r["variant_id"]: r["stock_curr"] for r in snap.rows if r.get("stock_curr") != ""}
 
 
 # ── Product discovery — Anoto ─────────────────────────────────────────────────
@@ -536,6 +536,8 @@ def write_snapshot_to_db(store: str, snapshot_date: str, detail_rows: list[dict]
         conflict_columns=["snapshot_date", "store", "variant_id"],
     )
     write_snapshot_to_db.last_error = error
+    if error is None:
+        safe_refresh("refresh_anoto_daily_sales")
     return result
 
 
@@ -544,81 +546,54 @@ write_snapshot_to_db.last_error = None
 
 # ── Excel writer ───────────────────────────────────────────────────────────────
 
-_HDR_FILL = PatternFill("solid", fgColor="1F497D")
-_HDR_FONT = Font(bold=True, color="FFFFFF")
-
-
-def _write_headers(ws, headers: list[str]) -> None:
-    for col, h in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=h)
-        cell.fill = _HDR_FILL
-        cell.font = _HDR_FONT
-        cell.alignment = Alignment(horizontal="center")
-
-
-def _autofit(ws) -> None:
-    for col in ws.columns:
-        max_len = max(
-            (len(str(c.value)) for c in col if c.value is not None), default=8
-        )
-        ws.column_dimensions[get_column_letter(col[0].column)].width = min(
-            max_len + 4, 55
-        )
-
+def write_excel(anoto_store: SnapshotStore, neo_store: SnapshotStore) -> None:
+    """
+    Rebuild the workbook from both snapshot stores, streamed (core.report).
+    Each store's sheets are keyed on its partition count and latest run, so
+    when only one store got a new snapshot the other store's sheets are
+    copied from the previous file instead of regenerated.
+    """
+    report = ReportWriter(XLSX_PATH)
 
-def write_excel(anoto_state: dict, neo_state: dict) -> None:
-    if XLSX_PATH.exists():
-        wb = load_workbook(XLSX_PATH)
-    else:
-        wb = Workbook()
-        for name in list(wb.sheetnames):
-            del wb[name]
-
-    # ─────────────────────────────────────────────────────────────────────────
-    # Helpers to (re-)create sheets for a given state dict and sheet-name prefix
-    # ─────────────────────────────────────────────────────────────────────────
-    def _curr_label(state: dict, fallback: str = "USD") -> str:
-        cat = state.get("product_catalog") or {}
+    def _curr_label(store: SnapshotStore, fallback: str = "USD") -> str:
+        cat = store.load_meta().get("product_catalog") or {}
         if cat:
             return next(iter(cat.values()), {}).get("currency", fallback)
         return fallback
 
-    def _write_store_sheets(
-        state: dict,
-        prefix: str,
-        sheet_index_start: int,
-        curr_label: str,
-    ) -> None:
-        """Write the four standard sheets for one store."""
-        all_entries = state.get("daily_summary", [])
+    def _add_store_sheets(store: SnapshotStore, prefix: str, curr_label: str) -> None:
+        """Register the four standard sheets for one store."""
+        latest_date = store.latest_date()
+        latest_hdr  = store.read_header(latest_date) if latest_date else None
+        key = (len(store.dates()), latest_date, (latest_hdr or {}).get("timestamp"), curr_label)
+
+        # Day headers are one line per partition (cheap, and the By Product
+        # columns depend on them); detail rows are only streamed, and only
+        # for sheets that are actually regenerated.
+        all_entries = [
+            {"date": snap.date, "summary": snap.header.get("summary", {})}
+            for snap in store.iter_range(headers_only=True)
+        ]
 
         # Sheet: Daily Summary
-        ds = f"{prefix}Daily Summary"
-        if ds in wb.sheetnames:
-            del wb[ds]
-        ws_ds = wb.create_sheet(ds, sheet_index_start)
-        _write_headers(ws_ds, [
+        def _summary_rows():
+            for entry in all_entries:
+                s = entry.get("summary", {})
+                yield [
+                    entry.get("date", ""),
+                    s.get("est_sold_units", 0),
+                    s.get("est_revenue", 0.0),
+                    s.get("restocks", 0),
+                ]
+
+        report.sheet(f"{prefix}Daily Summary", [
             "Date",
             "Est. Sold (units)",
             f"Est. Revenue ({curr_label})",
             "Restocks",
-        ])
-        for entry in all_entries:
-            s = entry.get("summary", {})
-            ws_ds.append([
-                entry.get("date", ""),
-                s.get("est_sold_units", 0),
-                s.get("est_revenue", 0.0),
-                s.get("restocks", 0),
-            ])
-        _autofit(ws_ds)
+        ], _summary_rows, key=key)
 
         # Sheet: By Product
-        pn = f"{prefix}By Product"
-        if pn in wb.sheetnames:
-            del wb[pn]
-        ws_p = wb.create_sheet(pn, sheet_index_start + 1)
-
         all_prods: set[str] = set()
         for entry in all_entries:
             all_prods.update(entry.get("summary", {}).get("by_product", {}).keys())
@@ -634,30 +609,25 @@ def write_excel(anoto_state: dict, neo_state: dict) -> None:
             [f"{p} (Units)" for p in sorted_prods]
             + [f"{p} (Rev {curr_label})" for p in sorted_prods]
         )
-        _write_headers(ws_p, ["Date"] + prod_cols)
-        for entry in all_entries:
-            by_p = entry.get("summary", {}).get("by_product", {})
-            row: list = [entry.get("date", "")]
-            for p in sorted_prods:
-                row.append(by_p.get(p, {}).get("est_sold_units", 0))
-            for p in sorted_prods:
-                row.append(by_p.get(p, {}).get("est_rev", 0.0))
-            ws_p.append(row)
-        _autofit(ws_p)
+
+        def _product_rows():
+            for entry in all_entries:
+                by_p = entry.get("summary", {}).get("by_product", {})
+                row: list = [entry.get("date", "")]
+                for p in sorted_prods:
+                    row.append(by_p.get(p, {}).get("est_sold_units", 0))
+                for p in sorted_prods:
+                    row.append(by_p.get(p, {}).get("est_rev", 0.0))
+                yield row
+
+        report.sheet(f"{prefix}By Product", ["Date"] + prod_cols, _product_rows, key=key)
 
         # Sheet: Latest Snapshot
-        snap = f"{prefix}Latest Snapshot"
-        if snap in wb.sheetnames:
-            del wb[snap]
-        ws_s = wb.create_sheet(snap, sheet_index_start + 2)
-        _write_headers(ws_s, [
-            "Product", "Variant", "SKU",
-            f"Price ({curr_label})", "Stock Today", "Stock Yesterday",
-            "Delta", "Est. Sold", f"Est. Revenue ({curr_label})",
-        ])
-        if all_entries:
-            for row_d in all_entries[-1].get("detail_rows", []):
-                ws_s.append([
+        def _latest_rows():
+            if latest_date is None:
+                return
+            for row_d in store.iter_rows(latest_date):
+                yield [
                     row_d.get("product_title", ""),
                     row_d.get("variant_title", ""),
                     row_d.get("sku", ""),
@@ -667,52 +637,51 @@ def write_excel(anoto_state: dict, neo_state: dict) -> None:
                     row_d.get("delta", ""),
                     row_d.get("est_sold", 0),
                     row_d.get("est_rev", 0.0),
-                ])
-        _autofit(ws_s)
-
-        # Sheet: History Detail
-        hist = f"{prefix}History Detail"
-        if hist in wb.sheetnames:
-            del wb[hist]
-        ws_h = wb.create_sheet(hist, sheet_index_start + 3)
-        _write_headers(ws_h, [
+                ]
+
+        report.sheet(f"{prefix}Latest Snapshot", [
+            "Product", "Variant", "SKU",
+            f"Price ({curr_label})", "Stock Today", "Stock Yesterday",
+            "Delta", "Est. Sold", f"Est. Revenue ({curr_label})",
+        ], _latest_rows, key=key)
+
+        # Sheet: History Detail (one partition in memory at a time)
+        def _history_rows():
+            for d in store.dates():
+                for row_d in store.iter_rows(d):
+                    yield [
+                        d,
+                        row_d.get("product_title", ""),
+                        row_d.get("variant_title", ""),
+                        row_d.get("sku", ""),
+                        row_d.get("price", 0.0),
+                        row_d.get("stock_curr", ""),
+                        row_d.get("delta", ""),
+                        row_d.get("est_sold", 0),
+                        row_d.get("est_rev", 0.0),
+                    ]
+
+        report.sheet(f"{prefix}History Detail", [
             "Date", "Product", "Variant", "SKU",
             f"Price ({curr_label})", "Stock", "Delta",
             "Est. Sold", f"Est. Revenue ({curr_label})",
-        ])
-        for entry in all_entries:
-            d = entry.get("date", "")
-            for row_d in entry.get("detail_rows", []):
-                ws_h.append([
-                    d,
-                    row_d.get("product_title", ""),
-                    row_d.get("variant_title", ""),
-                    row_d.get("sku", ""),
-                    row_d.get("price", 0.0),
-                    row_d.get("stock_curr", ""),
-                    row_d.get("delta", ""),
-                    row_d.get("est_sold", 0),
-                    row_d.get("est_rev", 0.0),
-                ])
-        _autofit(ws_h)
+        ], _history_rows, key=key)
 
-    # ── Anoto sheets (indices 0-3) ────────────────────────────────────────────
-    _write_store_sheets(
-        anoto_state,
+    # ── Anoto sheets (first four) ─────────────────────────────────────────────
+    _add_store_sheets(
+        anoto_store,
         prefix="",                  # no prefix keeps original sheet names
-        sheet_index_start=0,
-        curr_label=_curr_label(anoto_state, "USD"),
+        curr_label=_curr_label(anoto_store, "USD"),
     )
 
-    # ── Neo Smart Pen sheets (indices 4-7) ────────────────────────────────────
-    _write_store_sheets(
-        neo_state,
+    # ── Neo Smart Pen sheets (last four) ──────────────────────────────────────
+    _add_store_sheets(
+        neo_store,
         prefix="Neo - ",
-        sheet_index_start=4,
-        curr_label=_curr_label(neo_state, "SEK"),
+        curr_label=_curr_label(neo_store, "SEK"),
     )
 
-    wb.save(XLSX_PATH)
+    report.save()
     print(f"  Saved -> {XLSX_PATH}")
 
 
@@ -729,19 +698,19 @@ def main() -> None:
     # PART 1 — Anoto / inq.shop
     # ══════════════════════════════════════════════════════════════════════════
     print("\n\u2500\u2500 Anoto / inq.shop \u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500")
-    anoto_state = load_state()
+    anoto_store = open_anoto_store()
     anoto_skip  = False
     anoto_db_rows_written = None
     anoto_db_error = None
 
-    if anoto_state.get("daily_summary") and anoto_state["daily_summary"][-1]["date"] == today:
+    if today in anoto_store:
         print(
-            f"  Already ran today ({today}). Delete the last entry in daily_summary "
-            f"from {STATE_FILE.name} to re-run."
+            f"  Already ran today ({today}). Delete {today}.jsonl "
+            f"from {anoto_store.dir} to re-run."
         )
         anoto_skip = True
         anoto_db_rows_written = write_snapshot_to_db(
-            "anoto", today, anoto_state["daily_summary"][-1].get("detail_rows", [])
+            "anoto", today, list(anoto_store.iter_rows(today))
         )
         anoto_db_error = write_snapshot_to_db.last_error
     else:
@@ -764,10 +733,11 @@ def main() -> None:
                 anoto_skip = True
             else:
                 print("\nComputing deltas ...")
-                last_snapshot = anoto_state.get("last_snapshot") or {}
+                prev_snap     = anoto_store.previous(today)
+                last_snapshot = snapshot_inventory(prev_snap)
                 is_first_run  = not last_snapshot
-                if anoto_state.get("daily_summary"):
-                    warn_if_gap(anoto_state["daily_summary"][-1]["date"], today, "sold/restock")
+                if prev_snap is not None:
+                    warn_if_gap(prev_snap.date, today, "sold/restock")
                 summary, detail_rows = compute_summary(curr_inv, last_snapshot, catalog)
 
                 if is_first_run:
@@ -789,22 +759,11 @@ def main() -> None:
                         f"  restocks={pdata['restocks']}"
                     )
 
-                if not isinstance(anoto_state.get("daily_summary"), list):
-                    anoto_state["daily_summary"] = []
-
-                anoto_state["daily_summary"].append({
-                    "date":        today,
-                    "timestamp":   now,
-                    "summary":     summary,
-                    "detail_rows": detail_rows,
-                })
-                anoto_state["last_snapshot"]   = curr_inv
-                anoto_state["product_catalog"] = {
-                    **anoto_state.get("product_catalog", {}), **catalog
-                }
-
-                save_state(anoto_state)
-                print(f"\n  State saved -> {STATE_FILE.name}")
+                anoto_store.put(today, detail_rows, {"timestamp": now, "summary": summary})
+                meta = anoto_store.load_meta()
+                meta["product_catalog"] = {**meta.get("product_catalog", {}), **catalog}
+                anoto_store.save_meta(meta)
+                print(f"\n  Snapshot saved -> {anoto_store.dir.name}/{today}.jsonl")
 
                 anoto_db_rows_written = write_snapshot_to_db("anoto", today, detail_rows)
                 anoto_db_error = write_snapshot_to_db.last_error
@@ -813,19 +772,19 @@ def main() -> None:
     # PART 2 — Neo Smart Pen
     # ══════════════════════════════════════════════════════════════════════════
     print("\n\u2500\u2500 Neo Smart Pen \u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500\u2500")
-    neo_state = load_neo_state()
+    neo_store = open_neo_store()
     neo_skip  = False
     neo_db_rows_written = None
     neo_db_error = None
 
-    if neo_state.get("daily_summary") and neo_state["daily_summary"][-1]["date"] == today:
+    if today in neo_store:
         print(
-            f"  Already ran today ({today}). Delete the last entry in daily_summary "
-            f"from {NEO_STATE_FILE.name} to re-run."
+            f"  Already ran today ({today}). Delete {today}.jsonl "
+            f"from {neo_store.dir} to re-run."
         )
         neo_skip = True
         neo_db_rows_written = write_snapshot_to_db(
-            "neo", today, neo_state["daily_summary"][-1].get("detail_rows", [])
+            "neo", today, list(neo_store.iter_rows(today))
         )
         neo_db_error = write_snapshot_to_db.last_error
     else:
@@ -849,10 +808,11 @@ def main() -> None:
                 neo_skip = True
             else:
                 print("\nComputing Neo deltas ...")
-                neo_last_snapshot = neo_state.get("last_snapshot") or {}
+                neo_prev_snap     = neo_store.previous(today)
+                neo_last_snapshot = snapshot_inventory(neo_prev_snap)
                 neo_is_first_run  = not neo_last_snapshot
-                if neo_state.get("daily_summary"):
-                    warn_if_gap(neo_state["daily_summary"][-1]["date"], today, "sold/restock")
+                if neo_prev_snap is not None:
+                    warn_if_gap(neo_prev_snap.date, today, "sold/restock")
                 neo_summary, neo_detail_rows = compute_summary(
                     neo_curr_inv, neo_last_snapshot, neo_catalog
                 )
@@ -876,22 +836,11 @@ def main() -> None:
                         f"  restocks={pdata['restocks']}"
                     )
 
-                if not isinstance(neo_state.get("daily_summary"), list):
-                    neo_state["daily_summary"] = []
-
-                neo_state["daily_summary"].append({
-                    "date":        today,
-                    "timestamp":   now,
-                    "summary":     neo_summary,
-                    "detail_rows": neo_detail_rows,
-                })
-                neo_state["last_snapshot"]   = neo_curr_inv
-                neo_state["product_catalog"] = {
-                    **neo_state.get("product_catalog", {}), **neo_catalog
-                }
-
-                save_neo_state(neo_state)
-                print(f"\n  State saved -> {NEO_STATE_FILE.name}")
+                neo_store.put(today, neo_detail_rows, {"timestamp": now, "summary": neo_summary})
+                neo_meta = neo_store.load_meta()
+                neo_meta["product_catalog"] = {**neo_meta.get("product_catalog", {}), **neo_catalog}
+                neo_store.save_meta(neo_meta)
+                print(f"\n  Snapshot saved -> {neo_store.dir.name}/{today}.jsonl")
 
                 neo_db_rows_written = write_snapshot_to_db("neo", today, neo_detail_rows)
                 neo_db_error = write_snapshot_to_db.last_error
@@ -901,7 +850,7 @@ def main() -> None:
     # ══════════════════════════════════════════════════════════════════════════
     if not (anoto_skip and neo_skip):
         print("\nWriting combined Excel ...")
-        write_excel(anoto_state, neo_state)
+        write_excel(anoto_store, neo_store)
     else:
         print("\nBoth stores already ran today — skipping Excel update.")
 
@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
 
+import asyncio
 import os
 import re
-import time
 import math
 import statistics
 from datetime import date
@@ -14,12 +14,9 @@ from bs4 import BeautifulSoup
 # Excel (NYTT)
 from openpyxl import Workbook, load_workbook
 
-# ──────────────────────────────────────────────────────────────────────────────
-# Selenium setup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+from playwright.async_api import TimeoutError as PWTimeoutError
+
+from core.browser import BlockRules, BrowserPool, goto_dom_ready, scroll_until_settled
 
 # ──────────────────────────────────────────────────────────────────────────────
 # 1) URLs & selectors
@@ -51,6 +48,11 @@ MEDIAMARKT_URLS = [
 ]
 NEWEGG_URL = "https://www.newegg.com/Fractal-Design/BrandStore/ID-14581"
 
+SELECTOR_WEBHALLEN  = "div.price-value._right span"
+SELECTOR_MEDIAMARKT = 'div[data-test*="cofr-price"] span'
+SELECTOR_NEWEGG     = "div.goods-price-current span.goods-price-value"
+SELECTOR_NEWEGG_ALT = "li.item-cell .price-current"
+
 # Spara XLSX under ../data relativt till detta script (ditt repo har /data bredvid /scripts)
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 XLSX_PATH = os.path.normpath(os.path.join(SCRIPT_DIR, "..", "data", "combined_prices.xlsx"))
@@ -62,31 +64,49 @@ HEADERS = {
     )
 }
 
+# Webbläsarkontexter: en per butik, så varje sajt får egna cookies och sin
+# egen gräns för parallella sidor. Vi läser bara pristexter, så bilder,
+# typsnitt, media och annons-/analysvärdar blockeras.
+RETAILERS = {
+    "Inet":       "inet.se",
+    "Amazon":     "amazon.com",
+    "Webhallen":  "webhallen.com",
+    "MediaMarkt": "mediamarkt.de",
+    "Newegg":     "newegg.com",
+}
+BLOCK = BlockRules()
+CONTEXT_OPTIONS = dict(
+    user_agent=HEADERS["User-Agent"],
+    locale="sv-SE",
+    extra_http_headers={"Accept-Language": "sv-SE,sv;q=0.9,en-US;q=0.8,en;q=0.7,de;q=0.6"},
+    viewport={"width": 1920, "height": 1080},
+)
+PAGE_TIMEOUT_MS = 30_000
+
 # ──────────────────────────────────────────────────────────────────────────────
 # 2) Helpers
 
-def create_driver():
-    opts = Options()
-    opts.add_argument("--headless=new")
-    opts.add_argument("--window-size=1920,1080")
-    opts.add_argument("--disable-gpu")
-    opts.add_argument("--no-sandbox")
-    opts.add_argument("--lang=sv-SE,sv;q=0.9,en-US;q=0.8,en;q=0.7,de;q=0.6")
-    opts.add_argument(
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/115.0.0.0 Safari/537.36"
-    )
-    svc = Service(ChromeDriverManager().install())
-    return webdriver.Chrome(service=svc, options=opts)
-
-def fetch_prices_selenium(driver, url, css_selector, sleep_time=4, scroll_times=1) -> List[float]:
-    driver.get(url)
-    time.sleep(sleep_time)
-    for _ in range(scroll_times):
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(2)
-    soup = BeautifulSoup(driver.page_source, "html.parser")
+async def fetch_html(pool: BrowserPool, key: str, url: str, css_selector: str, scrolls: int = 1) -> str:
+    """
+    Laddar sidan i butikens kontext och väntar på prisselektorn i stället för
+    en fast paus; scrollar sedan tills inga fler priser lazy-laddas. Returnerar
+    sidans HTML ("" om sidan inte gick att ladda).
+    """
+    try:
+        async with pool.page(key) as page:
+            try:
+                await goto_dom_ready(page, url, css_selector, timeout_ms=PAGE_TIMEOUT_MS)
+            except PWTimeoutError:
+                print(f"[{key}] no prices within {PAGE_TIMEOUT_MS // 1000}s: {url}")
+                return await page.content()
+            await scroll_until_settled(page, css_selector, max_scrolls=scrolls)
+            return await page.content()
+    except Exception as e:
+        print(f"[{key}] {e}")
+        return ""
+
+def parse_prices(html: str, css_selector: str) -> List[float]:
+    soup = BeautifulSoup(html, "html.parser")
     prices: List[float] = []
     for tag in soup.select(css_selector):
         txt = tag.get_text(strip=True)
@@ -139,52 +159,45 @@ def avg_median(nums: List[float]) -> Tuple[Optional[float], Optional[float]]:
         return None, None
     return round(sum(vals) / len(vals), 2), round(statistics.median(vals), 2)
 
-def scroll_to_bottom(driver, times=2, pause=1.5):
-    for _ in range(times):
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(pause)
-
 # ──────────────────────────────────────────────────────────────────────────────
-# 3) Scrapers (oförändrat)
+# 3) Scrapers (samma selektorer och tolkning; alla sidor hämtas parallellt)
 
-def scrape_webhallen_selenium(driver) -> List[float]:
+async def scrape_webhallen(pool: BrowserPool) -> List[float]:
+    pages = await asyncio.gather(*(
+        fetch_html(pool, "Webhallen", url, SELECTOR_WEBHALLEN, scrolls=2) for url in WEBHALLEN_URLS
+    ))
     prices: List[float] = []
-    for url in WEBHALLEN_URLS:
-        driver.get(url)
-        time.sleep(3)
-        scroll_to_bottom(driver, times=2, pause=1.2)
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-        for span in soup.select("div.price-value._right span"):
+    for html in pages:
+        soup = BeautifulSoup(html, "html.parser")
+        for span in soup.select(SELECTOR_WEBHALLEN):
             p = to_number(span.get_text())
             if p:
                 prices.append(p)
     return prices
 
-def scrape_mediamarkt_selenium(driver) -> List[float]:
+async def scrape_mediamarkt(pool: BrowserPool) -> List[float]:
+    pages = await asyncio.gather(*(
+        fetch_html(pool, "MediaMarkt", url, SELECTOR_MEDIAMARKT, scrolls=2) for url in MEDIAMARKT_URLS
+    ))
     prices: List[float] = []
-    for url in MEDIAMARKT_URLS:
-        driver.get(url)
-        time.sleep(3)
-        scroll_to_bottom(driver, times=2, pause=1.0)
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-        for span in soup.select('div[data-test*="cofr-price"] span'):
+    for html in pages:
+        soup = BeautifulSoup(html, "html.parser")
+        for span in soup.select(SELECTOR_MEDIAMARKT):
             p = to_number(span.get_text(strip=True))
             if p:
                 prices.append(p)
     return prices
 
-def scrape_newegg_selenium(driver) -> List[float]:
-    driver.get(NEWEGG_URL)
-    time.sleep(3)
-    scroll_to_bottom(driver, times=3, pause=1.0)
-    soup = BeautifulSoup(driver.page_source, "html.parser")
+async def scrape_newegg(pool: BrowserPool) -> List[float]:
+    html = await fetch_html(pool, "Newegg", NEWEGG_URL, f"{SELECTOR_NEWEGG}, {SELECTOR_NEWEGG_ALT}", scrolls=3)
+    soup = BeautifulSoup(html, "html.parser")
     prices: List[float] = []
-    for node in soup.select("div.goods-price-current span.goods-price-value"):
+    for node in soup.select(SELECTOR_NEWEGG):
         p = to_number(node.get_text(strip=True))
         if p:
             prices.append(p)
     if not prices:
-        for card in soup.select("li.item-cell .price-current"):
+        for card in soup.select(SELECTOR_NEWEGG_ALT):
             p = to_number(card.get_text(strip=True))
             if p:
                 prices.append(p)
@@ -207,11 +220,11 @@ def scrape_awd_it_requests() -> List[float]:
         print(f"[AWD-IT] {e}")
     return prices
 
-def scrape_inet_selenium(driver) -> List[float]:
-    return fetch_prices_selenium(driver, URL_INET, SELECTOR_INET, sleep_time=4, scroll_times=1)
+async def scrape_inet(pool: BrowserPool) -> List[float]:
+    return parse_prices(await fetch_html(pool, "Inet", URL_INET, SELECTOR_INET, scrolls=1), SELECTOR_INET)
 
-def scrape_amazon_selenium(driver) -> List[float]:
-    return fetch_prices_selenium(driver, URL_AMAZON, SELECTOR_AMAZON, sleep_time=5, scroll_times=2)
+async def scrape_amazon(pool: BrowserPool) -> List[float]:
+    return parse_prices(await fetch_html(pool, "Amazon", URL_AMAZON, SELECTOR_AMAZON, scrolls=2), SELECTOR_AMAZON)
 
 # ──────────────────────────────────────────────────────────────────────────────
 # 4) Excel-hantering (ersätter CSV)
@@ -258,27 +271,32 @@ def append_row_xlsx(*, avg_inet, avg_amz, avg_webhallen, avg_awd, avg_mm, avg_ne
 # ──────────────────────────────────────────────────────────────────────────────
 # 5) Orchestrator
 
-def main():
+async def main():
     ensure_header_xlsx()
     print(f"Working directory: {os.getcwd()}")
     print(f"Excel will be saved to: {XLSX_PATH}")
 
-    driver = create_driver()
-    try:
-        inet_prices = scrape_inet_selenium(driver)
-        print(f"  • Inet: {len(inet_prices)} prices")
-        amz_prices = scrape_amazon_selenium(driver)
-        print(f"  • Amazon: {len(amz_prices)} prices")
-        webhallen_prices = scrape_webhallen_selenium(driver)
-        print(f"  • Webhallen: {len(webhallen_prices)} prices")
-        mm_prices = scrape_mediamarkt_selenium(driver)
-        print(f"  • MediaMarkt: {len(mm_prices)} prices")
-        newegg_prices = scrape_newegg_selenium(driver)
-        print(f"  • Newegg: {len(newegg_prices)} prices")
-    finally:
-        driver.quit()
-
-    awd_prices = scrape_awd_it_requests()
+    # Alla butiker och sidor parallellt (MediaMarkts fyra sidor samtidigt);
+    # AWD-IT renderas på servern och hämtas med vanlig HTTP i en tråd bredvid.
+    async with BrowserPool(per_domain_limit=len(MEDIAMARKT_URLS)) as pool:
+        for key, domain in RETAILERS.items():
+            pool.add_context(key, domain, block=BLOCK, **CONTEXT_OPTIONS)
+        (inet_prices, amz_prices, webhallen_prices,
+         mm_prices, newegg_prices, awd_prices) = await asyncio.gather(
+            scrape_inet(pool),
+            scrape_amazon(pool),
+            scrape_webhallen(pool),
+            scrape_mediamarkt(pool),
+            scrape_newegg(pool),
+            asyncio.to_thread(scrape_awd_it_requests),
+        )
+        pool.print_stats()
+
+    print(f"  • Inet: {len(inet_prices)} prices")
+    print(f"  • Amazon: {len(amz_prices)} prices")
+    print(f"  • Webhallen: {len(webhallen_prices)} prices")
+    print(f"  • MediaMarkt: {len(mm_prices)} prices")
+    print(f"  • Newegg: {len(newegg_prices)} prices")
     print(f"  • AWD-IT: {len(awd_prices)} prices")
 
     # Stats
@@ -297,4 +315,4 @@ def main():
     )
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -1,14 +1,15 @@
 # track_fractal_rankings_playwright.py
 from datetime import datetime
+import asyncio
 import re
-import time
 import random
 from pathlib import Path
-from playwright.sync_api import sync_playwright, TimeoutError as PWTimeoutError
+from playwright.async_api import TimeoutError as PWTimeoutError
 
 # NEW: Excel
 from openpyxl import Workbook, load_workbook
 
+from core.browser import BlockRules, BrowserPool, goto_dom_ready
 from core.db import safe_insert
 
 # Notera: Newegg ändrar ofta URL-strukturen. Om scriptet slutar fungera, kontrollera dessa.
@@ -45,6 +46,9 @@ CHAIR_PRODUCTS = {
     ],
 }
 
+# Vi läser bara titlar/länkar: blockera bilder, typsnitt, media och annons-/analysvärdar.
+BLOCK = BlockRules().with_hosts("2o7.net", "omtrdc.net", "sentry.io")
+
 SCRIPT_DIR = Path(__file__).resolve().parent
 XLSX_PATH = (SCRIPT_DIR / ".." / "data" / "fractal_rankings.xlsx").resolve()
 
@@ -54,30 +58,30 @@ def canon(s: str) -> str:
     s = re.sub(r"[\s\-\(\)\[\],.:/®™]+", " ", s)
     return " ".join(s.split())
 
-def wait_page_ready(page):
+async def wait_page_ready(page):
     """Väntar på att listan ska laddas."""
     try:
-        page.wait_for_load_state("domcontentloaded", timeout=15000)
+        await page.wait_for_load_state("domcontentloaded", timeout=15000)
     except PWTimeoutError:
         pass
     
     # Vänta specifikt på att produktcellerna ska synas
     try:
-        page.wait_for_selector(".item-cell", timeout=15000)
+        await page.wait_for_selector(".item-cell", timeout=15000)
     except PWTimeoutError:
         print("[WARN] Could not find .item-cell selector immediately.")
 
-def human_scroll(page, steps=5):
+async def human_scroll(page, steps=5):
     """
     Scrollar mjukare för att trigga lazy loading och undvika bot-detektion.
     """
     for _ in range(steps):
         # Scrolla en slumpmässig mängd pixlar
         scroll_y = random.randint(400, 800)
-        page.mouse.wheel(0, scroll_y)
-        time.sleep(random.uniform(0.5, 1.5))
+        await page.mouse.wheel(0, scroll_y)
+        await asyncio.sleep(random.uniform(0.5, 1.5))
 
-def get_items_from_cells(page):
+async def get_items_from_cells(page):
     """
     Hämtar (href, title) genom att iterera över .item-cell.
     Detta är mer robust för att bestämma faktisk rankingposition.
@@ -85,7 +89,7 @@ def get_items_from_cells(page):
     items = []
     # Hämta alla celler (både list view och grid view använder item-cell oftast)
     cells = page.locator(".item-cell")
-    count = cells.count()
+    count = await cells.count()
     
     for i in range(count):
         cell = cells.nth(i)
@@ -94,24 +98,24 @@ def get_items_from_cells(page):
         title_el = cell.locator("a.item-title")
         
         # Om ingen titel finns i cellen (kanske en annons eller tom plats), hoppa över
-        if not title_el.is_visible():
+        if not await title_el.is_visible():
             continue
             
-        href = title_el.get_attribute("href") or ""
-        text = title_el.inner_text() or ""
+        href = await title_el.get_attribute("href") or ""
+        text = await title_el.inner_text() or ""
         
         if "/p/" in href: # Se till att det är en produktsida
             items.append((href.strip(), text.strip()))
             
     return items
 
-def paginate_and_rank(page, url, targets_aliases, max_pages=3, debug_name=""):
+async def paginate_and_rank(page, url, targets_aliases, max_pages=3, debug_name=""):
     alias_map = {k: [canon(k)] + [canon(a) for a in v] for k, v in targets_aliases.items()}
     out = {k: "NA" for k in alias_map.keys()}
 
     print(f"--- Processing {debug_name} ---")
-    page.goto(url)
-    wait_page_ready(page)
+    await goto_dom_ready(page, url)
+    await wait_page_ready(page)
 
     global_rank = 0
     page_idx = 0
@@ -122,10 +126,10 @@ def paginate_and_rank(page, url, targets_aliases, max_pages=3, debug_name=""):
         print(f"Scanning page {page_idx}...")
 
         # Scrolla för att ladda in items
-        human_scroll(page, steps=8)
+        await human_scroll(page, steps=8)
 
         # Hämta items baserat på faktisk cell-position
-        items = get_items_from_cells(page)
+        items = await get_items_from_cells(page)
         
         # Filtrera bort dubbletter som Playwright kanske ser om DOMen uppdateras konstigt,
         # men behåll ordningen för rankingens skull.
@@ -161,14 +165,14 @@ def paginate_and_rank(page, url, targets_aliases, max_pages=3, debug_name=""):
         # Pagination logic
         next_btn = page.locator("button[aria-label='Next']").first
         # Fallback för andra typer av knappar
-        if not next_btn.is_visible():
+        if not await next_btn.is_visible():
             next_btn = page.locator("a[aria-label='Next']").first
             
-        if next_btn.is_visible() and next_btn.is_enabled():
+        if await next_btn.is_visible() and await next_btn.is_enabled():
             try:
-                next_btn.click()
-                time.sleep(3) # Vänta lite extra vid sidbyte
-                wait_page_ready(page)
+                await next_btn.click()
+                await asyncio.sleep(3) # Vänta lite extra vid sidbyte
+                await wait_page_ready(page)
             except Exception as e:
                 print(f"Error clicking next: {e}")
                 break
@@ -220,46 +224,47 @@ def write_rankings_to_db(all_ranks):
         conflict_columns=["snapshot_date", "product"],
     )
 
-def main():
+async def main():
     ensure_header_xlsx()
-    with sync_playwright() as p:
-        # VIKTIGT: Arguments för att undvika bot-detektion
-        browser = p.chromium.launch(
-            headless=True,  # Sätt till True för Github Actions / Servers
-            args=[
-                "--disable-blink-features=AutomationControlled",
-                "--start-maximized"
-            ]
-        )
-        
-        context = browser.new_context(
+    # VIKTIGT: Arguments för att undvika bot-detektion
+    async with BrowserPool(
+        headless=True,  # Sätt till True för Github Actions / Servers
+        args=[
+            "--disable-blink-features=AutomationControlled",
+            "--start-maximized"
+        ],
+    ) as pool:
+        # En context för Newegg (navigator.webdriver maskas av poolen);
+        # headsets och stolar paginas parallellt i varsin sida.
+        pool.add_context(
+            "newegg", "newegg.com",
+            block=BLOCK,
             viewport={"width": 1920, "height": 1080},
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
         )
-        
-        # Scripting removal kan hjälpa mot vissa detection scripts
-        context.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-        
-        page = context.new_page()
 
-        headsets = paginate_and_rank(page, HEADSET_URL, HEADSET_PRODUCTS, max_pages=3, debug_name="Headsets")
-        chairs   = paginate_and_rank(page, CHAIR_URL,   CHAIR_PRODUCTS,   max_pages=6, debug_name="Chairs")
+        async def rank(page, job):
+            url, products, max_pages, debug_name = job
+            return await paginate_and_rank(page, url, products, max_pages=max_pages, debug_name=debug_name)
 
-        all_ranks = {}
-        all_ranks.update(headsets)
-        all_ranks.update(chairs)
+        headsets, chairs = await pool.run([
+            ("newegg", (HEADSET_URL, HEADSET_PRODUCTS, 3, "Headsets")),
+            ("newegg", (CHAIR_URL,   CHAIR_PRODUCTS,   6, "Chairs")),
+        ], rank)
+        pool.print_stats()
 
-        append_row(all_ranks)
-        print("Final Rankings:", all_ranks)
+    all_ranks = {}
+    all_ranks.update(headsets)
+    all_ranks.update(chairs)
 
-        db_rows_written, db_error = write_rankings_to_db(all_ranks)
-        if db_error is not None:
-            print(f"Databas: MISSLYCKADES – {db_error}")
-        else:
-            print(f"Databas: {db_rows_written} rader skrivna")
+    append_row(all_ranks)
+    print("Final Rankings:", all_ranks)
 
-        context.close()
-        browser.close()
+    db_rows_written, db_error = write_rankings_to_db(all_ranks)
+    if db_error is not None:
+        print(f"Databas: MISSLYCKADES – {db_error}")
+    else:
+        print(f"Databas: {db_rows_written} rader skrivna")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
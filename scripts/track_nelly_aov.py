@@ -3,20 +3,17 @@
 import os
 import csv
 import re
-import time
+import asyncio
 import statistics
 from datetime import date
 from bs4 import BeautifulSoup
-
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+from playwright.async_api import TimeoutError as PWTimeoutError
 
 # NEW: Excel
 from openpyxl import Workbook, load_workbook
 from pathlib import Path
 
+from core.browser import BlockRules, BrowserPool, goto_dom_ready, scroll_until_settled
 from core.db import safe_insert
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -44,21 +41,23 @@ PRICE_SELECTOR = "span.text-subhead.leading-none.text-darkGrey"
 # NEW: write to ../data/nelly_aov.xlsx (repo-root/data)
 SCRIPT_DIR = Path(__file__).resolve().parent
 XLSX_PATH = (SCRIPT_DIR / ".." / "data" / "nelly_aov.xlsx").resolve()
-# ──────────────────────────────────────────────────────────────────────────────
 
-def create_driver():
-    opts = Options()
-    opts.add_argument("--headless")
-    opts.add_argument("--window-size=1920,1080")
-    opts.add_argument("--disable-gpu")
-    opts.add_argument("--no-sandbox")
-    opts.add_argument(
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/115.0.0.0 Safari/537.36"
-    )
-    service = Service(ChromeDriverManager().install())
-    return webdriver.Chrome(service=service, options=opts)
+# The ten pages load a few at a time in one browser context (the pool's
+# per-domain cap keeps it from hitting nelly.com with all of them at once);
+# only the price text is read, so images, fonts, media and ad/analytics hosts
+# are blocked.
+PAGES_IN_PARALLEL = 3
+# A day built from fewer pages is a different (smaller, top-heavy) sample, so
+# it isn't written at all if more than this many of the ten pages failed.
+MAX_FAILED_PAGES = 3
+PAGE_TIMEOUT_MS = 30_000
+BLOCK = BlockRules()
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/124.0.0.0 Safari/537.36"
+)
+# ──────────────────────────────────────────────────────────────────────────────
 
 def _to_number(text):
     # Keep digits, comma, dot; normalize comma to dot; strip NBSPs.
@@ -69,14 +68,22 @@ def _to_number(text):
     except ValueError:
         return None
 
-def fetch_prices(driver, url):
-    driver.get(url)
-    time.sleep(3)
-    # Trigger lazy loading
-    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-    time.sleep(2)
+async def fetch_prices(page, url):
+    # Wait for the first price instead of a fixed pause, then scroll until no
+    # more lazy-loaded cards (and prices) appear. Returns None if the page
+    # failed, so one bad page doesn't cost the other nine their results.
+    try:
+        try:
+            await goto_dom_ready(page, url, PRICE_SELECTOR, timeout_ms=PAGE_TIMEOUT_MS)
+            await scroll_until_settled(page, PRICE_SELECTOR, max_scrolls=1)
+        except PWTimeoutError:
+            print(f"  ⚠ No price element within {PAGE_TIMEOUT_MS // 1000}s on {url}")
+        html = await page.content()
+    except Exception as e:
+        print(f"  ⚠ {url}: {e}")
+        return None
 
-    soup = BeautifulSoup(driver.page_source, "html.parser")
+    soup = BeautifulSoup(html, "html.parser")
 
     prices = []
     for tag in soup.select(PRICE_SELECTOR):
@@ -96,24 +103,28 @@ def ensure_header_xlsx():
     wb = Workbook()
     ws = wb.active
     ws.title = "Sheet1"
-    ws.append(["date", "median_price", "average_price"])
+    ws.append(["date", "median_price", "average_price", "failed_pages"])
     wb.save(XLSX_PATH)
 
-def append_to_xlsx(median_price, average_price):
+def append_to_xlsx(median_price, average_price, failed_pages):
     today = date.today().isoformat()
     if not XLSX_PATH.exists():
         ensure_header_xlsx()
     wb = load_workbook(XLSX_PATH)
     ws = wb.active
-    ws.append([today, round(median_price, 2), round(average_price, 2)])
+    if ws.cell(row=1, column=4).value is None:
+        # Sheets created before failed_pages was tracked
+        ws.cell(row=1, column=4, value="failed_pages")
+    ws.append([today, round(median_price, 2), round(average_price, 2), failed_pages])
     wb.save(XLSX_PATH)
-    print(f"✓ Appended {today}: median={median_price:.2f}, avg={average_price:.2f} → {XLSX_PATH}")
+    print(f"✓ Appended {today}: median={median_price:.2f}, avg={average_price:.2f}, "
+          f"failed_pages={failed_pages} → {XLSX_PATH}")
 
     # Best-effort: also write to Postgres (must not break the script)
     db_rows_written, db_error = safe_insert(
         table="nelly_aov",
-        columns=["snapshot_date", "median_price", "average_price"],
-        rows=[(today, round(median_price, 2), round(average_price, 2))],
+        columns=["snapshot_date", "median_price", "average_price", "failed_pages"],
+        rows=[(today, round(median_price, 2), round(average_price, 2), failed_pages)],
         conflict_columns=["snapshot_date"],
     )
     if db_error is not None:
@@ -123,17 +134,31 @@ def append_to_xlsx(median_price, average_price):
 
 # ──────────────────────────────────────────────────────────────────────────────
 
-def main():
+async def main():
     ensure_header_xlsx()
-    driver = create_driver()
     all_prices = []
-
-    for url in URLS:
-        ps = fetch_prices(driver, url)
+    failed_pages = 0
+
+    async with BrowserPool(per_domain_limit=PAGES_IN_PARALLEL) as pool:
+        pool.add_context(
+            "nelly", "nelly.com", block=BLOCK,
+            user_agent=USER_AGENT, locale="sv-SE", viewport={"width": 1920, "height": 1080},
+        )
+        results = await pool.run([("nelly", url) for url in URLS], fetch_prices)
+        pool.print_stats()
+
+    for url, ps in zip(URLS, results):
+        if ps is None:
+            print(f"  • Nelly Topplistan – page failed, skipped: {url}")
+            failed_pages += 1
+            continue
         print(f"  • Nelly Topplistan – found {len(ps)} prices on {url}")
         all_prices.extend(ps)
 
-    driver.quit()
+    print(f"  • Nelly Topplistan – {failed_pages}/{len(URLS)} pages failed")
+    if failed_pages > MAX_FAILED_PAGES:
+        print(f"❌ More than {MAX_FAILED_PAGES} pages failed; not writing today's value.")
+        return
 
     if not all_prices:
         print("❌ No prices found; check selectors or if the site changed its HTML.")
@@ -141,7 +166,7 @@ def main():
 
     med = statistics.median(all_prices)
     avg = statistics.mean(all_prices)
-    append_to_xlsx(med, avg)
+    append_to_xlsx(med, avg, failed_pages)
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -13,6 +13,7 @@ Each daily run:
      Saves them to the state file for all future runs.
   2. Queries the Voyado Elevate storefront API for every top-level category
      in each market, paginating with limit=600 until all products are fetched.
+     Categories and page offsets are fetched concurrently (core.elevate).
   3. Extracts per-variant stockNumber, sellingPrice, listPrice, brand, title,
      category, and inStock status.
   4. Groups variants by product-colour key (e.g. "262438-6915") and sums
@@ -39,7 +40,10 @@ the same variant.  Stock totals and sales-delta estimates therefore use ONLY the
 SE market (W_SE → Nelly, M_SE → NlyMan) as the primary source of truth.
 All other markets (NO, DK, FI, NL, DE, BE, PL, FR, AT) are tracked for product
 LISTING AVAILABILITY only — showing whether each product is currently offered
-in that country's storefront.
+in that country's storefront.  They are fetched keys-only (no presentCustom /
+presentPrices, only variant keys parsed and kept as a set per market),
+concurrently with the primary fetch, so the availability flags cost a
+fraction of the primary markets' payload.
 
 How the data is fetched
 -----------------------
@@ -62,25 +66,23 @@ Excel output: data/nelly_inventory.xlsx
 import json
 import re
 import time
-import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime
 from pathlib import Path
 from typing import Optional
 
-import requests
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import Alignment, Font, PatternFill
-from openpyxl.utils import get_column_letter
 from psycopg2.extras import Json
 
-from core.db import safe_insert
+from core.db import safe_transaction
 from core.cli import warn_if_gap
+from core.elevate import ElevateClient
+from core.report import ReportWriter
 
 # ── Elevate API configuration ──────────────────────────────────────────────────
-ELEVATE_BASE_URL_TEMPLATE = "https://{cluster}.api.esales.apptus.cloud"
-ELEVATE_ENDPOINT          = "/api/storefront/v3/queries/landing-page"
-ELEVATE_LIMIT             = 600      # max allowed by Elevate API
+# Endpoint, page size and pooling live in core.elevate.
 ELEVATE_CLUSTER_ID        = "w67a8630f"
+ELEVATE_MAX_CONCURRENCY   = 8        # in-flight requests against the cluster host
+AVAILABILITY_MAX_CONCURRENCY = 8     # same, for the keys-only availability fetch
 
 # Stock increases below this threshold are treated as customer returns (negative sales).
 # Increases >= this value are treated as true warehouse restocks.
@@ -395,38 +397,6 @@ def _group_category(full_cat: str) -> str:
     return ">".join(parts[:2]) if len(parts) >= 2 else full_cat
 
 
-def fetch_elevate_page(
-    cluster_id: str,
-    elevate_market: str,
-    locale: str,
-    page_ref: str,
-    skip: int = 0,
-    customer_key: str = "",
-    session_key: str = "",
-) -> Optional[dict]:
-    """Fetch one page from the Elevate landing-page API."""
-    url = ELEVATE_BASE_URL_TEMPLATE.format(cluster=cluster_id) + ELEVATE_ENDPOINT
-    params = {
-        "market":        elevate_market,
-        "locale":        locale,
-        "customerKey":   customer_key,
-        "sessionKey":    session_key,
-        "touchpoint":    "desktop",
-        "pageReference": page_ref,
-        "limit":         ELEVATE_LIMIT,
-        "skip":          skip,
-        "presentPrices": NELLY_PRESENT_PRICES,
-        "presentCustom": NELLY_PRESENT_CUSTOM,
-    }
-    try:
-        resp = requests.get(url, params=params, timeout=(10, 60))
-        resp.raise_for_status()
-        return resp.json()
-    except requests.RequestException as exc:
-        print(f"    [WARN] Elevate {page_ref} skip={skip}: {exc}")
-        return None
-
-
 def extract_products_from_page(data: dict, page_ref: str = "") -> tuple[dict[str, dict], int, int]:
     """
     Extract size-level (variant) data from an Elevate landing-page response.
@@ -528,75 +498,92 @@ def extract_products_from_page(data: dict, page_ref: str = "") -> tuple[dict[str
     return variants, total_hits, len(groups)
 
 
-def fetch_all_by_market(cluster_id: str) -> dict[str, dict[str, dict]]:
+def extract_listing_keys(data: dict, page_ref: str = "") -> tuple[dict[str, None], int, int]:
     """
-    Fetch all product-colour level data for every market/site combination.
-    Uses per-market category lists from the MARKETS config.
-
-    Returns
-    -------
-    {market_key: {product_colour_key: {...}}}
-    e.g. {"W_SE": {"262438-6915": {...}}, "M_SE": {...}, ...}
+    Keys-only counterpart of extract_products_from_page for the availability
+    markets: ({variant_key: None}, total_hits, group_count). Nothing else in
+    the response is read.
     """
-    result: dict[str, dict[str, dict]] = {}
-
-    for market_code, cfg in MARKETS.items():
-        if not cfg.get("primary"):
-            continue  # only fetch primary markets (W_SE, M_SE) — shared stock pool
-        elevate_market = cfg["elevate_market"]
-        locale         = cfg["locale"]
-        categories     = cfg["categories"]
-        customer_key   = str(uuid.uuid4())
-        session_key    = str(uuid.uuid4())
-        site_label     = cfg["site"]
-        print(f"\n[{market_code}] {site_label} Elevate API (market={elevate_market})")
-
-        market_products: dict[str, dict] = {}
-
-        for cat in categories:
-            skip, page = 0, 1
-            cat_total  = None
-
-            while True:
-                data = fetch_elevate_page(
-                    cluster_id, elevate_market, locale, cat,
-                    skip, customer_key, session_key,
-                )
-                if data is None:
-                    break
-
-                new_p, total_hits, group_count = extract_products_from_page(data, cat)
+    pl = data.get("primaryList") or {}
+    groups = pl.get("productGroups") or []
+    keys = {
+        str(variant["key"]): None
+        for group in groups
+        for product in group.get("products") or []
+        for variant in product.get("variants") or []
+        if variant.get("key")
+    }
+    return keys, int(pl.get("totalHits") or 0), len(groups)
 
-                if cat_total is None:
-                    cat_total = total_hits
 
-                market_products.update(new_p)
-                print(
-                    f"  {cat} p{page}: +{len(new_p)} products "
-                    f"[{skip}–{skip + group_count}/{total_hits}]"
-                )
+def fetch_availability(cluster_id: str, markets: dict[str, dict]) -> tuple[dict[str, frozenset], set[str]]:
+    """
+    Listing availability for the non-primary markets: ({market_code:
+    frozenset(variant_key)}, market codes with a failed page). A key missing
+    from an incomplete market may just be on the failed page, so it says
+    nothing about whether the product is listed there. Requests carry no
+    presentCustom/presentPrices, and every market, category and page offset
+    is fetched concurrently.
+    """
+    with ElevateClient(cluster_id, max_concurrency=AVAILABILITY_MAX_CONCURRENCY) as client:
+        result = client.fetch_markets(markets, extract_listing_keys, label="keys")
+        failed = dict(client.failed_pages)
+    for mc, n in failed.items():
+        print(f"  [WARN] [{mc}] {n} availability page(s) failed — unlisted flags skipped for this market")
+    return {mc: frozenset(keys) for mc, keys in result.items()}, set(failed)
 
-                if total_hits == 0:
-                    print(f"  [WARN] {cat}: 0 hits — check pageReference")
-                    break
 
-                skip += group_count
-                if skip >= total_hits or group_count == 0:
-                    break
-                page += 1
+def fetch_all_by_market(cluster_id: str) -> tuple[dict[str, dict], set[str]]:
+    """
+    Fetch all product-colour level data for the primary markets, and the
+    listed variant keys for every other market/site combination. Uses
+    per-market category lists from the MARKETS config; both fetches run at
+    the same time and all categories and pages are fetched concurrently
+    through core.elevate.
 
-        site_tag = f"[{site_label}/{cfg['country']}]"
-        print(f"  {site_tag} {len(market_products):,} unique product-colours fetched")
-        result[market_code] = market_products
+    Returns
+    -------
+    {market_key: {product_colour_key: {...}}} for primary markets and
+    {market_key: frozenset(product_colour_key)} for availability markets,
+    e.g. {"W_SE": {"262438-6915": {...}}, "M_SE": {...}, "W_NO": frozenset({...}), ...},
+    plus the availability markets that had a failed page (see fetch_availability).
+    """
+    # full data only for the primary markets (W_SE, M_SE) — shared stock pool
+    primary = {mc: cfg for mc, cfg in MARKETS.items() if cfg.get("primary")}
+    others  = {mc: cfg for mc, cfg in MARKETS.items() if not cfg.get("primary")}
+    for market_code, cfg in primary.items():
+        print(f"  [{market_code}] {cfg['site']} Elevate API (market={cfg['elevate_market']})")
+    print(f"  + {len(others)} availability markets, keys only")
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        availability = pool.submit(fetch_availability, cluster_id, others)
+        with ElevateClient(
+            cluster_id,
+            base_params={"presentPrices": NELLY_PRESENT_PRICES, "presentCustom": NELLY_PRESENT_CUSTOM},
+            max_concurrency=ELEVATE_MAX_CONCURRENCY,
+        ) as client:
+            result: dict[str, dict] = client.fetch_markets(primary, extract_products_from_page, label="products")
+        listed, incomplete = availability.result()
+        result.update(listed)
+
+    for market_code, market_products in result.items():
+        cfg = MARKETS[market_code]
+        site_tag = f"[{cfg['site']}/{cfg['country']}]"
+        if cfg.get("primary"):
+            print(f"  {site_tag} {len(market_products):,} unique product-colours fetched")
+        else:
+            print(f"  {site_tag} {len(market_products):,} listed"
+                  f"{' (incomplete)' if market_code in incomplete else ''}")
 
-    return result
+    return result, incomplete
 
 
 # ── Stock-delta analysis ───────────────────────────────────────────────────────
 
 def compute_snapshot_summary(
-    curr_by_market: dict[str, dict[str, dict]],
+    curr_by_market: dict[str, dict],
     last_snapshot:  dict[str, int],    # "{site}/{key}": primary_stock_int
+    incomplete_markets: frozenset = frozenset(),
 ) -> tuple[dict, list[dict], dict, dict]:
     """
     Compute a daily summary from the current multi-market snapshot.
@@ -610,8 +597,12 @@ def compute_snapshot_summary(
 
     Parameters
     ----------
-    curr_by_market : {market_code: {product_key: product_data}}
+    curr_by_market : {market_code: {product_key: product_data}} for the
+                     primary markets; any container of listed keys (a set,
+                     from fetch_availability) for the others
     last_snapshot  : {"{site}/{key}": int}  — previous run's primary stock
+    incomplete_markets : availability markets with a failed page; a product
+                     missing there is flagged None (unknown), not 0
 
     Returns
     -------
@@ -698,11 +689,12 @@ def compute_snapshot_summary(
                 est_sold = -stock_delta  # stock dropped = units sold (positive)
 
             # Availability flags: is this product listed in each non-primary market?
-            avail: dict[str, int] = {
-                mc: (1 if key in curr_by_market.get(mc, {}) else 0)
+            avail: dict[str, Optional[int]] = {
+                mc: (1 if key in curr_by_market.get(mc, {})
+                     else None if mc in incomplete_markets else 0)
                 for mc in avail_mkt_codes
             }
-            listed_count = 1 + sum(avail.values())  # primary counts as 1
+            listed_count = 1 + sum(v for v in avail.values() if v)  # primary counts as 1
 
             # Pricing — natively in SEK (primary market is SE).
             sell_sek     = pd["sell_price"]
@@ -800,68 +792,38 @@ def compute_snapshot_summary(
 
 # ── Excel writer ──────────────────────────────────────────────────────────────
 
-_HDR_FILL = PatternFill("solid", fgColor="1F497D")
-_HDR_FONT = Font(bold=True, color="FFFFFF")
-
-
-def _write_headers(ws, headers: list[str]) -> None:
-    for col, h in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=h)
-        cell.fill = _HDR_FILL
-        cell.font = _HDR_FONT
-        cell.alignment = Alignment(horizontal="center")
-
-
-def _autofit(ws) -> None:
-    for col in ws.columns:
-        max_len = max((len(str(c.value)) for c in col if c.value is not None), default=8)
-        ws.column_dimensions[get_column_letter(col[0].column)].width = min(max_len + 4, 55)
-
-
 def write_excel(state: dict, detail_rows: list[dict]) -> None:
-    if XLSX_PATH.exists():
-        wb = load_workbook(XLSX_PATH)
-    else:
-        wb = Workbook()
-        for name in list(wb.sheetnames):
-            del wb[name]
-
-    # Remove obsolete sheets if present.
-    for _obs in ("By Market", "Latest Detail"):
-        if _obs in wb.sheetnames:
-            del wb[_obs]
-
+    """
+    Rebuild the workbook from state["daily_summary"], streamed (core.report).
+    Every sheet is keyed on the history length and the latest run, so a
+    re-run without a new day copies the sheets from the previous file.
+    """
     all_entries = state.get("daily_summary", [])
+    report = ReportWriter(XLSX_PATH)
+    latest = all_entries[-1] if all_entries else {}
+    key = (len(all_entries), latest.get("date"), latest.get("timestamp"))
 
     # ── Sheet 1: Daily Summary ────────────────────────────────────────────────
-    ds_name = "Daily Summary"
-    if ds_name in wb.sheetnames:
-        del wb[ds_name]
-    ws = wb.create_sheet(ds_name, 0)
-    _write_headers(ws, [
+    def _summary_rows():
+        for entry in all_entries:
+            s = entry.get("summary", {})
+            yield [
+                entry.get("date", ""),
+                s.get("est_sold_today_sek",    0),
+                s.get("est_sold_today_list_sek", 0),
+                s.get("returns",               0),
+                s.get("restocks",              0),
+            ]
+
+    report.sheet("Daily Summary", [
         "Date",
         "Est. Sales (sell price SEK)",
         "Est. Sales (list price SEK)",
         "Est. Returns (units)",
         "Restocks",
-    ])
-    for entry in all_entries:
-        s = entry.get("summary", {})
-        ws.append([
-            entry.get("date", ""),
-            s.get("est_sold_today_sek",    0),
-            s.get("est_sold_today_list_sek", 0),
-            s.get("returns",               0),
-            s.get("restocks",              0),
-        ])
-    _autofit(ws)
+    ], _summary_rows, key=key)
 
     # ── Sheet 2: By Category (wide, rebuilt each run) ────────────────────────
-    cat_name = "By Category"
-    if cat_name in wb.sheetnames:
-        del wb[cat_name]
-    ws_c = wb.create_sheet(cat_name)
-
     # Collect all category names across all history.
     all_cats: set[str] = set()
     for entry in all_entries:
@@ -877,23 +839,20 @@ def write_excel(state: dict, detail_rows: list[dict]) -> None:
     # Columns: all categories (Sell) sorted by latest sell revenue desc,
     # then all categories (List) in the same category order.
     cat_cols = [f"{c} (Sell)" for c in sorted_cats] + [f"{c} (List)" for c in sorted_cats]
-    _write_headers(ws_c, ["Date"] + cat_cols)
-    for entry in all_entries:
-        by_cat = entry.get("summary", {}).get("by_category", {})
-        row: list = [entry.get("date", "")]
-        for c in sorted_cats:
-            row.append(round(by_cat.get(c, {}).get("sell_rev_sek", 0), 0))
-        for c in sorted_cats:
-            row.append(round(by_cat.get(c, {}).get("list_rev_sek", 0), 0))
-        ws_c.append(row)
-    _autofit(ws_c)
 
-    # ── Sheet 3: By Brand (wide, rebuilt each run) ────────────────────────────
-    brand_name = "By Brand"
-    if brand_name in wb.sheetnames:
-        del wb[brand_name]
-    ws_b = wb.create_sheet(brand_name)
+    def _cat_rows():
+        for entry in all_entries:
+            by_cat = entry.get("summary", {}).get("by_category", {})
+            row: list = [entry.get("date", "")]
+            for c in sorted_cats:
+                row.append(round(by_cat.get(c, {}).get("sell_rev_sek", 0), 0))
+            for c in sorted_cats:
+                row.append(round(by_cat.get(c, {}).get("list_rev_sek", 0), 0))
+            yield row
 
+    report.sheet("By Category", ["Date"] + cat_cols, _cat_rows, key=key)
+
+    # ── Sheet 3: By Brand (wide, rebuilt each run) ────────────────────────────
     # Collect all brand names across all history.
     all_brands: set[str] = set()
     for entry in all_entries:
@@ -910,24 +869,20 @@ def write_excel(state: dict, detail_rows: list[dict]) -> None:
     # Columns: all brands (Sell) sorted by latest sell revenue desc,
     # then all brands (List) in the same brand order.
     brand_cols = [f"{b} (Sell)" for b in sorted_brands] + [f"{b} (List)" for b in sorted_brands]
-    _write_headers(ws_b, ["Date"] + brand_cols)
 
-    for entry in all_entries:
-        by_br = entry.get("summary", {}).get("by_brand", {})
-        row: list = [entry.get("date", "")]
-        for b in sorted_brands:
-            row.append(round(by_br.get(b, {}).get("sell_rev_sek", 0), 0))
-        for b in sorted_brands:
-            row.append(round(by_br.get(b, {}).get("list_rev_sek", 0), 0))
-        ws_b.append(row)
-    _autofit(ws_b)
+    def _brand_rows():
+        for entry in all_entries:
+            by_br = entry.get("summary", {}).get("by_brand", {})
+            row: list = [entry.get("date", "")]
+            for b in sorted_brands:
+                row.append(round(by_br.get(b, {}).get("sell_rev_sek", 0), 0))
+            for b in sorted_brands:
+                row.append(round(by_br.get(b, {}).get("list_rev_sek", 0), 0))
+            yield row
 
-    # ── Sheet 3b: By Site (wide, rebuilt each run) ───────────────────────────
-    site_sheet = "By Site"
-    if site_sheet in wb.sheetnames:
-        del wb[site_sheet]
-    ws_s = wb.create_sheet(site_sheet)
+    report.sheet("By Brand", ["Date"] + brand_cols, _brand_rows, key=key)
 
+    # ── Sheet 3b: By Site (wide, rebuilt each run) ───────────────────────────
     all_sites: set[str] = set()
     for entry in all_entries:
         all_sites.update(entry.get("summary", {}).get("by_site", {}).keys())
@@ -938,115 +893,87 @@ def write_excel(state: dict, detail_rows: list[dict]) -> None:
         + [f"{s} (List)"  for s in sorted_sites]
         + [f"{s} (Units)" for s in sorted_sites]
     )
-    _write_headers(ws_s, ["Date"] + site_cols)
-    for entry in all_entries:
-        by_s = entry.get("summary", {}).get("by_site", {})
-        row: list = [entry.get("date", "")]
-        for s in sorted_sites:
-            row.append(round(by_s.get(s, {}).get("sell_rev_sek", 0), 0))
-        for s in sorted_sites:
-            row.append(round(by_s.get(s, {}).get("list_rev_sek", 0), 0))
-        for s in sorted_sites:
-            row.append(by_s.get(s, {}).get("est_sold_units", 0))
-        ws_s.append(row)
-    _autofit(ws_s)
-
-    # ── Sheet 4: Restocks (rebuilt each run, one row per event) ───────────────
-    restock_sheet = "Restocks"
-    if restock_sheet in wb.sheetnames:
-        del wb[restock_sheet]
-    ws_r = wb.create_sheet(restock_sheet)
-    _write_headers(ws_r, [
+
+    def _site_rows():
+        for entry in all_entries:
+            by_s = entry.get("summary", {}).get("by_site", {})
+            row: list = [entry.get("date", "")]
+            for s in sorted_sites:
+                row.append(round(by_s.get(s, {}).get("sell_rev_sek", 0), 0))
+            for s in sorted_sites:
+                row.append(round(by_s.get(s, {}).get("list_rev_sek", 0), 0))
+            for s in sorted_sites:
+                row.append(by_s.get(s, {}).get("est_sold_units", 0))
+            yield row
+
+    report.sheet("By Site", ["Date"] + site_cols, _site_rows, key=key)
+
+    # ── Sheets 4-5: Restocks / Returns Detail (one row per event) ─────────────
+    def _event_rows(events_key: str):
+        for entry in all_entries:
+            d = entry.get("date", "")
+            for ev in entry.get("summary", {}).get(events_key, []):
+                delta      = ev.get("delta", 0)
+                sell_price = ev.get("sell_price_sek", 0)
+                yield [
+                    d,
+                    ev.get("site", ""),
+                    ev.get("key", ""),
+                    ev.get("size", ""),
+                    ev.get("brand", ""),
+                    ev.get("title", ""),
+                    ev.get("category", ""),
+                    ev.get("stock_before", 0),
+                    ev.get("stock_after", 0),
+                    delta,
+                    round(sell_price, 0),
+                    round(delta * sell_price, 0),
+                ]
+
+    report.sheet("Restocks", [
         "Date", "Site", "Product Key", "Size", "Brand", "Title", "Category",
         "Stock Before", "Stock After", "Delta", "Sell Price (SEK)",
         "Est. Restock Value (SEK)",
-    ])
-    for entry in all_entries:
-        d = entry.get("date", "")
-        for ev in entry.get("summary", {}).get("restock_events", []):
-            delta     = ev.get("delta", 0)
-            sell_price = ev.get("sell_price_sek", 0)
-            ws_r.append([
-                d,
-                ev.get("site", ""),
-                ev.get("key", ""),
-                ev.get("size", ""),
-                ev.get("brand", ""),
-                ev.get("title", ""),
-                ev.get("category", ""),
-                ev.get("stock_before", 0),
-                ev.get("stock_after", 0),
-                delta,
-                round(sell_price, 0),
-                round(delta * sell_price, 0),
-            ])
-    _autofit(ws_r)
-
-    # ── Sheet 5: Returns Detail (rebuilt each run, one row per return event) ──
-    ret_sheet = "Returns Detail"
-    if ret_sheet in wb.sheetnames:
-        del wb[ret_sheet]
-    ws_ret = wb.create_sheet(ret_sheet)
-    _write_headers(ws_ret, [
+    ], lambda: _event_rows("restock_events"), key=key)
+    report.sheet("Returns Detail", [
         "Date", "Site", "Product Key", "Size", "Brand", "Title", "Category",
         "Stock Before", "Stock After", "Units Returned", "Sell Price (SEK)",
         "Est. Return Value (SEK)",
-    ])
-    for entry in all_entries:
-        d = entry.get("date", "")
-        for ev in entry.get("summary", {}).get("return_events", []):
-            delta      = ev.get("delta", 0)
-            sell_price = ev.get("sell_price_sek", 0)
-            ws_ret.append([
-                d,
-                ev.get("site", ""),
-                ev.get("key", ""),
-                ev.get("size", ""),
-                ev.get("brand", ""),
-                ev.get("title", ""),
-                ev.get("category", ""),
-                ev.get("stock_before", 0),
-                ev.get("stock_after", 0),
-                delta,
-                round(sell_price, 0),
-                round(delta * sell_price, 0),
-            ])
-    _autofit(ws_ret)
-
-    wb.save(XLSX_PATH)
+    ], lambda: _event_rows("return_events"), key=key)
+
+    report.save()
     print(f"  Saved -> {XLSX_PATH}")
 
 
 # ── Databasskrivning ───────────────────────────────────────────────────────────
 
-def write_daily_summary_to_db(today: str, summary: dict) -> tuple[Optional[int], Optional[str]]:
-    """Best-effort: write the daily aggregate summary to Postgres."""
-    return safe_insert(
-        table="nelly_daily_summary",
-        columns=["snapshot_date", "total_products", "est_sold_today_units",
-                 "est_sold_today_sek", "est_sold_today_list_sek", "restocks", "returns",
-                 "by_category", "by_brand", "by_site", "restock_events", "return_events"],
-        rows=[(
-            today,
-            summary.get("total_products"),
-            summary.get("est_sold_today_units"),
-            summary.get("est_sold_today_sek"),
-            summary.get("est_sold_today_list_sek"),
-            summary.get("restocks"),
-            summary.get("returns"),
-            Json(summary.get("by_category") or {}),
-            Json(summary.get("by_brand") or {}),
-            Json(summary.get("by_site") or {}),
-            Json(summary.get("restock_events") or []),
-            Json(summary.get("return_events") or []),
-        )],
-        conflict_columns=["snapshot_date"],
+_SUMMARY_COLUMNS = ["snapshot_date", "total_products", "est_sold_today_units",
+                    "est_sold_today_sek", "est_sold_today_list_sek", "restocks", "returns",
+                    "by_category", "by_brand", "by_site", "restock_events", "return_events"]
+_VARIANT_COLUMNS = ["snapshot_date", "site", "product_key", "brand", "title", "category",
+                    "sell_price_sek", "list_price_sek", "historic_low_sek", "discount_pct",
+                    "is_new", "primary_stock", "listed_count"]
+
+
+def _summary_row(today: str, summary: dict) -> tuple:
+    return (
+        today,
+        summary.get("total_products"),
+        summary.get("est_sold_today_units"),
+        summary.get("est_sold_today_sek"),
+        summary.get("est_sold_today_list_sek"),
+        summary.get("restocks"),
+        summary.get("returns"),
+        Json(summary.get("by_category") or {}),
+        Json(summary.get("by_brand") or {}),
+        Json(summary.get("by_site") or {}),
+        Json(summary.get("restock_events") or []),
+        Json(summary.get("return_events") or []),
     )
 
 
-def write_variant_snapshot_to_db(today: str, detail_rows: list[dict]) -> tuple[Optional[int], Optional[str]]:
-    """Best-effort: write one row per product-colour to Postgres."""
-    values = [
+def _variant_rows(today: str, detail_rows: list[dict]) -> list[tuple]:
+    return [
         (
             today, r["site"], r["key"], r.get("brand"), r.get("title"), r.get("category"),
             r.get("sell_price_sek"), r.get("list_price_sek"), r.get("historic_low_sek"),
@@ -1054,14 +981,30 @@ def write_variant_snapshot_to_db(today: str, detail_rows: list[dict]) -> tuple[O
         )
         for r in detail_rows
     ]
-    return safe_insert(
-        table="nelly_variant_snapshot",
-        columns=["snapshot_date", "site", "product_key", "brand", "title", "category",
-                 "sell_price_sek", "list_price_sek", "historic_low_sek", "discount_pct",
-                 "is_new", "primary_stock", "listed_count"],
-        rows=values,
-        conflict_columns=["snapshot_date", "site", "product_key"],
-    )
+
+
+def write_run_to_db(today: str, summary: dict, detail_rows: list[dict]) -> tuple[Optional[int], Optional[str]]:
+    """
+    Best-effort: write the daily summary and one row per product-colour in a
+    single transaction, so the dashboard never sees today's summary without
+    its variant rows (or a half-written variant snapshot). detail_rows may be
+    empty: the already-ran-today path only re-writes the summary.
+    """
+    def write(tx) -> None:
+        tx.insert(
+            table="nelly_daily_summary",
+            columns=_SUMMARY_COLUMNS,
+            rows=[_summary_row(today, summary)],
+            conflict_columns=["snapshot_date"],
+        )
+        tx.insert(
+            table="nelly_variant_snapshot",
+            columns=_VARIANT_COLUMNS,
+            rows=_variant_rows(today, detail_rows),
+            conflict_columns=["snapshot_date", "site", "product_key"],
+        )
+
+    return safe_transaction(write)
 
 
 # ── Main ───────────────────────────────────────────────────────────────────────
@@ -1081,7 +1024,7 @@ def main() -> None:
               f"from {STATE_FILE.name} to re-run.")
 
         last_summary = state["daily_summary"][-1].get("summary", {})
-        db_rows_written, db_error = write_daily_summary_to_db(today, last_summary)
+        db_rows_written, db_error = write_run_to_db(today, last_summary, [])
         if db_error is not None:
             print(f"Databas: MISSLYCKADES – {db_error}")
         else:
@@ -1100,10 +1043,11 @@ def main() -> None:
 
     # ── Step 2: Fetch inventory from all markets ─────────────────────────────
     print("\nFetching inventory across all markets and categories ...")
-    curr_by_market = fetch_all_by_market(cluster_id)
+    curr_by_market, incomplete_markets = fetch_all_by_market(cluster_id)
 
-    total_raw     = sum(len(v) for v in curr_by_market.values())
-    unique_keys   = len({k for mv in curr_by_market.values() for k in mv})
+    primary_data  = [v for mc, v in curr_by_market.items() if MARKETS[mc].get("primary")]
+    total_raw     = sum(len(v) for v in primary_data)
+    unique_keys   = len({k for mv in primary_data for k in mv})
     print(f"\nTotal fetched: {total_raw:,} raw  |  {unique_keys:,} unique product-colours")
 
     if total_raw == 0:
@@ -1119,7 +1063,7 @@ def main() -> None:
         warn_if_gap(state["daily_summary"][-1]["date"], today, "sold/restock/return")
 
     summary, detail_rows, new_snapshot, product_catalog = compute_snapshot_summary(
-        curr_by_market, last_snapshot
+        curr_by_market, last_snapshot, incomplete_markets
     )
 
     if is_first_run:
@@ -1167,11 +1111,7 @@ def main() -> None:
     write_excel(state, detail_rows)
 
     # ── Step 7: Write to Postgres (best-effort) ──────────────────────────────
-    db_rows_written, db_error = write_daily_summary_to_db(today, summary)
-    db_rows_written2, db_error2 = write_variant_snapshot_to_db(today, detail_rows)
-    db_error = db_error or db_error2
-    if db_rows_written is not None and db_rows_written2 is not None:
-        db_rows_written += db_rows_written2
+    db_rows_written, db_error = write_run_to_db(today, summary, detail_rows)
     if db_error is not None:
         print(f"Databas: MISSLYCKADES – {db_error}")
     else:
@@ -17,10 +17,14 @@ Methodology
      - DE URL  → price in EUR, converted to SEK via live ECB rate
      Reviews are already aggregated at baseProduct level, so there is NO
      double-counting across colour variants.
-4. Compare against the previous stored snapshot → new_reviews per product.
+4. Sync the local review store (core/rvrc_reviews.py, only reviews newer
+   than its watermark are fetched) and count the reviews the sync added –
+   including late ones published before the watermark – → new_reviews per
+   product / country / category / gender.
 5. Sales-activity proxy  =  Σ  price_sek × new_reviews   (all products)
 
 State file    :  data/revolutionrace_state.json
+Review store  :  data/reviews/revolutionrace/
 Excel output  :  data/revolutionrace_reviews.xlsx
   Sheet "Summary"  – date | total_reviews | total_new_reviews | proxy_value_sek
 """
@@ -38,11 +42,13 @@ import requests
 from bs4 import BeautifulSoup
 from openpyxl import Workbook, load_workbook
 
+from core.fx import rate
+from core.rvrc_reviews import ReviewStore, sync
+
 # ── Configuration ──────────────────────────────────────────────────────────────
 GRAPHQL_URL      = "https://reviews.revolutionrace.com/revolutionrace/graphql"
 SE_CHANNEL_UUID  = "3963b20d-4d89-4ddb-92dc-d0c897dc149a"  # Swedish store (SEK)
 DE_CHANNEL_UUID  = "76302142-cd49-4c57-a48e-9217cf41c8b5"  # German store  (EUR)
-EUR_SEK_FALLBACK = 11.5                                     # fallback rate if API unavailable
 
 SCRIPT_DIR       = Path(__file__).resolve().parent
 STATE_FILE       = (SCRIPT_DIR / ".." / "data" / "revolutionrace_state.json").resolve()
@@ -243,27 +249,6 @@ def fetch_product_info_batch(base_products: list[str]) -> dict[str, dict]:
     return results
 
 
-# ── EUR/SEK exchange rate ────────────────────────────────────────────────────────
-
-def fetch_eur_sek_rate() -> float:
-    """
-    Fetch today's EUR/SEK rate from the Frankfurter API (free, ECB-sourced).
-    Falls back to EUR_SEK_FALLBACK if unavailable.
-    """
-    try:
-        resp = requests.get(
-            "https://api.frankfurter.app/latest?from=EUR&to=SEK",
-            timeout=10,
-        )
-        resp.raise_for_status()
-        rate = resp.json()["rates"]["SEK"]
-        print(f"  EUR/SEK rate: {rate:.4f}")
-        return float(rate)
-    except Exception:
-        print(f"  EUR/SEK rate: using fallback {EUR_SEK_FALLBACK}")
-        return EUR_SEK_FALLBACK
-
-
 # ── Price fetching ─────────────────────────────────────────────────────────────
 
 def _fetch_price_from_page(url: str, eur_sek: float) -> Optional[float]:
@@ -423,7 +408,6 @@ def main() -> None:
 
     # Store daily aggregate snapshots; update in-place if re-running same day.
     agg_state = state.setdefault("aggregates", [])
-    prior_agg  = next((a for a in reversed(agg_state) if a["date"] != today), None)
     today_snap = {
         "date":       today,
         "avg_rating": agg_now["avg_rating"],
@@ -437,13 +421,43 @@ def main() -> None:
     else:
         agg_state.append(today_snap)
 
-    # Deltas vs prior day
-    prev_ch  = prior_agg["channels"]   if prior_agg else {}
-    prev_cat = prior_agg["categories"] if prior_agg else {}
-    prev_gen = prior_agg["genders"]    if prior_agg else {}
-    ch_delta  = {k: max(0, v - prev_ch.get(k, 0))  for k, v in agg_now["channels"].items()}
-    cat_delta = {k: max(0, v - prev_cat.get(k, 0)) for k, v in agg_now["categories"].items()}
-    gen_delta = {k: max(0, v - prev_gen.get(k, 0)) for k, v in agg_now["genders"].items()}
+    # ── New reviews since the previous run, from the local review store ──────
+    # "New" is what sync() added to the store, by id, so reviews that show up
+    # late with a publishedAt behind the watermark (SYNC_OVERLAP_DAYS) are
+    # counted too. A backfill adds a product's whole history (all products
+    # when the store is built from scratch, new products and retried failed
+    # backfills later), so of those only reviews published after the last
+    # run count. The day's ids are kept in the state file, so a re-run on
+    # the same day reports the same set plus anything its own sync added.
+    store       = ReviewStore()
+    sync_mark   = state.get("review_sync") or {}
+    earlier_ids = set(sync_mark.get("ids", [])) if sync_mark.get("date") == today else set()
+
+    print("  Syncing review store …")
+    synced    = sync(store, current_counts)
+    prior_run = next((r["date"] for r in reversed(runs) if r.get("date") != today), None)
+    since     = f"{prior_run}T23:59:59.999999" if prior_run else None
+    added     = synced.newer + [
+        r for r in synced.backfilled if since is None or r.published_at > since
+    ]
+    added_ids = {r.id for r in added}
+    new_reviews_list = added
+    if earlier_ids - added_ids:
+        new_reviews_list = added + [
+            r for r in store.iter_reviews() if r.id in earlier_ids and r.id not in added_ids
+        ]
+    state["review_sync"] = {"date": today, "ids": sorted(earlier_ids | added_ids)}
+    print(f"  {len(new_reviews_list):,} reviews new to the store today")
+
+    ch_delta:      dict[str, int] = {}
+    cat_delta:     dict[str, int] = {}
+    gen_delta:     dict[str, int] = {}
+    product_delta: dict[str, int] = {}
+    for r in new_reviews_list:
+        ch_delta[r.channel]      = ch_delta.get(r.channel, 0) + 1
+        cat_delta[r.category]    = cat_delta.get(r.category, 0) + 1
+        gen_delta[r.gender]      = gen_delta.get(r.gender, 0) + 1
+        product_delta[r.product] = product_delta.get(r.product, 0) + 1
 
     # Per-country new reviews using CHANNEL_COUNTRIES map
     country_new: dict[str, int] = {}
@@ -535,7 +549,8 @@ def main() -> None:
         and (products_state.get(bp, {}).get("se_url") or products_state.get(bp, {}).get("de_url"))
     }
     if needs_price:
-        eur_sek = fetch_eur_sek_rate()
+        eur_sek = rate("EUR")
+        print(f"  EUR/SEK rate: {eur_sek:.4f}")
         se_count = sum(1 for bp, url in needs_price.items() if url and "revolutionrace.se" in url)
         de_count = len(needs_price) - se_count
         print(f"  Fetching prices for {len(needs_price)} products "
@@ -559,11 +574,7 @@ def main() -> None:
             "price_sek": None, "price_updated": None, "counts": [],
         })
 
-        # Previous count = last entry that is NOT today (so re-runs on the same
-        # day don't accumulate phantom new reviews).
-        prior_entries = [e for e in p["counts"] if e["date"] != today]
-        prev_count  = prior_entries[-1]["count"] if prior_entries else 0
-        new_reviews = max(0, current_count - prev_count)
+        new_reviews = product_delta.get(base_product, 0)
 
         # Update today's entry in-place rather than appending duplicates.
         if p["counts"] and p["counts"][-1]["date"] == today:
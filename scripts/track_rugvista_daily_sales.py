@@ -10,7 +10,7 @@ from typing import Dict, Any, List, Optional, Tuple
 import requests
 import pandas as pd
 
-from core.db import safe_insert
+from core.db import safe_insert, safe_refresh
 from core.cli import add_no_side_effects_flag, log_skip
 
 try:
@@ -190,6 +190,8 @@ def write_snapshot_to_db(rows: List[Dict[str, Any]]) -> Optional[int]:
         conflict_columns=["snapshot_date", "product_id"],
     )
     write_snapshot_to_db.last_error = error
+    if error is None:
+        safe_refresh("refresh_rugvista_daily_sales")
     return result
 
 
@@ -47,29 +47,24 @@ The response includes variant.custom.sale_last_week = total units sold globally
 across all markets in the trailing 7 days (per product-colour combination).
 
 Pagination uses skip (offset by productGroup count) until skip >= totalHits.
-Typically 5–15 total requests cover all 5 markets, completing in ~30 seconds.
+Once the first page of a category returns totalHits, every remaining offset is
+requested at once; all markets and categories run concurrently (core.elevate).
 
 State file  : data/rvrc_inventory_state.json
 Excel output: data/rvrc_inventory.xlsx
 """
 
 import json
-import time
-import uuid
 from datetime import date, datetime
 from pathlib import Path
-from typing import Optional
 
-import requests
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import Alignment, Font, PatternFill
-from openpyxl.utils import get_column_letter
+from core.elevate import ElevateClient
+from core.fx import sek_rates
+from core.report import ReportWriter
 
 # ── Elevate API configuration ──────────────────────────────────────────────────
 ELEVATE_CLUSTER_ID = "wA4BFC9F5"
-ELEVATE_BASE_URL   = f"https://{ELEVATE_CLUSTER_ID}.api.esales.apptus.cloud"
-ELEVATE_ENDPOINT   = "/api/storefront/v3/queries/landing-page"
-ELEVATE_LIMIT      = 600  # max allowed by API (1000 returns 400 error)
+ELEVATE_MAX_CONCURRENCY = 8  # in-flight requests against the cluster host (see core.elevate)
 
 # Custom attributes to request from Elevate (mirrors the E1 list in RVRC's
 # website JS bundle — BMqHAaDt.js, imported as `c0` / `xo` and passed as
@@ -102,14 +97,6 @@ MARKETS: dict[str, dict] = {
     "COM": {"elevate_market": "EU",  "locale": "en-001", "currency": "EUR"},
 }
 
-# FX fallback rates (local currency → SEK) used if the Frankfurter API is down
-FX_FALLBACKS: dict[str, float] = {
-    "SEK": 1.0,
-    "EUR": 11.5,
-    "NOK": 0.97,
-    "GBP": 13.0,
-}
-
 SCRIPT_DIR = Path(__file__).resolve().parent
 STATE_FILE = (SCRIPT_DIR / ".." / "data" / "rvrc_inventory_state.json").resolve()
 XLSX_PATH  = (SCRIPT_DIR / ".." / "data" / "rvrc_inventory.xlsx").resolve()
@@ -131,45 +118,6 @@ def save_state(state: dict) -> None:
     )
 
 
-# ── FX rates ───────────────────────────────────────────────────────────────────
-
-def fetch_fx_rates() -> dict[str, float]:
-    """
-    Fetch current exchange rates to SEK for all non-SEK market currencies via
-    the Frankfurter API (free, ECB-sourced).  Falls back to FX_FALLBACKS.
-
-    Returns {currency_code: sek_per_unit}, e.g. {"SEK": 1.0, "EUR": 11.5, ...}
-    """
-    non_sek = sorted({cfg["currency"] for cfg in MARKETS.values() if cfg["currency"] != "SEK"})
-    rates: dict[str, float] = {"SEK": 1.0}
-    if not non_sek:
-        return rates
-    try:
-        resp = requests.get(
-            f"https://api.frankfurter.app/latest?from=EUR&to=SEK,{','.join(non_sek)}",
-            timeout=10,
-        )
-        resp.raise_for_status()
-        data = resp.json()["rates"]
-        eur_sek = float(data["SEK"])
-        rates["EUR"] = eur_sek
-        for ccy in non_sek:
-            if ccy == "EUR":
-                continue
-            if ccy in data:
-                # Cross-rate: 1 ccy = (EUR/SEK) / (EUR/ccy) SEK
-                rates[ccy] = eur_sek / float(data[ccy])
-            else:
-                rates[ccy] = FX_FALLBACKS.get(ccy, 1.0)
-                print(f"  [FX] {ccy} not in API response — using fallback {rates[ccy]}")
-        print(f"  [FX] {rates}")
-    except Exception as e:
-        print(f"  [FX] API error ({e}) — using fallbacks")
-        for ccy in non_sek:
-            rates[ccy] = FX_FALLBACKS.get(ccy, 1.0)
-    return rates
-
-
 # ── Elevate API helpers ────────────────────────────────────────────────────────
 
 def _get_price(price_raw) -> float:
@@ -235,35 +183,6 @@ def _parse_category(breadcrumb_id: str, page_ref: str) -> str:
     )
 
 
-def fetch_elevate_page(
-    elevate_market: str, locale: str, page_ref: str,
-    skip: int = 0, customer_key: str = "", session_key: str = "",
-) -> Optional[dict]:
-    """Fetch one page from the Elevate landing-page API."""
-    params = {
-        "market":        elevate_market,
-        "locale":        locale,
-        "customerKey":   customer_key,
-        "sessionKey":    session_key,
-        "touchpoint":    "desktop",
-        "pageReference": page_ref,
-        "limit":         ELEVATE_LIMIT,
-        "skip":          skip,
-        "presentCustom": ELEVATE_PRESENT_CUSTOM,
-    }
-    try:
-        resp = requests.get(
-            ELEVATE_BASE_URL + ELEVATE_ENDPOINT,
-            params=params,
-            timeout=(10, 60),
-        )
-        resp.raise_for_status()
-        return resp.json()
-    except requests.RequestException as exc:
-        print(f"    [WARN] Elevate {page_ref} skip={skip}: {exc}")
-        return None
-
-
 def extract_variants_from_elevate(data: dict, page_ref: str = "") -> tuple[dict[str, dict], int, int]:
     """
     Extract variant data from an Elevate landing-page response.
@@ -348,42 +267,25 @@ MIN_EXPECTED_VARIANTS: dict[str, int] = {
 def fetch_all_by_market() -> dict[str, dict[str, dict]]:
     """
     Fetch variants for every market using the Voyado Elevate API directly.
-    ~5–15 total requests across all markets (<30s) vs old ~600 requests (~40min).
+    All markets, categories and page offsets are fetched concurrently through
+    core.elevate, so wall time is roughly the slowest single category.
 
     Returns
     -------
     {market_code: {variant_key: {"stock", "sell_price", "list_price", "title", "size"}}}
     """
-    result: dict[str, dict[str, dict]] = {}
-
-    for market_code, cfg in MARKETS.items():
-        elevate_market = cfg["elevate_market"]
-        locale         = cfg["locale"]
-        customer_key   = str(uuid.uuid4())
-        session_key    = str(uuid.uuid4())
-        print(f"\n[{market_code}] Elevate API (market={elevate_market}, locale={locale})")
-
-        market_variants: dict[str, dict] = {}
-
-        for cat in ELEVATE_CATEGORIES:
-            skip, page = 0, 1
-            while True:
-                data = fetch_elevate_page(
-                    elevate_market, locale, cat, skip, customer_key, session_key
-                )
-                if data is None:
-                    break
-                new_v, total_hits, pg_count = extract_variants_from_elevate(data, cat)
-                market_variants.update(new_v)
-                print(
-                    f"  {cat} p{page}: +{len(new_v)} variants "
-                    f"[{skip}–{skip + pg_count}/{total_hits}]"
-                )
-                skip += pg_count
-                if skip >= total_hits or pg_count == 0:
-                    break
-                page += 1
-
+    markets = {mc: {**cfg, "categories": ELEVATE_CATEGORIES} for mc, cfg in MARKETS.items()}
+    for market_code, cfg in markets.items():
+        print(f"  [{market_code}] Elevate API (market={cfg['elevate_market']}, locale={cfg['locale']})")
+
+    with ElevateClient(
+        ELEVATE_CLUSTER_ID,
+        base_params={"presentCustom": ELEVATE_PRESENT_CUSTOM},
+        max_concurrency=ELEVATE_MAX_CONCURRENCY,
+    ) as client:
+        result = client.fetch_markets(markets, extract_variants_from_elevate)
+
+    for market_code, market_variants in result.items():
         variant_count = len(market_variants)
         min_expected  = MIN_EXPECTED_VARIANTS.get(market_code, 5000)
         status = "OK" if variant_count >= min_expected else "LOW"
@@ -394,8 +296,6 @@ def fetch_all_by_market() -> dict[str, dict[str, dict]]:
                 f"(expected >= {min_expected:,}). Possible API change or fetch failure. ***"
             )
 
-        result[market_code] = market_variants
-
     return result
 
 
@@ -515,60 +415,41 @@ def compute_daily_from_slw(
     )
 
 
+def _append_sheet(report: ReportWriter, name: str, headers: list[str], new_rows: list[list]) -> None:
+    """Append-style sheet: the previous file's rows (and header, if any) streamed, then new_rows."""
+    existing_header = next(report.existing_rows(name, with_header=True), None)
+    if existing_header is not None:
+        headers = [h for h in existing_header if h is not None]
 
+    def _rows():
+        yield from report.existing_rows(name)
+        yield from new_rows
 
-_HDR_FILL = PatternFill("solid", fgColor="1F497D")
-_HDR_FONT = Font(bold=True, color="FFFFFF")
-
-
-def _write_headers(ws, headers: list[str]) -> None:
-    for col, h in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=h)
-        cell.fill = _HDR_FILL
-        cell.font = _HDR_FONT
-        cell.alignment = Alignment(horizontal="center")
-
-
-def _autofit(ws) -> None:
-    for col in ws.columns:
-        max_len = max((len(str(c.value)) for c in col if c.value is not None), default=8)
-        ws.column_dimensions[get_column_letter(col[0].column)].width = min(max_len + 4, 55)
+    report.sheet(name, headers, _rows)
 
 
 def write_excel(state: dict, per_product_color_today: list[dict]) -> None:
-    if XLSX_PATH.exists():
-        wb = load_workbook(XLSX_PATH)
-    else:
-        wb = Workbook()
-        for name in list(wb.sheetnames):
-            del wb[name]
+    report = ReportWriter(XLSX_PATH)
 
     today_row   = state["daily_sales"][-1] if state["daily_sales"] else {}
     fx_snapshot = today_row.get("fx_rates", {})
 
     # ── Sheet 1: Daily Summary (one row appended per run) ────────────────────
-    summary_name = "Daily Summary"
-    if summary_name in wb.sheetnames:
-        ws_sum = wb[summary_name]
-    else:
-        ws_sum = wb.create_sheet(summary_name)
-        _write_headers(ws_sum, [
-            "Date",
-            "Est. Daily Units (slw/7)",
-            "Est. Daily Rev Sell (EUR)",
-            "Est. Daily Rev List (EUR)",
-            "Avg Discount %",
-            "Product-Colors Active",
-            "EUR/SEK",
-        ])
-
     rev_sell = today_row.get("estimated_revenue_sell_eur", 0.0)
     rev_list = today_row.get("estimated_revenue_list_eur", 0.0)
     avg_disc = (
         round(100.0 * (1.0 - rev_sell / rev_list), 1)
         if rev_list > 0 else 0.0
     )
-    ws_sum.append([
+    _append_sheet(report, "Daily Summary", [
+        "Date",
+        "Est. Daily Units (slw/7)",
+        "Est. Daily Rev Sell (EUR)",
+        "Est. Daily Rev List (EUR)",
+        "Avg Discount %",
+        "Product-Colors Active",
+        "EUR/SEK",
+    ], [[
         today_row.get("date", ""),
         today_row.get("estimated_units_daily", 0),
         round(rev_sell, 0),
@@ -576,41 +457,30 @@ def write_excel(state: dict, per_product_color_today: list[dict]) -> None:
         avg_disc,
         today_row.get("product_colors_active", 0),
         fx_snapshot.get("EUR", ""),
-    ])
-    _autofit(ws_sum)
+    ]])
 
     # ── Sheet 2: By Category (one row per category per run, appended) ────────
-    by_cat_name = "By Category"
-    if by_cat_name in wb.sheetnames:
-        ws_cat = wb[by_cat_name]
-    else:
-        ws_cat = wb.create_sheet(by_cat_name)
-        _write_headers(ws_cat, [
-            "Date",
-            "Category",
-            "Est. Daily Units",
-            "Daily Rev Sell (EUR)",
-            "Daily Rev List (EUR)",
-            "Product-Colors",
-        ])
-
-    for cat_name, cdata in sorted(today_row.get("by_category", {}).items()):
-        ws_cat.append([
+    _append_sheet(report, "By Category", [
+        "Date",
+        "Category",
+        "Est. Daily Units",
+        "Daily Rev Sell (EUR)",
+        "Daily Rev List (EUR)",
+        "Product-Colors",
+    ], [
+        [
             today_row.get("date", ""),
             cat_name,
             cdata.get("units", 0),
             round(cdata.get("revenue_sell_eur", 0.0), 0),
             round(cdata.get("revenue_list_eur", 0.0), 0),
             cdata.get("product_colors", 0),
-        ])
-    _autofit(ws_cat)
+        ]
+        for cat_name, cdata in sorted(today_row.get("by_category", {}).items())
+    ])
 
     # ── Sheet 3: Latest Detail (replaced each run) ────────────────────────────
-    detail_name = "Latest Detail"
-    if detail_name in wb.sheetnames:
-        del wb[detail_name]
-    ws_det = wb.create_sheet(detail_name)
-    _write_headers(ws_det, [
+    report.sheet("Latest Detail", [
         "Product-Color Key",
         "Product Title",
         "Category",
@@ -621,9 +491,8 @@ def write_excel(state: dict, per_product_color_today: list[dict]) -> None:
         "Daily Rev Sell (EUR)",
         "Daily Rev List (EUR)",
         "Discount %",
-    ])
-    for row in sorted(per_product_color_today, key=lambda x: -x["sell_revenue_eur"]):
-        ws_det.append([
+    ], (
+        [
             row["key"],
             row["title"],
             row["category"],
@@ -634,10 +503,11 @@ def write_excel(state: dict, per_product_color_today: list[dict]) -> None:
             round(row["sell_revenue_eur"], 0),
             round(row["list_revenue_eur"], 0),
             row["discount_pct"],
-        ])
-    _autofit(ws_det)
+        ]
+        for row in sorted(per_product_color_today, key=lambda x: -x["sell_revenue_eur"])
+    ))
 
-    wb.save(XLSX_PATH)
+    report.save()
     print(f"  Saved -> {XLSX_PATH}")
 
 
@@ -659,7 +529,7 @@ def main() -> None:
         return
 
     print("\nFetching live FX rates ...")
-    fx_rates = fetch_fx_rates()
+    fx_rates = sek_rates(cfg["currency"] for cfg in MARKETS.values())
 
     print("\nFetching inventory across all markets and categories ...")
     curr_by_market = fetch_all_by_market()
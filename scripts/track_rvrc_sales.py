@@ -28,26 +28,24 @@ Output
 """
 
 import json
-import uuid
 from collections import defaultdict
 from datetime import date, datetime
 from pathlib import Path
 from typing import Optional
 
-import requests
 from openpyxl import Workbook, load_workbook
 from openpyxl.styles import Alignment, Font, PatternFill
 from openpyxl.utils import get_column_letter
 
 from core.db import safe_insert
+from core.elevate import ElevateClient
+from core.fx import sek_rates
 
 # ---------------------------------------------------------------------------
 # Elevate API configuration
 # ---------------------------------------------------------------------------
 ELEVATE_CLUSTER_ID = "wA4BFC9F5"
-ELEVATE_BASE_URL = f"https://{ELEVATE_CLUSTER_ID}.api.esales.apptus.cloud"
-ELEVATE_ENDPOINT = "/api/storefront/v3/queries/landing-page"
-ELEVATE_LIMIT = 600
+ELEVATE_MAX_CONCURRENCY = 8  # in-flight requests against the cluster host (see core.elevate)
 
 ELEVATE_PRESENT_CUSTOM = (
     "allcategories|color_name|features_name|fit_name|gender_name|isdead|"
@@ -72,13 +70,6 @@ MARKETS: dict[str, dict] = {
 
 MARKET_PRIORITY = ["DE", "SE", "NO", "UK", "COM"]
 
-FX_FALLBACKS: dict[str, float] = {
-    "SEK": 1.0,
-    "EUR": 11.5,
-    "NOK": 0.97,
-    "GBP": 13.0,
-}
-
 # ---------------------------------------------------------------------------
 # Paths
 # ---------------------------------------------------------------------------
@@ -123,39 +114,6 @@ def save_state(state: dict) -> None:
     )
 
 
-# ---------------------------------------------------------------------------
-# FX rates
-# ---------------------------------------------------------------------------
-
-def fetch_fx_rates() -> dict[str, float]:
-    non_sek = sorted({c["currency"] for c in MARKETS.values() if c["currency"] != "SEK"})
-    rates: dict[str, float] = {"SEK": 1.0}
-    if not non_sek:
-        return rates
-    try:
-        resp = requests.get(
-            f"https://api.frankfurter.app/latest?from=EUR&to=SEK,{','.join(non_sek)}",
-            timeout=10,
-        )
-        resp.raise_for_status()
-        data = resp.json()["rates"]
-        eur_sek = float(data["SEK"])
-        rates["EUR"] = eur_sek
-        for ccy in non_sek:
-            if ccy == "EUR":
-                continue
-            if ccy in data:
-                rates[ccy] = eur_sek / float(data[ccy])
-            else:
-                rates[ccy] = FX_FALLBACKS.get(ccy, 1.0)
-        print(f"  [FX] {rates}")
-    except Exception as e:
-        print(f"  [FX] API error ({e}) -- using fallbacks")
-        for ccy in non_sek:
-            rates[ccy] = FX_FALLBACKS.get(ccy, 1.0)
-    return rates
-
-
 # ---------------------------------------------------------------------------
 # Elevate API helpers
 # ---------------------------------------------------------------------------
@@ -185,28 +143,6 @@ def _parse_category(breadcrumb_id: str, page_ref: str) -> str:
             "shoes": "Shoes"}.get(page_ref, page_ref.capitalize())
 
 
-def fetch_elevate_page(
-    elevate_market: str, locale: str, page_ref: str,
-    skip: int = 0, customer_key: str = "", session_key: str = "",
-) -> Optional[dict]:
-    params = {
-        "market": elevate_market, "locale": locale,
-        "customerKey": customer_key, "sessionKey": session_key,
-        "touchpoint": "desktop", "pageReference": page_ref,
-        "limit": ELEVATE_LIMIT, "skip": skip,
-        "presentCustom": ELEVATE_PRESENT_CUSTOM,
-    }
-    try:
-        resp = requests.get(
-            ELEVATE_BASE_URL + ELEVATE_ENDPOINT, params=params, timeout=(10, 60),
-        )
-        resp.raise_for_status()
-        return resp.json()
-    except requests.RequestException as exc:
-        print(f"    [WARN] Elevate {page_ref} skip={skip}: {exc}")
-        return None
-
-
 def extract_variants(data: dict, page_ref: str = "") -> tuple[dict[str, dict], int, int]:
     """Extract variant data from an Elevate landing-page response."""
     variants: dict[str, dict] = {}
@@ -262,32 +198,15 @@ def extract_variants(data: dict, page_ref: str = "") -> tuple[dict[str, dict], i
 # ---------------------------------------------------------------------------
 
 def fetch_all_markets() -> dict[str, dict[str, dict]]:
-    result: dict[str, dict[str, dict]] = {}
-    for market_code, cfg in MARKETS.items():
-        elevate_market = cfg["elevate_market"]
-        locale = cfg["locale"]
-        customer_key = str(uuid.uuid4())
-        session_key = str(uuid.uuid4())
-        print(f"  [{market_code}] Fetching (market={elevate_market}) ...")
-        market_variants: dict[str, dict] = {}
-        for cat in ELEVATE_CATEGORIES:
-            skip, page = 0, 1
-            while True:
-                data = fetch_elevate_page(
-                    elevate_market, locale, cat, skip, customer_key, session_key,
-                )
-                if data is None:
-                    break
-                new_v, total_hits, pg_count = extract_variants(data, cat)
-                market_variants.update(new_v)
-                print(f"    {cat} p{page}: +{len(new_v)} variants "
-                      f"[{skip}-{skip + pg_count}/{total_hits}]")
-                skip += pg_count
-                if skip >= total_hits or pg_count == 0:
-                    break
-                page += 1
+    markets = {mc: {**cfg, "categories": ELEVATE_CATEGORIES} for mc, cfg in MARKETS.items()}
+    with ElevateClient(
+        ELEVATE_CLUSTER_ID,
+        base_params={"presentCustom": ELEVATE_PRESENT_CUSTOM},
+        max_concurrency=ELEVATE_MAX_CONCURRENCY,
+    ) as client:
+        result = client.fetch_markets(markets, extract_variants)
+    for market_code, market_variants in result.items():
         print(f"  [{market_code}] {len(market_variants):,} unique variants")
-        result[market_code] = market_variants
     return result
 
 
@@ -604,7 +523,7 @@ def main() -> None:
         return
 
     print("\nFetching FX rates ...")
-    fx_rates = fetch_fx_rates()
+    fx_rates = sek_rates(cfg["currency"] for cfg in MARKETS.values())
 
     print("\nFetching inventory from Elevate API ...")
     data_by_market = fetch_all_markets()
@@ -0,0 +1,6 @@
+alter table ted_tracked_companies add column if not exists lot_detail boolean not null default false;
+
+-- Companies that were in the hardcoded DETAIL_COMPANIES set.
+update ted_tracked_companies
+   set lot_detail = true
+ where company = 'EQL Pharma AB';
@@ -0,0 +1,9 @@
+create table if not exists fx_rate_daily (
+    rate_date    date    not null,
+    currency     text    not null,
+    per_eur      numeric not null,
+    as_of        date    not null,
+    source       text    not null,
+    fetched_at   timestamptz not null,
+    primary key (rate_date, currency)
+);
@@ -0,0 +1,14 @@
+-- Indexes behind the incremental daily-sales refreshes. Then create the
+-- rugvista_daily_sales / ahlsell_plejd_sales_daily / anoto_daily_sales
+-- tables from sql/schema.sql, apply sql/views/{rugvista_daily_sales,
+-- ahlsell_plejd_sales,anoto_daily_sales}.sql for the refresh functions,
+-- and backfill each table once:
+--   select refresh_rugvista_daily_sales('-infinity');
+--   select refresh_ahlsell_plejd_sales_daily('-infinity');
+--   select refresh_anoto_daily_sales('-infinity');
+
+create index if not exists rugvista_variant_snapshot_product_captured_idx
+  on rugvista_variant_snapshot (product_id, captured_at);
+
+create index if not exists anoto_variant_snapshot_variant_date_idx
+  on anoto_variant_snapshot (store, variant_id, snapshot_date);
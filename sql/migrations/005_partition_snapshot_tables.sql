@@ -0,0 +1,79 @@
+-- Convert the five per-day snapshot tables to monthly range partitions on
+-- snapshot_date, with BRIN indexes on the date columns. Apply
+-- sql/partitions.sql first (create_snapshot_partition is used below), then
+-- this file, then re-apply sql/views/{rugvista_daily_sales,
+-- ahlsell_plejd_sales,anoto_daily_sales}.sql - their views are dropped here
+-- because they'd otherwise keep pointing at the old, renamed tables.
+--
+-- Each table is renamed to <table>_unpartitioned, recreated partitioned
+-- (month partitions from its first snapshot_date to three months ahead,
+-- plus <table>_default), copied, row-count checked and dropped - all in one
+-- transaction, so any failure leaves the old tables untouched.
+--
+-- rugvista_variant_snapshot's primary key changes from
+-- (captured_at, product_id) to (snapshot_date, product_id): a partitioned
+-- table's unique constraints must include the partition key, and
+-- rugvista_variant_snapshot_day_uk already enforced exactly that key, so no
+-- existing row is affected. load_rugvista_history.py now conflicts on it.
+
+begin;
+
+drop view if exists rugvista_daily_sales_v;
+drop view if exists ahlsell_plejd_sales_v;
+drop view if exists anoto_daily_sales_v;
+
+create function pg_temp.partition_snapshot_table(p_table text, p_key text)
+returns void
+language plpgsql
+as $$
+declare
+    v_old    text := p_table || '_unpartitioned';
+    v_month  date;
+    v_before bigint;
+    v_after  bigint;
+begin
+    execute format('alter table %I rename to %I', p_table, v_old);
+    execute format('alter index if exists %I rename to %I', p_table || '_pkey', v_old || '_pkey');
+
+    execute format('create table %I (like %I including defaults) partition by range (snapshot_date)',
+                   p_table, v_old);
+    execute format('alter table %I add primary key (%s)', p_table, p_key);
+    execute format('create table %I partition of %I default', p_table || '_default', p_table);
+
+    execute format('select date_trunc(''month'', coalesce(min(snapshot_date), current_date))::date from %I', v_old)
+        into v_month;
+    while v_month <= date_trunc('month', current_date) + interval '3 months' loop
+        perform create_snapshot_partition(p_table, v_month);
+        v_month := (v_month + interval '1 month')::date;
+    end loop;
+
+    execute format('insert into %I select * from %I', p_table, v_old);
+    execute format('select count(*) from %I', v_old) into v_before;
+    execute format('select count(*) from %I', p_table) into v_after;
+    if v_before <> v_after then
+        raise exception '%: copied % of % rows', p_table, v_after, v_before;
+    end if;
+    execute format('drop table %I', v_old);
+
+    execute format('create index %I on %I using brin (snapshot_date)', p_table || '_date_brin', p_table);
+end;
+$$;
+
+drop index if exists rugvista_variant_snapshot_day_uk;
+drop index if exists rugvista_variant_snapshot_product_captured_idx;
+drop index if exists anoto_variant_snapshot_variant_date_idx;
+
+select pg_temp.partition_snapshot_table('nelly_variant_snapshot',    'snapshot_date, site, product_key');
+select pg_temp.partition_snapshot_table('rvrc_variant_snapshot',     'snapshot_date, base_key');
+select pg_temp.partition_snapshot_table('ahlsell_stock_snapshot',    'snapshot_date, article, warehouse_id');
+select pg_temp.partition_snapshot_table('anoto_variant_snapshot',    'snapshot_date, store, variant_id');
+select pg_temp.partition_snapshot_table('rugvista_variant_snapshot', 'snapshot_date, product_id');
+
+create index rugvista_variant_snapshot_captured_brin
+  on rugvista_variant_snapshot using brin (captured_at);
+create index rugvista_variant_snapshot_product_captured_idx
+  on rugvista_variant_snapshot (product_id, captured_at);
+create index anoto_variant_snapshot_variant_date_idx
+  on anoto_variant_snapshot (store, variant_id, snapshot_date);
+
+commit;
@@ -0,0 +1,5 @@
+-- track_nelly_aov.py now records how many of the ten topplistan pages failed
+-- on each day (and skips the day if too many did). Rows from before this
+-- stay NULL.
+
+alter table nelly_aov add column if not exists failed_pages integer;
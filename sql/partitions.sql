@@ -0,0 +1,99 @@
+-- Monthly partition maintenance for the per-day snapshot tables
+-- (nelly_variant_snapshot, rvrc_variant_snapshot, ahlsell_stock_snapshot,
+-- anoto_variant_snapshot, rugvista_variant_snapshot).
+--
+-- Each of those is PARTITION BY RANGE (snapshot_date) with one partition per
+-- calendar month, named <table>_YYYY_MM, plus a <table>_default partition
+-- that catches any day whose month hasn't been created yet - so a missed
+-- create_snapshot_partitions() run never makes an insert fail, it only
+-- lands rows in the default partition until the month is created (which
+-- moves them out again).
+--
+-- Apply this file before sql/migrations/005_partition_snapshot_tables.sql
+-- (the migration uses create_snapshot_partition), and run
+--   select create_snapshot_partitions();
+-- once a month or so to keep the next few months pre-created. Retention is
+-- detach_snapshot_partitions(): the detached month stays as a plain table
+-- to dump/archive and drop by hand, nothing is deleted here.
+
+create or replace function create_snapshot_partition(p_table text, p_month date)
+returns boolean
+language plpgsql
+as $$
+declare
+    v_from    date := date_trunc('month', p_month)::date;
+    v_to      date := (date_trunc('month', p_month) + interval '1 month')::date;
+    v_name    text := p_table || '_' || to_char(p_month, 'YYYY_MM');
+    v_default text := p_table || '_default';
+begin
+    if to_regclass(v_name) is not null then
+        return false;
+    end if;
+
+    -- Built detached and attached afterwards, so rows already sitting in the
+    -- default partition for this month can be moved in first (attaching a
+    -- range that overlaps rows still in the default partition is an error).
+    execute format('create table %I (like %I including defaults)', v_name, p_table);
+    if to_regclass(v_default) is not null then
+        execute format(
+            'with moved as (delete from %I where snapshot_date >= %L and snapshot_date < %L returning *)
+             insert into %I select * from moved',
+            v_default, v_from, v_to, v_name);
+    end if;
+    execute format('alter table %I attach partition %I for values from (%L) to (%L)',
+                   p_table, v_name, v_from, v_to);
+    return true;
+end;
+$$;
+
+-- Pre-create this month and the next p_months_ahead months for every
+-- partitioned snapshot table. Idempotent; returns how many partitions were
+-- actually created.
+create or replace function create_snapshot_partitions(p_months_ahead int default 3)
+returns integer
+language plpgsql
+as $$
+declare
+    v_table   text;
+    v_offset  int;
+    v_created int := 0;
+begin
+    foreach v_table in array array[
+        'nelly_variant_snapshot', 'rvrc_variant_snapshot', 'ahlsell_stock_snapshot',
+        'anoto_variant_snapshot', 'rugvista_variant_snapshot'
+    ] loop
+        for v_offset in 0 .. p_months_ahead loop
+            if create_snapshot_partition(
+                   v_table, (date_trunc('month', current_date) + make_interval(months => v_offset))::date) then
+                v_created := v_created + 1;
+            end if;
+        end loop;
+    end loop;
+    return v_created;
+end;
+$$;
+
+-- Detach every monthly partition of p_table that ends on or before
+-- p_before (e.g. '2025-01-01' detaches 2024 and earlier). Returns the
+-- detached table names.
+create or replace function detach_snapshot_partitions(p_table text, p_before date)
+returns setof text
+language plpgsql
+as $$
+declare
+    v_name text;
+begin
+    for v_name in
+        select c.relname
+        from pg_inherits i
+        join pg_class c on c.oid = i.inhrelid
+        where i.inhparent = p_table::regclass
+          and c.relname ~ ('^' || p_table || '_\d{4}_\d{2}$')
+          and to_date(right(c.relname, 7), 'YYYY_MM') + interval '1 month' <= p_before
+        order by c.relname
+    loop
+        execute format('alter table %I detach partition %I', p_table, v_name);
+        return next v_name;
+    end loop;
+end;
+$$;
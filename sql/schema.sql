@@ -1,3 +1,11 @@
+-- Per-day snapshot tables (rugvista/ahlsell_stock/anoto/rvrc/nelly
+-- *_snapshot) are PARTITION BY RANGE (snapshot_date), one partition per
+-- month plus a default partition (created at the end of this file), with
+-- BRIN indexes on the date columns. Monthly partitions are created by
+-- sql/partitions.sql - apply it after this file and run
+--   select create_snapshot_partitions();
+-- (migration 005 converted the existing tables).
+
 -- rugvista_variant_snapshot
 -- One row per product variant per snapshot capture: historical backfill from
 -- raw/rugvista_state/*.json (scripts/tools/load_rugvista_history.py) plus
@@ -14,14 +22,18 @@ CREATE TABLE IF NOT EXISTS rugvista_variant_snapshot (
     price_sek      numeric,
     available      int,
     snapshot_date  date        NOT NULL,
-    PRIMARY KEY (captured_at, product_id)
-);
+    -- Day-level key: lets the live script use ON CONFLICT (snapshot_date, product_id)
+    -- so re-running it the same day doesn't create a second row per variant, even
+    -- though captured_at differs slightly between runs. (Was (captured_at,
+    -- product_id) plus a unique index on this key before partitioning - a
+    -- partitioned table's primary key has to include snapshot_date.)
+    PRIMARY KEY (snapshot_date, product_id)
+) PARTITION BY RANGE (snapshot_date);
 
--- Day-level dedup key: lets the live script use ON CONFLICT (snapshot_date, product_id)
--- so re-running it the same day doesn't create a second row per variant, even
--- though captured_at differs slightly between runs.
-CREATE UNIQUE INDEX IF NOT EXISTS rugvista_variant_snapshot_day_uk
-    ON rugvista_variant_snapshot (snapshot_date, product_id);
+CREATE INDEX IF NOT EXISTS rugvista_variant_snapshot_date_brin
+    ON rugvista_variant_snapshot USING brin (snapshot_date);
+CREATE INDEX IF NOT EXISTS rugvista_variant_snapshot_captured_brin
+    ON rugvista_variant_snapshot USING brin (captured_at);
 
 -- ahlsell_stock_snapshot
 -- One row per article per warehouse per day (Ahlsell/Plejd inventory tracking).
@@ -31,7 +43,10 @@ CREATE TABLE IF NOT EXISTS ahlsell_stock_snapshot (
     warehouse_id   text NOT NULL,
     quantity       numeric,
     PRIMARY KEY (snapshot_date, article, warehouse_id)
-);
+) PARTITION BY RANGE (snapshot_date);
+
+CREATE INDEX IF NOT EXISTS ahlsell_stock_snapshot_date_brin
+    ON ahlsell_stock_snapshot USING brin (snapshot_date);
 
 -- ahlsell_article
 -- Article metadata. category is categorized once via
@@ -151,7 +166,10 @@ CREATE TABLE IF NOT EXISTS anoto_variant_snapshot (
     currency       text,
     quantity       int,
     PRIMARY KEY (snapshot_date, store, variant_id)
-);
+) PARTITION BY RANGE (snapshot_date);
+
+CREATE INDEX IF NOT EXISTS anoto_variant_snapshot_date_brin
+    ON anoto_variant_snapshot USING brin (snapshot_date);
 
 -- rvrc_sales_daily_summary
 -- Daily aggregated RevolutionRace sales metrics (sale_last_week/
@@ -192,7 +210,10 @@ CREATE TABLE IF NOT EXISTS rvrc_variant_snapshot (
     sell_price_eur   numeric,
     list_price_eur   numeric,
     PRIMARY KEY (snapshot_date, base_key)
-);
+) PARTITION BY RANGE (snapshot_date);
+
+CREATE INDEX IF NOT EXISTS rvrc_variant_snapshot_date_brin
+    ON rvrc_variant_snapshot USING brin (snapshot_date);
 
 -- nelly_daily_summary
 -- Daily aggregated Nelly/NlyMan inventory-delta sales estimate, computed by
@@ -244,17 +265,23 @@ CREATE TABLE IF NOT EXISTS nelly_variant_snapshot (
     primary_stock     int,
     listed_count      int,
     PRIMARY KEY (snapshot_date, site, product_key)
-);
+) PARTITION BY RANGE (snapshot_date);
+
+CREATE INDEX IF NOT EXISTS nelly_variant_snapshot_date_brin
+    ON nelly_variant_snapshot USING brin (snapshot_date);
 
 -- ted_tracked_companies
 -- Companies fetch_ted_procurements.py fetches TED notices for. Data instead
 -- of a hardcoded Python list, so adding a company doesn't need a code
 -- change. The script falls back to a small built-in default list if this
 -- table can't be read (must never let a DB problem stop the fetch).
+-- lot_detail: also download and parse each notice's eForms XML into
+-- ted_lot_tender (was the hardcoded DETAIL_COMPANIES set; migration 002).
 CREATE TABLE IF NOT EXISTS ted_tracked_companies (
     company       text PRIMARY KEY,
     search_terms  jsonb NOT NULL,
-    org_numbers   jsonb NOT NULL DEFAULT '[]'::jsonb
+    org_numbers   jsonb NOT NULL DEFAULT '[]'::jsonb,
+    lot_detail    boolean NOT NULL DEFAULT false
 );
 
 -- ted_procurement_notice
@@ -299,6 +326,7 @@ CREATE TABLE IF NOT EXISTS nelly_aov (
     snapshot_date   date NOT NULL,
     median_price    numeric,
     average_price   numeric,
+    failed_pages    integer,        -- topplistan pages that failed; NULL before it was tracked
     PRIMARY KEY (snapshot_date)
 );
 
@@ -395,3 +423,81 @@ CREATE TABLE IF NOT EXISTS ted_lot_tender (
     last_seen_at           timestamptz NOT NULL,
     PRIMARY KEY (company, publication_number, lot_id)
 );
+
+-- fx_rate_daily
+-- One day's exchange-rate vector from scripts/core/fx.py: units of currency
+-- per 1 EUR for every currency the provider publishes, stored under the
+-- calendar day it was requested for (as_of is the provider's publication
+-- date, e.g. Friday's ECB fixing for a Sunday run). Any pair is derived as
+-- per_eur(quote) / per_eur(currency). Written once per day by whichever
+-- script first needs rates; the same data is cached in data/fx_rates.json.
+CREATE TABLE IF NOT EXISTS fx_rate_daily (
+    rate_date    date    NOT NULL,
+    currency     text    NOT NULL,
+    per_eur      numeric NOT NULL,
+    as_of        date    NOT NULL,
+    source       text    NOT NULL,
+    fetched_at   timestamptz NOT NULL,
+    PRIMARY KEY (rate_date, currency)
+);
+
+-- Supporting indexes for the incremental aggregate refreshes below: each
+-- snapshot row's previous snapshot is found by one index probe on
+-- (natural key, time) instead of a window over the whole history.
+CREATE INDEX IF NOT EXISTS rugvista_variant_snapshot_product_captured_idx
+    ON rugvista_variant_snapshot (product_id, captured_at);
+CREATE INDEX IF NOT EXISTS anoto_variant_snapshot_variant_date_idx
+    ON anoto_variant_snapshot (store, variant_id, snapshot_date);
+
+-- rugvista_daily_sales
+-- Materialised rugvista_daily_sales_v (same columns), one row per day,
+-- maintained by refresh_rugvista_daily_sales() in
+-- sql/views/rugvista_daily_sales.sql after each load. day_captured_at is
+-- the day's first captured_at, kept so the next refresh can compute
+-- hours_since_prev_snapshot without rescanning history.
+CREATE TABLE IF NOT EXISTS rugvista_daily_sales (
+    day                        date NOT NULL,
+    units_sold                 bigint NOT NULL,
+    revenue_sek                numeric NOT NULL,
+    aov                        numeric,
+    hours_since_prev_snapshot  numeric,
+    new_variants               bigint NOT NULL,
+    day_captured_at            timestamptz NOT NULL,
+    refreshed_at               timestamptz NOT NULL,
+    PRIMARY KEY (day)
+);
+
+-- ahlsell_plejd_sales_daily
+-- Materialised ahlsell_plejd_sales_v (same columns plus the date each row
+-- was compared against), maintained by refresh_ahlsell_plejd_sales_daily()
+-- in sql/views/ahlsell_plejd_sales.sql after each load.
+CREATE TABLE IF NOT EXISTS ahlsell_plejd_sales_daily (
+    snapshot_date  date NOT NULL,
+    category       text NOT NULL,
+    sales_out      numeric NOT NULL,
+    sales_in       numeric NOT NULL,
+    prev_date      date NOT NULL,
+    refreshed_at   timestamptz NOT NULL,
+    PRIMARY KEY (snapshot_date, category)
+);
+
+-- anoto_daily_sales
+-- Materialised anoto_daily_sales_v (same columns), maintained by
+-- refresh_anoto_daily_sales() in sql/views/anoto_daily_sales.sql after
+-- each load.
+CREATE TABLE IF NOT EXISTS anoto_daily_sales (
+    snapshot_date     date NOT NULL,
+    store             text NOT NULL,
+    est_sold_units    bigint NOT NULL,
+    est_sold_revenue  numeric NOT NULL,
+    refreshed_at      timestamptz NOT NULL,
+    PRIMARY KEY (snapshot_date, store)
+);
+
+-- Default partitions for the snapshot tables: catch any day whose month
+-- partition hasn't been created yet (see sql/partitions.sql).
+CREATE TABLE IF NOT EXISTS rugvista_variant_snapshot_default PARTITION OF rugvista_variant_snapshot DEFAULT;
+CREATE TABLE IF NOT EXISTS ahlsell_stock_snapshot_default    PARTITION OF ahlsell_stock_snapshot DEFAULT;
+CREATE TABLE IF NOT EXISTS anoto_variant_snapshot_default    PARTITION OF anoto_variant_snapshot DEFAULT;
+CREATE TABLE IF NOT EXISTS rvrc_variant_snapshot_default     PARTITION OF rvrc_variant_snapshot DEFAULT;
+CREATE TABLE IF NOT EXISTS nelly_variant_snapshot_default    PARTITION OF nelly_variant_snapshot DEFAULT;
@@ -79,3 +79,103 @@ SELECT
 FROM with_category
 GROUP BY curr_date, category
 ORDER BY curr_date, category;
+
+-- ahlsell_plejd_sales_daily (table) / refresh_ahlsell_plejd_sales_daily(p_since)
+--
+-- Incrementally maintained copy of ahlsell_plejd_sales_v for the
+-- dashboard. Recomputes only snapshot dates >= p_since (default: the
+-- newest date already in the table), each against the immediately
+-- preceding date that has data - the same pairing the view gets from
+-- LAG() over distinct dates, but found with an index range scan on the
+-- snapshot_date-leading primary key instead of reading every row. The same
+-- FULL OUTER JOIN / COALESCE(…, 0) and current ahlsell_article.category
+-- apply, so the KNOWN_ISSUES.md #3/#5 caveats on the view apply here too.
+--
+-- Called after each load (track_ahlsell_plejd_inventory.py, via
+-- core.db.safe_refresh). Categories are resolved at refresh time: after
+-- recategorising articles in ahlsell_article, or after changing the view,
+-- rebuild everything with
+--     SELECT refresh_ahlsell_plejd_sales_daily('-infinity');
+-- and check that
+--     SELECT * FROM ahlsell_plejd_sales_v
+--     EXCEPT SELECT snapshot_date, category, sales_out, sales_in FROM ahlsell_plejd_sales_daily;
+-- returns no rows.
+
+CREATE OR REPLACE FUNCTION refresh_ahlsell_plejd_sales_daily(p_since date DEFAULT NULL)
+RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_since date;
+    v_rows  integer;
+BEGIN
+    v_since := COALESCE(p_since, (SELECT MAX(snapshot_date) FROM ahlsell_plejd_sales_daily), '-infinity'::date);
+
+    DELETE FROM ahlsell_plejd_sales_daily WHERE snapshot_date >= v_since;
+
+    INSERT INTO ahlsell_plejd_sales_daily
+        (snapshot_date, category, sales_out, sales_in, prev_date, refreshed_at)
+    WITH distinct_dates AS (
+        -- The refreshed dates plus the one date before them (their first
+        -- comparison partner). Aggregated before LAG, as in the view.
+        SELECT DISTINCT snapshot_date FROM ahlsell_stock_snapshot WHERE snapshot_date >= v_since
+        UNION
+        SELECT MAX(snapshot_date) FROM ahlsell_stock_snapshot WHERE snapshot_date < v_since
+    ),
+    dates AS (
+        SELECT
+            snapshot_date,
+            LAG(snapshot_date) OVER (ORDER BY snapshot_date) AS prev_date
+        FROM distinct_dates
+        WHERE snapshot_date IS NOT NULL
+    ),
+    pairs AS (
+        SELECT snapshot_date, prev_date
+        FROM dates
+        WHERE prev_date IS NOT NULL AND snapshot_date >= v_since
+    ),
+    curr_rows AS (
+        SELECT d.snapshot_date AS curr_date, s.article, s.warehouse_id, s.quantity
+        FROM pairs d
+        JOIN ahlsell_stock_snapshot s ON s.snapshot_date = d.snapshot_date
+    ),
+    prev_rows AS (
+        SELECT d.snapshot_date AS curr_date, s.article, s.warehouse_id, s.quantity AS prev_quantity
+        FROM pairs d
+        JOIN ahlsell_stock_snapshot s ON s.snapshot_date = d.prev_date
+    ),
+    joined AS (
+        SELECT
+            COALESCE(c.curr_date, p.curr_date)       AS curr_date,
+            COALESCE(c.article, p.article)           AS article,
+            COALESCE(c.warehouse_id, p.warehouse_id) AS warehouse_id,
+            COALESCE(c.quantity, 0)      AS curr_qty,
+            COALESCE(p.prev_quantity, 0) AS prev_qty
+        FROM curr_rows c
+        FULL OUTER JOIN prev_rows p
+            ON c.curr_date = p.curr_date
+           AND c.article = p.article
+           AND c.warehouse_id = p.warehouse_id
+    ),
+    with_category AS (
+        SELECT
+            j.curr_date,
+            COALESCE(a.category, 'Övrigt') AS category,
+            j.curr_qty - j.prev_qty AS delta
+        FROM joined j
+        LEFT JOIN ahlsell_article a ON a.article = j.article
+    )
+    SELECT
+        w.curr_date,
+        w.category,
+        SUM(CASE WHEN w.delta < 0 THEN -w.delta ELSE 0 END),
+        SUM(CASE WHEN w.delta > 0 THEN w.delta  ELSE 0 END),
+        p.prev_date,
+        now()
+    FROM with_category w
+    JOIN pairs p ON p.snapshot_date = w.curr_date
+    GROUP BY w.curr_date, w.category, p.prev_date;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$;
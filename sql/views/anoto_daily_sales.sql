@@ -52,3 +52,60 @@ FROM lag
 WHERE prev_quantity IS NOT NULL
 GROUP BY snapshot_date, store
 ORDER BY snapshot_date, store;
+
+-- anoto_daily_sales (table) / refresh_anoto_daily_sales(p_since)
+--
+-- Incrementally maintained copy of anoto_daily_sales_v for the dashboard.
+-- Recomputes only snapshot dates >= p_since (default: the newest date
+-- already in the table). Each variant row's previous snapshot is one probe
+-- of anoto_variant_snapshot_variant_date_idx rather than a LAG() window
+-- over the store's whole history; the one-calendar-day gap guard and the
+-- "no previous snapshot = skipped" rule are the view's.
+--
+-- Called after each load (track_anoto_inventory.py, via
+-- core.db.safe_refresh). After changing the view, change this function to
+-- match and rebuild everything with
+--     SELECT refresh_anoto_daily_sales('-infinity');
+-- and check that
+--     SELECT * FROM anoto_daily_sales_v
+--     EXCEPT SELECT snapshot_date, store, est_sold_units, est_sold_revenue FROM anoto_daily_sales;
+-- returns no rows.
+
+CREATE OR REPLACE FUNCTION refresh_anoto_daily_sales(p_since date DEFAULT NULL)
+RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_since date;
+    v_rows  integer;
+BEGIN
+    v_since := COALESCE(p_since, (SELECT MAX(snapshot_date) FROM anoto_daily_sales), '-infinity'::date);
+
+    DELETE FROM anoto_daily_sales WHERE snapshot_date >= v_since;
+
+    INSERT INTO anoto_daily_sales
+        (snapshot_date, store, est_sold_units, est_sold_revenue, refreshed_at)
+    SELECT
+        s.snapshot_date,
+        s.store,
+        SUM(CASE WHEN s.snapshot_date - p.snapshot_date <= 1
+                 THEN GREATEST(0, p.quantity - s.quantity) ELSE 0 END)::bigint,
+        ROUND(SUM(CASE WHEN s.snapshot_date - p.snapshot_date <= 1
+                       THEN GREATEST(0, p.quantity - s.quantity) * s.price ELSE 0 END), 2),
+        now()
+    FROM anoto_variant_snapshot s
+    JOIN LATERAL (
+        SELECT prev.quantity, prev.snapshot_date
+        FROM anoto_variant_snapshot prev
+        WHERE prev.store = s.store
+          AND prev.variant_id = s.variant_id
+          AND prev.snapshot_date < s.snapshot_date
+        ORDER BY prev.snapshot_date DESC
+        LIMIT 1
+    ) p ON p.quantity IS NOT NULL
+    WHERE s.snapshot_date >= v_since
+    GROUP BY s.snapshot_date, s.store;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$;
@@ -93,3 +93,113 @@ JOIN day_gaps g ON g.day = d.day
 LEFT JOIN variant_metrics vm ON vm.day = d.day
 GROUP BY d.day, g.hours_since_prev_snapshot
 ORDER BY d.day;
+
+-- rugvista_daily_sales (table) / refresh_rugvista_daily_sales(p_since)
+--
+-- Incrementally maintained copy of rugvista_daily_sales_v for the
+-- dashboard: the view re-runs LAG() over the whole snapshot history on
+-- every Power Query refresh, the table is just read. The function
+-- recomputes only days >= p_since (default: the newest day already in the
+-- table, so a same-day rerun is picked up too) with exactly the view's
+-- rules - each variant row is compared to its previous snapshot found by
+-- one probe of rugvista_variant_snapshot_product_captured_idx instead of a
+-- window over all history, and hours_since_prev_snapshot continues from
+-- the last day already aggregated. Days are keyed by snapshot_date, which
+-- is the Europe/Stockholm date of captured_at (migration 001).
+--
+-- Called after each load (track_rugvista_daily_sales.py, via
+-- core.db.safe_refresh). After changing the view, change this function to
+-- match and rebuild everything with
+--     SELECT refresh_rugvista_daily_sales('-infinity');
+-- then check that
+--     SELECT * FROM rugvista_daily_sales_v
+--     EXCEPT SELECT day, units_sold, revenue_sek, aov, hours_since_prev_snapshot, new_variants
+--            FROM rugvista_daily_sales;
+-- returns no rows.
+
+CREATE OR REPLACE FUNCTION refresh_rugvista_daily_sales(p_since date DEFAULT NULL)
+RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_since        date;
+    v_prev_capture timestamptz;
+    v_rows         integer;
+BEGIN
+    v_since := COALESCE(p_since, (SELECT MAX(day) FROM rugvista_daily_sales), '-infinity'::date);
+
+    DELETE FROM rugvista_daily_sales WHERE day >= v_since;
+    SELECT day_captured_at INTO v_prev_capture
+      FROM rugvista_daily_sales ORDER BY day DESC LIMIT 1;
+
+    INSERT INTO rugvista_daily_sales
+        (day, units_sold, revenue_sek, aov, hours_since_prev_snapshot, new_variants,
+         day_captured_at, refreshed_at)
+    WITH day_snapshots AS (
+        SELECT snapshot_date AS day, MIN(captured_at) AS day_captured_at
+        FROM rugvista_variant_snapshot
+        WHERE snapshot_date >= v_since
+        GROUP BY 1
+    ),
+    day_gaps AS (
+        SELECT
+            day,
+            day_captured_at,
+            EXTRACT(EPOCH FROM (
+                day_captured_at - COALESCE(
+                    LAG(day_captured_at) OVER (ORDER BY day_captured_at), v_prev_capture)
+            )) / 3600.0 AS hours_since_prev_snapshot
+        FROM day_snapshots
+    ),
+    variant_metrics AS (
+        SELECT
+            s.snapshot_date AS day,
+            p.available IS NULL AS is_new_variant,
+            CASE
+                WHEN p.available IS NOT NULL
+                 AND s.price_sek IS NOT NULL
+                 AND s.snapshot_date - p.snapshot_date <= 1
+                 AND s.available < p.available
+                THEN p.available - s.available
+                ELSE 0
+            END AS units_sold,
+            CASE
+                WHEN p.available IS NOT NULL
+                 AND s.price_sek IS NOT NULL
+                 AND s.snapshot_date - p.snapshot_date <= 1
+                 AND s.available < p.available
+                THEN (p.available - s.available) * s.price_sek
+                ELSE 0
+            END AS revenue_sek
+        FROM rugvista_variant_snapshot s
+        LEFT JOIN LATERAL (
+            SELECT prev.available, prev.snapshot_date
+            FROM rugvista_variant_snapshot prev
+            WHERE prev.product_id = s.product_id
+              AND prev.captured_at < s.captured_at
+            ORDER BY prev.captured_at DESC
+            LIMIT 1
+        ) p ON true
+        WHERE s.snapshot_date >= v_since
+    )
+    SELECT
+        d.day,
+        COALESCE(SUM(vm.units_sold), 0)::bigint,
+        ROUND(COALESCE(SUM(vm.revenue_sek), 0), 2),
+        CASE
+            WHEN COALESCE(SUM(vm.units_sold), 0) > 0
+            THEN ROUND(SUM(vm.revenue_sek) / SUM(vm.units_sold), 2)
+            ELSE NULL
+        END,
+        g.hours_since_prev_snapshot,
+        COUNT(*) FILTER (WHERE vm.is_new_variant),
+        d.day_captured_at,
+        now()
+    FROM day_snapshots d
+    JOIN day_gaps g ON g.day = d.day
+    LEFT JOIN variant_metrics vm ON vm.day = d.day
+    GROUP BY d.day, d.day_captured_at, g.hours_since_prev_snapshot;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$;